@@ -0,0 +1,83 @@
+"""
+Micro-benchmark for web_portal.spatial_index.
+
+Builds a GridIndex over synthetic points spread over Pakistan's bounding box
+and compares radius and nearest queries with the linear haversine scan the
+views used to do. No database is needed.
+
+    python manage.py bench_spatial_index --points 100000 --queries 200
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from web_portal.spatial_index import GridIndex, haversine_km
+
+LAT_RANGE = (24.0, 37.0)
+LNG_RANGE = (61.0, 77.0)
+
+
+def scan_within(points, lat, lng, radius_km):
+    hits = []
+    for key, plat, plng in points:
+        distance = haversine_km(lat, lng, plat, plng)
+        if distance <= radius_km:
+            hits.append((distance, key))
+    hits.sort(key=lambda hit: hit[0])
+    return hits
+
+
+def scan_nearest(points, lat, lng, k):
+    return sorted((haversine_km(lat, lng, plat, plng), key) for key, plat, plng in points)[:k]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark spatial index radius/nearest queries against a linear scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100000, help='Synthetic points to index')
+        parser.add_argument('--queries', type=int, default=200, help='Queries per case')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per case (best is reported)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def best_of(self, repeat, fn):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        points = [(i, rnd.uniform(*LAT_RANGE), rnd.uniform(*LNG_RANGE)) for i in range(options['points'])]
+        queries = [(rnd.uniform(*LAT_RANGE), rnd.uniform(*LNG_RANGE)) for _ in range(options['queries'])]
+        repeat = options['repeat']
+        cell_deg = getattr(settings, 'SPATIAL_INDEX_CELL_DEG', 0.05)
+
+        build = self.best_of(repeat, lambda: GridIndex(points, cell_deg=cell_deg))
+        index = GridIndex(points, cell_deg=cell_deg)
+        self.stdout.write(f'{len(points)} points, {len(queries)} queries, {cell_deg} deg cells, best of {repeat}')
+        self.stdout.write(f'{"build":<24} {build * 1e3:9.1f} ms')
+
+        # The linear scan is slow; time it on a slice of the queries
+        scan_queries = queries[:max(1, len(queries) // 10)]
+        cases = [
+            ('within 5 km', lambda q: index.within(*q, 5), lambda q: scan_within(points, *q, 5)),
+            ('within 25 km', lambda q: index.within(*q, 25), lambda q: scan_within(points, *q, 25)),
+            ('nearest k=1', lambda q: index.nearest(*q, 1), lambda q: scan_nearest(points, *q, 1)),
+            ('nearest k=10', lambda q: index.nearest(*q, 10), lambda q: scan_nearest(points, *q, 10)),
+        ]
+        for label, indexed, scan in cases:
+            for q in scan_queries:
+                if indexed(q) != scan(q):
+                    self.stderr.write(f'{label}: index and scan disagree at {q}')
+                    break
+            fast = self.best_of(repeat, lambda: [indexed(q) for q in queries]) / len(queries)
+            slow = self.best_of(1, lambda: [scan(q) for q in scan_queries]) / len(scan_queries)
+            self.stdout.write(
+                f'{label:<24} {fast * 1e6:9.1f} us/query  scan {slow * 1e3:8.1f} ms/query  {slow / fast:8.0f}x'
+            )
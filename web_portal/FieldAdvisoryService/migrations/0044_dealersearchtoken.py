@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_dealers(apps, schema_editor):
+    from web_portal import search_index
+
+    _, _, fields = search_index.INDEXES['dealer']
+    search_index.rebuild(apps.get_model('FieldAdvisoryService', 'Dealer'), apps.get_model('FieldAdvisoryService', 'DealerSearchToken'), fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FieldAdvisoryService', '0043_company_series_field_drop_companyseries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealerSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='FieldAdvisoryService.Dealer')),
+            ],
+            options={
+                'db_table': 'fieldadvisoryservice_dealer_search_token',
+                'indexes': [models.Index(fields=['token', 'target'], name='dealer_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_dealers, migrations.RunPython.noop),
+    ]
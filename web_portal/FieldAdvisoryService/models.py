@@ -3,6 +3,7 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db.models import UniqueConstraint
 from django.core.validators import FileExtensionValidator
+from accounts import sequences
 from FieldAdvisoryService.validators import (
     cnic_validator, phone_number_validator,
     validate_latitude, validate_longitude,email_validator,validate_image  ,
@@ -580,21 +581,12 @@ class SalesOrder(models.Model):
         if not self.portal_order_id:
             # Generate portal ID based on status
             prefix = 'SO' if self.status == 'pending' else 'SA'
-            
-            # Get last order with this prefix
-            last_order = SalesOrder.objects.filter(
-                portal_order_id__startswith=prefix
-            ).order_by('-portal_order_id').first()
-            
-            if last_order and last_order.portal_order_id:
-                # Extract number and increment
-                last_num = int(last_order.portal_order_id[2:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-            
+            number = sequences.next_value(
+                sequences.sequence_key('portal_order_id', prefix),
+                seed=lambda: sequences.max_suffix(SalesOrder.objects.all(), 'portal_order_id', prefix),
+            )
             # Generate new ID with zero-padded number
-            self.portal_order_id = f"{prefix}{new_num:03d}"
+            self.portal_order_id = f"{prefix}{number:03d}"
         
         super().save(*args, **kwargs)
 
@@ -668,4 +660,17 @@ class SalesOrderAttachment(models.Model):
         return self.file.name
     
     class Meta:
-        db_table = 'fieldadvisoryservice_salesorderattachment'
\ No newline at end of file
+        db_table = 'fieldadvisoryservice_salesorderattachment'
+
+
+class DealerSearchToken(models.Model):
+    """Normalized search token of a Dealer (see web_portal/search_index.py)."""
+    target = models.ForeignKey(Dealer, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        db_table = 'fieldadvisoryservice_dealer_search_token'
+        indexes = [
+            models.Index(fields=['token', 'target'], name='dealer_search_token_idx'),
+        ]
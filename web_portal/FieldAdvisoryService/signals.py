@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import DealerRequest, Dealer
+from web_portal import search_index, spatial_index
+from .models import DealerRequest, Dealer, Territory
 
 @receiver(post_save, sender=DealerRequest)
 def create_dealer_from_request(sender, instance, created, **kwargs):
@@ -46,3 +47,23 @@ def create_dealer_from_request(sender, instance, created, **kwargs):
 # def save(self, *args, **kwargs):
 #     super().save(*args, **kwargs)
 #     self._previous_status = self.status
+
+
+@receiver(post_save, sender=Territory)
+@receiver(post_delete, sender=Territory)
+def invalidate_territory_index(sender, **kwargs):
+    """Territory locations changed: rebuild the 'territories' spatial index."""
+    spatial_index.invalidate('territories')
+
+
+@receiver(post_save, sender=Dealer)
+@receiver(post_delete, sender=Dealer)
+def invalidate_dealer_index(sender, **kwargs):
+    """Dealer locations or active flags changed: rebuild the 'dealers' spatial index."""
+    spatial_index.invalidate('dealers')
+
+
+@receiver(post_save, sender=Dealer)
+def index_dealer(sender, instance, **kwargs):
+    """Keep the dealer's search tokens in step with its fields."""
+    search_index.reindex(instance)
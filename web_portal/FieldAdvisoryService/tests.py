@@ -1,3 +1,267 @@
-from django.test import TestCase
+import json
+import random
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase, Client
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from accounts.models import Role
+from web_portal import spatial_index
+from web_portal.spatial_index import GridIndex, haversine_km
+from .models import Company, Region, Territory, Zone
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        self.conn.queries.append((sql, params))
+        cols, rows = self.conn.respond(sql)
+        self.description = [(c,) for c in cols]
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        return None
+
+
+class FakeHanaPricing:
+    """Answers the order pricing queries from canned policy data"""
+
+    def __init__(self):
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        return None
+
+    def respond(self, sql):
+        if '"@PLR4"' in sql:
+            return (['U_proj', 'DocEntry', 'U_itc', 'U_np', 'U_ad', 'U_ed'], [
+                ('PRJ1', 18, 'FG001', 1500, 2, 1),
+                ('PRJ1', 18, 'FG002', 900, 0, 3),
+            ])
+        if '"@PL1"' in sql:
+            return (['U_proj', 'DocEntry'], [('PRJ1', 18)])
+        if '"@PLR3"' in sql:
+            return (['PrjCode', 'U_zdis'], [('PRJ1', 5)])
+        if 'JDT1' in sql:
+            return (['Project', 'Balance'], [('PRJ1', 25000)])
+        if 'OITW' in sql:
+            return (['ItemCode', 'WhsCode', 'WhsName'], [
+                ('FG001', 'WH01', 'Multan'),
+                ('FG001', 'WH02', 'Lahore'),
+                ('FG002', 'WH01', 'Multan'),
+            ])
+        return ([], [])
+
+
+class OrderPricingApiTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    def _post(self, payload):
+        return self.client.post(reverse('api_order_pricing'), data=json.dumps(payload), content_type='application/json')
+
+    def test_resolves_all_lines_with_fixed_query_count(self):
+        fake = FakeHanaPricing()
+        lines = [{'key': 'line-%d' % i, 'item_code': 'FG001' if i % 2 else 'FG002', 'policy': 'PRJ1'} for i in range(30)]
+        with patch('FieldAdvisoryService.views.get_hana_connection', return_value=fake):
+            resp = self._post({'card_code': 'C001', 'lines': lines})
+        self.assertEqual(resp.status_code, 200)
+        rows = resp.json()['lines']
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(len(fake.queries), 5)
+
+        first = rows[1]
+        self.assertEqual(first['key'], 'line-1')
+        self.assertEqual(first['policy_link'], '18')
+        self.assertEqual(first['unit_price'], 1500.0)
+        self.assertEqual(first['u_ad'], 2.0)
+        self.assertEqual(first['u_ed'], 1.0)
+        self.assertEqual(first['phase_discount'], 5.0)
+        self.assertEqual(first['project_balance'], 25000.0)
+        self.assertEqual([w['WhsCode'] for w in first['warehouses']], ['WH01', 'WH02'])
+        self.assertEqual(rows[0]['unit_price'], 900.0)
+
+    def test_item_codes_use_order_level_policy(self):
+        fake = FakeHanaPricing()
+        with patch('FieldAdvisoryService.views.get_hana_connection', return_value=fake):
+            resp = self._post({'policy': 'PRJ1', 'lines': ['FG002', 'FG404']})
+        rows = resp.json()['lines']
+        self.assertEqual(rows[0]['unit_price'], 900.0)
+        self.assertIsNone(rows[1]['unit_price'])
+        self.assertEqual(rows[1]['warehouses'], [])
+        # Every placeholder must be bound
+        for sql, params in fake.queries:
+            self.assertEqual(sql.count('?'), len(params))
+
+    def test_missing_lines_rejected(self):
+        resp = self._post({'policy': 'PRJ1'})
+        self.assertEqual(resp.status_code, 400)
+
+
+class PreparingCursor(FakeCursor):
+    def prepare(self, sql):
+        self.conn.prepared.append(sql)
+        self.sql = sql
+
+    def executeprepared(self, params=()):
+        self.execute(self.sql, params)
+
+
+class FakeHanaConnection(FakeHanaPricing):
+    """Connection whose cursors support hdbcli-style prepare/executeprepared"""
+
+    def __init__(self):
+        super().__init__()
+        self.prepared = []
+        self.open = True
+
+    def cursor(self):
+        return PreparingCursor(self)
+
+    def isconnected(self):
+        return self.open
+
+    def close(self):
+        self.open = False
+
+    def respond(self, sql):
+        if '"@PLR4"' in sql:
+            return (['U_ad', 'U_ed'], [(2, 1)])
+        if 'JDT1' in sql:
+            return (['Balance'], [(1250,)])
+        return super().respond(sql)
+
+
+class HanaStatementRegistryTests(TestCase):
+    def setUp(self):
+        from sap_integration import hana_statements
+        self.statements = hana_statements
+        self.statements.reset_stats()
+        self.client = Client()
+
+    def test_discounts_bind_parameters_and_prepare_once_per_connection(self):
+        fake = FakeHanaConnection()
+        fake.close = lambda: None  # keep the connection open across requests
+        params = {'policy': "PRJ1' OR 1=1 --", 'item_code': 'FG001', 'pl': '18'}
+        with patch('FieldAdvisoryService.views.get_hana_connection', return_value=fake):
+            for _ in range(3):
+                resp = self.client.get(reverse('api_discounts'), params)
+                self.assertEqual(resp.json(), {'u_ad': 2.0, 'u_exd': 1.0})
+
+        self.assertEqual(len(fake.queries), 3)
+        self.assertEqual(len(fake.prepared), 1)
+        sql, bound = fake.queries[0]
+        self.assertNotIn('PRJ1', sql)
+        self.assertEqual(bound, ("PRJ1' OR 1=1 --", 'FG001', '18'))
+
+        stats = {s['name']: s for s in self.statements.stats()}
+        self.assertEqual(stats['policy_item_discounts']['calls'], 3)
+        self.assertEqual(stats['policy_item_discounts']['errors'], 0)
+
+    def test_closed_connection_is_prepared_again(self):
+        from sap_integration import hana_connect
+        first = FakeHanaConnection()
+        hana_connect.project_balance_total(first, 'PRJ1')
+        first.close()
+        second = FakeHanaConnection()
+        row = hana_connect.project_balance_total(second, 'PRJ1')
+        self.assertEqual(row, {'Balance': 1250})
+        self.assertEqual(len(second.prepared), 1)
+
+    def test_reregistering_with_different_sql_is_rejected(self):
+        self.statements.register('test_statement', 'SELECT 1 FROM DUMMY')
+        self.statements.register('test_statement', 'SELECT 1 FROM DUMMY')
+        with self.assertRaises(ValueError):
+            self.statements.register('test_statement', 'SELECT 2 FROM DUMMY')
+
+
+class GridIndexTests(TestCase):
+    def setUp(self):
+        rnd = random.Random(7)
+        self.points = [(i, rnd.uniform(24, 37), rnd.uniform(61, 77)) for i in range(5000)]
+        self.index = GridIndex(self.points, cell_deg=0.1)
+        self.queries = [(rnd.uniform(23, 38), rnd.uniform(60, 78)) for _ in range(25)]
+
+    def scan(self, lat, lng):
+        return sorted((haversine_km(lat, lng, plat, plng), key) for key, plat, plng in self.points)
+
+    def test_within_matches_linear_scan(self):
+        for lat, lng in self.queries:
+            expected = [hit for hit in self.scan(lat, lng) if hit[0] <= 40]
+            self.assertEqual(self.index.within(lat, lng, 40), expected)
+        lat, lng = self.queries[0]
+        self.assertEqual(len(self.index.within(lat, lng, 200, limit=3)), 3)
+
+    def test_nearest_matches_linear_scan(self):
+        for lat, lng in self.queries:
+            self.assertEqual(self.index.nearest(lat, lng, k=5), self.scan(lat, lng)[:5])
+        # Far from every point: falls back to measuring them all
+        self.assertEqual(self.index.nearest(0, 0, k=2), self.scan(0, 0)[:2])
+        self.assertEqual(self.index.nearest(0, 0, k=2, max_km=100), [])
+        self.assertEqual(GridIndex().nearest(31.5, 74.3), [])
+
+    def test_parse_point(self):
+        self.assertEqual(spatial_index.parse_point('31.52, 74.35'), (31.52, 74.35))
+        self.assertIsNone(spatial_index.parse_point(''))
+        self.assertIsNone(spatial_index.parse_point('0,0'))
+        self.assertIsNone(spatial_index.parse_point('91,74'))
+
+
+class TerritoryNearbyTests(APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='TestRole')
+        role.permissions.add(Permission.objects.get(
+            content_type__app_label='FieldAdvisoryService', codename='view_territory'))
+        user = get_user_model().objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role,
+        )
+        self.client.force_authenticate(user)
+        company = Company.objects.create(Company_name='4B-BIO_APP', name='4B-BIO_APP', address='Lahore',
+                                         email='info@example.com')
+        region = Region.objects.create(company=company, name='Punjab')
+        zone = Zone.objects.create(company=company, region=region, name='Lahore Zone')
+        self.company = company
+
+        def territory(name, lat, lng):
+            return Territory.objects.create(company=company, zone=zone, name=name, latitude=lat, longitude=lng)
+
+        self.model_town = territory('Model Town', '31.483300', '74.325700')
+        self.gulberg = territory('Gulberg', '31.516000', '74.343000')
+        territory('Multan', '30.157500', '71.524900')
+        self.url = reverse('territory-nearby')
+
+    def test_nearest_first_with_distance(self):
+        response = self.client.get(self.url, {'lat': 31.52, 'lng': 74.35, 'radius_km': 20, 'company': self.company.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.gulberg.pk, self.model_town.pk])
+        self.assertLess(response.data['results'][0]['distance_km'], 1)
+
+    def test_index_follows_saves(self):
+        params = {'lat': 30.16, 'lng': 71.52, 'radius_km': 5, 'company': self.company.pk}
+        self.assertEqual(self.client.get(self.url, params).data['count'], 1)
+        Territory.objects.filter(name='Multan').get().delete()
+        self.assertEqual(self.client.get(self.url, params).data['count'], 0)
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'lng': 74.35}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'lat': 95, 'lng': 74.35}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'lat': 31.5, 'lng': 74.35, 'limit': 'x'}).status_code, 400)
@@ -6,7 +6,8 @@ from .views import (
     DealerViewSet, MeetingScheduleViewSet, SalesOrderViewSet,
     CompanyViewSet, RegionViewSet, ZoneViewSet, TerritoryViewSet,
     DealerRequestViewSet, CompanyNestedViewSet ,RegionNestedViewSet, ZoneNestedViewSet,TerritoryNestedViewSet,
-    api_warehouse_for_item, api_customer_address, api_policy_link, api_discounts, api_project_balance, api_customer_details, api_child_customers
+    api_warehouse_for_item, api_customer_address, api_policy_link, api_discounts, api_project_balance, api_customer_details, api_child_customers,
+    api_order_pricing, api_hana_statement_stats
 )
 
 # 📦 Core API Router
@@ -40,4 +41,6 @@ urlpatterns = [
     path('api/policy_link/', api_policy_link, name='api_policy_link'),
     path('api/discounts/', api_discounts, name='api_discounts'),
     path('api/project_balance/', api_project_balance, name='api_project_balance'),
+    path('api/order_pricing/', api_order_pricing, name='api_order_pricing'),
+    path('api/hana_statement_stats/', api_hana_statement_stats, name='api_hana_statement_stats'),
 ]
\ No newline at end of file
@@ -24,6 +24,8 @@ from .permissions import IsAdminOrReadOnly
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import IsAuthenticated
 from accounts.permissions import HasRolePermission
+from web_portal.nearby import NearbyMixin
+from web_portal.search_filters import RankedOrderingFilter, SearchIndexFilter
 from rest_framework import viewsets
 
 from drf_yasg import openapi
@@ -836,10 +838,12 @@ class SalesOrderViewSet(HierarchyFilterMixin, viewsets.ModelViewSet):
             )
 
 
-class DealerViewSet(viewsets.ModelViewSet):
+class DealerViewSet(NearbyMixin, viewsets.ModelViewSet):
     queryset = Dealer.objects.all()
     serializer_class = DealerSerializer
     ordering = ['-id']
+    spatial_layer = 'dealers'
+    filter_backends = [DjangoFilterBackend, SearchIndexFilter, RankedOrderingFilter]
 
     @swagger_auto_schema(
         operation_description="List all dealers with their user credentials",
@@ -1370,9 +1374,10 @@ class ZoneViewSet(viewsets.ModelViewSet):
         return super().create(request, *args, **kwargs)
 
 
-class TerritoryViewSet(viewsets.ModelViewSet):
+class TerritoryViewSet(NearbyMixin, viewsets.ModelViewSet):
     queryset = Territory.objects.select_related('company', 'zone', 'zone__region').all()
     serializer_class = TerritorySerializer
+    spatial_layer = 'territories'
     # permission_classes = [IsAdminOrReadOnly]
     permission_classes = [IsAuthenticated, HasRolePermission]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -1473,7 +1478,7 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.csrf import csrf_exempt
-from sap_integration import hana_connect
+from sap_integration import hana_connect, hana_statements
 import os
 
 def _load_env_file(path: str) -> None:
@@ -1632,22 +1637,15 @@ def api_customer_address(request):
         if not db:
             return JsonResponse({'error': 'Database connection failed'}, status=500)
         
-        # Query for address
-        query = f"""
-        SELECT T0."Address", T0."Street" 
-        FROM CRD1 T0 
-        WHERE T0."CardCode" = '{card_code}'
-        """
-        cursor = db.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        
-        db.close()
+        try:
+            result = hana_connect.customer_address(db, card_code)
+        finally:
+            db.close()
         
         if result:
             return JsonResponse({
-                'address': result[0],
-                'street': result[1]
+                'address': result.get('Address'),
+                'street': result.get('Street')
             })
         else:
             return JsonResponse({'address': '', 'street': ''})
@@ -1667,17 +1665,11 @@ def api_policy_link(request):
         if not db:
             return JsonResponse({'error': 'Database connection failed'}, status=500)
         
-        query = f"""
-        SELECT a."DocEntry" 
-        FROM "@PL1" a 
-        WHERE a."U_proj" = '{project_code}'
-        """
-        cursor = db.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        
-        db.close()
-        return JsonResponse({'policy_link': result[0] if result else None})
+        try:
+            result = hana_connect.policy_doc_entry(db, project_code)
+        finally:
+            db.close()
+        return JsonResponse({'policy_link': result.get('DocEntry') if result else None})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -1697,38 +1689,16 @@ def api_discounts(request):
         if not db:
             return JsonResponse({'error': 'Database connection failed'}, status=500)
         
-        # Get U_AD
-        query_ad = f"""
-        SELECT b."U_ad" 
-        FROM "@PL1" a 
-        INNER JOIN "@PLR4" b ON a."DocEntry" = b."DocEntry" 
-        WHERE a."U_proj" = '{policy}' 
-        AND b."U_itc" = '{item_code}' 
-        AND a."DocEntry" = {pl}
-        """
-        
-        # Get U_EXD
-        query_exd = f"""
-        SELECT b."U_ed" 
-        FROM "@PL1" a 
-        INNER JOIN "@PLR4" b ON a."DocEntry" = b."DocEntry" 
-        WHERE a."U_proj" = '{policy}' 
-        AND b."U_itc" = '{item_code}' 
-        AND a."DocEntry" = {pl}
-        """
-        
-        cursor = db.cursor()
-        cursor.execute(query_ad)
-        result_ad = cursor.fetchone()
-        
-        cursor.execute(query_exd)
-        result_exd = cursor.fetchone()
-        
-        db.close()
+        # U_AD and U_EXD come from the same policy line
+        try:
+            result = hana_connect.policy_item_discounts(db, policy, item_code, pl)
+        finally:
+            db.close()
         
+        result = result or {}
         return JsonResponse({
-            'u_ad': float(result_ad[0]) if result_ad and result_ad[0] else 0.0,
-            'u_exd': float(result_exd[0]) if result_exd and result_exd[0] else 0.0
+            'u_ad': float(result['U_ad']) if result.get('U_ad') else 0.0,
+            'u_exd': float(result['U_ed']) if result.get('U_ed') else 0.0
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -1746,22 +1716,73 @@ def api_project_balance(request):
         if not db:
             return JsonResponse({'error': 'Database connection failed'}, status=500)
         
-        query = f"""
-        SELECT IFNULL(SUM(a."Debit" - a."Credit"), 0) 
-        FROM jdt1 a 
-        WHERE a."Project" = '{project_code}'
-        """
-        cursor = db.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        
-        db.close()
+        try:
+            result = hana_connect.project_balance_total(db, project_code)
+        finally:
+            db.close()
         
-        return JsonResponse({'u_bp': float(result[0]) if result else 0.0})
+        return JsonResponse({'u_bp': float(result['Balance']) if result else 0.0})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["POST"])
+def api_order_pricing(request):
+    """Resolve price, discounts, warehouses and policy link for all order lines in one call"""
+    import json
+    try:
+        payload = json.loads(request.body or b'{}')
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+    lines = payload.get('lines') if isinstance(payload, dict) else None
+    if not isinstance(lines, list):
+        return JsonResponse({'error': 'lines parameter required'}, status=400)
+    if not lines:
+        return JsonResponse({'lines': []})
+
+    card_code = (payload.get('card_code') or '').strip() or None
+    policy = (payload.get('policy') or '').strip()
+    # Accept plain item codes sharing the order-level policy as well as full line dicts
+    lines = [l if isinstance(l, dict) else {'item_code': l, 'policy': policy} for l in lines]
+    for l in lines:
+        if policy and not l.get('policy'):
+            l['policy'] = policy
+
+    def _num(v):
+        try:
+            return float(v) if v is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    try:
+        db = get_hana_connection(request, payload.get('database'))
+        if not db:
+            return JsonResponse({'error': 'Database connection failed'}, status=500)
+        try:
+            rows = hana_connect.order_line_pricing(db, lines, card_code=card_code)
+        finally:
+            db.close()
+
+        for r in rows:
+            for k in ('unit_price', 'u_ad', 'u_ed', 'phase_discount', 'project_balance'):
+                r[k] = _num(r[k])
+            if r['policy_link'] is not None:
+                r['policy_link'] = str(r['policy_link'])
+        return JsonResponse({'lines': rows})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@staff_member_required
+@require_http_methods(["GET"])
+def api_hana_statement_stats(request):
+    """Execution counts and latency of the named HANA statements in this process"""
+    if request.GET.get('reset') in ('1', 'true'):
+        hana_statements.reset_stats()
+    return JsonResponse({'statements': hana_statements.stats()})
+
+
 @staff_member_required
 @require_http_methods(["GET"])
 def api_child_customers(request):
@@ -1792,18 +1813,6 @@ def api_child_customers(request):
             # logger.error("Database connection failed")
             return JsonResponse({'error': 'Database connection failed - HANA service unavailable', 'children': []}, status=200)
         
-        # Verify current schema
-        try:
-            cursor = db.cursor()
-            cursor.execute('SELECT CURRENT_SCHEMA FROM DUMMY')
-            current_schema = cursor.fetchone()[0]
-            cursor.close()
-            # logger.info(f"Connected to HANA schema: {current_schema}, fetching child customers for {father_card}")
-        except Exception as e:
-            # logger.warning(f"Could not verify current schema: {e}")
-            # logger.info(f"Database connected, fetching child customers for {father_card}")
-            pass
-        
         # Get child customers with optional search
         try:
             child_customers = hana_connect.child_card_code(db, father_card, search or None)
@@ -1887,86 +1896,48 @@ def api_customer_details(request):
             # logger.error("Database connection failed")
             return JsonResponse({'error': 'Database connection failed'}, status=500)
         
-        # Verify current schema
-        cursor = db.cursor()
         try:
-            cursor.execute('SELECT CURRENT_SCHEMA FROM DUMMY')
-            current_schema = cursor.fetchone()[0]
-            # logger.info(f"Connected to HANA schema: {current_schema}, fetching details for {card_code}")
-        except Exception as e:
-            # logger.warning(f"Could not verify current schema: {e}")
-            # logger.info(f"Database connected, fetching details for {card_code}")
-            pass
-        
-        # Get customer basic info
-        customer_query = """
-        SELECT 
-            T0."CardName", 
-            T0."CntctPrsn",
-            T0."LicTradNum",
-            T0."BillToDef",
-            T0."Address"
-        FROM OCRD T0 
-        WHERE T0."CardCode" = ?
-        """
-        cursor.execute(customer_query, (card_code,))
-        customer_result = cursor.fetchone()
-        
-        # logger.info(f"Customer query result: {customer_result}")
-        
-        if not customer_result:
-            cursor.close()
+            # Get customer basic info
+            customer_result = hana_connect.customer_details(db, card_code)
+            
+            # logger.info(f"Customer query result: {customer_result}")
+            
+            if not customer_result:
+                # logger.warning(f"Customer not found: {card_code}")
+                return JsonResponse({'error': f'Customer not found: {card_code}'}, status=404)
+            
+            # Get contact person code from OCPR table
+            contact_code = None
+            if customer_result.get('CntctPrsn'):  # If CntctPrsn (contact name) exists
+                contact_result = hana_connect.contact_code_by_name(db, card_code, customer_result['CntctPrsn'])
+                if contact_result:
+                    contact_code = int(contact_result['CntctCode'])
+            
+            # Get billing address from CRD1
+            address = customer_result.get('Address')  # Use Address from OCRD first
+            if not address or address.strip() == '':
+                # Try to get formatted address from CRD1
+                address_result = hana_connect.customer_bill_to_address(db, card_code)
+                if address_result:
+                    address = address_result.get('Address')
+        finally:
             db.close()
-            # logger.warning(f"Customer not found: {card_code}")
-            return JsonResponse({'error': f'Customer not found: {card_code}'}, status=404)
-        
-        # Get contact person code from OCPR table
-        contact_code = None
-        if customer_result[1]:  # If CntctPrsn (contact name) exists
-            contact_query = """
-            SELECT T0."CntctCode"
-            FROM OCPR T0
-            WHERE T0."CardCode" = ? AND T0."Name" = ?
-            """
-            cursor.execute(contact_query, (card_code, customer_result[1]))
-            contact_result = cursor.fetchone()
-            if contact_result:
-                contact_code = int(contact_result[0])
-        
-        # Get billing address from CRD1
-        address = customer_result[4]  # Use Address from OCRD first
-        if not address or address.strip() == '':
-            # Try to get formatted address from CRD1
-            address_query = """
-            SELECT 
-                T0."Street"||', '||T2."Name" AS "Address"
-            FROM CRD1 T0 
-            INNER JOIN OCRD T1 ON T0."CardCode" = T1."CardCode" AND T0."Address" = T1."BillToDef"
-            INNER JOIN OCRY T2 ON T1."Country" = T2."Code"
-            WHERE T1."CardCode" = ?
-            """
-            cursor.execute(address_query, (card_code,))
-            address_result = cursor.fetchone()
-            if address_result:
-                address = address_result[0]
         
         # logger.info(f"Address query result: {address}")
         
-        cursor.close()
-        db.close()
-        
         # Parse the results safely
-        card_name = customer_result[0] if customer_result[0] else ''
-        federal_tax_id = customer_result[2] if customer_result[2] else ''
+        card_name = customer_result.get('CardName') or ''
+        federal_tax_id = customer_result.get('LicTradNum') or ''
         
         # Handle pay_to_code (BillToDef) - might be string or int
         pay_to_code = None
-        if customer_result[3]:
+        bill_to_def = customer_result.get('BillToDef')
+        if bill_to_def:
             try:
-                pay_to_code = int(customer_result[3]) if customer_result[3] else None
+                pay_to_code = int(bill_to_def)
             except (ValueError, TypeError):
                 # If it's already a string address code, keep it
-                pay_to_code = customer_result[3]
+                pay_to_code = bill_to_def
         
         response_data = {
             'card_name': card_name,
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_add_salesstaffcompany_through_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text="Series key, e.g. 'farmer_id:FM'", max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0, help_text='Last allocated number')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'accounts_id_sequence',
+            },
+        ),
+    ]
@@ -626,3 +626,19 @@ class AccountDeletionRequest(models.Model):
     def __str__(self):
         return f"{self.request_type.title()} request by {self.user.email} - {self.status}"
 
+
+
+class IdSequence(models.Model):
+    """
+    Counter behind a human-readable ID series (farmer IDs, portal order IDs).
+    ``value`` is the last number handed out; see accounts/sequences.py.
+    """
+    name = models.CharField(max_length=100, unique=True, help_text="Series key, e.g. 'farmer_id:FM'")
+    value = models.BigIntegerField(default=0, help_text="Last allocated number")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'accounts_id_sequence'
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
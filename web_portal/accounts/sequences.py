@@ -0,0 +1,90 @@
+"""
+Counter-table ID allocator for human-readable ID series.
+
+Farmer IDs (FM01, FM02, ...) and portal order IDs (SO001, SA002, ...) used to
+be derived from the highest existing ID: every new row read the table and two
+concurrent creators computed the same next number. Each series now has an
+``IdSequence`` row keyed by name ('farmer_id:FM', 'portal_order_id:SO', or any
+per-company key such as 'portal_order_id:SO:4B-BIO'); ``allocate`` locks it
+with SELECT ... FOR UPDATE, bumps ``value`` and returns the reserved numbers,
+so concurrent creators queue on one row instead of racing.
+
+The row is created on first use and seeded from the existing data (``seed``
+returns the highest number already taken), so no data migration is needed.
+
+Inside an outer transaction the row lock is held until that transaction
+ends and a rollback returns the numbers. Outside one, ``next_value`` can
+reserve IDSEQUENCE_BLOCK_SIZE numbers at a time and hand them out from
+memory, so bulk imports touch the counter row once per block; numbers left
+over when the process exits are never used (gaps, not duplicates).
+"""
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BigIntegerField, Max
+from django.db.models.functions import Cast, Substr
+
+_blocks = {}
+_lock = threading.Lock()
+
+
+def sequence_key(*parts) -> str:
+    """'portal_order_id', 'SO', company -> 'portal_order_id:SO:<company>'."""
+    return ':'.join(str(part) for part in parts if part not in (None, ''))
+
+
+def max_suffix(queryset, field: str, prefix: str) -> int:
+    """Highest number N among ``field`` values of the form <prefix><digits>, or 0."""
+    rows = queryset.filter(**{f'{field}__regex': rf'^{prefix}[0-9]+$'})
+    number = Cast(Substr(field, len(prefix) + 1), BigIntegerField())
+    return rows.aggregate(top=Max(number))['top'] or 0
+
+
+def allocate(name: str, count: int = 1, seed=None) -> range:
+    """
+    Reserve ``count`` consecutive numbers of series ``name``.
+
+    ``seed`` is called once, when the series has no counter row yet, and
+    returns the last number already in use.
+    """
+    from accounts.models import IdSequence
+
+    if count < 1:
+        raise ValueError('count must be at least 1')
+    with transaction.atomic():
+        row = IdSequence.objects.select_for_update().filter(name=name).first()
+        if row is None:
+            try:
+                with transaction.atomic():
+                    row = IdSequence.objects.create(name=name, value=seed() if seed else 0)
+            except IntegrityError:
+                # Another process created the row first; queue on its lock
+                row = IdSequence.objects.select_for_update().get(name=name)
+        start = row.value + 1
+        row.value += count
+        row.save(update_fields=['value', 'updated_at'])
+    return range(start, start + count)
+
+
+def next_value(name: str, seed=None, block_size: int | None = None) -> int:
+    """The next number of series ``name``, from this process's reserved block when possible."""
+    if block_size is None:
+        block_size = getattr(settings, 'IDSEQUENCE_BLOCK_SIZE', 1)
+    if block_size <= 1 or connection.in_atomic_block:
+        # A block reserved inside a transaction that later rolls back would be
+        # handed out again by the counter, so only reserve what is used now
+        return allocate(name, 1, seed)[0]
+    with _lock:
+        block = _blocks.get(name)
+        value = next(block, None) if block else None
+        if value is None:
+            block = _blocks[name] = iter(allocate(name, block_size, seed))
+            value = next(block)
+        return value
+
+
+def discard_blocks() -> None:
+    """Forget this process's reserved blocks (their numbers are skipped)."""
+    with _lock:
+        _blocks.clear()
@@ -1,3 +1,94 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+
+from FieldAdvisoryService.models import SalesOrder
+from farmers.models import Farmer
+from . import sequences
+from .models import IdSequence, Role
+
+
+def farmer(phone, **extra):
+    return Farmer.objects.create(
+        first_name='Ali', last_name='Khan', primary_phone=phone,
+        village='Chak 12', tehsil='Okara', district='Okara', **extra,
+    )
+
+
+class IdSequenceTests(TestCase):
+    def setUp(self):
+        # Farmer.save creates the farmer's login with the default role
+        Role.objects.create(name='FirstRole')
+
+    def test_allocate_reserves_consecutive_numbers(self):
+        self.assertEqual(list(sequences.allocate('test:A', 3)), [1, 2, 3])
+        self.assertEqual(list(sequences.allocate('test:A')), [4])
+        self.assertEqual(list(sequences.allocate('test:B', seed=lambda: 40)), [41])
+        self.assertEqual(IdSequence.objects.get(name='test:A').value, 4)
+        with self.assertRaises(ValueError):
+            sequences.allocate('test:A', 0)
+
+    def test_series_continue_from_existing_ids(self):
+        # Numeric, not string, maximum: SO999 < SO1000
+        SalesOrder.objects.create(portal_order_id='SO999')
+        SalesOrder.objects.create(portal_order_id='SO1000')
+        SalesOrder.objects.create(portal_order_id='SOX12')
+
+        self.assertEqual(SalesOrder.objects.create().portal_order_id, 'SO1001')
+        self.assertEqual(SalesOrder.objects.create(status='approved').portal_order_id, 'SA001')
+
+        farmer('03001234567', farmer_id='FM07')
+        self.assertEqual(farmer('03001234568').farmer_id, 'FM08')
+        self.assertEqual(farmer('03001234569').farmer_id, 'FM09')
+
+    def test_sequence_key(self):
+        self.assertEqual(sequences.sequence_key('portal_order_id', 'SO', '4B-BIO'), 'portal_order_id:SO:4B-BIO')
+        self.assertEqual(sequences.sequence_key('farmer_id', 'FM', None), 'farmer_id:FM')
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class IdSequenceConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        Role.objects.create(name='FirstRole')
+
+    def run_parallel(self, fn, workers=8):
+        def worker(index):
+            try:
+                return fn(index)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(worker, range(workers)))
+
+    def test_parallel_allocations_never_collide(self):
+        results = self.run_parallel(lambda _: [sequences.allocate('test:parallel')[0] for _ in range(25)])
+
+        numbers = sorted(n for batch in results for n in batch)
+        self.assertEqual(numbers, list(range(1, 201)))
+
+    def test_parallel_order_creators_get_distinct_ids(self):
+        SalesOrder.objects.create(portal_order_id='SO010')
+
+        results = self.run_parallel(lambda _: [SalesOrder.objects.create().portal_order_id for _ in range(5)])
+
+        ids = [order_id for batch in results for order_id in batch]
+        self.assertEqual(len(set(ids)), 40)
+        self.assertEqual(max(int(order_id[2:]) for order_id in ids), 50)
+
+    def test_parallel_farmer_creators_get_distinct_ids(self):
+        results = self.run_parallel(lambda i: [farmer(f'0300{i:03d}{n:04d}').farmer_id for n in range(3)], workers=4)
+
+        ids = [farmer_id for batch in results for farmer_id in batch]
+        self.assertEqual(sorted(ids), [f'FM{n:02d}' for n in range(1, 13)])
+
+    @override_settings(IDSEQUENCE_BLOCK_SIZE=10)
+    def test_blocks_are_reserved_once_per_process(self):
+        sequences.discard_blocks()
+        try:
+            numbers = [sequences.next_value('test:block') for _ in range(12)]
+            self.assertEqual(numbers, list(range(1, 13)))
+            self.assertEqual(IdSequence.objects.get(name='test:block').value, 20)
+        finally:
+            sequences.discard_blocks()
@@ -28,13 +28,8 @@ from preferences.models import Setting
 
 # Import SAP functions
 try:
-    from sap_integration.hana_connect import (
-        sales_vs_achievement_by_emp,
-        sales_vs_achievement_geo_inv,
-        sales_vs_achievement_territory,
-        collection_vs_achievement,
-        _load_env_file as _hana_load_env_file
-    )
+    from sap_integration.hana_connect import _load_env_file as _hana_load_env_file
+    from sap_integration import hana_reports
     SAP_AVAILABLE = True
 except ImportError:
     SAP_AVAILABLE = False
@@ -511,12 +506,13 @@ class DashboardOverviewView(APIView):
                 kwargs['encrypt'] = True
                 kwargs['sslValidateCertificate'] = ssl_validate
             
-            conn = dbapi.connect(**kwargs)
-            
-            if schema:
-                cur = conn.cursor()
-                cur.execute(f'SET SCHEMA "{schema}"')
-                cur.close()
+            def connect():
+                conn = dbapi.connect(**kwargs)
+                if schema:
+                    cur = conn.cursor()
+                    cur.execute(f'SET SCHEMA "{schema}"')
+                    cur.close()
+                return conn
             
             # Parse emp_id
             emp_val = None
@@ -526,59 +522,38 @@ class DashboardOverviewView(APIView):
                 except Exception:
                     pass
             
-            # Get sales vs achievement data
+            # Get sales vs achievement data, grouped and scaled in SQL
             if region or zone or territory:
-                # Use geo-based function
-                data = sales_vs_achievement_geo_inv(
-                    conn,
-                    emp_id=emp_val,
-                    region=region or None,
-                    zone=zone or None,
-                    territory=territory or None,
-                    start_date=start_date or None,
-                    end_date=end_date or None,
-                    group_by_emp=bool(emp_val)
-                )
+                dims = ['region', 'zone', 'territory'] + (['employee'] if emp_val else [])
             else:
-                # Use employee-based function
-                data = sales_vs_achievement_by_emp(
-                    conn,
-                    emp_val,
-                    None,
-                    None,
-                    None,
-                    start_date or None,
-                    end_date or None
-                )
-            
-            # Process and format data
-            sales_list = []
-            for record in (data or []):
-                if isinstance(record, dict):
-                    sales_target = float(record.get('SALES_TARGET', 0) or 0)
-                    achievement = float(record.get('ACCHIVEMENT', 0) or record.get('ACHIEVEMENT', 0) or 0)
-                    
-                    if in_millions:
-                        sales_target = round(sales_target / 1000000.0, 2)
-                        achievement = round(achievement / 1000000.0, 2)
-                    
-                    percentage = round((achievement / sales_target * 100), 2) if sales_target > 0 else 0
-                    
-                    sales_list.append({
-                        'emp_id': record.get('EMPID'),
-                        'territory_id': record.get('TERRITORYID'),
-                        'territory_name': record.get('TERRITORYNAME'),
-                        'sales_target': sales_target,
-                        'achievement': achievement,
-                        'from_date': record.get('F_REFDATE'),
-                        'to_date': record.get('T_REFDATE'),
-                        'percentage': percentage
-                    })
+                dims = ['employee', 'territory']
+            data = hana_reports.report(
+                connect, schema, 'sales_target', dims, ['target', 'achievement'],
+                emp_id=emp_val,
+                region=region or None,
+                zone=zone or None,
+                territory=territory or None,
+                start_date=start_date or None,
+                end_date=end_date or None,
+                in_millions=in_millions,
+            )
+
+            sales_list = [
+                {
+                    'emp_id': record.get('EmployeeID'),
+                    'territory_id': record.get('TerritoryId'),
+                    'territory_name': record.get('TerritoryName'),
+                    'sales_target': float(record.get('Target') or 0),
+                    'achievement': float(record.get('Achievement') or 0),
+                    'from_date': record.get('From_Date'),
+                    'to_date': record.get('To_Date'),
+                    'percentage': float(record.get('Percentage') or 0),
+                }
+                for record in data
+            ]
             
             result['sales_vs_achievement'] = sales_list
             
-            conn.close()
-            
         except Exception as e:
             result['error'] = str(e)
         
@@ -687,12 +662,13 @@ class DashboardOverviewView(APIView):
                 if not ssl_validate:
                     kwargs['sslValidateCertificate'] = False
             
-            conn = dbapi.connect(**kwargs)
-            
-            if schema:
-                cur = conn.cursor()
-                cur.execute(f'SET SCHEMA "{schema}"')
-                cur.close()
+            def connect():
+                conn = dbapi.connect(**kwargs)
+                if schema:
+                    cur = conn.cursor()
+                    cur.execute(f'SET SCHEMA "{schema}"')
+                    cur.close()
+                return conn
             
             # Parse emp_id
             emp_val = None
@@ -702,48 +678,38 @@ class DashboardOverviewView(APIView):
                 except Exception:
                     pass
             
-            # Get collection vs achievement data using robust geo function
-            data = sales_vs_achievement_geo_inv(
-                conn,
+            # Invoice totals per territory (and day), grouped and scaled in SQL
+            data = hana_reports.report(
+                connect, schema, 'invoice',
+                ['region', 'zone', 'territory'] + (['day'] if group_by_date else []),
+                ['achievement'],
                 emp_id=emp_val,
                 region=region or None,
                 zone=zone or None,
                 territory=territory or None,
                 start_date=start_date or None,
                 end_date=end_date or None,
-                group_by_date=group_by_date,
-                group_by_emp=False
+                in_millions=in_millions,
             )
-            
-            # Process and format data
-            collection_list = []
-            for record in (data or []):
-                if isinstance(record, dict):
-                    target = float(record.get('Collection_Target', 0) or 0)
-                    achievement = float(record.get('Collection_Achievement', 0) or 0)
-                    
-                    if in_millions:
-                        target = round(target / 1000000.0, 2)
-                        achievement = round(achievement / 1000000.0, 2)
-                    
-                    percentage = round((achievement / target * 100), 2) if target > 0 else 0
-                    
-                    collection_list.append({
-                        'region': record.get('Region'),
-                        'zone': record.get('Zone'),
-                        'territory_id': record.get('TerritoryId'),
-                        'territory_name': record.get('Territory') or record.get('TerritoryName'),
-                        'collection_target': target,
-                        'collection_achievement': achievement,
-                        'from_date': record.get('From_Date'),
-                        'to_date': record.get('To_Date'),
-                        'percentage': percentage
-                    })
+
+            # Invoiced amount is both the target and the achievement here
+            collection_list = [
+                {
+                    'region': record.get('Region'),
+                    'zone': record.get('Zone'),
+                    'territory_id': record.get('TerritoryId'),
+                    'territory_name': record.get('TerritoryName'),
+                    'collection_target': float(record.get('Achievement') or 0),
+                    'collection_achievement': float(record.get('Achievement') or 0),
+                    'from_date': record.get('From_Date'),
+                    'to_date': record.get('To_Date'),
+                    'percentage': 100.0 if float(record.get('Achievement') or 0) > 0 else 0,
+                }
+                for record in data
+            ]
             
             result['collection_vs_achievement'] = collection_list
             
-            conn.close()
-            
         except Exception as e:
             result['error'] = str(e)
         
@@ -902,12 +868,13 @@ class DashboardOverviewView(APIView):
                 kwargs['encrypt'] = True
                 kwargs['sslValidateCertificate'] = ssl_validate if ssl_validate else False
             
-            conn = dbapi.connect(**kwargs)
-            
-            if schema:
-                cur = conn.cursor()
-                cur.execute(f'SET SCHEMA "{schema}"')
-                cur.close()
+            def connect():
+                conn = dbapi.connect(**kwargs)
+                if schema:
+                    cur = conn.cursor()
+                    cur.execute(f'SET SCHEMA "{schema}"')
+                    cur.close()
+                return conn
             
             # Parse emp_id
             emp_val = None
@@ -917,54 +884,28 @@ class DashboardOverviewView(APIView):
                 except Exception:
                     pass
             
-            # Get collection data using the correct function
-            data = collection_vs_achievement(
-                conn,
+            # Grand total computed by HANA (no dimensions -> one row)
+            rows = hana_reports.report(
+                connect, schema, 'collection_target', [], ['target', 'achievement'],
                 emp_id=emp_val,
                 region=region or None,
                 zone=zone or None,
                 territory=territory or None,
                 start_date=start_date or None,
                 end_date=end_date or None,
-                group_by_date=False,
-                ignore_emp_filter=ignore_emp_filter
+                active_only=True,
             )
             
-            conn.close()
-            
-            # Aggregate totals
-            total_target = 0.0
-            total_achievement = 0.0
-            min_from = None
-            max_to = None
-            
-            for row in (data or []):
-                if isinstance(row, dict):
-                    try:
-                        total_target += float(row.get('Collection_Target', 0) or 0)
-                    except Exception:
-                        pass
-                    try:
-                        total_achievement += float(row.get('Collection_Achievement', 0) or 0)
-                    except Exception:
-                        pass
-                    
-                    row_from = row.get('From_Date')
-                    row_to = row.get('To_Date')
-                    if row_from and (min_from is None or str(row_from) < str(min_from)):
-                        min_from = row_from
-                    if row_to and (max_to is None or str(row_to) > str(max_to)):
-                        max_to = row_to
-            
+            total = rows[0] if rows else {}
             result = {
-                'target': round(total_target, 2),
-                'achievement': round(total_achievement, 2),
-                'from_date': min_from or start_date,
-                'to_date': max_to or end_date
+                'target': round(float(total.get('Target') or 0), 2),
+                'achievement': round(float(total.get('Achievement') or 0), 2),
+                'from_date': total.get('From_Date') or start_date,
+                'to_date': total.get('To_Date') or end_date
             }
             
             # DEBUG: Uncomment to see collection totals result
-            # print(f"[DEBUG _get_collection_totals] Result: target={result['target']}, achievement={result['achievement']}, rows_processed={len(data or [])}")
+            # print(f"[DEBUG _get_collection_totals] Result: target={result['target']}, achievement={result['achievement']}")
             
             return result
             
@@ -1059,12 +1000,13 @@ class DashboardOverviewView(APIView):
                 kwargs['encrypt'] = True
                 kwargs['sslValidateCertificate'] = ssl_validate if ssl_validate else False
             
-            conn = dbapi.connect(**kwargs)
-            
-            if schema:
-                cur = conn.cursor()
-                cur.execute(f'SET SCHEMA "{schema}"')
-                cur.close()
+            def connect():
+                conn = dbapi.connect(**kwargs)
+                if schema:
+                    cur = conn.cursor()
+                    cur.execute(f'SET SCHEMA "{schema}"')
+                    cur.close()
+                return conn
             
             # Parse emp_id
             emp_val = None
@@ -1074,61 +1016,28 @@ class DashboardOverviewView(APIView):
                 except Exception:
                     pass
             
-            # Get sales data using sales_vs_achievement_territory (same as /sap/sales-vs-achievement-territory endpoint)
-            data = sales_vs_achievement_territory(
-                conn,
+            # Grand total computed by HANA (same scope as /sap/sales-vs-achievement-territory)
+            rows = hana_reports.report(
+                connect, schema, 'sales_target', [], ['target', 'achievement'],
                 emp_id=emp_val,
                 region=region or None,
                 zone=zone or None,
                 territory=territory or None,
                 start_date=start_date or None,
                 end_date=end_date or None,
-                group_by_date=False,
-                ignore_emp_filter=False,
-                group_by_emp=False
+                active_only=True,
             )
             
-            conn.close()
-            
-            # Aggregate totals - Skip GRAND TOTAL row to avoid double counting
-            total_target = 0.0
-            total_achievement = 0.0
-            min_from = None
-            max_to = None
-            rows_processed = 0
-            
-            for row in (data or []):
-                if isinstance(row, dict):
-                    # Skip the GRAND TOTAL row to avoid double counting
-                    if row.get('Region') == 'GRAND TOTAL':
-                        continue
-                    
-                    rows_processed += 1
-                    try:
-                        total_target += float(row.get('Sales_Target', 0) or 0)
-                    except Exception:
-                        pass
-                    try:
-                        total_achievement += float(row.get('Sales_Achievement', 0) or 0)
-                    except Exception:
-                        pass
-                    
-                    row_from = row.get('From_Date')
-                    row_to = row.get('To_Date')
-                    if row_from and (min_from is None or str(row_from) < str(min_from)):
-                        min_from = row_from
-                    if row_to and (max_to is None or str(row_to) > str(max_to)):
-                        max_to = row_to
-            
+            total = rows[0] if rows else {}
             result = {
-                'target': round(total_target, 2),
-                'achievement': round(total_achievement, 2),
-                'from_date': min_from or start_date,
-                'to_date': max_to or end_date
+                'target': round(float(total.get('Target') or 0), 2),
+                'achievement': round(float(total.get('Achievement') or 0), 2),
+                'from_date': total.get('From_Date') or start_date,
+                'to_date': total.get('To_Date') or end_date
             }
             
             # DEBUG: Uncomment to see sales totals result
-            # print(f"[DEBUG _get_sales_totals] Result: target={result['target']}, achievement={result['achievement']}, rows_processed={rows_processed}/{len(data or [])}")
+            # print(f"[DEBUG _get_sales_totals] Result: target={result['target']}, achievement={result['achievement']}")
             
             return result
             
@@ -1268,7 +1177,7 @@ class CollectionAnalyticsView(APIView):
             openapi.Parameter('region', openapi.IN_QUERY, description="Filter by region name. Example: North, South", type=openapi.TYPE_STRING, required=False),
             openapi.Parameter('zone', openapi.IN_QUERY, description="Filter by zone name. Example: Zone1, Zone2", type=openapi.TYPE_STRING, required=False),
             openapi.Parameter('territory', openapi.IN_QUERY, description="Filter by territory name. Example: Territory1", type=openapi.TYPE_STRING, required=False),
-            openapi.Parameter('group_by_date', openapi.IN_QUERY, description="Group results by date range. Default: false", type=openapi.TYPE_BOOLEAN, required=False),
+            openapi.Parameter('group_by_date', openapi.IN_QUERY, description="Add a 'dates' list of per-day target and achievement to each territory. Default: false", type=openapi.TYPE_BOOLEAN, required=False),
             openapi.Parameter('ignore_emp_filter', openapi.IN_QUERY, description="Ignore employee filter to get all data (Admin/Manager use). Default: false", type=openapi.TYPE_BOOLEAN, required=False),
             openapi.Parameter('in_millions', openapi.IN_QUERY, description="Convert target and achievement values to millions for readability. Default: false", type=openapi.TYPE_BOOLEAN, required=False),
             openapi.Parameter('page', openapi.IN_QUERY, description="Page number for pagination. Default: 1", type=openapi.TYPE_INTEGER, default=1),
@@ -1481,250 +1390,146 @@ class CollectionAnalyticsView(APIView):
                 if not cfg['ssl_validate'] or str(cfg['ssl_validate']).strip().lower() not in ('true', '1', 'yes'):
                     kwargs['sslValidateCertificate'] = False
             
-            conn = dbapi.connect(**kwargs)
-            
-            try:
-                # Set schema
+            def connect():
+                conn = dbapi.connect(**kwargs)
                 if cfg['schema']:
                     cur = conn.cursor()
                     cur.execute(f'SET SCHEMA "{cfg["schema"]}"')
                     cur.close()
-                
-                # DEBUG: Uncomment to see schema and parameters
-                # print(f"[DEBUG CollectionAnalyticsView] schema={cfg['schema']}, emp_id={sap_emp_id}, dates={start_date} to {end_date}, period={period if period else 'None'}")
-                
-                # CEO special case: employee_code='00' should see ALL territories
-                # When employee_code is '00', ignore employee filter to show organization-wide data
-                if employee_code == '00':
-                    ignore_emp_filter = True
-                    sap_emp_id = None  # Don't pass emp_id to query
-                
-                # Fetch data using collection_vs_achievement function
-                data = collection_vs_achievement(
-                    conn,
-                    emp_id=sap_emp_id,
-                    region=region or None,
-                    zone=zone or None,
-                    territory=territory or None,
-                    start_date=start_date or None,
-                    end_date=end_date or None,
-                    group_by_date=group_by_date,
-                    ignore_emp_filter=ignore_emp_filter
-                )
-                
-                # Process data
-                if in_millions:
-                    scaled = []
-                    for row in (data or []):
-                        if isinstance(row, dict):
-                            r = dict(row)
-                            try:
-                                v = r.get('Collection_Target')
-                                if v is not None:
-                                    r['Collection_Target'] = float(v) / 1000000.0
-                            except Exception:
-                                pass
-                            try:
-                                v = r.get('Collection_Achievement')
-                                if v is not None:
-                                    r['Collection_Achievement'] = float(v) / 1000000.0
-                            except Exception:
-                                pass
-                            scaled.append(r)
-                        else:
-                            scaled.append(row)
-                    data = scaled
-                
-                # Build Hierarchy (Region → Zone → Territory) - OPTIMIZED
-                hierarchy = {}
-                for row in (data or []):
-                    if not isinstance(row, dict):
-                        continue
-                    
-                    # Extract and convert values once
-                    reg = row.get('Region') or 'All Regions'
-                    zon = row.get('Zone') or 'All Zones'
-                    ter = row.get('TerritoryName') or row.get('Territory') or 'All Territories'
-                    
-                    target = float(row.get('Collection_Target') or 0.0)
-                    ach = float(row.get('Collection_Achievement') or 0.0)
-                    row_from = row.get('From_Date')
-                    row_to = row.get('To_Date')
-                    
-                    # Initialize Region if needed
-                    if reg not in hierarchy:
-                        hierarchy[reg] = {
-                            'name': reg, 
-                            'target': 0.0, 
-                            'achievement': 0.0, 
-                            'zones': {},
-                            'from_date': row_from,
-                            'to_date': row_to
-                        }
-                    
-                    reg_data = hierarchy[reg]
-                    
-                    # Update Region
-                    if row_from and (not reg_data['from_date'] or row_from < reg_data['from_date']):
-                        reg_data['from_date'] = row_from
-                    if row_to and (not reg_data['to_date'] or row_to > reg_data['to_date']):
-                        reg_data['to_date'] = row_to
-                    reg_data['target'] += target
-                    reg_data['achievement'] += ach
-                    
-                    # Initialize Zone if needed
-                    if zon not in reg_data['zones']:
-                        reg_data['zones'][zon] = {
-                            'name': zon, 
-                            'target': 0.0, 
-                            'achievement': 0.0, 
-                            'territories': {},
-                            'from_date': row_from,
-                            'to_date': row_to
-                        }
-                    
-                    zon_data = reg_data['zones'][zon]
-                    
-                    # Update Zone
-                    if row_from and (not zon_data['from_date'] or row_from < zon_data['from_date']):
-                        zon_data['from_date'] = row_from
-                    if row_to and (not zon_data['to_date'] or row_to > zon_data['to_date']):
-                        zon_data['to_date'] = row_to
-                    zon_data['target'] += target
-                    zon_data['achievement'] += ach
-                    
-                    # Initialize Territory if needed
-                    if ter not in zon_data['territories']:
-                        zon_data['territories'][ter] = {
-                            'name': ter,
-                            'target': 0.0,
-                            'achievement': 0.0,
-                            'from_date': row_from,
-                            'to_date': row_to,
-                        }
-                    
-                    ter_data = zon_data['territories'][ter]
-                    
-                    # Update Territory
-                    ter_data['target'] += target
-                    ter_data['achievement'] += ach
-                    if row_from and (not ter_data['from_date'] or row_from < ter_data['from_date']):
-                        ter_data['from_date'] = row_from
-                    if row_to and (not ter_data['to_date'] or row_to > ter_data['to_date']):
-                        ter_data['to_date'] = row_to
-                            
-                
-                # Convert hierarchy to list - OPTIMIZED with inline rounding
-                final_list = []
-                grand_total_target = 0.0
-                grand_total_achievement = 0.0
-                
-                for r_name in sorted(hierarchy.keys()):
-                    r_data = hierarchy[r_name]
-                    
-                    # Grand total accumulates UNROUNDED region values (round once at the end)
-                    grand_total_target += r_data['target']
-                    grand_total_achievement += r_data['achievement']
-
-                    # Round region totals for display
-                    r_data['target'] = round(r_data['target'], 2)
-                    r_data['achievement'] = round(r_data['achievement'], 2)
-                    
-                    zones_list = []
-                    for z_name in sorted(r_data['zones'].keys()):
-                        z_data = r_data['zones'][z_name]
-                        
-                        # Round zone totals
-                        z_data['target'] = round(z_data['target'], 2)
-                        z_data['achievement'] = round(z_data['achievement'], 2)
-                        
-                        # Convert territories dict to list with rounding
-                        territories_list = []
-                        for t_name in sorted(z_data['territories'].keys()):
-                            t_item = z_data['territories'][t_name]
-                            t_item['target'] = round(t_item['target'], 2)
-                            t_item['achievement'] = round(t_item['achievement'], 2)
-                            territories_list.append(t_item)
-                            
-                        z_data['territories'] = territories_list
-                        zones_list.append(z_data)
-                        
-                    r_data['zones'] = zones_list
-                    final_list.append(r_data)
-                
-                grand_total = {
-                    'target': round(grand_total_target, 2),
-                    'achievement': round(grand_total_achievement, 2)
-                }
-                
-                # Pagination
-                page_param = (request.GET.get('page') or '1').strip()
-                page_size_param = (request.GET.get('page_size') or '').strip()
-                
-                try:
-                    page_num = int(page_param) if page_param else 1
-                except Exception:
-                    page_num = 1
-                
-                default_page_size = 10
-                try:
-                    page_size = int(page_size_param) if page_size_param else default_page_size
-                except Exception:
-                    page_size = default_page_size
-                
-                from django.core.paginator import Paginator
-                paginator = Paginator(list(final_list or []), page_size)
-                
-                try:
-                    page_obj = paginator.page(page_num)
-                    paged_rows = list(page_obj.object_list)
-                except Exception:
-                    paged_rows = list(final_list or [])
-                    page_obj = None
-                
-                pagination = {
-                    'page': (page_obj.number if page_obj else 1),
-                    'num_pages': (paginator.num_pages if paginator else 1),
-                    'has_next': (page_obj.has_next() if page_obj else False),
-                    'has_prev': (page_obj.has_previous() if page_obj else False),
-                    'next_page': ((page_obj.next_page_number() if page_obj and page_obj.has_next() else None)),
-                    'prev_page': ((page_obj.previous_page_number() if page_obj and page_obj.has_previous() else None)),
-                    'count': (paginator.count if paginator else len(final_list or [])),
-                    'page_size': page_size
+                return conn
+            
+            # DEBUG: Uncomment to see schema and parameters
+            # print(f"[DEBUG CollectionAnalyticsView] schema={cfg['schema']}, emp_id={sap_emp_id}, dates={start_date} to {end_date}, period={period if period else 'None'}")
+            
+            # CEO special case: employee_code='00' should see ALL territories
+            # When employee_code is '00', ignore employee filter to show organization-wide data
+            if employee_code == '00':
+                ignore_emp_filter = True
+                sap_emp_id = None  # Don't pass emp_id to query
+            
+            # Region -> Zone -> Territory totals in one ROLLUP query: detail
+            # rows per territory (per day with group_by_date) plus day,
+            # zone, region and grand total rows
+            dims = ['region', 'zone', 'territory'] + (['day'] if group_by_date else [])
+            data = hana_reports.report(
+                connect, cfg['schema'], 'collection_target', dims, ['target', 'achievement'],
+                emp_id=sap_emp_id,
+                region=region or None,
+                zone=zone or None,
+                territory=territory or None,
+                start_date=start_date or None,
+                end_date=end_date or None,
+                active_only=True,
+                rollup=True,
+                in_millions=in_millions,
+            )
+            
+            # Nest the pre-aggregated rows (already ordered region, zone, territory, day)
+            final_list = []
+            grand_total = {'target': 0.0, 'achievement': 0.0}
+            reg_data = zon_data = ter_data = None
+            for row in data:
+                item = {
+                    'target': round(float(row.get('Target') or 0.0), 2),
+                    'achievement': round(float(row.get('Achievement') or 0.0), 2),
+                    'from_date': row.get('From_Date'),
+                    'to_date': row.get('To_Date'),
                 }
-                
-                # Get user_id and employee_id only if explicitly provided
-                user_id = None
-                employee_id = None
-                
-                # Return the queried user's info, not the authenticated user making the request
-                if user_id_param:
-                    user_id = int(user_id_param) if user_id_param else None
-                    employee_id = emp_val  # The employee code we fetched from the queried user
-                elif emp_id_param:
-                    employee_id = emp_val  # The employee ID that was provided
-                
-                return Response({
-                    'success': True,
-                    'user_id': user_id,
-                    'employee_id': employee_id,
-                    'count': (paginator.count if paginator else len(final_list or [])),
-                    'data': paged_rows,
-                    'pagination': pagination,
-                    'filters': {
-                        'company': db_param,
-                        'region': region,
-                        'zone': zone,
-                        'territory': territory
-                    },
-                    'totals': grand_total
-                }, status=status.HTTP_200_OK)
-                
-            finally:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
+                if hana_reports.is_total(row, dims, 'region'):
+                    grand_total = {'target': item['target'], 'achievement': item['achievement']}
+                    continue
+                if hana_reports.is_total(row, dims, 'zone'):
+                    if reg_data is not None:
+                        reg_data.update(item)
+                        final_list.append(reg_data)
+                    reg_data = zon_data = None
+                    continue
+                if hana_reports.is_total(row, dims, 'territory'):
+                    if zon_data is not None:
+                        zon_data.update(item)
+                        reg_data['zones'].append(zon_data)
+                    zon_data = None
+                    continue
+                if reg_data is None:
+                    reg_data = {'name': row.get('Region') or 'All Regions', 'zones': []}
+                if zon_data is None:
+                    zon_data = {'name': row.get('Zone') or 'All Zones', 'territories': []}
+                if not group_by_date:
+                    item['name'] = row.get('TerritoryName') or 'All Territories'
+                    zon_data['territories'].append(item)
+                elif hana_reports.is_total(row, dims, 'day'):
+                    if ter_data is not None:
+                        ter_data.update(item)
+                        zon_data['territories'].append(ter_data)
+                    ter_data = None
+                else:
+                    if ter_data is None:
+                        ter_data = {'name': row.get('TerritoryName') or 'All Territories', 'dates': []}
+                    item['date'] = row.get('Day')
+                    ter_data['dates'].append(item)
+            
+            # Pagination
+            page_param = (request.GET.get('page') or '1').strip()
+            page_size_param = (request.GET.get('page_size') or '').strip()
+            
+            try:
+                page_num = int(page_param) if page_param else 1
+            except Exception:
+                page_num = 1
+            
+            default_page_size = 10
+            try:
+                page_size = int(page_size_param) if page_size_param else default_page_size
+            except Exception:
+                page_size = default_page_size
+            
+            from django.core.paginator import Paginator
+            paginator = Paginator(list(final_list or []), page_size)
+            
+            try:
+                page_obj = paginator.page(page_num)
+                paged_rows = list(page_obj.object_list)
+            except Exception:
+                paged_rows = list(final_list or [])
+                page_obj = None
+            
+            pagination = {
+                'page': (page_obj.number if page_obj else 1),
+                'num_pages': (paginator.num_pages if paginator else 1),
+                'has_next': (page_obj.has_next() if page_obj else False),
+                'has_prev': (page_obj.has_previous() if page_obj else False),
+                'next_page': ((page_obj.next_page_number() if page_obj and page_obj.has_next() else None)),
+                'prev_page': ((page_obj.previous_page_number() if page_obj and page_obj.has_previous() else None)),
+                'count': (paginator.count if paginator else len(final_list or [])),
+                'page_size': page_size
+            }
+            
+            # Get user_id and employee_id only if explicitly provided
+            user_id = None
+            employee_id = None
+            
+            # Return the queried user's info, not the authenticated user making the request
+            if user_id_param:
+                user_id = int(user_id_param) if user_id_param else None
+                employee_id = emp_val  # The employee code we fetched from the queried user
+            elif emp_id_param:
+                employee_id = emp_val  # The employee ID that was provided
+            
+            return Response({
+                'success': True,
+                'user_id': user_id,
+                'employee_id': employee_id,
+                'count': (paginator.count if paginator else len(final_list or [])),
+                'data': paged_rows,
+                'pagination': pagination,
+                'filters': {
+                    'company': db_param,
+                    'region': region,
+                    'zone': zone,
+                    'territory': territory
+                },
+                'totals': grand_total
+            }, status=status.HTTP_200_OK)
                     
         except Exception as e:
             return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
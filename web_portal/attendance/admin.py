@@ -1,6 +1,6 @@
 from django.contrib import admin
 from web_portal.admin import admin_site
-from .models import Attendance, AttendanceRequest
+from .models import Attendance, AttendanceRequest, day_of
 
 @admin.register(Attendance, site=admin_site)
 class AttendanceAdmin(admin.ModelAdmin):
@@ -24,13 +24,13 @@ class AttendanceRequestAdmin(admin.ModelAdmin):
         check_out_time = obj.check_out_time
 
         # Use check_in_time or check_out_time to detect date
-        target_date = check_in_time.date() if check_type == 'check_in' and check_in_time else \
-                      check_out_time.date() if check_out_time else None
+        target_date = day_of(check_in_time) if check_type == 'check_in' and check_in_time else \
+                      day_of(check_out_time) if check_out_time else None
 
         if target_date:
             attendance = Attendance.objects.filter(
                 attendee=user,
-                check_in_time__date=target_date
+                attendance_date=target_date
             ).first()
 
             if attendance:
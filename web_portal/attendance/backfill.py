@@ -0,0 +1,56 @@
+"""
+Backfill of ``Attendance.attendance_date`` for rows written before the column
+existed.
+
+Takes the model class as an argument so the same code runs from migration
+0016 (historical model) and from ``manage.py backfill_attendance_dates``.
+When an attendee has several legacy rows on one day, only the oldest one gets
+the date (the unique (attendee, attendance_date) constraint allows one per
+day); the others keep NULL and are reported as skipped.
+"""
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def _local_day(moment):
+    return timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+
+
+def fill_attendance_dates(model, batch_size: int = BATCH_SIZE, dry_run: bool = False):
+    """Set attendance_date on undated rows; returns (filled, skipped) counts."""
+    filled = skipped = 0
+    last_id = 0
+    # Dry runs write nothing, so days claimed by earlier batches are tracked here
+    planned = set()
+    while True:
+        rows = list(
+            model.objects.filter(attendance_date__isnull=True, id__gt=last_id)
+            .exclude(check_in_time__isnull=True, check_out_time__isnull=True)
+            .order_by('id')
+            .values('id', 'attendee_id', 'check_in_time', 'check_out_time')[:batch_size]
+        )
+        if not rows:
+            return filled, skipped
+        last_id = rows[-1]['id']
+
+        days = {row['id']: _local_day(row['check_in_time'] or row['check_out_time']) for row in rows}
+        taken = set(
+            model.objects.filter(
+                attendee_id__in={row['attendee_id'] for row in rows},
+                attendance_date__in=set(days.values()),
+            ).values_list('attendee_id', 'attendance_date')
+        ) | planned
+        updates = []
+        for row in rows:
+            key = (row['attendee_id'], days[row['id']])
+            if key in taken:
+                skipped += 1
+                continue
+            taken.add(key)
+            updates.append(model(id=row['id'], attendee_id=row['attendee_id'], attendance_date=days[row['id']]))
+        if dry_run:
+            planned.update((obj.attendee_id, obj.attendance_date) for obj in updates)
+        elif updates:
+            model.objects.bulk_update(updates, ['attendance_date'], batch_size=500)
+        filled += len(updates)
@@ -0,0 +1,45 @@
+"""
+Check-in geofence.
+
+Territories only carry a centre point, so "inside the assigned territory"
+means within ATTENDANCE_GEOFENCE_RADIUS_KM of the centre of one of the
+territories on the attendee's sales profile. The check is answered from the
+'territories' spatial index (web_portal/spatial_index.py) instead of loading
+and measuring every territory. A radius of 0 disables it; attendees without
+assigned territories, or whose territories have no location, are not fenced.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from web_portal import spatial_index
+
+
+def assigned_territory_ids(attendee):
+    profile = getattr(attendee, 'sales_profile', None)
+    if profile is None:
+        return set()
+    return set(profile.territories.values_list('id', flat=True))
+
+
+def validate_location(attendee, latitude, longitude):
+    """Raise ValidationError when (latitude, longitude) is outside the attendee's territories."""
+    radius_km = getattr(settings, 'ATTENDANCE_GEOFENCE_RADIUS_KM', 0)
+    if not radius_km or latitude in (None, '') or longitude in (None, ''):
+        return
+    try:
+        lat, lng = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValidationError('Invalid check-in coordinates.')
+
+    index = spatial_index.get_index('territories')
+    assigned = {pk for pk in assigned_territory_ids(attendee) if pk in index}
+    if not assigned:
+        return
+    if any(pk in assigned for _, pk in index.within(lat, lng, radius_km)):
+        return
+
+    nearest = min(spatial_index.haversine_km(lat, lng, *index.point(pk)) for pk in assigned)
+    raise ValidationError(
+        f'Check-in location is {nearest:.1f} km from the nearest assigned territory '
+        f'(allowed: {radius_km:g} km).'
+    )
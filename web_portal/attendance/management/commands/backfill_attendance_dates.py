@@ -0,0 +1,44 @@
+"""
+Management command to fill Attendance.attendance_date on old rows.
+
+Migration 0016 runs the same backfill; run this afterwards for rows imported
+or restored without the column, or with --dry-run to count duplicate legacy
+rows (same attendee and day) that keep an empty date.
+
+Usage:
+    python manage.py backfill_attendance_dates [--batch-size 2000] [--dry-run]
+"""
+
+from django.core.management.base import BaseCommand
+
+from attendance.backfill import BATCH_SIZE, fill_attendance_dates
+from attendance.models import Attendance
+
+
+class Command(BaseCommand):
+    help = 'Fill attendance_date on attendance records that do not have it yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Rows read per batch (default: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count the rows that would be filled without writing',
+        )
+
+    def handle(self, *args, **options):
+        filled, skipped = fill_attendance_dates(
+            Attendance, batch_size=options['batch_size'], dry_run=options['dry_run']
+        )
+        verb = 'Would fill' if options['dry_run'] else 'Filled'
+        self.stdout.write(self.style.SUCCESS(f'{verb} attendance_date on {filled} record(s)'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f'{skipped} record(s) duplicate another record of the same attendee and day '
+                f'and were left without a date'
+            ))
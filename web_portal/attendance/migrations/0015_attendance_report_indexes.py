@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0014_fix_table_names_lowercase'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['check_in_time'], name='attendance_checkin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['attendee', 'check_in_time'], name='att_attendee_checkin_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from attendance.backfill import fill_attendance_dates
+
+    fill_attendance_dates(apps.get_model('attendance', 'Attendance'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0015_attendance_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='attendance_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('attendee', 'attendance_date'), name='attendance_attendee_day_uniq'),
+        ),
+    ]
@@ -39,6 +39,14 @@ class Holiday(models.Model):
 # -------------------
 # Attendance Model
 # -------------------
+def day_of(check_in_time, check_out_time=None):
+    """Local date an attendance record belongs to: its check-in day, else its check-out day."""
+    moment = check_in_time or check_out_time
+    if moment is None:
+        return None
+    return timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+
+
 class Attendance(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -68,11 +76,23 @@ class Attendance(models.Model):
     # Removed attachment field - now using separate check_in_image and check_out_image
     SOURCE_CHOICES = [('manual', 'Manual'), ('request', 'Request')]
     source = models.CharField(max_length=50, choices=SOURCE_CHOICES, default="manual")
+    # Local day of the record (check-in, else check-out), kept in sync by save().
+    # Lookups of "today's record" filter on this instead of check_in_time__date,
+    # whose cast MySQL cannot serve from an index.
+    attendance_date = models.DateField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     _current_user = None  # Temporary holder for request.user
 
     class Meta:
         db_table = 'attendance_attendance'
+        indexes = [
+            # Reports filter check_in_time as a half-open range (attendance/reports.py)
+            models.Index(fields=['check_in_time'], name='attendance_checkin_idx'),
+            models.Index(fields=['attendee', 'check_in_time'], name='att_attendee_checkin_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['attendee', 'attendance_date'], name='attendance_attendee_day_uniq'),
+        ]
 
     def set_current_user(self, user):
         self._current_user = user
@@ -115,16 +135,15 @@ class Attendance(models.Model):
                 raise ValidationError("You can only mark attendance for today.")
 
         # Duplicate prevention
-        record_date = timezone.localtime(self.check_in_time).date() if self.check_in_time else timezone.localtime(self.check_out_time).date()
-        qs = Attendance.objects.filter(attendee=self.attendee).filter(
-            check_in_time__date=record_date
-        )
+        record_date = day_of(self.check_in_time, self.check_out_time)
+        qs = Attendance.objects.filter(attendee=self.attendee, attendance_date=record_date)
         if self.pk:
             qs = qs.exclude(pk=self.pk)
         if qs.exists():
             raise ValidationError(f"Attendance for {record_date} already exists.")
 
     def save(self, *args, **kwargs):
+        self.attendance_date = day_of(self.check_in_time, self.check_out_time)
         self.full_clean()
         opening_time = time(9, 0)
         closing_time = time(18, 0)
@@ -259,3 +278,29 @@ class LeaveRequest(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+
+# -------------------
+# Offline Sync Ledger
+# -------------------
+class AttendanceSyncEvent(models.Model):
+    """
+    A check-in/check-out replayed by the mobile app through the bulk sync
+    endpoint, keyed by the id the device generated for it, so a batch that is
+    sent again after a dropped connection is not applied twice.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_sync_events')
+    client_event_id = models.CharField(max_length=64)
+    attendee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    check_type = models.CharField(max_length=10, choices=AttendanceRequest.CHECK_TYPE_CHOICES)
+    event_time = models.DateTimeField()
+    attendance = models.ForeignKey(Attendance, on_delete=models.SET_NULL, null=True, blank=True, related_name='sync_events')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'attendance_attendancesyncevent'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_event_id'], name='attendance_sync_event_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.check_type} {self.client_event_id}"
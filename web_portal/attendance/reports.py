@@ -0,0 +1,266 @@
+"""
+Attendance report engine behind ``AttendanceReportView``.
+
+The report used to serialize every matching Attendance row through
+AttendanceReportSerializer, so a monthly report for the whole sales force
+built tens of thousands of model instances and worked out hours in Python.
+Reports now come in three shapes:
+
+* summary: one row per attendee and day/week/month, aggregated in SQL
+  (present days, late arrivals, early departures, hours worked and the summed
+  check-in/check-out gaps);
+* detail: the individual records, read with ``values()`` and hours worked
+  computed in SQL, one page at a time;
+* export: either of the above streamed as CSV, or written row by row to a
+  write-only XLSX workbook, without holding the rows in memory.
+
+Dates are filtered as half-open ranges on the aware start of each local day
+(``check_in_time >= start AND check_in_time < end + 1 day``) instead of
+``check_in_time__date``, whose cast keeps MySQL off the ``attendance_checkin_idx``
+and ``att_attendee_checkin_idx`` indexes. Day/week/month buckets are
+taken in the current time zone; on MySQL this needs the server's time zone
+tables loaded (mysql_tzinfo_to_sql).
+"""
+import csv
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.duration import duration_string
+
+from .models import Attendance
+
+REPORT_TYPES = ('daily', 'weekly', 'monthly', 'custom')
+MODES = ('detail', 'summary')
+GROUPINGS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+DETAIL_COLUMNS = (
+    'attendee', 'attendee_username', 'day', 'check_in_time', 'check_out_time',
+    'check_in_gap', 'check_out_gap', 'total_hours',
+)
+SUMMARY_COLUMNS = (
+    'attendee', 'attendee_username', 'period', 'present_days', 'late_arrivals',
+    'early_departures', 'hours_worked', 'total_check_in_gap', 'total_check_out_gap',
+)
+
+WORKED = ExpressionWrapper(F('check_out_time') - F('check_in_time'), output_field=DurationField())
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def report_range(report_type: str, start_date: str | None = None, end_date: str | None = None, today=None):
+    """
+    (start, end) dates, both inclusive, of a daily/weekly/monthly/custom report.
+
+    Raises ValueError for an unknown type or a custom range without valid dates.
+    """
+    today = today or timezone.localdate()
+    if report_type == 'daily':
+        return today, today
+    if report_type == 'weekly':
+        return today - timedelta(days=7), today
+    if report_type == 'monthly':
+        return today - timedelta(days=30), today
+    if report_type == 'custom' and start_date and end_date:
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Invalid date format, use YYYY-MM-DD')
+        if end < start:
+            raise ValueError('end_date must not be before start_date')
+        return start, end
+    raise ValueError('Invalid or incomplete report parameters')
+
+
+def _day_start(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def attendance_in_range(start_date, end_date, user_id=None):
+    """Attendance checked in on local days ``start_date`` .. ``end_date``."""
+    qs = Attendance.objects.filter(
+        check_in_time__gte=_day_start(start_date),
+        check_in_time__lt=_day_start(end_date + timedelta(days=1)),
+    )
+    if user_id:
+        try:
+            qs = qs.filter(attendee_id=int(user_id))
+        except (ValueError, TypeError):
+            raise ValueError('user_id must be an integer')
+    return qs
+
+
+def _local_date(value):
+    if value is None:
+        return None
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+def detail_rows(qs):
+    """One dict per record, in check-in order; hours worked come from SQL."""
+    return (
+        qs.annotate(total_hours=WORKED)
+        .order_by('check_in_time', 'id')
+        .values('id', 'attendee_id', 'attendee__username', 'check_in_time', 'check_out_time',
+                'check_in_gap', 'check_out_gap', 'total_hours')
+    )
+
+
+def _detail_row(row) -> dict:
+    return {
+        'attendee': row['attendee_id'],
+        'attendee_username': row['attendee__username'],
+        'day': _local_date(row['check_in_time']),
+        'check_in_time': row['check_in_time'],
+        'check_out_time': row['check_out_time'],
+        'check_in_gap': row['check_in_gap'],
+        'check_out_gap': row['check_out_gap'],
+        'total_hours': row['total_hours'],
+    }
+
+
+def summary_rows(qs, group_by: str = 'day'):
+    """Per attendee and day/week/month rollups, one GROUP BY query."""
+    if group_by not in GROUPINGS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUPINGS)}")
+    return (
+        qs.annotate(period=GROUPINGS[group_by]('check_in_time'))
+        .values('attendee_id', 'attendee__username', 'period')
+        .annotate(
+            present_days=Count(TruncDate('check_in_time'), distinct=True),
+            late_arrivals=Count('id', filter=Q(check_in_gap__gt=timedelta(0))),
+            early_departures=Count('id', filter=Q(check_out_gap__lt=timedelta(0))),
+            hours_worked=Sum(WORKED),
+            total_check_in_gap=Sum('check_in_gap'),
+            total_check_out_gap=Sum('check_out_gap'),
+        )
+        .order_by('attendee_id', 'period')
+    )
+
+
+def _summary_row(row) -> dict:
+    worked = row['hours_worked']
+    return {
+        'attendee': row['attendee_id'],
+        'attendee_username': row['attendee__username'],
+        'period': _local_date(row['period']),
+        'present_days': row['present_days'],
+        'late_arrivals': row['late_arrivals'],
+        'early_departures': row['early_departures'],
+        'hours_worked': round(worked.total_seconds() / 3600, 2) if worked is not None else 0,
+        'total_check_in_gap': row['total_check_in_gap'],
+        'total_check_out_gap': row['total_check_out_gap'],
+    }
+
+
+def summary(qs, group_by: str = 'day') -> list:
+    return [_summary_row(row) for row in summary_rows(qs, group_by)]
+
+
+def detail_page(qs, page=1, page_size=None) -> dict:
+    """
+    One page of detail rows with ``count``, ``page``, ``page_size`` and
+    ``num_pages``. Raises ValueError for a bad page or page size.
+    """
+    try:
+        page_size = min(max(1, int(page_size or DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except (ValueError, TypeError):
+        raise ValueError('page_size must be an integer')
+    paginator = Paginator(detail_rows(qs), page_size)
+    try:
+        current = paginator.page(page or 1)
+    except PageNotAnInteger:
+        raise ValueError('page must be an integer')
+    except EmptyPage:
+        raise ValueError('page out of range')
+    return {
+        'count': paginator.count,
+        'page': current.number,
+        'page_size': page_size,
+        'num_pages': paginator.num_pages,
+        'records': [_detail_row(row) for row in current.object_list],
+    }
+
+
+def export_rows(qs, mode: str = 'detail', group_by: str = 'day'):
+    """(columns, row iterator) for an export of ``mode``."""
+    if mode == 'summary':
+        return SUMMARY_COLUMNS, (_summary_row(row) for row in summary_rows(qs, group_by).iterator())
+    return DETAIL_COLUMNS, (_detail_row(row) for row in detail_rows(qs).iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, timedelta):
+        return duration_string(value)
+    if isinstance(value, datetime):
+        return (timezone.localtime(value) if timezone.is_aware(value) else value).isoformat()
+    return value
+
+
+def _excel(value):
+    if isinstance(value, timedelta):
+        return duration_string(value)
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        # openpyxl rejects aware datetimes
+        return timezone.make_naive(value)
+    return value
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(columns, rows, filename: str):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        # BOM so Excel opens Urdu names as UTF-8
+        yield '\ufeff' + writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([_text(row[column]) for column in columns])
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(columns, rows, filename: str):
+    """Raises ImportError when openpyxl is not installed."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Attendance')
+    sheet.append(list(columns))
+    for row in rows:
+        sheet.append([_excel(row[column]) for column in columns])
+    # Write-only workbooks keep rows on disk, the saved file is streamed back
+    out = tempfile.TemporaryFile()
+    workbook.save(out)
+    out.seek(0)
+    return FileResponse(out, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def export(qs, export_format: str, mode: str, group_by: str, filename: str):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"export must be one of: {', '.join(EXPORT_FORMATS)}")
+    columns, rows = export_rows(qs, mode, group_by)
+    if export_format == 'xlsx':
+        return xlsx_response(columns, rows, f'{filename}.xlsx')
+    return csv_response(columns, rows, f'{filename}.csv')
@@ -2,15 +2,16 @@ from rest_framework import serializers
 from .models import Attendance, AttendanceRequest, LeaveRequest, Holiday
 from preferences.models import Setting 
 from datetime import datetime
-from django.core.exceptions import ValidationError
+from decimal import Decimal
+from django.contrib.auth import get_user_model
 from django.utils.timezone import localtime,localdate
-from django.utils.timezone import is_naive, make_aware
-from django.db.models import Q
+from django.utils.timezone import make_aware
 from .services import mark_attendance
+from web_portal.image_pipeline import NormalizeUploadsMixin, normalize_upload
 # -----------------------------
 # Attendance Serializer
 # -----------------------------
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(NormalizeUploadsMixin, serializers.ModelSerializer):
     class Meta:
         model = Attendance
         fields = [
@@ -62,9 +63,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
             # -------------------
             # Duplicate attendance check
             # -------------------
-            existing_qs = Attendance.objects.filter(attendee=attendee).filter(
-                Q(check_in_time__date=record_date) | Q(check_out_time__date=record_date)
-            )
+            existing_qs = Attendance.objects.filter(attendee=attendee, attendance_date=record_date)
             if self.instance:
                 existing_qs = existing_qs.exclude(pk=self.instance.pk)
             if existing_qs.exists():
@@ -150,9 +149,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
 
         # Auto-complete checkout if partial exists
         if record_date:
-            existing = Attendance.objects.filter(attendee=attendee).filter(
-                Q(check_in_time__date=record_date) | Q(check_out_time__date=record_date)
-            ).first()
+            existing = Attendance.objects.filter(attendee=attendee, attendance_date=record_date).first()
             if existing and not existing.check_out_time and validated_data.get("check_out_time"):
                 existing.check_out_time = validated_data["check_out_time"]
                 existing.save()
@@ -171,7 +168,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
 # -----------------------------
 # Check-in Only Serializer
 # -----------------------------
-class AttendanceCheckInSerializer(serializers.ModelSerializer):
+class AttendanceCheckInSerializer(NormalizeUploadsMixin, serializers.ModelSerializer):
     class Meta:
         model = Attendance
         fields = [
@@ -195,7 +192,7 @@ class AttendanceCheckInSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Check-in time is required.")
         return data
 
-class AttendanceCheckOutSerializer(serializers.ModelSerializer):
+class AttendanceCheckOutSerializer(NormalizeUploadsMixin, serializers.ModelSerializer):
     class Meta:
         model = Attendance
         fields = [
@@ -352,6 +349,62 @@ class AttendanceRequestSerializer(serializers.ModelSerializer):
 class EmptySerializer(serializers.Serializer):
     """Used for Swagger to show no input fields"""
     pass
+
+
+# -----------------------------
+# Offline Sync Serializers
+# -----------------------------
+class AttendanceSyncEventSerializer(serializers.Serializer):
+    """
+    One queued check-in/check-out. ``image`` names the multipart file part
+    holding the photo; the view swaps it for the uploaded file.
+    """
+    id = serializers.CharField(max_length=64)
+    type = serializers.ChoiceField(choices=[AttendanceRequest.CHECK_IN, AttendanceRequest.CHECK_OUT])
+    timestamp = serializers.DateTimeField()
+    attendee = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects.all(), required=False)
+    latitude = serializers.FloatField(required=False, allow_null=True, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, allow_null=True, min_value=-180, max_value=180)
+    image = serializers.CharField(required=False, allow_blank=True)
+
+    def _coordinate(self, value):
+        # Stored as DecimalField(max_digits=9, decimal_places=6)
+        return None if value is None else Decimal(f"{value:.6f}")
+
+    def validate_latitude(self, value):
+        return self._coordinate(value)
+
+    def validate_longitude(self, value):
+        return self._coordinate(value)
+
+    def validate(self, data):
+        user = self.context['request'].user
+        attendee = data.get('attendee') or user
+        if attendee != user and not (user.is_staff or user.is_superuser):
+            raise serializers.ValidationError("You cannot mark attendance for other users.")
+        data['attendee'] = attendee
+
+        name = data.get('image')
+        if name:
+            files = self.context.get('files') or {}
+            if name not in files:
+                raise serializers.ValidationError({'image': f"No uploaded file named '{name}'."})
+            data['image'] = normalize_upload(files[name])
+        else:
+            data['image'] = None
+        return data
+
+
+class AttendanceSyncRequestSerializer(serializers.Serializer):
+    """Swagger schema of the sync request body."""
+    events = AttendanceSyncEventSerializer(many=True)
+
+
+class AttendanceSyncResultSerializer(serializers.Serializer):
+    id = serializers.CharField()
+    status = serializers.ChoiceField(choices=['applied', 'duplicate', 'rejected', 'invalid'])
+    attendance_id = serializers.IntegerField(required=False, allow_null=True)
+    errors = serializers.JSONField(required=False)
 class AttendanceReportSerializer(serializers.ModelSerializer):
     total_hours = serializers.SerializerMethodField()
     day = serializers.SerializerMethodField()
@@ -375,7 +428,32 @@ class AttendanceReportSerializer(serializers.ModelSerializer):
 
     def get_day(self, obj):
         return obj.check_in_time.date() if obj.check_in_time else obj.created_at.date()
-    
+
+
+# Report rows are dicts built by attendance.reports, not model instances
+class AttendanceReportRowSerializer(serializers.Serializer):
+    attendee = serializers.IntegerField()
+    attendee_username = serializers.CharField()
+    day = serializers.DateField()
+    check_in_time = serializers.DateTimeField()
+    check_out_time = serializers.DateTimeField(allow_null=True)
+    check_in_gap = serializers.DurationField(allow_null=True)
+    check_out_gap = serializers.DurationField(allow_null=True)
+    total_hours = serializers.DurationField(allow_null=True)
+
+
+class AttendanceSummaryRowSerializer(serializers.Serializer):
+    attendee = serializers.IntegerField()
+    attendee_username = serializers.CharField()
+    period = serializers.DateField()
+    present_days = serializers.IntegerField()
+    late_arrivals = serializers.IntegerField()
+    early_departures = serializers.IntegerField()
+    hours_worked = serializers.FloatField()
+    total_check_in_gap = serializers.DurationField(allow_null=True)
+    total_check_out_gap = serializers.DurationField(allow_null=True)
+
+
 class LeaveRequestSerializer(serializers.ModelSerializer):
         user = serializers.ReadOnlyField(source='user.username')
 
@@ -110,14 +110,56 @@
 #     return attendance
 
 import logging
+from collections import defaultdict
 from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import Attendance  # make sure this import does not create circular imports
+from .geofence import validate_location
+from .models import Attendance, AttendanceSyncEvent  # make sure this import does not create circular imports
 
 logger = logging.getLogger(__name__)
 
+COORDINATE_PLACES = Decimal("0.000001")  # decimal_places of the Attendance coordinate fields
+
+
+def _coordinate(value):
+    """``value`` (float, str or Decimal) rounded to the 6 places the model stores, or None."""
+    if value in (None, ""):
+        return None
+    try:
+        return Decimal(str(value)).quantize(COORDINATE_PLACES, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValidationError("Invalid coordinates.")
+
+
+def _apply(attendance, check_type, timestamp, latitude, longitude, check_in_image, check_out_image):
+    """Fill the check-in or check-out side of ``attendance``; existing times are kept."""
+    if check_type == "check_in":
+        if not attendance.check_in_time:
+            attendance.check_in_time = timestamp
+        if latitude:
+            attendance.check_in_latitude = latitude
+        if longitude:
+            attendance.check_in_longitude = longitude
+        if check_in_image:
+            attendance.check_in_image = check_in_image
+    else:
+        if not attendance.check_out_time:
+            attendance.check_out_time = timestamp
+        if latitude:
+            attendance.check_out_latitude = latitude
+        if longitude:
+            attendance.check_out_longitude = longitude
+        if check_out_image:
+            attendance.check_out_image = check_out_image
+
+
+def _locked_day(attendee, attendance_date):
+    return Attendance.objects.select_for_update().filter(attendee=attendee, attendance_date=attendance_date)
+
+
 def mark_attendance(
     user,
     attendee,
@@ -132,10 +174,19 @@ def mark_attendance(
     """
     Centralized function to handle attendance marking.
 
-    - Automatically creates or updates Attendance record for the day.
+    - Creates or updates the attendee's Attendance record for the day, found
+      through the indexed (attendee, attendance_date) key.
     - Does NOT crash if check-in/check-out already exists.
-    - Updates optional fields (latitude, longitude, check_in_image, check_out_image) if provided.
+    - Updates optional fields (latitude, longitude, check_in_image, check_out_image)
+      of the check-in or check-out side if provided.
     - source='request' by default to indicate it comes from a request approval.
+    - Check-in coordinates must fall inside the attendee's assigned territories
+      when ATTENDANCE_GEOFENCE_RADIUS_KM is set (see geofence.py).
+
+    The day's row is inserted when there is none, otherwise locked with
+    SELECT ... FOR UPDATE and updated. A concurrent insert of the same day hits
+    the unique (attendee, attendance_date) constraint and the winner's row is
+    updated instead, so parallel check-ins never create two rows.
 
     Returns:
         Attendance object
@@ -159,50 +210,44 @@ def mark_attendance(
     if timezone.is_naive(timestamp):
         timestamp = timezone.make_aware(timestamp)
 
+    # Devices send GPS floats with more places than the columns keep
+    latitude, longitude = _coordinate(latitude), _coordinate(longitude)
+
+    if check_type == "check_in":
+        validate_location(attendee, latitude, longitude)
+
     attendance_date = timezone.localtime(timestamp).date()
+    fields = (check_type, timestamp, latitude, longitude, check_in_image, check_out_image)
 
     try:
         with transaction.atomic():
-            # Get existing attendance for this user & day or create a new one
-            attendance, created = Attendance.objects.get_or_create(
-                attendee=attendee,
-                check_in_time__date=attendance_date if check_type == "check_in" else None,
-                defaults={
-                    "user": user,
-                    "attendee": attendee,
-                    "check_in_time": timestamp if check_type == "check_in" else None,
-                    "check_out_time": timestamp if check_type == "check_out" else None,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "check_in_image": check_in_image if check_type == "check_in" else None,
-                    "check_out_image": check_out_image if check_type == "check_out" else None,
-                    "source": source,
-                },
-            )
+            # Plain read first: a locking read of a missing key would take gap
+            # locks and turn two concurrent first check-ins into a deadlock
+            if not Attendance.objects.filter(attendee=attendee, attendance_date=attendance_date).exists():
+                attendance = Attendance(user=user, attendee=attendee, source=source)
+                _apply(attendance, *fields)
+                try:
+                    with transaction.atomic():
+                        attendance.save()
+                    return attendance
+                except (IntegrityError, ValidationError):
+                    # Either a concurrent request inserted the day's row first (unique
+                    # constraint / duplicate check in clean) or the input is invalid.
+                    # A locking read sees rows committed after this transaction began.
+                    if not _locked_day(attendee, attendance_date).exists():
+                        raise
+
+            attendance = _locked_day(attendee, attendance_date).get()
+
+            # Prevent check-out without check-in
+            if check_type == "check_out" and not attendance.check_in_time:
+                raise ValidationError("Cannot check-out without check-in first.")
+            _apply(attendance, *fields)
 
-            # Update existing record if needed
-            if not created:
-                if check_type == "check_in" and not attendance.check_in_time:
-                    attendance.check_in_time = timestamp
-                if check_type == "check_out" and not attendance.check_out_time:
-                    # Prevent check-out without check-in
-                    if not attendance.check_in_time:
-                        raise ValidationError("Cannot check-out without check-in first.")
-                    attendance.check_out_time = timestamp
-
-                # Update optional fields if provided
-                if latitude:
-                    attendance.latitude = latitude
-                if longitude:
-                    attendance.longitude = longitude
-                if attachment:
-                    attendance.attachment = attachment
-
-                # Always update source
-                attendance.source = source
-
-                attendance.save()
+            # Always update source
+            attendance.source = source
 
+            attendance.save()
             return attendance
 
     except ValidationError as ve:
@@ -212,4 +257,69 @@ def mark_attendance(
     except Exception as e:
         # Unexpected errors logged for debugging
         logger.exception("mark_attendance failed")
-        raise ValidationError(["An unexpected error occurred while marking attendance."])
\ No newline at end of file
+        raise ValidationError(["An unexpected error occurred while marking attendance."])
+
+
+def _sync_one(user, event):
+    key = event["id"]
+    previous = AttendanceSyncEvent.objects.filter(user=user, client_event_id=key).first()
+    if previous:
+        return {"id": key, "status": "duplicate", "attendance_id": previous.attendance_id}
+
+    check_type = event["type"]
+    try:
+        with transaction.atomic():
+            # Claim the key first: a concurrent sync of the same event blocks on
+            # the unique (user, client_event_id) index and then fails here
+            ledger = AttendanceSyncEvent.objects.create(
+                user=user,
+                client_event_id=key,
+                attendee=event["attendee"],
+                check_type=check_type,
+                event_time=event["timestamp"],
+            )
+            attendance = mark_attendance(
+                user=user,
+                attendee=event["attendee"],
+                check_type=check_type,
+                timestamp=event["timestamp"],
+                latitude=event.get("latitude"),
+                longitude=event.get("longitude"),
+                check_in_image=event.get("image") if check_type == "check_in" else None,
+                check_out_image=event.get("image") if check_type == "check_out" else None,
+                source="manual",
+            )
+            ledger.attendance = attendance
+            ledger.save(update_fields=["attendance"])
+    except IntegrityError:
+        previous = AttendanceSyncEvent.objects.select_for_update().filter(user=user, client_event_id=key).first()
+        return {"id": key, "status": "duplicate", "attendance_id": previous.attendance_id if previous else None}
+    except ValidationError as e:
+        return {"id": key, "status": "rejected", "errors": e.messages}
+    return {"id": key, "status": "applied", "attendance_id": attendance.id}
+
+
+def sync_attendance_events(user, events):
+    """
+    Apply check-ins/check-outs queued offline on a device, in the order given.
+
+    ``events`` are validated dicts (see AttendanceSyncEventSerializer) with
+    ``id`` (client idempotency key), ``type``, ``timestamp``, ``attendee`` and
+    optional ``latitude``, ``longitude`` and ``image`` (an uploaded file).
+    Each attendee's events are applied through mark_attendance in one
+    transaction, with a savepoint per event so one rejected event does not
+    undo the rest. Events already synced are reported as duplicates.
+
+    Returns one result dict per event, in input order, with ``status``
+    applied / duplicate / rejected.
+    """
+    results = [None] * len(events)
+    by_attendee = defaultdict(list)
+    for index, event in enumerate(events):
+        by_attendee[event["attendee"].pk].append((index, event))
+
+    for attendee_events in by_attendee.values():
+        with transaction.atomic():
+            for index, event in attendee_events:
+                results[index] = _sync_one(user, event)
+    return results
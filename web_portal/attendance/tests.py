@@ -1,3 +1,301 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import DesignationModel, Role, SalesStaffProfile
+from FieldAdvisoryService.models import Company, Region, Territory, Zone
+from . import reports
+from .backfill import fill_attendance_dates
+from .models import Attendance, AttendanceSyncEvent
+from .services import mark_attendance
+
+User = get_user_model()
+
+
+def local(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute))
+
+
+class AttendanceReportTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(name='TestRole')
+        self.ali = User.objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role,
+        )
+        self.sara = User.objects.create_user(
+            username='sara', email='sara@example.com', password='testpass123',
+            first_name='Sara', last_name='Ahmed', role=role,
+        )
+        self.monday = date(2026, 3, 2)
+
+    def mark(self, attendee, day, check_in, check_out=None):
+        return Attendance.objects.create(
+            user=attendee,
+            attendee=attendee,
+            check_in_time=local(day, *check_in),
+            check_out_time=local(day, *check_out) if check_out else None,
+        )
+
+    def test_report_range(self):
+        today = date(2026, 3, 10)
+        self.assertEqual(reports.report_range('daily', today=today), (today, today))
+        self.assertEqual(reports.report_range('weekly', today=today), (date(2026, 3, 3), today))
+        self.assertEqual(reports.report_range('custom', '2026-03-01', '2026-03-05', today=today),
+                         (date(2026, 3, 1), date(2026, 3, 5)))
+        with self.assertRaises(ValueError):
+            reports.report_range('custom', '2026-03-05', '2026-03-01')
+        with self.assertRaises(ValueError):
+            reports.report_range('custom', '03/01/2026', '2026-03-05')
+        with self.assertRaises(ValueError):
+            reports.report_range('yearly')
+
+    def test_range_is_local_days_inclusive(self):
+        self.mark(self.ali, self.monday, (0, 5))
+        self.mark(self.ali, self.monday + timedelta(days=1), (23, 50))
+        self.mark(self.ali, self.monday + timedelta(days=2), (0, 0))
+
+        qs = reports.attendance_in_range(self.monday, self.monday + timedelta(days=1))
+
+        self.assertEqual(qs.count(), 2)
+        with self.assertRaises(ValueError):
+            reports.attendance_in_range(self.monday, self.monday, user_id='abc')
+
+    def test_summary_is_aggregated_per_attendee_and_period(self):
+        # Official hours are 9:00 - 18:00
+        self.mark(self.ali, self.monday, (9, 30), (18, 0))
+        self.mark(self.ali, self.monday + timedelta(days=1), (8, 45), (17, 0))
+        self.mark(self.sara, self.monday, (9, 0), (18, 30))
+
+        qs = reports.attendance_in_range(self.monday, self.monday + timedelta(days=6))
+        rows = reports.summary(qs, 'week')
+
+        self.assertEqual(len(rows), 2)
+        ali = rows[0]
+        self.assertEqual(ali['attendee'], self.ali.pk)
+        self.assertEqual(ali['period'], self.monday)
+        self.assertEqual(ali['present_days'], 2)
+        self.assertEqual(ali['late_arrivals'], 1)
+        self.assertEqual(ali['early_departures'], 1)
+        self.assertEqual(ali['hours_worked'], 16.75)
+        self.assertEqual(ali['total_check_in_gap'], timedelta(minutes=15))
+        self.assertEqual(ali['total_check_out_gap'], timedelta(hours=-1))
+        self.assertEqual(rows[1]['hours_worked'], 9.5)
+
+        by_day = reports.summary(qs, 'day')
+        self.assertEqual([(r['attendee'], r['period']) for r in by_day], [
+            (self.ali.pk, self.monday),
+            (self.ali.pk, self.monday + timedelta(days=1)),
+            (self.sara.pk, self.monday),
+        ])
+        with self.assertRaises(ValueError):
+            reports.summary(qs, 'year')
+
+    def test_detail_is_paginated(self):
+        for offset in range(5):
+            self.mark(self.ali, self.monday + timedelta(days=offset), (9, 0), (17, 30))
+        self.mark(self.sara, self.monday, (10, 0))
+
+        qs = reports.attendance_in_range(self.monday, self.monday + timedelta(days=6))
+        page = reports.detail_page(qs, page=2, page_size=4)
+
+        self.assertEqual(page['count'], 6)
+        self.assertEqual(page['num_pages'], 2)
+        self.assertEqual(len(page['records']), 2)
+        last = page['records'][-1]
+        self.assertEqual(last['attendee_username'], 'ali')
+        self.assertEqual(last['day'], self.monday + timedelta(days=4))
+        self.assertEqual(last['total_hours'], timedelta(hours=8, minutes=30))
+        sara = reports.detail_page(qs, page_size=4)['records'][1]
+        self.assertIsNone(sara['total_hours'])
+        with self.assertRaises(ValueError):
+            reports.detail_page(qs, page=3, page_size=4)
+
+    def test_csv_export_streams_every_row(self):
+        for offset in range(3):
+            self.mark(self.ali, self.monday + timedelta(days=offset), (9, 0), (18, 0))
+
+        qs = reports.attendance_in_range(self.monday, self.monday + timedelta(days=6))
+        response = reports.export(qs, 'csv', 'detail', 'day', 'attendance')
+
+        self.assertTrue(response.streaming)
+        self.assertIn('attendance.csv', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], ','.join(reports.DETAIL_COLUMNS))
+        self.assertEqual(len(lines), 4)
+        self.assertIn('09:00:00', lines[1])
+        with self.assertRaises(ValueError):
+            reports.export(qs, 'pdf', 'detail', 'day', 'attendance')
+
+
+class AttendanceDayTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(name='TestRole')
+        self.ali = User.objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role,
+        )
+        self.day = date(2026, 3, 2)
+
+    def test_save_sets_local_attendance_date(self):
+        # 00:30 in Karachi is still the previous day in UTC
+        attendance = Attendance.objects.create(user=self.ali, attendee=self.ali, check_in_time=local(self.day, 0, 30))
+        self.assertEqual(attendance.attendance_date, self.day)
+
+    def test_mark_attendance_upserts_the_days_record(self):
+        check_in = mark_attendance(self.ali, self.ali, 'check_in', local(self.day, 9, 5),
+                                   latitude=31.52041237, longitude=74.3)
+        again = mark_attendance(self.ali, self.ali, 'check_in', local(self.day, 9, 20))
+        check_out = mark_attendance(self.ali, self.ali, 'check_out', local(self.day, 18, 0), source='manual')
+
+        self.assertEqual(Attendance.objects.filter(attendee=self.ali).count(), 1)
+        self.assertEqual(again.pk, check_in.pk)
+        self.assertEqual(check_out.pk, check_in.pk)
+        check_out.refresh_from_db()
+        self.assertEqual(check_out.check_in_time, local(self.day, 9, 5))
+        self.assertEqual(check_out.check_out_time, local(self.day, 18, 0))
+        self.assertEqual(check_out.check_in_latitude, Decimal('31.520412'))
+        self.assertEqual(check_out.check_in_longitude, Decimal('74.300000'))
+        self.assertEqual(check_out.attendance_date, self.day)
+        with self.assertRaisesMessage(ValidationError, 'Invalid coordinates.'):
+            mark_attendance(self.ali, self.ali, 'check_out', local(self.day, 18, 5), latitude='north')
+
+    def test_backfill_skips_duplicate_days(self):
+        Attendance.objects.bulk_create([
+            Attendance(user=self.ali, attendee=self.ali, check_in_time=local(self.day, 9, 0)),
+            Attendance(user=self.ali, attendee=self.ali, check_in_time=local(self.day, 14, 0)),
+            Attendance(user=self.ali, attendee=self.ali, check_out_time=local(self.day + timedelta(days=1), 18, 0)),
+        ])
+
+        self.assertEqual(fill_attendance_dates(Attendance, batch_size=2, dry_run=True), (2, 1))
+        self.assertEqual(Attendance.objects.filter(attendance_date__isnull=False).count(), 0)
+        self.assertEqual(fill_attendance_dates(Attendance, batch_size=2), (2, 1))
+
+        dated = Attendance.objects.exclude(attendance_date=None).order_by('id')
+        self.assertEqual([a.attendance_date for a in dated], [self.day, self.day + timedelta(days=1)])
+        self.assertEqual(dated[0].check_in_time, local(self.day, 9, 0))
+
+
+class AttendanceSyncTests(APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='TestRole')
+        role.permissions.add(Permission.objects.get(content_type__app_label='attendance', codename='add_attendance'))
+        self.ali = User.objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role,
+        )
+        self.sara = User.objects.create_user(
+            username='sara', email='sara@example.com', password='testpass123',
+            first_name='Sara', last_name='Ahmed', role=role,
+        )
+        self.client.force_authenticate(self.ali)
+        self.url = reverse('attendance-sync')
+        self.day = date(2026, 3, 2)
+
+    def event(self, event_id, check_type, hour, **extra):
+        return {'id': event_id, 'type': check_type, 'timestamp': local(self.day, hour).isoformat(), **extra}
+
+    def test_day_backlog_syncs_in_one_request(self):
+        response = self.client.post(self.url, {'events': [
+            self.event('e1', 'check_in', 9, latitude=31.520412345, longitude=74.358712),
+            self.event('e2', 'check_out', 18),
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['applied'], 2)
+        first, second = response.data['results']
+        self.assertEqual(first['attendance_id'], second['attendance_id'])
+        attendance = Attendance.objects.get(pk=first['attendance_id'])
+        self.assertEqual(attendance.check_out_time, local(self.day, 18))
+        self.assertEqual(str(attendance.check_in_latitude), '31.520412')
+        self.assertEqual(AttendanceSyncEvent.objects.filter(user=self.ali).count(), 2)
+
+    def test_replayed_events_are_not_applied_twice(self):
+        events = [self.event('e1', 'check_in', 9), self.event('e2', 'check_out', 18)]
+        self.client.post(self.url, {'events': events}, format='json')
+        Attendance.objects.update(check_out_time=local(self.day, 17))
+
+        response = self.client.post(self.url, {'events': events + [self.event('e1', 'check_in', 10)]}, format='json')
+
+        self.assertEqual(response.data['duplicate'], 3)
+        self.assertEqual(response.data['applied'], 0)
+        self.assertEqual(Attendance.objects.get().check_out_time, local(self.day, 17))
+        self.assertEqual(AttendanceSyncEvent.objects.count(), 2)
+
+    def test_each_event_gets_its_own_result(self):
+        response = self.client.post(self.url, {'events': [
+            self.event('out', 'check_out', 18),
+            self.event('in', 'check_in', 9),
+            self.event('other', 'check_in', 9, attendee=self.sara.pk),
+            {'id': 'broken', 'type': 'lunch'},
+            self.event('photo', 'check_in', 9, image='missing.jpg'),
+        ]}, format='json')
+
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['applied', 'applied', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(response.data['results'][3]['id'], 'broken')
+
+    def test_check_out_without_check_in_is_rejected(self):
+        Attendance.objects.create(user=self.ali, attendee=self.ali, check_out_time=local(self.day, 18))
+
+        response = self.client.post(self.url, {'events': [self.event('out', 'check_out', 19)]}, format='json')
+
+        self.assertEqual(response.data['results'][0]['status'], 'rejected')
+        self.assertFalse(AttendanceSyncEvent.objects.exists())
+
+    def test_events_must_be_a_list(self):
+        self.assertEqual(self.client.post(self.url, {'events': []}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'events': 'nope'}, format='multipart').status_code, 400)
+
+
+@override_settings(ATTENDANCE_GEOFENCE_RADIUS_KM=15)
+class AttendanceGeofenceTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(name='TestRole')
+        self.ali = User.objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role,
+        )
+        company = Company.objects.create(Company_name='4B-BIO_APP', name='4B-BIO_APP', address='Lahore',
+                                         email='info@example.com')
+        region = Region.objects.create(company=company, name='Punjab')
+        zone = Zone.objects.create(company=company, region=region, name='Lahore Zone')
+        lahore = Territory.objects.create(company=company, zone=zone, name='Lahore',
+                                          latitude='31.520400', longitude='74.358700')
+        Territory.objects.create(company=company, zone=zone, name='Multan',
+                                 latitude='30.157500', longitude='71.524900')
+        designation = DesignationModel.objects.create(code='FSM', name='Field Sales Manager')
+        profile = SalesStaffProfile.objects.create(user=self.ali, designation=designation)
+        profile.territories.add(lahore)
+        self.day = date(2026, 3, 2)
+
+    def test_check_in_inside_assigned_territory(self):
+        # Raw GPS floats, as devices send them
+        attendance = mark_attendance(self.ali, self.ali, 'check_in', local(self.day, 9),
+                                     latitude=31.47000012, longitude=74.40999987)
+        self.assertEqual(attendance.attendance_date, self.day)
+        attendance.refresh_from_db()
+        self.assertEqual((attendance.check_in_latitude, attendance.check_in_longitude),
+                         (Decimal('31.470000'), Decimal('74.410000')))
+
+    def test_check_in_elsewhere_is_rejected(self):
+        # Close to Multan, which is not assigned to Ali
+        with self.assertRaisesMessage(ValidationError, 'from the nearest assigned territory'):
+            mark_attendance(self.ali, self.ali, 'check_in', local(self.day, 9), latitude=30.16, longitude=71.52)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_unfenced_cases(self):
+        mark_attendance(self.ali, self.ali, 'check_in', local(self.day, 9))
+        check_out = mark_attendance(self.ali, self.ali, 'check_out', local(self.day, 18), latitude=30.16, longitude=71.52)
+        self.assertEqual(check_out.check_out_latitude, Decimal('30.160000'))
+        with override_settings(ATTENDANCE_GEOFENCE_RADIUS_KM=0):
+            mark_attendance(self.ali, self.ali, 'check_in', local(self.day + timedelta(days=1), 9),
+                            latitude=30.16, longitude=71.52)
+        self.assertEqual(Attendance.objects.count(), 2)
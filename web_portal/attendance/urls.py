@@ -3,7 +3,7 @@ from .views import (
     AttendanceListView, AttendanceIndividualView, AttendanceCheckInView, AttendanceUpdateView, AttendanceUpdateView,
     AttendanceRequestViewSet, AttendanceReportView, 
     LeaveRequestListCreateView, LeaveRequestDetailView, AttendanceByAttendeeView,
-    AttendanceStatusView
+    AttendanceStatusView, AttendanceSyncView
 )
 from rest_framework.routers import DefaultRouter
 # from .views import AttendanceReportView
@@ -15,6 +15,7 @@ urlpatterns = [
     path('attendances/', AttendanceListView.as_view(), name='attendance-list'),
     path('attendances/<int:pk>/', AttendanceIndividualView.as_view(), name='attendance-individual'),
     path('attendance/check-in/', AttendanceCheckInView.as_view(), name='attendance-check-in'),
+    path('attendance/sync/', AttendanceSyncView.as_view(), name='attendance-sync'),
     path('attendances/by-attendee/', AttendanceByAttendeeView.as_view(), name='attendance-by-attendee'),
     path('attendances/attendee/<int:attendee_id>/', AttendanceUpdateView.as_view(), name='attendance-update'),
     # path('attendances/status/today/', AttendanceStatusView.as_view(), name='attendance-status-today'),
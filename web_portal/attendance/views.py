@@ -1,31 +1,23 @@
 from rest_framework import generics, permissions, viewsets, status
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.decorators import action
 from .models import Attendance, AttendanceRequest
-from .serializers import AttendanceSerializer, AttendanceRequestSerializer,AttendanceReportSerializer,EmptySerializer, AttendanceCheckInSerializer, AttendanceCheckOutSerializer
+from .serializers import AttendanceSerializer, AttendanceRequestSerializer,AttendanceReportRowSerializer,AttendanceSummaryRowSerializer, AttendanceCheckInSerializer, AttendanceCheckOutSerializer
+from .serializers import AttendanceSyncEventSerializer, AttendanceSyncRequestSerializer, AttendanceSyncResultSerializer
+from . import reports
 from rest_framework.permissions import IsAuthenticated
 from accounts.permissions import HasRolePermission
 from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
-from .services import mark_attendance
-from django.utils.timezone import now, localdate
-from datetime import timedelta
+from .services import mark_attendance, sync_attendance_events
 from .models import LeaveRequest
 from .serializers import LeaveRequestSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework import viewsets, status, permissions
-from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
-from drf_yasg.utils import swagger_auto_schema
-from .models import AttendanceRequest, Attendance
-from .serializers import AttendanceRequestSerializer
 from rest_framework import serializers
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -128,10 +120,84 @@ class AttendanceCheckInView(generics.CreateAPIView):
         return super().post(request, *args, **kwargs)
     
     def perform_create(self, serializer):
+        from django.core.exceptions import ValidationError as DjangoValidationError
+
         user = self.request.user
-        attendee = serializer.validated_data.get('attendee', user)
-        
-        serializer.save(user=user, attendee=attendee)
+        data = serializer.validated_data
+        attendee = data.get('attendee', user)
+
+        # Upsert on (attendee, attendance_date): a repeated or concurrent check-in
+        # completes the day's record instead of racing to insert a second one
+        try:
+            serializer.instance = mark_attendance(
+                user=user,
+                attendee=attendee,
+                check_type='check_in',
+                timestamp=data['check_in_time'],
+                latitude=data.get('check_in_latitude'),
+                longitude=data.get('check_in_longitude'),
+                check_in_image=data.get('check_in_image'),
+                source='manual',
+            )
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+
+
+# ✅ Bulk Offline Sync (POST)
+class AttendanceSyncView(APIView):
+    permission_classes = [IsAuthenticated, HasRolePermission]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+    queryset = Attendance.objects.none()  # HasRolePermission checks add_attendance
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Replay check-ins/check-outs queued offline on the device in one request. "
+            "Send JSON {\"events\": [...]} or multipart/form-data with an `events` JSON field and one "
+            "file part per photo, referenced by name from the event's `image`. Each event carries a "
+            "client-generated `id`; events already synced are reported as duplicates and not applied "
+            "again. Events are applied in order, one transaction per attendee, and every event gets "
+            "its own result: applied, duplicate, rejected (e.g. check-out without check-in) or invalid."
+        ),
+        request_body=AttendanceSyncRequestSerializer,
+        responses={200: AttendanceSyncResultSerializer(many=True), 400: 'Bad Request - events missing or too many'},
+        tags=["08. Attendance"]
+    )
+    def post(self, request):
+        import json
+        from collections import Counter
+        from django.conf import settings
+
+        events = request.data.get('events')
+        if isinstance(events, str):
+            try:
+                events = json.loads(events)
+            except ValueError:
+                return Response({'error': 'events must be a JSON list'}, status=400)
+        if not isinstance(events, list) or not events:
+            return Response({'error': 'events must be a non-empty list'}, status=400)
+        limit = getattr(settings, 'ATTENDANCE_SYNC_MAX_EVENTS', 500)
+        if len(events) > limit:
+            return Response({'error': f'At most {limit} events per request'}, status=400)
+
+        context = {'request': request, 'files': request.FILES}
+        results = [None] * len(events)
+        valid, positions = [], []
+        for index, item in enumerate(events):
+            serializer = AttendanceSyncEventSerializer(data=item, context=context)
+            if serializer.is_valid():
+                valid.append(serializer.validated_data)
+                positions.append(index)
+            else:
+                event_id = item.get('id') if isinstance(item, dict) else None
+                results[index] = {'id': event_id, 'status': 'invalid', 'errors': serializer.errors}
+        for index, result in zip(positions, sync_attendance_events(request.user, valid)):
+            results[index] = result
+
+        counts = Counter(result['status'] for result in results)
+        return Response({
+            'results': results,
+            **{state: counts.get(state, 0) for state in ('applied', 'duplicate', 'rejected', 'invalid')},
+        })
 
 
 # ✅ Attendance Update/Delete View (PUT, PATCH, DELETE)
@@ -283,7 +349,6 @@ class AttendanceByAttendeeView(generics.ListAPIView):
                 return Attendance.objects.none()
         
         # Time-range filtering
-        from django.utils import timezone
         from datetime import datetime, time, timedelta
         today = timezone.localdate()
         
@@ -414,9 +479,6 @@ class AttendanceStatusView(APIView):
         tags=["08. Attendance"]
     )
     def get(self, request):
-        from django.utils import timezone
-        from rest_framework.response import Response
-        
         # Ensure user is authenticated
         if not request.user.is_authenticated:
             return Response({'error': 'Authentication required'}, status=401)
@@ -442,14 +504,14 @@ class AttendanceStatusView(APIView):
         # Check both user and attendee fields to cover all cases
         attendance = Attendance.objects.filter(
             attendee=target_user,
-            check_in_time__date=today
+            attendance_date=today
         ).first()
         
         if not attendance:
             # Also check if user is the one who marked attendance
             attendance = Attendance.objects.filter(
                 user=target_user,
-                check_in_time__date=today
+                attendance_date=today
             ).first()
         
         if attendance:
@@ -749,7 +811,12 @@ class AttendanceReportView(APIView):
     permission_classes = [IsAuthenticated, HasRolePermission]
     # 🔹 Swagger parameters
     @swagger_auto_schema(
-        operation_description="Get attendance report (daily, weekly, monthly, or custom)",
+        operation_description=(
+            "Get attendance report (daily, weekly, monthly, or custom). "
+            "mode=detail returns one page of records, mode=summary per-attendee rollups "
+            "by day/week/month computed in the database; export=csv|xlsx downloads the "
+            "whole report of the chosen mode as a file."
+        ),
         tags=["10. Attendance Report"],
         manual_parameters=[
             openapi.Parameter(
@@ -781,48 +848,83 @@ class AttendanceReportView(APIView):
                 type=openapi.TYPE_INTEGER,
                 required=False
             ),
+            openapi.Parameter(
+                "mode",
+                openapi.IN_QUERY,
+                description="detail (default): paginated records; summary: per-attendee rollups",
+                type=openapi.TYPE_STRING,
+                enum=list(reports.MODES),
+                required=False
+            ),
+            openapi.Parameter(
+                "group_by",
+                openapi.IN_QUERY,
+                description="Rollup period for mode=summary (default day)",
+                type=openapi.TYPE_STRING,
+                enum=list(reports.GROUPINGS),
+                required=False
+            ),
+            openapi.Parameter(
+                "page",
+                openapi.IN_QUERY,
+                description="Page number for mode=detail (default 1)",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+            openapi.Parameter(
+                "page_size",
+                openapi.IN_QUERY,
+                description=f"Records per page for mode=detail (default {reports.DEFAULT_PAGE_SIZE}, max {reports.MAX_PAGE_SIZE})",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+            openapi.Parameter(
+                "export",
+                openapi.IN_QUERY,
+                description="Download the full report as csv or xlsx instead of JSON",
+                type=openapi.TYPE_STRING,
+                enum=list(reports.EXPORT_FORMATS),
+                required=False
+            ),
         ],
-        responses={200: AttendanceReportSerializer(many=True)},
+        responses={200: AttendanceReportRowSerializer(many=True)},
     )
     def get(self, request):
-        report_type = request.query_params.get("type", "weekly")
-        user_id = request.query_params.get("user_id")
-        start_date_param = request.query_params.get("start_date")
-        end_date_param = request.query_params.get("end_date")
-
-        today = localdate()
-
-        # 🔹 Handle date ranges
-        if report_type == "daily":
-            start_date, end_date = today, today
-        elif report_type == "weekly":
-            start_date, end_date = today - timedelta(days=7), today
-        elif report_type == "monthly":
-            start_date, end_date = today - timedelta(days=30), today
-        elif report_type == "custom" and start_date_param and end_date_param:
-            from datetime import datetime
-            try:
-                start_date = datetime.strptime(start_date_param, "%Y-%m-%d").date()
-                end_date = datetime.strptime(end_date_param, "%Y-%m-%d").date()
-            except ValueError:
-                return Response({"error": "Invalid date format, use YYYY-MM-DD"}, status=400)
-        else:
-            return Response({"error": "Invalid or incomplete report parameters"}, status=400)
+        params = request.query_params
+        report_type = params.get("type", "weekly")
+        mode = params.get("mode", "detail")
+        group_by = params.get("group_by", "day")
 
-        # 🔹 Filter attendance
-        qs = Attendance.objects.filter(check_in_time__date__gte=start_date,
-                                       check_in_time__date__lte=end_date)
+        try:
+            if mode not in reports.MODES:
+                raise ValueError(f"mode must be one of: {', '.join(reports.MODES)}")
+            start_date, end_date = reports.report_range(
+                report_type, params.get("start_date"), params.get("end_date")
+            )
+            qs = reports.attendance_in_range(start_date, end_date, params.get("user_id"))
 
-        if user_id:
-            qs = qs.filter(attendee_id=user_id)
+            if params.get("export"):
+                filename = f"attendance-{mode}-{start_date}-{end_date}"
+                return reports.export(qs, params["export"], mode, group_by, filename)
 
-        serializer = AttendanceReportSerializer(qs, many=True)
-        return Response({
-            "report_type": report_type,
-            "start_date": str(start_date),
-            "end_date": str(end_date),
-            "records": serializer.data
-        })
+            data = {
+                "report_type": report_type,
+                "mode": mode,
+                "start_date": str(start_date),
+                "end_date": str(end_date),
+            }
+            if mode == "summary":
+                data["group_by"] = group_by
+                data["records"] = AttendanceSummaryRowSerializer(reports.summary(qs, group_by), many=True).data
+            else:
+                page = reports.detail_page(qs, params.get("page"), params.get("page_size"))
+                page["records"] = AttendanceReportRowSerializer(page["records"], many=True).data
+                data.update(page)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        except ImportError:
+            return Response({"error": "Excel export not available. Please install openpyxl package."}, status=500)
+        return Response(data)
         
 # ✅ Enum values
 LEAVE_TYPE_CHOICES = ["sick", "casual", "annual"]
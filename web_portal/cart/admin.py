@@ -1,7 +1,7 @@
 from django.contrib import admin
 from web_portal.admin import admin_site
 from .models import (
-    Cart, CartItem, Order, OrderItem, Payment, OrderStatusHistory,
+    Cart, CartItem, Order, OrderItem, Payment, PaymentEvent, OrderStatusHistory,
 )
 
 
@@ -261,6 +261,21 @@ class PaymentAdmin(admin.ModelAdmin):
         return super().has_delete_permission(request, obj)
 
 
+@admin.register(PaymentEvent, site=admin_site)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ['transaction_ref', 'payment', 'source', 'outcome', 'state', 'response_code', 'duplicates', 'created_at']
+    list_filter = ['state', 'outcome', 'source', 'created_at']
+    list_per_page = 25
+    search_fields = ['transaction_ref', 'payment__transaction_id', 'payment__order__order_number']
+    readonly_fields = [
+        'transaction_ref', 'payment', 'source', 'outcome', 'state', 'response_code', 'response_message',
+        'amount', 'payload', 'note', 'duplicates', 'created_at', 'applied_at',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(OrderStatusHistory, site=admin_site)
 class OrderStatusHistoryAdmin(admin.ModelAdmin):
     list_display = ['order', 'old_status', 'new_status', 'changed_by', 'created_at']
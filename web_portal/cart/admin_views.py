@@ -5,12 +5,13 @@ Renders a consistent, orange-themed overview page (matching the SAP
 integration admin dashboards) with order/payment/cart statistics and a
 recent-orders table. Wired in web_portal/urls.py via admin.site.admin_view.
 """
-from django.db.models import Sum, Count, DecimalField
+from django.db.models import Sum, DecimalField
 from django.db.models.functions import Coalesce
 from django.shortcuts import render
 from django.utils import timezone
 from datetime import timedelta
 
+from . import statistics
 from .models import Cart, CartItem, Order, OrderItem, Payment
 
 
@@ -27,22 +28,15 @@ def cart_dashboard_admin(request):
     orders = Order.objects.all()
 
     # --- Order statistics -------------------------------------------------
-    order_agg = orders.aggregate(
-        total=Count('id'),
-        total_amount=Coalesce(Sum('total_amount'), 0, output_field=DecimalField()),
-        paid_amount=Coalesce(Sum('paid_amount'), 0, output_field=DecimalField()),
-    )
+    summary = statistics.summarize(orders)
+    status_counts = summary['status_breakdown']
+    payment_counts = summary['payment_status_breakdown']
 
-    status_counts = {row['status']: row['count'] for row in
-                     orders.values('status').annotate(count=Count('id'))}
-    payment_counts = {row['payment_status']: row['count'] for row in
-                      orders.values('payment_status').annotate(count=Count('id'))}
-
-    total_amount = _money(order_agg['total_amount'])
-    paid_amount = _money(order_agg['paid_amount'])
+    total_amount = _money(summary['total_amount'])
+    paid_amount = _money(summary['total_spent'])
 
     order_stats = {
-        'total': order_agg['total'],
+        'total': summary['total_orders'],
         'pending': status_counts.get('pending', 0),
         'inprogress': status_counts.get('inprogress', 0),
         'delivered': status_counts.get('delivered', 0),
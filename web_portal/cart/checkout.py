@@ -0,0 +1,123 @@
+"""
+Cart to order conversion shared by CartViewSet.checkout and OrderViewSet.create.
+
+Checkout used to create every OrderItem with its own INSERT and to run the
+expiry cleanup first, so its query count grew with the cart. ``place_order``
+runs a fixed number of queries however many items the cart holds:
+
+- the cart row is locked with SELECT ... FOR UPDATE, so a double-tapped
+  checkout waits for the first one and then finds the cart empty instead of
+  placing a second order;
+- the live items (active and not expired) are read once; that read is the
+  price snapshot, since unit prices were captured on the cart item when it
+  was added, and the product image URLs are derived from the same rows;
+- the order, its status history entry and all order items are inserted with
+  one statement each (items through bulk_create), and the items and the
+  cart are deactivated with one UPDATE each, all in one transaction.
+
+Expired items are never ordered; marking them inactive is left to the
+``clean_expired_carts`` sweeper.
+"""
+import uuid
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart, CartItem, Order, OrderItem, OrderStatusHistory
+
+ORDER_FIELDS = (
+    'customer_first_name', 'customer_last_name', 'customer_phone', 'customer_email',
+    'shipping_address', 'shipping_area', 'shipping_city', 'shipping_postal_code',
+    'payment_method', 'payment_phone', 'notes',
+)
+
+
+class EmptyCart(Exception):
+    """The user has no cart or no live items in it."""
+
+
+def product_image_urls(database, item_code):
+    """(product image URL, Urdu description image URL) of a product in the media folder."""
+    base = f"/media/product_images/{database}/{item_code}"
+    return f"{base}.jpg", f"{base}-urdu.jpg"
+
+
+def snapshot_items(cart, database):
+    """[{item fields, subtotal, image URLs}] of the live items of ``cart``, in one query."""
+    snapshot = []
+    for item in CartItem.objects.live().filter(cart=cart).order_by('id'):
+        unit_price = item.unit_price or Decimal('0')
+        image_url, urdu_url = product_image_urls(database, item.product_item_code)
+        snapshot.append({
+            'id': item.id,
+            'product_item_code': item.product_item_code,
+            'product_name': item.product_name,
+            'quantity': item.quantity,
+            'unit_price': unit_price,
+            'subtotal': item.quantity * unit_price,
+            'notes': item.notes,
+            'product_image_url': image_url,
+            'product_description_urdu_url': urdu_url,
+        })
+    return snapshot
+
+
+def new_order_number():
+    return f"ORD-{uuid.uuid4().hex[:8].upper()}-{timezone.now().strftime('%Y%m%d')}"
+
+
+def place_order(user, details, database, history_note=None):
+    """
+    Turn the live items of ``user``'s cart into a pending order.
+
+    ``details`` holds the Order customer, shipping and payment fields
+    (ORDER_FIELDS). A status history row is written when ``history_note``
+    is given. Returns (order, cart, item snapshot); raises EmptyCart.
+    """
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(user=user).first()
+        if cart is None:
+            raise EmptyCart()
+        snapshot = snapshot_items(cart, database)
+        if not snapshot:
+            raise EmptyCart()
+
+        order = Order.objects.create(
+            user=user,
+            order_number=new_order_number(),
+            status='pending',
+            total_amount=sum(item['subtotal'] for item in snapshot),
+            **{field: details.get(field, '') for field in ORDER_FIELDS},
+        )
+        if history_note:
+            OrderStatusHistory.objects.create(
+                order=order, new_status='pending', changed_by=user, notes=history_note,
+            )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_item_code=item['product_item_code'],
+                product_name=item['product_name'],
+                quantity=item['quantity'],
+                unit_price=item['unit_price'],
+                subtotal=item['subtotal'],
+                notes=item['notes'],
+            )
+            for item in snapshot
+        ])
+
+        # Clear cart - soft delete (mark items and cart inactive)
+        CartItem.objects.filter(id__in=[item['id'] for item in snapshot]).update(is_active=False)
+        Cart.objects.filter(pk=cart.pk).update(is_active=False, updated_date=timezone.now())
+        cart.is_active = False
+    return order, cart, snapshot
+
+
+def order_for_response(order):
+    """``order`` re-read with what OrderSerializer walks, in a fixed number of queries."""
+    return (
+        Order.objects.select_related('user')
+        .prefetch_related('items', 'status_history__changed_by')
+        .get(pk=order.pk)
+    )
@@ -1,21 +1,27 @@
 """
 Management command to clean expired cart items.
 
-This command removes cart items that have been inactive for more than 24 hours.
-Run this command periodically via cron job or task scheduler.
+Cart requests no longer clean up on every call; they hide expired items
+(CartItem.objects.live()) and this sweeper marks items that have been in a
+cart for more than CART_ITEM_TTL_HOURS (default 24) inactive, in batches.
+Run it periodically via cron job or task scheduler, or keep it running
+with --loop.
 
 Usage:
     python manage.py clean_expired_carts
+    python manage.py clean_expired_carts --loop --sleep 600
 """
 
+import time
+
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from cart.models import Cart, CartItem
+from cart.models import CartItem
 
 
 class Command(BaseCommand):
-    help = 'Remove cart items that have been in cart for more than 24 hours'
+    help = 'Mark cart items that have been in cart for more than 24 hours inactive'
     
     def add_arguments(self, parser):
         parser.add_argument(
@@ -26,60 +32,69 @@ class Command(BaseCommand):
         parser.add_argument(
             '--hours',
             type=int,
-            default=24,
-            help='Number of hours after which to expire cart items (default: 24)',
+            default=None,
+            help='Number of hours after which to expire cart items (default: CART_ITEM_TTL_HOURS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Items marked inactive per UPDATE (default: 1000)',
         )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping every --sleep seconds',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=600,
+            help='Seconds between sweeps with --loop (default: 600)',
+        )
+
+    def expired_items(self, hours):
+        if hours is None:
+            return CartItem.objects.expired()
+        expiry_time = timezone.now() - timedelta(hours=hours)
+        return CartItem.objects.filter(created_date__lt=expiry_time, is_active=True)
+
+    def sweep(self, hours, batch_size):
+        """Mark expired items inactive in primary key batches; returns the number swept."""
+        swept = 0
+        while True:
+            ids = list(self.expired_items(hours).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return swept
+            swept += CartItem.objects.filter(id__in=ids, is_active=True).update(is_active=False)
     
     def handle(self, *args, **options):
-        dry_run = options['dry_run']
         hours = options['hours']
-        
-        self.stdout.write(f'Searching for cart items older than {hours} hours...')
-        
-        # Calculate expiry time
-        expiry_time = timezone.now() - timedelta(hours=hours)
-        
-        # Find expired items
-        expired_items = CartItem.objects.filter(
-            created_at__lt=expiry_time,
-            is_active=True
-        )
-        
-        count = expired_items.count()
-        
-        if count == 0:
-            self.stdout.write(self.style.SUCCESS('No expired cart items found.'))
-            return
-        
-        # Show details
-        self.stdout.write(f'Found {count} expired cart items:')
-        
-        for item in expired_items[:10]:  # Show first 10
-            self.stdout.write(
-                f'  - {item.product_name} (x{item.quantity}) in cart of {item.cart.user.email} '
-                f'(added {item.created_at})'
-            )
-        
-        if count > 10:
-            self.stdout.write(f'  ... and {count - 10} more items')
-        
-        if dry_run:
+
+        if options['dry_run']:
+            expired_items = self.expired_items(hours)
+            count = expired_items.count()
+            self.stdout.write(f'Found {count} expired cart items:')
+            for item in expired_items.select_related('cart__user')[:10]:  # Show first 10
+                self.stdout.write(
+                    f'  - {item.product_name} (x{item.quantity}) in cart of {item.cart.user.email} '
+                    f'(added {item.created_date})'
+                )
+            if count > 10:
+                self.stdout.write(f'  ... and {count - 10} more items')
             self.stdout.write(
                 self.style.WARNING(
                     f'\nDRY RUN: Would mark {count} items as inactive. '
                     'Run without --dry-run to actually clean them.'
                 )
             )
-        else:
-            # Mark items as inactive
-            expired_items.update(is_active=False)
-            
+            return
+
+        while True:
+            count = self.sweep(hours, max(1, options['batch_size']))
             self.stdout.write(
-                self.style.SUCCESS(
-                    f'\nSuccessfully marked {count} expired cart items as inactive.'
-                )
+                self.style.SUCCESS(f'Marked {count} expired cart items as inactive.')
             )
-            
-            # Optionally, show statistics
-            total_active_items = CartItem.objects.filter(is_active=True).count()
-            self.stdout.write(f'Remaining active cart items: {total_active_items}')
+            if not options['loop']:
+                return
+            time.sleep(options['sleep'])
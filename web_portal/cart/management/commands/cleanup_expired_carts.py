@@ -35,7 +35,7 @@ class Command(BaseCommand):
         
         # Find expired items
         expired_items = CartItem.objects.filter(
-            created_at__lt=expiry_time,
+            created_date__lt=expiry_time,
             is_active=True
         )
         
@@ -55,7 +55,7 @@ class Command(BaseCommand):
             items = expired_items.filter(cart__user__email=email)
             self.stdout.write(f'\n  📧 {email}:')
             for item in items:
-                age_hours = (timezone.now() - item.created_at).total_seconds() / 3600
+                age_hours = (timezone.now() - item.created_date).total_seconds() / 3600
                 self.stdout.write(
                     f'    - {item.product_name} (x{item.quantity}) '
                     f'[Age: {age_hours:.1f} hours]'
@@ -0,0 +1,68 @@
+"""
+Management command to reconcile open JazzCash payments with the gateway.
+
+Callbacks can be lost, so payments still pending or processing
+JAZZCASH_RECONCILE_AFTER_MINUTES (default 15) after they were initiated are
+re-verified with a transaction status inquiry, in batches, and the answer
+is applied through the payment event ledger (cart/payment_events.py), the
+same way as a callback. Payments declined while their payment request had
+not yet expired are checked again too, since the customer may have retried
+and paid. Ledger events left unapplied by an interrupted
+callback are applied first. Run it periodically via cron job or task
+scheduler, or keep it running with --loop.
+
+Usage:
+    python manage.py reconcile_jazzcash_payments
+    python manage.py reconcile_jazzcash_payments --minutes 30 --batch-size 50
+    python manage.py reconcile_jazzcash_payments --loop --sleep 300
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from cart import payment_events
+
+
+class Command(BaseCommand):
+    help = 'Re-verify open JazzCash payments with the gateway and apply the results once'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes',
+            type=int,
+            default=None,
+            help='Only payments initiated this many minutes ago or earlier (default: JAZZCASH_RECONCILE_AFTER_MINUTES)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Payments read per query (default: 100)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep reconciling every --sleep seconds',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=300,
+            help='Seconds between runs with --loop (default: 300)',
+        )
+
+    def handle(self, *args, **options):
+        min_age = timedelta(minutes=options['minutes']) if options['minutes'] is not None else None
+
+        while True:
+            counts = payment_events.reconcile(max(1, options['batch_size']), min_age)
+            self.stdout.write(self.style.SUCCESS(
+                f"Checked {counts['checked']} payments: {counts['completed']} completed, "
+                f"{counts['failed']} failed, {counts['pending']} still open; "
+                f"applied {counts['resumed']} interrupted events."
+            ))
+            if not options['loop']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0008_add_cart_is_active'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['is_active', 'created_date'], name='cart_item_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0009_cartitem_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='jazzcash_payment_token',
+            field=models.CharField(blank=True, db_index=True, help_text='JazzCash payment token for verification', max_length=255, null=True),
+        ),
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_ref', models.CharField(help_text='Gateway transaction reference (pp_TxnRefNo)', max_length=100, unique=True)),
+                ('source', models.CharField(choices=[('callback', 'Gateway Callback'), ('return', 'Customer Return'), ('inquiry', 'Status Inquiry')], help_text='How the notification arrived', max_length=20)),
+                ('outcome', models.CharField(choices=[('completed', 'Completed'), ('failed', 'Failed')], help_text='Payment outcome reported by the gateway', max_length=20)),
+                ('state', models.CharField(choices=[('received', 'Received'), ('applied', 'Applied'), ('ignored', 'Ignored')], default='received', help_text='received -> applied, or ignored when there was nothing to apply', max_length=20)),
+                ('response_code', models.CharField(blank=True, help_text='Gateway response code', max_length=10)),
+                ('response_message', models.TextField(blank=True, help_text='Gateway response message')),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, help_text='Amount reported by the gateway', max_digits=12, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Verified notification as received')),
+                ('note', models.TextField(blank=True, help_text='Why the event was ignored')),
+                ('duplicates', models.PositiveIntegerField(default=0, help_text='Repeated notifications for this reference')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('applied_at', models.DateTimeField(blank=True, help_text='When the event left the received state', null=True)),
+                ('payment', models.ForeignKey(blank=True, help_text='Payment the notification was applied to', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='cart.payment')),
+            ],
+            options={
+                'verbose_name': 'Payment Event',
+                'verbose_name_plural': 'Payment Events',
+                'db_table': 'cart_paymentevent',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['state', 'created_at'], name='cart_payment_event_state_idx')],
+            },
+        ),
+    ]
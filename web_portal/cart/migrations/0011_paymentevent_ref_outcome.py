@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0010_paymentevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentevent',
+            name='transaction_ref',
+            field=models.CharField(help_text='Gateway transaction reference (pp_TxnRefNo)', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='paymentevent',
+            name='outcome',
+            field=models.CharField(choices=[('completed', 'Completed'), ('failed', 'Failed'), ('pending', 'Not Final')], help_text='Payment outcome reported by the gateway', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentevent',
+            constraint=models.UniqueConstraint(fields=('transaction_ref', 'outcome'), name='cart_payevent_ref_outcome_uniq'),
+        ),
+    ]
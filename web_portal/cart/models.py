@@ -4,6 +4,21 @@ from django.utils import timezone
 from datetime import timedelta
 
 
+def cart_item_expiry_cutoff():
+    """Items added before this moment have expired (CART_ITEM_TTL_HOURS, default 24)."""
+    return timezone.now() - timedelta(hours=getattr(settings, 'CART_ITEM_TTL_HOURS', 24))
+
+
+class CartItemQuerySet(models.QuerySet):
+    def live(self):
+        """Items still in the cart: active and not expired."""
+        return self.filter(is_active=True, created_date__gte=cart_item_expiry_cutoff())
+
+    def expired(self):
+        """Active items past their expiry, waiting for the clean_expired_carts sweep."""
+        return self.filter(is_active=True, created_date__lt=cart_item_expiry_cutoff())
+
+
 class Cart(models.Model):
     """
     Shopping cart for users.
@@ -36,22 +51,19 @@ class Cart(models.Model):
     
     def get_total_items(self):
         """Get total number of items in cart"""
-        return self.items.filter(is_active=True).count()
+        return self.items.live().count()
     
     def get_total_quantity(self):
         """Get total quantity of all items in cart"""
-        return sum(item.quantity for item in self.items.filter(is_active=True))
+        return self.items.live().aggregate(total=models.Sum('quantity'))['total'] or 0
     
     def clear_expired_items(self):
-        """Soft delete items that have been in cart for more than 24 hours"""
-        expiry_time = timezone.now() - timedelta(days=1)
-        expired_items = self.items.filter(
-            created_date__lt=expiry_time,
-            is_active=True
-        )
-        count = expired_items.count()
-        expired_items.update(is_active=False)  # Soft delete
-        return count
+        """
+        Soft delete items that have been in cart for more than 24 hours.
+        Requests no longer call this; expired items are hidden by
+        ``CartItem.objects.live()`` and swept by ``clean_expired_carts``.
+        """
+        return self.items.expired().update(is_active=False)  # Soft delete
 
 
 class CartItem(models.Model):
@@ -98,6 +110,8 @@ class CartItem(models.Model):
         help_text="When this item was added to cart"
     )
     updated_date = models.DateTimeField(auto_now=True)
+
+    objects = CartItemQuerySet.as_manager()
     
     class Meta:
         db_table = 'cart_cartitem'
@@ -106,14 +120,16 @@ class CartItem(models.Model):
         ordering = ['-created_date']
         # Only one active item per product in cart
         unique_together = [['cart', 'product_item_code']]
+        indexes = [
+            models.Index(fields=['is_active', 'created_date'], name='cart_item_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product_name} (x{self.quantity}) in {self.cart.user.email}'s cart"
     
     def is_expired(self):
         """Check if this item has been in cart for more than 24 hours"""
-        expiry_time = timezone.now() - timedelta(days=1)
-        return self.created_date < expiry_time
+        return self.created_date < cart_item_expiry_cutoff()
     
     def get_subtotal(self):
         """Calculate subtotal for this item"""
@@ -457,6 +473,7 @@ class Payment(models.Model):
         max_length=255,
         blank=True,
         null=True,
+        db_index=True,
         help_text="JazzCash payment token for verification"
     )
     
@@ -527,6 +544,112 @@ class Payment(models.Model):
         self.save()
 
 
+class PaymentEvent(models.Model):
+    """
+    Ledger of gateway payment notifications, one row per gateway transaction
+    reference (pp_TxnRefNo) and outcome. The unique pair makes duplicate or
+    concurrent callbacks collide on insert, so each outcome is applied to its
+    payment once, while a success may still follow a decline of the same
+    reference (cart/payment_events.py).
+    """
+    SOURCE_CHOICES = [
+        ('callback', 'Gateway Callback'),
+        ('return', 'Customer Return'),
+        ('inquiry', 'Status Inquiry'),
+    ]
+
+    OUTCOME_CHOICES = [
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('pending', 'Not Final'),
+    ]
+
+    STATE_CHOICES = [
+        ('received', 'Received'),
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+    ]
+
+    transaction_ref = models.CharField(
+        max_length=100,
+        help_text="Gateway transaction reference (pp_TxnRefNo)"
+    )
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='events',
+        help_text="Payment the notification was applied to"
+    )
+    source = models.CharField(
+        max_length=20,
+        choices=SOURCE_CHOICES,
+        help_text="How the notification arrived"
+    )
+    outcome = models.CharField(
+        max_length=20,
+        choices=OUTCOME_CHOICES,
+        help_text="Payment outcome reported by the gateway"
+    )
+    state = models.CharField(
+        max_length=20,
+        choices=STATE_CHOICES,
+        default='received',
+        help_text="received -> applied, or ignored when there was nothing to apply"
+    )
+    response_code = models.CharField(
+        max_length=10,
+        blank=True,
+        help_text="Gateway response code"
+    )
+    response_message = models.TextField(
+        blank=True,
+        help_text="Gateway response message"
+    )
+    amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Amount reported by the gateway"
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Verified notification as received"
+    )
+    note = models.TextField(
+        blank=True,
+        help_text="Why the event was ignored"
+    )
+    duplicates = models.PositiveIntegerField(
+        default=0,
+        help_text="Repeated notifications for this reference"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the event left the received state"
+    )
+
+    class Meta:
+        db_table = 'cart_paymentevent'
+        verbose_name = "Payment Event"
+        verbose_name_plural = "Payment Events"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['state', 'created_at'], name='cart_payment_event_state_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_ref', 'outcome'], name='cart_payevent_ref_outcome_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_ref} {self.outcome} ({self.state})"
+
+
 class OrderStatusHistory(models.Model):
     """
     Audit trail for order status changes.
@@ -0,0 +1,242 @@
+"""
+JazzCash payment notifications applied exactly once.
+
+The callback view used to look the payment up and call mark_completed on
+every POST, so a gateway retry, or a callback racing the customer's return
+redirect, added the amount to order.paid_amount twice. Each verified
+notification now goes through a small state machine on the PaymentEvent
+ledger:
+
+1. ``record`` inserts the event, keyed by the gateway transaction
+   reference and outcome, in its own transaction. A second notification with
+   the same reference and outcome fails that insert (a concurrent one waits
+   on the unique index until the first commits) and is answered from the
+   existing row.
+2. ``apply`` locks the event, the payment and the order (SELECT ... FOR
+   UPDATE) and moves the event out of 'received': to 'applied' when it
+   changed the payment, to 'ignored' otherwise.
+
+Only '000' completes a payment and only the final decline codes
+(FAILURE_CODES) fail it; other codes are recorded as 'pending' and left to
+reconciliation. A success also completes a payment an earlier decline of the
+same reference failed, since the customer may retry until the request
+expires (EXPIRY); a completed payment is never changed again.
+
+The event is committed before it is applied, so an apply cut short by a
+crash leaves it 'received' for the next duplicate or for ``reconcile``,
+which also asks the gateway about open payments whose callback never came
+and about payments declined while their request had not yet expired
+(``python manage.py reconcile_jazzcash_payments``).
+"""
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .jazzcash_service import JazzCashService
+from .models import Order, Payment, PaymentEvent
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ('pending', 'processing')
+# Response codes after which the gateway will not complete the transaction
+FAILURE_CODES = ('001', '002', '121', '124', '157', '158', '200')
+# pp_TxnExpiryDateTime of a payment request (JazzCashService.create_payment_request)
+EXPIRY = timedelta(hours=1)
+
+
+@dataclass
+class Result:
+    """Outcome of one notification; ``event`` is None when it was rejected."""
+    event: Optional[PaymentEvent] = None
+    duplicate: bool = False
+    error: str = ''
+
+    @property
+    def payment(self):
+        return self.event.payment if self.event else None
+
+    @property
+    def success(self):
+        return self.event is not None and self.event.outcome == 'completed'
+
+
+def outcome(response_code) -> str:
+    if response_code == '000':
+        return 'completed'
+    return 'failed' if response_code in FAILURE_CODES else 'pending'
+
+
+def _amount(value):
+    """pp_Amount (paisa) in rupees, or None."""
+    try:
+        return Decimal(str(value)) / 100
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def record(data, source='callback', service=None) -> Result:
+    """
+    Verify a gateway notification, insert its ledger row and apply it.
+    Notifications with a bad hash or without a transaction reference are
+    rejected without touching the ledger.
+    """
+    data = {key: data[key] for key in data}  # QueryDict -> one value per key
+    verification = (service or JazzCashService()).verify_payment_response(data)
+    if verification.get('error'):
+        return Result(error=verification['error'])
+    transaction_ref = data.get('pp_TxnRefNo', '')
+    if not transaction_ref:
+        return Result(error='Missing transaction reference')
+
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.create(
+                transaction_ref=transaction_ref,
+                source=source,
+                outcome=outcome(verification.get('response_code', '')),
+                response_code=verification.get('response_code', ''),
+                response_message=verification.get('response_message', ''),
+                amount=_amount(data.get('pp_Amount')),
+                payload=data,
+            )
+    except IntegrityError:
+        existing = PaymentEvent.objects.filter(
+            transaction_ref=transaction_ref, outcome=outcome(verification.get('response_code', '')),
+        )
+        existing.update(duplicates=F('duplicates') + 1)
+        event = existing.get()
+        logger.info(f"Duplicate {source} for JazzCash transaction {transaction_ref} ({event.state})")
+        if event.state == 'received':
+            event = apply(event.pk)
+        return Result(event=event, duplicate=True)
+
+    return Result(event=apply(event.pk))
+
+
+def _ignore(event, note):
+    event.state = 'ignored'
+    event.note = note
+    logger.warning(f"JazzCash transaction {event.transaction_ref} ignored: {note}")
+
+
+def apply(event_id) -> PaymentEvent:
+    """Apply a 'received' event to its payment and order; a no-op for any other state."""
+    with transaction.atomic():
+        event = PaymentEvent.objects.select_for_update().get(pk=event_id)
+        if event.state != 'received':
+            return event
+
+        payment = (
+            Payment.objects.select_for_update()
+            .filter(jazzcash_payment_token=event.transaction_ref)
+            .first()
+        )
+        # A success may overturn a decline; nothing overturns a success
+        allowed = OPEN_STATUSES + ('failed',) if event.outcome == 'completed' else OPEN_STATUSES
+        if payment is None:
+            _ignore(event, 'Payment record not found')
+        elif event.outcome == 'pending':
+            event.payment = payment
+            _ignore(event, f'Response code {event.response_code or "(none)"} is not final')
+        elif payment.status not in allowed:
+            event.payment = payment
+            _ignore(event, f'Payment already {payment.status}')
+        else:
+            # Lock the order too: other payments of the same order add to paid_amount
+            payment.order = Order.objects.select_for_update().get(pk=payment.order_id)
+            payment.jazzcash_transaction_id = event.transaction_ref
+            payment.jazzcash_response_code = event.response_code
+            payment.jazzcash_response_message = event.response_message
+            payment.raw_response = event.payload
+
+            if event.outcome == 'completed' and event.amount is not None and event.amount != payment.amount:
+                event.note = f'Gateway amount {event.amount} does not match payment amount {payment.amount}'
+                payment.mark_failed(event.note)
+            elif event.outcome == 'completed':
+                payment.order.status = 'confirmed'
+                payment.mark_completed()
+                logger.info(f"Payment {payment.transaction_id} completed successfully")
+            else:
+                payment.mark_failed(event.response_message or 'Payment verification failed')
+                logger.warning(f"Payment {payment.transaction_id} failed: {event.response_message}")
+            event.payment = payment
+            event.state = 'applied'
+
+        event.applied_at = timezone.now()
+        event.save(update_fields=['payment', 'state', 'note', 'applied_at'])
+    return event
+
+
+def stale_payments(min_age=None):
+    """
+    JazzCash payments initiated more than ``min_age`` ago (default
+    JAZZCASH_RECONCILE_AFTER_MINUTES) that are still open, or that failed
+    while their request could still be completed.
+    """
+    if min_age is None:
+        min_age = timedelta(minutes=getattr(settings, 'JAZZCASH_RECONCILE_AFTER_MINUTES', 15))
+    now = timezone.now()
+    return Payment.objects.filter(
+        Q(status__in=OPEN_STATUSES) | Q(status='failed', created_date__gte=now - EXPIRY - min_age),
+        payment_method='jazzcash',
+        created_date__lt=now - min_age,
+    ).exclude(jazzcash_payment_token__isnull=True).exclude(jazzcash_payment_token='')
+
+
+def inquire(payment, service=None) -> Optional[Result]:
+    """
+    Ask the gateway about ``payment`` and record the answer as an 'inquiry'
+    event. Returns None while there is nothing final to record: the gateway
+    was unreachable, answered for another reference, or reports a failure
+    before the payment request has expired (the customer may still pay).
+    """
+    service = service or JazzCashService()
+    status_result = service.get_transaction_status(payment.jazzcash_payment_token)
+    data = status_result.get('data') if status_result.get('success') else None
+    if not isinstance(data, dict) or data.get('pp_TxnRefNo') != payment.jazzcash_payment_token:
+        return None
+    if data.get('pp_ResponseCode') != '000' and payment.created_date > timezone.now() - EXPIRY:
+        return None
+    return record(data, source='inquiry', service=service)
+
+
+def reconcile(batch_size=100, min_age=None, service=None) -> dict:
+    """
+    Apply events left 'received' and re-verify stale open payments with the
+    gateway, ``batch_size`` rows per query. Returns counts by outcome.
+    """
+    counts = {'resumed': 0, 'checked': 0, 'completed': 0, 'failed': 0, 'pending': 0}
+    service = service or JazzCashService()
+    cutoff = timezone.now() - timedelta(minutes=1)
+
+    last_id = 0
+    while True:
+        ids = list(
+            PaymentEvent.objects.filter(state='received', created_at__lt=cutoff, pk__gt=last_id)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        for event_id in ids:
+            apply(event_id)
+        counts['resumed'] += len(ids)
+        last_id = ids[-1]
+
+    last_id = 0
+    while True:
+        batch = list(stale_payments(min_age).filter(pk__gt=last_id).order_by('pk')[:batch_size])
+        if not batch:
+            break
+        for payment in batch:
+            counts['checked'] += 1
+            result = inquire(payment, service)
+            counts[result.event.outcome if result and result.event else 'pending'] += 1
+        last_id = batch[-1].pk
+    return counts
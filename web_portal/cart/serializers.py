@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Cart, CartItem, Order, OrderItem, Payment, OrderStatusHistory
+from .checkout import product_image_urls
 from django.utils import timezone
 from django.conf import settings
 import os
@@ -42,24 +43,12 @@ class CartItemSerializer(serializers.ModelSerializer):
     def get_product_image_url(self, obj):
         """Get product image URL from media folder"""
         # Get database from context or default to 4B-BIO
-        database = self.context.get('database', '4B-BIO')
-        
-        # Construct image path based on product_item_code
-        # Assuming image naming convention: {ItemCode}-{ProductName}.jpg
-        # You may need to adjust this based on your actual SAP data
-        image_filename = f"{obj.product_item_code}.jpg"
-        image_path = f"/media/product_images/{database}/{image_filename}"
-        
-        # Check if file exists (optional)
         # For now, return the path - frontend can handle 404s
-        return image_path
+        return product_image_urls(self.context.get('database', '4B-BIO'), obj.product_item_code)[0]
     
     def get_product_description_urdu_url(self, obj):
         """Get product Urdu description image URL"""
-        database = self.context.get('database', '4B-BIO')
-        image_filename = f"{obj.product_item_code}-urdu.jpg"
-        image_path = f"/media/product_images/{database}/{image_filename}"
-        return image_path
+        return product_image_urls(self.context.get('database', '4B-BIO'), obj.product_item_code)[1]
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -88,24 +77,31 @@ class CartSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'cart_id', 'user_id', 'user', 'created_date', 'updated_date']
 
+    def active_items(self, obj):
+        """Live items of the cart (plus expired ones with include_expired), read once per cart"""
+        cache = self.__dict__.setdefault('_active_items', {})
+        if obj.pk not in cache:
+            items = obj.items.filter(is_active=True) if self.context.get('include_expired') else obj.items.live()
+            cache[obj.pk] = list(items)
+        return cache[obj.pk]
+
     def get_items(self, obj):
         """Get only active items in cart"""
-        active_items = obj.items.filter(is_active=True)
         # Get database from context if available
         database = self.context.get('database', '4B-BIO')
-        return CartItemSerializer(active_items, many=True, context={'database': database}).data
+        return CartItemSerializer(self.active_items(obj), many=True, context={'database': database}).data
 
     def get_total_items(self, obj):
         """Get total number of items"""
-        return obj.get_total_items()
+        return len(self.active_items(obj))
 
     def get_total_quantity(self, obj):
         """Get total quantity"""
-        return obj.get_total_quantity()
+        return sum(item.quantity for item in self.active_items(obj))
 
     def get_cart_total(self, obj):
         """Calculate cart total"""
-        return sum(item.get_subtotal() for item in obj.items.filter(is_active=True))
+        return sum(item.get_subtotal() for item in self.active_items(obj))
 
 
 class AddToCartSerializer(serializers.Serializer):
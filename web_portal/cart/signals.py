@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import statistics
+from .models import Order
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_statistics(sender, **kwargs):
+    """An order was placed, paid or changed: drop cached statistics and dashboards."""
+    statistics.invalidate()
@@ -0,0 +1,189 @@
+"""
+Order statistics computed in the database.
+
+OrderViewSet.statistics used to load every order of the user and add up the
+amounts in Python. ``summarize`` gets counts, totals and the status and
+payment status breakdowns from one aggregate query with conditional
+Count/Sum; ``breakdown`` returns the same metrics per day/week/month bucket
+and/or per dealer or territory (through the ordering user's dealer profile)
+from one GROUP BY query.
+
+``order_statistics`` wraps both in the cache for ORDER_STATS_CACHE_TTL
+seconds (0 disables). Saving or deleting an order bumps a version key
+(cart/signals.py), so a new order shows up at once rather than after the TTL.
+That only holds when every worker sees the bump, so results are cached only
+with a shared cache backend (Redis, Memcached, database, file); with the
+per-process LocMemCache each request runs the queries.
+The same engine serves the order statistics endpoint, the dealer dashboard
+endpoint, the dealer analytics API and the admin cart dashboard.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Order
+
+VERSION_KEY = 'cart:order_stats:version'
+
+OPEN_STATUSES = ('pending', 'inprogress')
+BUCKETS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+# name: (id path, name path) from Order
+GROUPS = {
+    'dealer': ('user__dealer__id', 'user__dealer__name'),
+    'territory': ('user__dealer__territory__id', 'user__dealer__territory__name'),
+}
+BUCKET_NAMES = [*BUCKETS]
+GROUP_NAMES = [*GROUPS]
+
+# Backends private to one worker process: an order saved in another worker
+# does not bump their version key
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY)
+
+# Aggregate alias -> result key, for keys that are also Order fields: an alias
+# named after a field shadows it in later expressions of the same query
+ALIASES = {'sum_total': 'total_amount'}
+
+
+def _money(expression):
+    return Coalesce(Sum(expression, output_field=MONEY), ZERO, output_field=MONEY)
+
+
+def metrics() -> dict:
+    """Aggregate expressions of one statistics row."""
+    exprs = {
+        'total_orders': Count('id'),
+        'pending_orders': Count('id', filter=Q(status__in=OPEN_STATUSES)),
+        'completed_orders': Count('id', filter=Q(status='delivered')),
+        'sum_total': _money('total_amount'),
+        'total_spent': _money('paid_amount'),
+        'unpaid_amount': _money(Case(
+            When(total_amount__gt=F('paid_amount'), then=F('total_amount') - F('paid_amount')),
+            default=ZERO,
+            output_field=MONEY,
+        )),
+    }
+    for key, _ in Order.STATUS_CHOICES:
+        exprs[f'n_status_{key}'] = Count('id', filter=Q(status=key))
+    for key, _ in Order.PAYMENT_STATUS_CHOICES:
+        exprs[f'n_payment_{key}'] = Count('id', filter=Q(payment_status=key))
+    return exprs
+
+
+def _shape(row: dict) -> dict:
+    """Fold the flat n_status_* / n_payment_* counts into breakdown dicts."""
+    shaped = {'status_breakdown': {}, 'payment_status_breakdown': {}}
+    for key, value in row.items():
+        if key.startswith('n_status_'):
+            shaped['status_breakdown'][key[len('n_status_'):]] = value
+        elif key.startswith('n_payment_'):
+            shaped['payment_status_breakdown'][key[len('n_payment_'):]] = value
+        else:
+            shaped[ALIASES.get(key, key)] = value
+    return shaped
+
+
+def filter_dates(queryset, date_from=None, date_to=None):
+    """Orders created between two dates (inclusive, YYYY-MM-DD); raises ValueError on bad dates."""
+    for name, value, lookup in (('from_date', date_from, 'gte'), ('to_date', date_to, 'lt')):
+        if not value:
+            continue
+        day = parse_date(value) if isinstance(value, str) else value
+        if day is None:
+            raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+        if lookup == 'lt':
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+        if settings.USE_TZ:
+            moment = timezone.make_aware(moment)
+        queryset = queryset.filter(**{f'created_date__{lookup}': moment})
+    return queryset
+
+
+def check_dimensions(bucket=None, group_by=None) -> None:
+    if bucket not in (None, *BUCKETS):
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKET_NAMES)}")
+    if group_by not in (None, *GROUPS):
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_NAMES)}")
+
+
+def summarize(queryset) -> dict:
+    """Counts, totals and status breakdowns of ``queryset`` in one query."""
+    return _shape(queryset.order_by().aggregate(**metrics()))
+
+
+def breakdown(queryset, bucket=None, group_by=None) -> list:
+    """
+    The ``summarize`` metrics per ``bucket`` (day/week/month, as 'period')
+    and/or per ``group_by`` (dealer/territory, as 'id' and 'name').
+    """
+    check_dimensions(bucket, group_by)
+    dims = {}
+    if bucket:
+        dims['period'] = BUCKETS[bucket]('created_date')
+    if group_by:
+        id_path, name_path = GROUPS[group_by]
+        dims['group_id'] = F(id_path)
+        dims['group_name'] = F(name_path)
+    if not dims:
+        return []
+    rows = queryset.order_by().annotate(**dims).values(*dims).annotate(**metrics()).order_by(*dims)
+    result = []
+    for row in rows:
+        row = _shape(row)
+        if 'period' in row:
+            period = row.pop('period')
+            row['period'] = period.date().isoformat() if hasattr(period, 'date') else str(period)
+        if 'group_id' in row:
+            row['id'] = row.pop('group_id')
+            row['name'] = row.pop('group_name')
+        result.append(row)
+    if group_by and not bucket:
+        result.sort(key=lambda row: row['total_amount'], reverse=True)
+    return result
+
+
+def invalidate() -> None:
+    """Forget every cached statistics result."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def order_statistics(queryset, scope: str, bucket=None, group_by=None, date_from=None, date_to=None) -> dict:
+    """
+    {summary metrics, 'buckets' or 'groups' when asked} of ``queryset``,
+    cached per ``scope`` (a string naming whose orders ``queryset`` holds)
+    and arguments. Raises ValueError on bad arguments.
+    """
+    queryset = filter_dates(queryset, date_from, date_to)
+    check_dimensions(bucket, group_by)
+
+    ttl = getattr(settings, 'ORDER_STATS_CACHE_TTL', 60)
+    key = None
+    if ttl > 0 and not isinstance(caches['default'], PROCESS_LOCAL_CACHES):
+        params = '|'.join(str(part) for part in (scope, bucket, group_by, date_from, date_to))
+        digest = hashlib.md5(params.encode('utf-8')).hexdigest()
+        key = f'cart:order_stats:{cache.get(VERSION_KEY, 0)}:{digest}'
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    stats = summarize(queryset)
+    if bucket or group_by:
+        stats['buckets' if bucket else 'groups'] = breakdown(queryset, bucket, group_by)
+    if key:
+        cache.set(key, stats, ttl)
+    return stats
@@ -0,0 +1,388 @@
+import io
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import Role
+from FieldAdvisoryService.models import Company, Dealer, Region, Territory, Zone
+from . import payment_events, statistics
+from .jazzcash_service import JazzCashService
+from .models import Cart, CartItem, Order, OrderItem, OrderStatusHistory, Payment, PaymentEvent
+
+CHECKOUT = {
+    'customer_first_name': 'Ali',
+    'customer_last_name': 'Khan',
+    'customer_phone': '03001234567',
+    'customer_email': 'ali@example.com',
+    'shipping_address': 'Chak 12',
+    'shipping_area': 'Okara',
+    'shipping_city': 'Okara',
+    'payment_method': 'cod',
+    'database': '4B-BIO',
+}
+
+
+class CheckoutTests(APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='TestRole')
+        self.user = get_user_model().objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role, is_active=True, is_superuser=True,
+        )
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+
+    def fill(self, count, prefix='FG'):
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product_item_code=f'{prefix}{i:05d}', product_name=f'Product {i}',
+                     quantity=i + 1, unit_price=Decimal('10.50'))
+            for i in range(count)
+        ])
+
+    def checkout(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('cart-checkout'), CHECKOUT, format='json')
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        self.fill(2, prefix='SM')
+        response, small = self.checkout()
+        self.assertEqual(response.status_code, 201)
+
+        self.fill(50)
+        response, large = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(large, small)
+        self.assertLessEqual(large, 20)
+
+        order = Order.objects.get(pk=response.data['order']['id'])
+        self.assertEqual(order.items.count(), 50)
+        self.assertEqual(order.total_amount, sum(Decimal('10.50') * (i + 1) for i in range(50)))
+        self.assertEqual(len(response.data['order']['items']), 50)
+        first = response.data['cart_details']['items'][0]
+        self.assertEqual(first['product_image_url'], '/media/product_images/4B-BIO/FG00000.jpg')
+        self.assertEqual(first['subtotal'], '10.50')
+        self.assertEqual(OrderStatusHistory.objects.filter(order=order).count(), 1)
+        self.assertFalse(CartItem.objects.live().filter(cart=self.cart).exists())
+
+    def test_second_checkout_finds_the_cart_empty(self):
+        self.fill(3)
+        self.assertEqual(self.checkout()[0].status_code, 201)
+        response, _ = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 3)
+
+    def test_expired_items_are_skipped_and_swept(self):
+        self.fill(2)
+        stale = CartItem.objects.get(product_item_code='FG00000')
+        CartItem.objects.filter(pk=stale.pk).update(created_date=timezone.now() - timedelta(days=2))
+
+        response = self.client.get(reverse('cart-count'), {'user_id': self.user.id})
+        self.assertEqual(response.data['total_items'], 1)
+        stale.refresh_from_db()
+        self.assertTrue(stale.is_active)  # reads no longer write
+
+        call_command('clean_expired_carts', stdout=io.StringIO())
+        stale.refresh_from_db()
+        self.assertFalse(stale.is_active)
+
+        response, _ = self.checkout()
+        self.assertEqual(
+            [item['product_item_code'] for item in response.data['cart_details']['items']], ['FG00001'],
+        )
+
+
+class OrderStatisticsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.role = Role.objects.create(name='TestRole')
+        self.manager = self.user('manager', is_superuser=True)
+        company = Company.objects.create(Company_name='4B-BIO_APP', name='4B-BIO_APP', address='Lahore',
+                                         email='info@example.com')
+        region = Region.objects.create(company=company, name='Punjab')
+        zone = Zone.objects.create(company=company, region=region, name='Okara Zone')
+        self.okara = Territory.objects.create(company=company, zone=zone, name='Okara')
+        sahiwal = Territory.objects.create(company=company, zone=zone, name='Sahiwal')
+
+        self.dealer_a = self.dealer('asif', self.okara, '35202-1234567-1', '03001234567')
+        self.dealer_b = self.dealer('bilal', sahiwal, '35202-7654321-1', '03007654321')
+        self.order(self.dealer_a.user, '1000', '1000', 'delivered', 'paid', days_ago=40)
+        self.order(self.dealer_a.user, '500', '200', 'pending', 'partially_paid')
+        self.order(self.dealer_b.user, '300', '0', 'inprogress', 'unpaid')
+
+    def user(self, username, **extra):
+        return get_user_model().objects.create_user(
+            username=username, email=f'{username}@example.com', password='testpass123',
+            first_name=username.title(), last_name='Khan', role=self.role, is_active=True, **extra,
+        )
+
+    def dealer(self, username, territory, cnic, phone):
+        user = self.user(username)
+        user.user_permissions.add(Permission.objects.get(codename='view_order_history'))
+        return Dealer.objects.create(user=user, name=username, cnic_number=cnic, contact_number=phone,
+                                     company=territory.company, territory=territory, address='Main Bazaar')
+
+    def order(self, user, total, paid, status, payment_status, days_ago=0):
+        order = Order.objects.create(
+            user=user, order_number=f'ORD-{Order.objects.count() + 1:04d}', status=status,
+            payment_status=payment_status, total_amount=Decimal(total), paid_amount=Decimal(paid),
+        )
+        Order.objects.filter(pk=order.pk).update(created_date=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            stats = statistics.summarize(Order.objects.all())
+        self.assertEqual((stats['total_orders'], stats['pending_orders'], stats['completed_orders']), (3, 2, 1))
+        self.assertEqual(stats['total_amount'], Decimal('1800'))
+        self.assertEqual(stats['total_spent'], Decimal('1200'))
+        self.assertEqual(stats['unpaid_amount'], Decimal('600'))
+        self.assertEqual(stats['status_breakdown'], {'pending': 1, 'inprogress': 1, 'delivered': 1})
+        self.assertEqual(stats['payment_status_breakdown'],
+                         {'unpaid': 1, 'partially_paid': 1, 'paid': 1, 'refunded': 0})
+
+    def test_buckets_and_groups(self):
+        months = statistics.breakdown(Order.objects.all(), bucket='month')
+        self.assertEqual(len(months), 2)
+        self.assertEqual([row['total_orders'] for row in months], [1, 2])
+
+        territories = statistics.breakdown(Order.objects.all(), group_by='territory')
+        self.assertEqual([(row['name'], row['total_amount']) for row in territories],
+                         [('Okara', Decimal('1500')), ('Sahiwal', Decimal('300'))])
+
+        with self.assertRaises(ValueError):
+            statistics.breakdown(Order.objects.all(), bucket='year')
+
+    def test_results_are_cached_until_an_order_changes(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }):
+            statistics.order_statistics(Order.objects.all(), 'all')
+            with self.assertNumQueries(0):
+                self.assertEqual(statistics.order_statistics(Order.objects.all(), 'all')['total_orders'], 3)
+            self.order(self.manager, '50', '0', 'pending', 'unpaid')
+            self.assertEqual(statistics.order_statistics(Order.objects.all(), 'all')['total_orders'], 4)
+
+    def test_process_local_cache_is_not_used(self):
+        statistics.order_statistics(Order.objects.all(), 'all')
+        with CaptureQueriesContext(connection) as queries:
+            statistics.order_statistics(Order.objects.all(), 'all')
+        self.assertEqual(len(queries), 1)
+
+    def test_statistics_endpoint(self):
+        self.client.force_authenticate(self.manager)
+        url = reverse('order-statistics')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_orders'], 0)
+
+        response = self.client.get(url, {'scope': 'all', 'group_by': 'dealer', 'from_date': '2000-01-01'})
+        self.assertEqual(response.data['total_orders'], 3)
+        self.assertEqual([row['id'] for row in response.data['groups']], [self.dealer_a.pk, self.dealer_b.pk])
+
+        self.assertEqual(self.client.get(url, {'bucket': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'to_date': 'yesterday'}).status_code, 400)
+
+    def test_dealer_dashboard(self):
+        self.client.force_authenticate(self.dealer_a.user)
+        url = reverse('order-dealer-dashboard')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['dealer']['territory'], 'Okara')
+        self.assertEqual(response.data['total_orders'], 2)
+        self.assertEqual(len(response.data['buckets']), 2)
+
+        self.assertEqual(self.client.get(url, {'dealer_id': self.dealer_b.pk}).status_code, 403)
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.get(url, {'dealer_id': self.dealer_b.pk, 'bucket': 'day'})
+        self.assertEqual(response.data['unpaid_amount'], Decimal('300'))
+
+
+class StubGateway(JazzCashService):
+    """Local stand-in for JazzCash: signs notifications and answers status inquiries."""
+
+    def __init__(self, answers=None):
+        super().__init__()
+        self.answers = answers or {}
+        self.inquiries = []
+
+    def notification(self, transaction_ref, amount, code='000', message='Transaction Successful'):
+        data = {
+            'pp_TxnRefNo': transaction_ref,
+            'pp_Amount': str(int(Decimal(amount) * 100)),
+            'pp_ResponseCode': code,
+            'pp_ResponseMessage': message,
+            'pp_BillReference': 'billRef',
+        }
+        data['pp_SecureHash'] = self.generate_secure_hash(data)
+        return data
+
+    def get_transaction_status(self, transaction_ref):
+        self.inquiries.append(transaction_ref)
+        if transaction_ref not in self.answers:
+            return {'success': False, 'error': 'timed out'}
+        return {'success': True, 'data': self.notification(transaction_ref, *self.answers[transaction_ref])}
+
+
+class JazzCashPaymentEventTests(APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='TestRole')
+        self.user = get_user_model().objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role, is_active=True, is_superuser=True,
+        )
+        self.order = Order.objects.create(user=self.user, order_number='ORD-0001', total_amount=Decimal('1500'))
+        self.payment = self.pay('T20261019120000', '1500')
+        self.gateway = StubGateway()
+        self.url = reverse('jazzcash-callback')
+
+    def pay(self, transaction_ref, amount, minutes_ago=0):
+        payment = Payment.objects.create(
+            order=self.order, user=self.user, transaction_id=f'PAY-{transaction_ref}', payment_method='jazzcash',
+            amount=Decimal(amount), jazzcash_payment_token=transaction_ref,
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_date=timezone.now() - timedelta(minutes=minutes_ago))
+        return payment
+
+    def test_repeated_callbacks_are_applied_once(self):
+        callback = self.gateway.notification('T20261019120000', '1500')
+        first = self.client.post(self.url, callback)
+        second = self.client.post(self.url, callback)
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual((first.data['duplicate'], second.data['duplicate']), (False, True))
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paid_amount, Decimal('1500'))
+        self.assertEqual(self.order.payment_status, 'paid')
+        event = PaymentEvent.objects.get()
+        self.assertEqual((event.state, event.duplicates, event.payment_id), ('applied', 1, self.payment.pk))
+
+        # The return redirect after the callback changes nothing either
+        self.client.get(reverse('jazzcash-return'), callback)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paid_amount, Decimal('1500'))
+
+    def test_return_page_is_shown_when_recording_fails(self):
+        callback = self.gateway.notification('T20261019120000', '1500')
+        with mock.patch.object(payment_events, 'record', side_effect=RuntimeError('database is locked')), \
+                self.assertLogs('cart.views', 'ERROR'):
+            response = self.client.get(reverse('jazzcash-return'), callback)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['response_code'], '000')
+        self.assertEqual(response.context['payment'], self.payment)
+
+    def test_success_after_a_decline_completes_the_payment(self):
+        declined = self.gateway.notification('T20261019120000', '1500', code='001', message='Declined')
+        self.assertEqual(self.client.post(self.url, declined).status_code, 400)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'failed')
+
+        paid = self.gateway.notification('T20261019120000', '1500')
+        self.assertEqual(self.client.post(self.url, paid).status_code, 200)
+        self.assertTrue(self.client.post(self.url, paid).data['duplicate'])
+        # A repeated decline no longer changes anything
+        self.assertTrue(payment_events.record(declined, service=self.gateway).duplicate)
+
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual(self.order.paid_amount, Decimal('1500'))
+        self.assertEqual(PaymentEvent.objects.filter(state='applied').count(), 2)
+
+    def test_codes_that_are_not_final_leave_the_payment_open(self):
+        response = self.client.post(self.url, self.gateway.notification('T20261019120000', '1500', code='947'))
+        self.assertEqual(response.status_code, 400)
+        event = PaymentEvent.objects.get()
+        self.assertEqual((event.outcome, event.state), ('pending', 'ignored'))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+        self.assertEqual(self.client.post(self.url, self.gateway.notification('T20261019120000', '1500')).status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+
+    def test_unsigned_and_mismatched_notifications(self):
+        forged = self.gateway.notification('T20261019120000', '1500')
+        forged['pp_Amount'] = '100'
+        self.assertEqual(self.client.post(self.url, forged).status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+        short = self.gateway.notification('T20261019120000', '15')
+        response = self.client.post(self.url, short)
+        self.assertEqual(response.status_code, 400)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'failed')
+
+        self.assertEqual(self.client.post(self.url, self.gateway.notification('T-UNKNOWN', '10')).status_code, 404)
+        self.assertEqual(PaymentEvent.objects.get(transaction_ref='T-UNKNOWN').state, 'ignored')
+
+    def test_reconcile_resolves_stale_payments(self):
+        Payment.objects.filter(pk=self.payment.pk).update(created_date=timezone.now() - timedelta(minutes=30))
+        declined = self.pay('T20261019090000', '200', minutes_ago=120)
+        recent = self.pay('T20261019125900', '300')
+        waiting = self.pay('T20261019115000', '400', minutes_ago=20)
+        gateway = StubGateway({
+            'T20261019120000': ('1500', '000'),
+            'T20261019090000': ('200', '001'),
+            'T20261019115000': ('400', '001'),  # not expired yet
+        })
+
+        counts = payment_events.reconcile(batch_size=2, service=gateway)
+        self.assertEqual(counts, {'resumed': 0, 'checked': 3, 'completed': 1, 'failed': 1, 'pending': 1})
+        self.assertNotIn(recent.jazzcash_payment_token, gateway.inquiries)
+        statuses = dict(Payment.objects.values_list('jazzcash_payment_token', 'status'))
+        self.assertEqual(statuses, {
+            'T20261019120000': 'completed', 'T20261019090000': 'failed',
+            'T20261019125900': 'pending', 'T20261019115000': 'pending',
+        })
+        self.assertEqual(PaymentEvent.objects.get(transaction_ref=declined.jazzcash_payment_token).source, 'inquiry')
+
+        # A callback arriving after reconciliation is a duplicate
+        response = self.client.post(self.url, gateway.notification('T20261019120000', '1500'))
+        self.assertTrue(response.data['duplicate'])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paid_amount, Decimal('1500'))
+        self.assertEqual(waiting.events.count(), 0)
+
+    def test_reconcile_rechecks_recent_declines(self):
+        Payment.objects.filter(pk=self.payment.pk).update(created_date=timezone.now() - timedelta(minutes=30))
+        stale = self.pay('T20261019080000', '100', minutes_ago=180)
+        for ref, amount in (('T20261019120000', '1500'), ('T20261019080000', '100')):
+            self.client.post(self.url, self.gateway.notification(ref, amount, code='001'))
+        gateway = StubGateway({'T20261019120000': ('1500', '000'), 'T20261019080000': ('100', '000')})
+
+        counts = payment_events.reconcile(service=gateway)
+        self.assertEqual((counts['checked'], counts['completed']), (1, 1))
+        self.assertEqual(gateway.inquiries, ['T20261019120000'])
+        self.payment.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((self.payment.status, stale.status), ('completed', 'failed'))
+
+    def test_reconcile_applies_interrupted_events(self):
+        event = PaymentEvent.objects.create(
+            transaction_ref='T20261019120000', source='callback', outcome='completed', amount=Decimal('1500'),
+        )
+        PaymentEvent.objects.filter(pk=event.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        counts = payment_events.reconcile(service=StubGateway())
+        self.assertEqual(counts['resumed'], 1)
+        event.refresh_from_db()
+        self.assertEqual(event.state, 'applied')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
@@ -13,7 +13,7 @@ from drf_yasg import openapi
 import uuid
 import logging
 
-from .models import Cart, CartItem, Order, OrderItem, Payment
+from .models import Cart, CartItem, Order, OrderStatusHistory, Payment
 from FieldAdvisoryService.models import Company
 from .serializers import (
     CartSerializer,
@@ -40,6 +40,9 @@ from .permissions import (
     IsOrderOwner,
 )
 from .jazzcash_service import JazzCashService, get_jazzcash_response_message
+from .checkout import EmptyCart, order_for_response, place_order
+from . import payment_events
+from . import statistics as order_stats
 
 logger = logging.getLogger(__name__)
 
@@ -82,8 +85,7 @@ class CartViewSet(viewsets.ViewSet):
             cart.is_active = True
             cart.save()
 
-        # Clean expired items
-        cart.clear_expired_items()
+        # Expired items are hidden by CartItem.objects.live() and swept by clean_expired_carts
         return cart
     
     def validate_user_access(self, request, user_id):
@@ -166,10 +168,8 @@ class CartViewSet(viewsets.ViewSet):
         
         # Option to include expired items
         include_expired = request.query_params.get('include_expired', 'false').lower() == 'true'
-        if not include_expired:
-            cart.clear_expired_items()
         
-        serializer = CartSerializer(cart)
+        serializer = CartSerializer(cart, context={'include_expired': include_expired})
         return Response(serializer.data)
     
     @swagger_auto_schema(
@@ -271,9 +271,9 @@ class CartViewSet(viewsets.ViewSet):
         # Filter by active status (default: true)
         is_active = request.query_params.get('is_active', 'true').lower()
         if is_active == 'true':
-            queryset = queryset.filter(is_active=True)
+            queryset = queryset.live()
         elif is_active == 'false':
-            queryset = queryset.filter(is_active=False)
+            queryset = queryset.exclude(id__in=cart.items.live().values('id'))
         
         # Filter by product item code
         product_item_code = request.query_params.get('product_item_code')
@@ -345,15 +345,11 @@ class CartViewSet(viewsets.ViewSet):
         # Security check: Ensure the authenticated user owns the cart or has permission
         if not request.user.is_superuser and cart.user != request.user:
             return Response({'error': 'You do not have permission to access this cart'}, status=status.HTTP_403_FORBIDDEN)
-
-        # Clean expired items
-        cart.clear_expired_items()
         
         # Check if item already exists in cart
-        existing_item = CartItem.objects.filter(
+        existing_item = CartItem.objects.live().filter(
             cart=cart,
             product_item_code=serializer.validated_data['product_item_code'],
-            is_active=True
         ).first()
         
         database = serializer.validated_data.get('database', get_default_company_key())
@@ -374,12 +370,11 @@ class CartViewSet(viewsets.ViewSet):
                 status=status.HTTP_200_OK
             )
         else:
-            # Clean up any inactive items for this product to avoid unique constraint violation
-            # (MySQL doesn't support conditional unique constraints)
+            # Clean up any inactive or expired items for this product to avoid unique constraint
+            # violation (MySQL doesn't support conditional unique constraints)
             CartItem.objects.filter(
                 cart=cart,
                 product_item_code=serializer.validated_data['product_item_code'],
-                is_active=False
             ).delete()
             
             # Create new cart item
@@ -442,7 +437,7 @@ class CartViewSet(viewsets.ViewSet):
             return error_response
         
         cart = self.get_or_create_cart(user)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart, is_active=True)
+        cart_item = get_object_or_404(CartItem.objects.live(), id=item_id, cart=cart)
         
         serializer = UpdateCartItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -499,7 +494,7 @@ class CartViewSet(viewsets.ViewSet):
             return error_response
         
         cart = self.get_or_create_cart(user)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart, is_active=True)
+        cart_item = get_object_or_404(CartItem.objects.live(), id=item_id, cart=cart)
         
         # Clean up any other inactive items for this product first (MySQL constraint workaround)
         CartItem.objects.filter(
@@ -661,7 +656,6 @@ class CartViewSet(viewsets.ViewSet):
         },
         tags=["06. Shopping Cart"]
     )
-    @transaction.atomic
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, CanAddToCart])
     def checkout(self, request):
         """
@@ -671,126 +665,59 @@ class CartViewSet(viewsets.ViewSet):
         """
         serializer = CheckoutSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        # Normalize consumer details
+        consumer_details = {
+            'user_id': request.user.id,
+            'first_name': data.get('customer_first_name', ''),
+            'last_name': data.get('customer_last_name', ''),
+            'email': data.get('customer_email', '') or request.user.email,
+            'phone': data.get('customer_phone', ''),
+            'shipping_address': data.get('shipping_address', ''),
+            'shipping_area': data.get('shipping_area', ''),
+            'shipping_city': data.get('shipping_city', ''),
+            'shipping_postal_code': data.get('shipping_postal_code', ''),
+            'payment_method': data.get('payment_method', ''),
+            'payment_phone': data.get('payment_phone', ''),
+        }
+        database = data.get('database') or get_default_company_key()
         
-        # Get user's cart
+        # Create the pending order and its items from the locked cart in one transaction
         try:
-            cart = Cart.objects.get(user=request.user)
-        except Cart.DoesNotExist:
-            return Response(
-                {'error': 'Cart is empty'},
-                status=status.HTTP_400_BAD_REQUEST
+            order, cart, snapshot = place_order(
+                request.user,
+                dict(data, customer_email=consumer_details['email']),
+                database,
+                history_note="Order placed via checkout",
             )
-        
-        # Clean expired items
-        cart.clear_expired_items()
-        
-        # Get active cart items
-        cart_items = cart.items.filter(is_active=True)
-        
-        if not cart_items.exists():
+        except EmptyCart:
             return Response(
                 {'error': 'Cart is empty'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Generate unique order number
-        order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}-{timezone.now().strftime('%Y%m%d')}"
-        
-        # Normalize cart details
+        # Normalize cart details with product images
         cart_details = {
             'cart_id': cart.id,
-            'total_items': cart.get_total_items(),
-            'total_quantity': cart.get_total_quantity(),
-            'items': []
-        }
-        
-        # Normalize consumer details
-        consumer_details = {
-            'user_id': request.user.id,
-            'first_name': serializer.validated_data.get('customer_first_name', ''),
-            'last_name': serializer.validated_data.get('customer_last_name', ''),
-            'email': serializer.validated_data.get('customer_email', '') or request.user.email,
-            'phone': serializer.validated_data.get('customer_phone', ''),
-            'shipping_address': serializer.validated_data.get('shipping_address', ''),
-            'shipping_area': serializer.validated_data.get('shipping_area', ''),
-            'shipping_city': serializer.validated_data.get('shipping_city', ''),
-            'shipping_postal_code': serializer.validated_data.get('shipping_postal_code', ''),
-            'payment_method': serializer.validated_data.get('payment_method', ''),
-            'payment_phone': serializer.validated_data.get('payment_phone', ''),
+            'total_items': len(snapshot),
+            'total_quantity': sum(item['quantity'] for item in snapshot),
+            'items': [
+                {
+                    'product_item_code': item['product_item_code'],
+                    'product_name': item['product_name'],
+                    'quantity': item['quantity'],
+                    'unit_price': str(item['unit_price']) if item['unit_price'] else '0',
+                    'subtotal': str(item['subtotal']),
+                    'product_image_url': item['product_image_url'],
+                    'product_description_urdu_url': item['product_description_urdu_url'],
+                }
+                for item in snapshot
+            ],
         }
-        
-        # Create order with pending status and all customer details
-        order = Order.objects.create(
-            user=request.user,
-            order_number=order_number,
-            status='pending',  # Default status as per requirements
-            # Customer details
-            customer_first_name=consumer_details['first_name'],
-            customer_last_name=consumer_details['last_name'],
-            customer_phone=consumer_details['phone'],
-            customer_email=consumer_details['email'],
-            # Shipping details
-            shipping_address=consumer_details['shipping_address'],
-            shipping_area=consumer_details['shipping_area'],
-            shipping_city=consumer_details['shipping_city'],
-            shipping_postal_code=consumer_details['shipping_postal_code'],
-            # Payment details
-            payment_method=consumer_details['payment_method'],
-            payment_phone=consumer_details['payment_phone'],
-            # Order notes
-            notes=serializer.validated_data.get('notes', ''),
-        )
-        
-        # Record initial status in history
-        OrderStatusHistory.objects.create(
-            order=order,
-            new_status='pending',
-            changed_by=request.user,
-            notes="Order placed via checkout"
-        )
-        
-        # Create order items from cart items and build cart details
-        total_amount = 0
-        database = serializer.validated_data.get('database', get_default_company_key())
-        
-        for cart_item in cart_items:
-            subtotal = cart_item.get_subtotal()
-            
-            # Create order item
-            OrderItem.objects.create(
-                order=order,
-                product_item_code=cart_item.product_item_code,
-                product_name=cart_item.product_name,
-                quantity=cart_item.quantity,
-                unit_price=cart_item.unit_price or 0,
-                subtotal=subtotal,
-                notes=cart_item.notes,
-            )
-            
-            # Add to cart details with product images
-            cart_details['items'].append({
-                'product_item_code': cart_item.product_item_code,
-                'product_name': cart_item.product_name,
-                'quantity': cart_item.quantity,
-                'unit_price': str(cart_item.unit_price) if cart_item.unit_price else '0',
-                'subtotal': str(subtotal),
-                'product_image_url': f"/media/product_images/{database}/{cart_item.product_item_code}.jpg",
-                'product_description_urdu_url': f"/media/product_images/{database}/{cart_item.product_item_code}-urdu.jpg",
-            })
-            
-            total_amount += subtotal
-        
-        # Update order total
-        order.total_amount = total_amount
-        order.save()
-
-        # Clear cart - soft delete (mark items and cart inactive)
-        cart.items.filter(is_active=True).update(is_active=False)
-        cart.is_active = False
-        cart.save()
 
         # Prepare response with normalized data
-        order_serializer = OrderSerializer(order)
+        order_serializer = OrderSerializer(order_for_response(order))
         
         return Response(
             {
@@ -825,7 +752,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         # Superusers and users with manage_orders permission see all orders
-        if user.is_superuser or user.has_perm('cart.manage_orders'):
+        if self.can_see_all(user):
             return Order.objects.all().prefetch_related('items')
         
         # Regular users see only their own orders
@@ -916,81 +843,22 @@ class OrderViewSet(viewsets.ModelViewSet):
         },
         tags=["08. Orders"]
     )
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
         """Create order from cart"""
         serializer = CreateOrderSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Get user's cart
+        # Create order and items from the locked cart, then clear the cart
         try:
-            cart = Cart.objects.get(user=request.user)
-        except Cart.DoesNotExist:
-            return Response(
-                {'error': 'Cart is empty'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Clean expired items
-        cart.clear_expired_items()
-        
-        # Get active cart items
-        cart_items = cart.items.filter(is_active=True)
-        
-        if not cart_items.exists():
+            order, _, _ = place_order(request.user, serializer.validated_data, get_default_company_key())
+        except EmptyCart:
             return Response(
                 {'error': 'Cart is empty'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Generate unique order number
-        order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}-{timezone.now().strftime('%Y%m%d')}"
-        
-        # Create order with all customer, shipping, and payment details
-        order = Order.objects.create(
-            user=request.user,
-            order_number=order_number,
-            # Customer details
-            customer_first_name=serializer.validated_data.get('customer_first_name', ''),
-            customer_last_name=serializer.validated_data.get('customer_last_name', ''),
-            customer_phone=serializer.validated_data.get('customer_phone', ''),
-            customer_email=serializer.validated_data.get('customer_email', ''),
-            # Shipping details
-            shipping_address=serializer.validated_data.get('shipping_address', ''),
-            shipping_area=serializer.validated_data.get('shipping_area', ''),
-            shipping_city=serializer.validated_data.get('shipping_city', ''),
-            shipping_postal_code=serializer.validated_data.get('shipping_postal_code', ''),
-            # Payment details
-            payment_method=serializer.validated_data.get('payment_method'),
-            payment_phone=serializer.validated_data.get('payment_phone', ''),
-            # Order notes
-            notes=serializer.validated_data.get('notes', ''),
-        )
-        
-        # Create order items from cart items
-        total_amount = 0
-        for cart_item in cart_items:
-            subtotal = cart_item.get_subtotal()
-            OrderItem.objects.create(
-                order=order,
-                product_item_code=cart_item.product_item_code,
-                product_name=cart_item.product_name,
-                quantity=cart_item.quantity,
-                unit_price=cart_item.unit_price or 0,
-                subtotal=subtotal,
-                notes=cart_item.notes,
-            )
-            total_amount += subtotal
-        
-        # Update order total
-        order.total_amount = total_amount
-        order.save()
-        
-        # Clear cart - soft delete (mark items inactive)
-        cart.items.filter(is_active=True).update(is_active=False)
-        
         # Return created order
-        order_serializer = OrderSerializer(order)
+        order_serializer = OrderSerializer(order_for_response(order))
         return Response(
             {
                 'message': 'Order created successfully',
@@ -1076,7 +944,17 @@ class OrderViewSet(viewsets.ModelViewSet):
         })
     
     @swagger_auto_schema(
-        operation_description="Get current user's order statistics",
+        operation_description=(
+            "Order statistics computed in the database: counts, totals and status breakdowns, "
+            "optionally per day/week/month bucket and per dealer or territory. Results are cached briefly."
+        ),
+        manual_parameters=[
+            openapi.Parameter('scope', openapi.IN_QUERY, description="'own' (default) or 'all' orders visible to the user", type=openapi.TYPE_STRING),
+            openapi.Parameter('from_date', openapi.IN_QUERY, description="Orders from date (YYYY-MM-DD)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('to_date', openapi.IN_QUERY, description="Orders to date, inclusive (YYYY-MM-DD)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('bucket', openapi.IN_QUERY, description="Add 'buckets' per day, week or month", type=openapi.TYPE_STRING, enum=order_stats.BUCKET_NAMES),
+            openapi.Parameter('group_by', openapi.IN_QUERY, description="Add 'groups' per dealer or territory", type=openapi.TYPE_STRING, enum=order_stats.GROUP_NAMES),
+        ],
         responses={200: openapi.Response(
             'Order statistics',
             schema=openapi.Schema(
@@ -1085,31 +963,95 @@ class OrderViewSet(viewsets.ModelViewSet):
                     'total_orders': openapi.Schema(type=openapi.TYPE_INTEGER),
                     'pending_orders': openapi.Schema(type=openapi.TYPE_INTEGER),
                     'completed_orders': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'total_amount': openapi.Schema(type=openapi.TYPE_NUMBER),
                     'total_spent': openapi.Schema(type=openapi.TYPE_NUMBER),
                     'unpaid_amount': openapi.Schema(type=openapi.TYPE_NUMBER),
+                    'status_breakdown': openapi.Schema(type=openapi.TYPE_OBJECT),
+                    'payment_status_breakdown': openapi.Schema(type=openapi.TYPE_OBJECT),
+                    'buckets': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                    'groups': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
                 }
             )
-        )},
+        ), 400: "Bad date, bucket or group_by"},
         tags=["08. Orders"]
     )
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get user's order statistics"""
-        user_orders = Order.objects.filter(user=request.user)
-        
-        stats = {
-            'total_orders': user_orders.count(),
-            'pending_orders': user_orders.filter(status__in=['pending', 'processing']).count(),
-            'completed_orders': user_orders.filter(status='delivered').count(),
-            'total_spent': sum(order.paid_amount for order in user_orders),
-            'unpaid_amount': sum(
-                order.total_amount - order.paid_amount 
-                for order in user_orders 
-                if order.total_amount > order.paid_amount
-            ),
-        }
+        params = request.query_params
+        queryset, scope = Order.objects.filter(user=request.user), f'user:{request.user.id}'
+        # Order managers can ask for every order (e.g. grouped per dealer or territory)
+        if params.get('scope') == 'all' and self.can_see_all(request.user):
+            queryset, scope = Order.objects.all(), 'all'
         
+        try:
+            stats = order_stats.order_statistics(
+                queryset, scope,
+                bucket=params.get('bucket') or None,
+                group_by=params.get('group_by') or None,
+                date_from=params.get('from_date'),
+                date_to=params.get('to_date'),
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(stats)
+    
+    @swagger_auto_schema(
+        operation_description=(
+            "Order dashboard of a dealer: totals, status breakdowns and a per-bucket series of the "
+            "orders placed by the dealer's user. Dealers see their own; order managers pass dealer_id."
+        ),
+        manual_parameters=[
+            openapi.Parameter('dealer_id', openapi.IN_QUERY, description="Dealer ID (order managers only; default: the user's own dealer)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('bucket', openapi.IN_QUERY, description="Series bucket (default: month)", type=openapi.TYPE_STRING, enum=order_stats.BUCKET_NAMES),
+            openapi.Parameter('from_date', openapi.IN_QUERY, description="Orders from date (YYYY-MM-DD)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('to_date', openapi.IN_QUERY, description="Orders to date, inclusive (YYYY-MM-DD)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+        ],
+        responses={200: "Dealer order dashboard", 400: "Bad parameters", 404: "Dealer not found"},
+        tags=["08. Orders"]
+    )
+    @action(detail=False, methods=['get'], url_path='dealer-dashboard')
+    def dealer_dashboard(self, request):
+        """Order statistics of one dealer"""
+        from FieldAdvisoryService.models import Dealer
+
+        params = request.query_params
+        dealers = Dealer.objects.select_related('territory')
+        if params.get('dealer_id'):
+            if not self.can_see_all(request.user):
+                return Response(
+                    {'error': 'You do not have permission to view other dealers.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            dealer = dealers.filter(pk=params['dealer_id']).first() if params['dealer_id'].isdigit() else None
+        else:
+            dealer = dealers.filter(user=request.user).first()
+        if dealer is None or dealer.user_id is None:
+            return Response({'error': 'Dealer not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            stats = order_stats.order_statistics(
+                Order.objects.filter(user_id=dealer.user_id), f'dealer:{dealer.pk}',
+                bucket=params.get('bucket') or 'month',
+                date_from=params.get('from_date'),
+                date_to=params.get('to_date'),
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'dealer': {
+                'id': dealer.pk,
+                'name': dealer.name,
+                'business_name': dealer.business_name or '',
+                'card_code': dealer.card_code,
+                'territory': dealer.territory.name if dealer.territory else None,
+            },
+            **stats,
+        })
+    
+    @staticmethod
+    def can_see_all(user):
+        return user.is_superuser or user.has_perm('cart.manage_orders')
 
 
 # =============== Payment Views ===============
@@ -1344,14 +1286,11 @@ class PaymentViewSet(viewsets.ModelViewSet):
         )
         
         # Check payment status via payment gateway if needed
-        if payment.payment_method == 'jazzcash' and payment.status == 'pending':
-            jazzcash = JazzCashService()
-            status_result = jazzcash.get_transaction_status(payment.jazzcash_payment_token)
-            
-            if status_result.get('success'):
-                # Update payment based on gateway response
-                # (This would need proper implementation based on JazzCash API response)
-                pass
+        if payment.payment_method == 'jazzcash' and payment.status in payment_events.OPEN_STATUSES \
+                and payment.jazzcash_payment_token:
+            # Records the gateway's answer in the payment ledger like a callback
+            payment_events.inquire(payment)
+            payment.refresh_from_db()
         
         payment_serializer = PaymentSerializer(payment)
         return Response({
@@ -1376,72 +1315,43 @@ class JazzCashCallbackView(APIView):
         },
         tags=["07. Payments"]
     )
-    @transaction.atomic
     def post(self, request):
-        """Process JazzCash payment callback"""
+        """Process JazzCash payment callback (repeated callbacks are answered from the ledger)"""
         logger.info(f"JazzCash callback received: {request.data}")
         
         try:
-            # Initialize JazzCash service
-            jazzcash = JazzCashService()
-            
-            # Verify payment response
-            verification_result = jazzcash.verify_payment_response(request.data)
-            
-            # Find payment record
-            transaction_ref = request.data.get('pp_TxnRefNo', '')
-            bill_reference = request.data.get('pp_BillReference', '')
-            
-            try:
-                payment = Payment.objects.select_related('order').get(
-                    jazzcash_payment_token=transaction_ref
-                )
-            except Payment.DoesNotExist:
-                logger.error(f"Payment not found for transaction: {transaction_ref}")
-                return Response(
-                    {'error': 'Payment record not found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Update payment with JazzCash response
-            payment.jazzcash_transaction_id = verification_result.get('jazzcash_transaction_id', '')
-            payment.jazzcash_response_code = verification_result.get('response_code', '')
-            payment.jazzcash_response_message = verification_result.get('response_message', '')
-            payment.raw_response = verification_result.get('raw_response', {})
-            
-            # Handle payment based on verification result
-            if verification_result.get('success'):
-                # Payment successful
-                payment.mark_completed()
-                payment.order.status = 'confirmed'
-                payment.order.save()
-                
-                logger.info(f"Payment {payment.transaction_id} completed successfully")
-                
-                return Response({
-                    'success': True,
-                    'message': 'Payment completed successfully',
-                    'transaction_id': payment.transaction_id,
-                })
-            else:
-                # Payment failed
-                error_msg = verification_result.get('response_message', 'Payment verification failed')
-                payment.mark_failed(error_msg)
-                
-                logger.warning(f"Payment {payment.transaction_id} failed: {error_msg}")
-                
-                return Response({
-                    'success': False,
-                    'message': error_msg,
-                    'transaction_id': payment.transaction_id,
-                }, status=status.HTTP_400_BAD_REQUEST)
-        
+            result = payment_events.record(request.data, source='callback')
         except Exception as e:
             logger.error(f"Error processing JazzCash callback: {str(e)}", exc_info=True)
             return Response(
                 {'error': 'Error processing payment callback'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        
+        if result.event is None:
+            return Response({'error': result.error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        payment = result.payment
+        if payment is None:
+            logger.error(f"Payment not found for transaction: {result.event.transaction_ref}")
+            return Response(
+                {'error': 'Payment record not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if result.success and not result.event.note:
+            return Response({
+                'success': True,
+                'message': 'Payment completed successfully',
+                'transaction_id': payment.transaction_id,
+                'duplicate': result.duplicate,
+            })
+        return Response({
+            'success': False,
+            'message': result.event.note or result.event.response_message or 'Payment verification failed',
+            'transaction_id': payment.transaction_id,
+            'duplicate': result.duplicate,
+        }, status=status.HTTP_400_BAD_REQUEST)
 
 
 class JazzCashReturnView(APIView):
@@ -1453,18 +1363,25 @@ class JazzCashReturnView(APIView):
     
     def get(self, request):
         """Handle payment return"""
-        transaction_ref = request.GET.get('pp_TxnRefNo', '')
-        response_code = request.GET.get('pp_ResponseCode', '')
-        response_message = request.GET.get('pp_ResponseMessage', '')
+        data = request.POST if request.method == 'POST' else request.GET
+        transaction_ref = data.get('pp_TxnRefNo', '')
+        response_code = data.get('pp_ResponseCode', '')
+        
+        # The redirect carries the same signed fields as the callback and may
+        # arrive first; the ledger applies whichever comes first, once
+        if data.get('pp_SecureHash'):
+            try:
+                result = payment_events.record(data, source='return')
+                if result.event is None:
+                    response_code = ''
+            except Exception as e:
+                # The callback or reconciliation applies it; still show the result page
+                logger.error(f"Error recording JazzCash return {transaction_ref}: {str(e)}", exc_info=True)
         
         # Try to find payment
-        payment = None
-        try:
-            payment = Payment.objects.select_related('order').get(
-                jazzcash_payment_token=transaction_ref
-            )
-        except Payment.DoesNotExist:
-            pass
+        payment = Payment.objects.select_related('order').filter(
+            jazzcash_payment_token=transaction_ref
+        ).first() if transaction_ref else None
         
         # Get user-friendly message
         message = get_jazzcash_response_message(response_code)
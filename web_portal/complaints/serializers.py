@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from web_portal.image_pipeline import NormalizeUploadsMixin
 from .models import Complaint
 
-class ComplaintSerializer(serializers.ModelSerializer):
+class ComplaintSerializer(NormalizeUploadsMixin, serializers.ModelSerializer):
     class Meta:
         model = Complaint
         fields = ['id', 'complaint_id', 'user', 'message', 'image', 'status', 'created_at']
@@ -1,3 +1,56 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from web_portal import image_pipeline
+from .serializers import ComplaintSerializer
+
+
+def phone_photo(size=(3000, 2000)) -> bytes:
+    img = Image.effect_noise(size, 40).convert('RGB')
+    exif = Image.Exif()
+    exif[0x0112] = 3  # upside down
+    exif[0x8825] = {1: 'N', 2: (31.0, 30.0, 0.0)}  # GPS
+    out = io.BytesIO()
+    img.save(out, 'JPEG', quality=98, exif=exif.tobytes())
+    return out.getvalue()
+
+
+@override_settings(IMAGE_NORMALIZE_ENABLED=True, IMAGE_NORMALIZE_MAX_SIDE=1200, IMAGE_NORMALIZE_FORMAT='JPEG')
+class ComplaintImageNormalizationTests(TestCase):
+    def setUp(self):
+        image_pipeline.reset_stats()
+
+    def test_image_is_normalized_before_validation(self):
+        photo = phone_photo()
+        upload = SimpleUploadedFile('evidence.png', photo, content_type='image/png')
+        serializer = ComplaintSerializer(data={'message': 'Leaves turning yellow', 'image': upload})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        stored = serializer.validated_data['image']
+        self.assertEqual(stored.name, 'evidence.jpg')
+        stored.seek(0)
+        with Image.open(stored) as img:
+            self.assertEqual(img.size, (1200, 800))
+            self.assertFalse(img.getexif())
+        stats = image_pipeline.stats()
+        self.assertEqual(stats['normalized'], 1)
+        self.assertEqual(stats['bytes_saved'], len(photo) - stored.size)
+        self.assertGreater(stats['bytes_saved'], 0)
+
+    def test_non_images_and_small_clean_images_pass_through(self):
+        pdf = SimpleUploadedFile('minutes.pdf', b'%PDF-1.4 test', content_type='application/pdf')
+        self.assertIs(image_pipeline.normalize_upload(pdf), pdf)
+
+        out = io.BytesIO()
+        Image.new('RGB', (64, 64), (10, 120, 30)).save(out, 'JPEG', quality=20, optimize=True, progressive=True)
+        small = SimpleUploadedFile('leaf.jpg', out.getvalue(), content_type='image/jpeg')
+        self.assertIs(image_pipeline.normalize_upload(small), small)
+        self.assertEqual(image_pipeline.stats()['kept'], 1)
+
+    @override_settings(IMAGE_NORMALIZE_ENABLED=False)
+    def test_disabled(self):
+        upload = SimpleUploadedFile('evidence.jpg', phone_photo((800, 600)), content_type='image/jpeg')
+        self.assertIs(image_pipeline.normalize_upload(upload), upload)
@@ -8,6 +8,8 @@ Usage:
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from document_management.models import Attachment, AttachmentAssignment
+from document_management import tracking
+from document_management.utils import assignment_totals
 
 User = get_user_model()
 
@@ -23,6 +25,8 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        # Counts buffered by this process (downloads run through the web workers' buffers)
+        tracking.flush()
         if options['user_id']:
             self.user_stats(options['user_id'])
         else:
@@ -35,12 +39,11 @@ class Command(BaseCommand):
         archived = Attachment.objects.filter(status='archived').count()
         expired = Attachment.objects.filter(status='expired').count()
         
-        total_assignments = AttachmentAssignment.objects.count()
-        viewed = AttachmentAssignment.objects.filter(viewed=True).count()
-        acknowledged = AttachmentAssignment.objects.filter(acknowledged=True).count()
-        total_downloads = sum(
-            a.download_count for a in AttachmentAssignment.objects.all()
-        )
+        totals = assignment_totals(AttachmentAssignment.objects.all())
+        total_assignments = totals['total_assigned']
+        viewed = totals['viewed_count']
+        acknowledged = totals['acknowledged_count']
+        total_downloads = totals['total_downloads']
         
         self.stdout.write(self.style.SUCCESS('\n=== ATTACHMENT STATISTICS ===\n'))
         
@@ -76,15 +79,16 @@ class Command(BaseCommand):
             return
         
         assignments = AttachmentAssignment.objects.filter(user=user)
-        total = assignments.count()
-        viewed = assignments.filter(viewed=True).count()
-        not_viewed = assignments.filter(viewed=False).count()
-        acknowledged = assignments.filter(acknowledged=True).count()
+        totals = assignment_totals(assignments)
+        total = totals['total_assigned']
+        viewed = totals['viewed_count']
+        not_viewed = totals['not_viewed_count']
+        acknowledged = totals['acknowledged_count']
         mandatory_pending = assignments.filter(
             attachment__is_mandatory=True,
             viewed=False
         ).count()
-        total_downloads = sum(a.download_count for a in assignments)
+        total_downloads = totals['total_downloads']
         
         self.stdout.write(
             self.style.SUCCESS(f'\n=== STATS FOR USER: {user.username} ===\n')
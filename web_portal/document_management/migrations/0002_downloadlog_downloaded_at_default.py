@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attachmentdownloadlog',
+            name='downloaded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Download timestamp'),
+        ),
+    ]
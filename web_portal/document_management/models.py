@@ -263,10 +263,13 @@ class AttachmentAssignment(models.Model):
             self.save(update_fields=['viewed', 'viewed_at'])
 
     def increment_download_count(self):
-        """Increment download counter."""
-        self.download_count += 1
+        """Increment download counter (in the database, safe under concurrency)."""
         self.last_downloaded_at = timezone.now()
-        self.save(update_fields=['download_count', 'last_downloaded_at'])
+        AttachmentAssignment.objects.filter(pk=self.pk).update(
+            download_count=models.F('download_count') + 1,
+            last_downloaded_at=self.last_downloaded_at,
+        )
+        self.refresh_from_db(fields=['download_count'])
 
 
 class AttachmentDownloadLog(models.Model):
@@ -278,8 +281,9 @@ class AttachmentDownloadLog(models.Model):
         on_delete=models.CASCADE,
         related_name='download_logs'
     )
+    # Set by the tracking buffer to the time of the request, not of the flush
     downloaded_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         help_text='Download timestamp'
     )
     ip_address = models.GenericIPAddressField(
@@ -1,11 +1,17 @@
-from django.test import TestCase
+import os
+import tempfile
+
+from django.test import RequestFactory, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Attachment, AttachmentAssignment
+from accounts.models import Role
+from web_portal.media_serving import default_cache_control, serve_file
+from . import tracking
+from .models import Attachment, AttachmentAssignment, AttachmentDownloadLog
 
 User = get_user_model()
 
@@ -180,3 +186,118 @@ class AttachmentAPITest(APITestCase):
         response = self.client.get('/api/documents/attachments/')
         
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class MediaServingTest(TestCase):
+    """Test cases for validators, conditional requests and ranges in web_portal.media_serving."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        handle, self.path = tempfile.mkstemp(suffix='.pdf')
+        os.write(handle, bytes(range(256)) * 4)
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def serve(self, **headers):
+        return serve_file(self.factory.get('/media/x.pdf', **headers), self.path)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_validators_and_not_modified(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(len(self.body(response)), 1024)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.serve(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_byte_ranges(self):
+        response = self.serve(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(self.body(response), bytes(range(10, 20)))
+        self.assertEqual(self.body(self.serve(HTTP_RANGE='bytes=-4')), bytes(range(252, 256)))
+        self.assertEqual(self.serve(HTTP_RANGE='bytes=2000-').status_code, 416)
+        # A stale If-Range gets the whole file
+        self.assertEqual(self.serve(HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"').status_code, 200)
+
+    def test_cache_control_and_offload(self):
+        self.assertIn('immutable', default_cache_control('cache/product_documents/3f/3f9a0c7d21b4/image-1.png'))
+        # Timestamps and hex runs in upload names do not make a file immutable
+        self.assertEqual(default_cache_control('product_images/4B-AGRI/Baap-3-Ltr2802202611501087213.png'),
+                         'public, no-cache')
+        self.assertEqual(default_cache_control('complaints/leaf-3f9a0c7d21b4.jpg'), 'public, no-cache')
+        with self.settings(MEDIA_CACHE_MAX_AGE=600):
+            self.assertEqual(default_cache_control('product_images/4B-BIO/Map.jpg'), 'public, max-age=600')
+        static = tempfile.gettempdir()
+        manifest = {'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'}}
+        with self.settings(STATIC_ROOT=static, STORAGES=manifest):
+            self.assertIn('immutable', default_cache_control(os.path.join(static, 'css', 'site.0a1b2c3d4e5f.css')))
+            self.assertEqual(default_cache_control(os.path.join(static, 'css', 'site.css')), 'public, no-cache')
+        with self.settings(MEDIA_SENDFILE_BACKEND='nginx', MEDIA_SENDFILE_ROOT='/', MEDIA_SENDFILE_URL='/protected/'):
+            response = self.serve()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected' + self.path)
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(DOCUMENT_TRACKING_BUFFERED=True, DOCUMENT_TRACKING_FLUSH_INTERVAL=0)
+class AttachmentDownloadTest(APITestCase):
+    """Test cases for attachment downloads through the media backend."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='admin123',
+            first_name='Admin', last_name='User', role=Role.objects.create(name='TestRole'),
+            is_active=True, is_staff=True, is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        # The buffer is per process: write leftovers before this test's rollback
+        self.addCleanup(tracking.flush)
+        file = SimpleUploadedFile("manual.pdf", b"0123456789" * 100, content_type="application/pdf")
+        self.attachment = Attachment.objects.create(title="Manual", file=file, created_by=self.admin)
+        self.addCleanup(self.attachment.file.delete, save=False)
+        self.url = f'/api/documents/attachments/{self.attachment.pk}/download/'
+
+    def test_revalidation_and_resumed_ranges_are_not_counted(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        self.assertTrue(first['Content-Disposition'].startswith('attachment;'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        resumed = self.client.get(self.url, HTTP_RANGE='bytes=500-')
+        self.assertEqual(resumed.status_code, 206)
+        self.assertEqual(b''.join(resumed.streaming_content), b"0123456789" * 50)
+        self.assertEqual(tracking.flush(), 1)
+        assignment = AttachmentAssignment.objects.get(attachment=self.attachment, user=self.admin)
+        self.assertEqual(assignment.download_count, 1)
+
+    def test_downloads_are_buffered_until_flushed(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        assignment = AttachmentAssignment.objects.get(attachment=self.attachment, user=self.admin)
+        self.assertEqual((assignment.download_count, assignment.viewed), (0, False))
+        self.assertEqual(tracking.pending(), 3)
+
+        # Reading statistics writes the buffer first
+        stats = self.client.get(f'/api/documents/attachments/{self.attachment.pk}/statistics/').json()
+        self.assertEqual((stats['total_downloads'], stats['viewed_count'], stats['not_viewed_count']), (3, 1, 0))
+        assignment.refresh_from_db()
+        self.assertTrue(assignment.viewed)
+        self.assertIsNotNone(assignment.last_downloaded_at)
+        self.assertEqual(AttachmentDownloadLog.objects.filter(assignment=assignment).count(), 3)
+
+    def test_flush_on_threshold_adds_to_concurrent_counts(self):
+        assignment = AttachmentAssignment.objects.create(attachment=self.attachment, user=self.admin)
+        with self.settings(DOCUMENT_TRACKING_FLUSH_SIZE=2):
+            tracking.record_download(assignment)
+            # Another process counted a download meanwhile
+            AttachmentAssignment.objects.filter(pk=assignment.pk).update(download_count=5)
+            tracking.record_download(assignment)
+        self.assertEqual(tracking.pending(), 0)
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.download_count, 7)
@@ -0,0 +1,159 @@
+"""
+Buffered download and view tracking for attachment assignments.
+
+Downloads used to update the assignment row (read-modify-write of
+download_count) and insert a download log row inside the request, so
+popular attachments serialized on the row lock and concurrent downloads
+could overwrite each other's count. ``record_download`` now only appends the
+event to an in-process buffer. ``flush`` turns the buffered events into one
+``download_count = download_count + n`` UPDATE per downloaded assignment, one
+conditional UPDATE per newly viewed assignment and one bulk INSERT of the
+download logs, in a single transaction. Increments are applied with F()
+expressions, so counts stay exact with any number of processes.
+
+The buffer is flushed when it holds DOCUMENT_TRACKING_FLUSH_SIZE events,
+DOCUMENT_TRACKING_FLUSH_INTERVAL seconds after the first buffered event (on a
+timer thread), at interpreter exit, and before statistics are read. With
+DOCUMENT_TRACKING_BUFFERED off every event is written straight away.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_events = []
+_timer = None
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def record_download(assignment, ip_address=None, user_agent='') -> None:
+    """Count a download of ``assignment`` (and its first view)."""
+    event = {
+        'assignment_id': assignment.pk,
+        'at': timezone.now(),
+        'ip_address': ip_address,
+        'user_agent': user_agent or '',
+        'first_view': not assignment.viewed,
+    }
+    if not _setting('DOCUMENT_TRACKING_BUFFERED', True):
+        _write([event])
+        return
+    with _lock:
+        _events.append(event)
+        full = len(_events) >= _setting('DOCUMENT_TRACKING_FLUSH_SIZE', 200)
+        if not full:
+            _schedule()
+    if full:
+        flush()
+
+
+def pending() -> int:
+    with _lock:
+        return len(_events)
+
+
+def _schedule() -> None:
+    """Start the flush timer for the first event of a batch (called with _lock held)."""
+    global _timer
+    interval = _setting('DOCUMENT_TRACKING_FLUSH_INTERVAL', 5)
+    if _timer is not None or not interval:
+        return
+    _timer = threading.Timer(interval, _flush_in_thread)
+    _timer.daemon = True
+    _timer.start()
+
+
+def _flush_in_thread() -> None:
+    close_old_connections()
+    try:
+        flush()
+    finally:
+        close_old_connections()
+
+
+def flush() -> int:
+    """Write all buffered events; returns how many were written."""
+    global _timer
+    with _lock:
+        events = _events[:]
+        del _events[:]
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not events:
+        return 0
+    try:
+        _write(events)
+    except Exception:
+        logger.exception('Could not write %d attachment tracking events; keeping them buffered', len(events))
+        # Events of assignments deleted meanwhile can never be written
+        events = _existing(events)
+        with _lock:
+            _events[:0] = events
+            if events:
+                _schedule()
+        return 0
+    return len(events)
+
+
+def _existing(events):
+    from .models import AttachmentAssignment
+
+    try:
+        ids = set(AttachmentAssignment.objects.filter(
+            pk__in={e['assignment_id'] for e in events}
+        ).values_list('pk', flat=True))
+    except Exception:
+        return events
+    return [e for e in events if e['assignment_id'] in ids]
+
+
+def _write(events) -> None:
+    from .models import AttachmentAssignment, AttachmentDownloadLog
+
+    downloads = defaultdict(int)
+    last_at = {}
+    first_view = {}
+    for event in events:
+        pk = event['assignment_id']
+        downloads[pk] += 1
+        last_at[pk] = max(last_at.get(pk, event['at']), event['at'])
+        if event['first_view'] and pk not in first_view:
+            first_view[pk] = event['at']
+
+    with transaction.atomic():
+        for pk, n in downloads.items():
+            AttachmentAssignment.objects.filter(pk=pk).update(
+                download_count=F('download_count') + n,
+                last_downloaded_at=last_at[pk],
+            )
+        for pk, at in first_view.items():
+            AttachmentAssignment.objects.filter(pk=pk, viewed=False).update(viewed=True, viewed_at=at)
+        AttachmentDownloadLog.objects.bulk_create([
+            AttachmentDownloadLog(
+                assignment_id=event['assignment_id'],
+                downloaded_at=event['at'],
+                ip_address=event['ip_address'],
+                user_agent=event['user_agent'],
+            )
+            for event in events
+        ])
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    try:
+        flush()
+    except Exception:
+        pass
@@ -71,6 +71,29 @@ def format_file_size(size_bytes):
     return f"{size_bytes:.2f} PB"
 
 
+def assignment_totals(assignments):
+    """
+    Assignment, view, acknowledgment and download totals in one query.
+    
+    Args:
+        assignments: AttachmentAssignment queryset
+        
+    Returns:
+        dict: Totals dictionary
+    """
+    from django.db.models import Count, Q, Sum
+    
+    totals = assignments.aggregate(
+        total_assigned=Count('id'),
+        viewed_count=Count('id', filter=Q(viewed=True)),
+        acknowledged_count=Count('id', filter=Q(acknowledged=True)),
+        total_downloads=Sum('download_count'),
+    )
+    totals['not_viewed_count'] = totals['total_assigned'] - totals['viewed_count']
+    totals['total_downloads'] = totals['total_downloads'] or 0
+    return totals
+
+
 def get_attachment_statistics(attachment):
     """
     Get comprehensive statistics for an attachment.
@@ -81,15 +104,14 @@ def get_attachment_statistics(attachment):
     Returns:
         dict: Statistics dictionary
     """
-    assignments = attachment.assignments.all()
+    from .tracking import flush
+    
+    flush()
+    totals = assignment_totals(attachment.assignments.all())
     
     return {
-        'total_assigned': assignments.count(),
-        'viewed_count': assignments.filter(viewed=True).count(),
-        'not_viewed_count': assignments.filter(viewed=False).count(),
-        'acknowledged_count': assignments.filter(acknowledged=True).count(),
-        'total_downloads': sum(a.download_count for a in assignments),
-        'average_downloads': sum(a.download_count for a in assignments) / assignments.count() if assignments.count() > 0 else 0,
+        **totals,
+        'average_downloads': totals['total_downloads'] / totals['total_assigned'] if totals['total_assigned'] > 0 else 0,
         'file_size': attachment.formatted_file_size,
         'file_type': attachment.file_type,
         'status': attachment.status,
@@ -147,18 +169,22 @@ def get_user_attachment_summary(user):
     """
     from .models import AttachmentAssignment
     
+    from .tracking import flush
+    
+    flush()
     assignments = AttachmentAssignment.objects.filter(user=user)
+    totals = assignment_totals(assignments)
     
     return {
-        'total_assigned': assignments.count(),
-        'viewed': assignments.filter(viewed=True).count(),
-        'not_viewed': assignments.filter(viewed=False).count(),
+        'total_assigned': totals['total_assigned'],
+        'viewed': totals['viewed_count'],
+        'not_viewed': totals['not_viewed_count'],
         'mandatory_pending': assignments.filter(
             attachment__is_mandatory=True,
             viewed=False
         ).count(),
-        'acknowledged': assignments.filter(acknowledged=True).count(),
-        'total_downloads': sum(a.download_count for a in assignments),
+        'acknowledged': totals['acknowledged_count'],
+        'total_downloads': totals['total_downloads'],
     }
 
 
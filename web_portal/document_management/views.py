@@ -9,8 +9,9 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from web_portal.media_serving import is_first_fetch, serve_file
 
-from .models import Attachment, AttachmentAssignment, AttachmentDownloadLog
+from .models import Attachment, AttachmentAssignment
 from .serializers import (
     AttachmentListSerializer,
     AttachmentDetailSerializer,
@@ -26,6 +27,8 @@ from .permissions import (
     CanAssignAttachment,
 )
 from .filters import AttachmentFilter
+from . import tracking
+from .utils import assignment_totals
 
 
 def get_client_ip(request):
@@ -291,29 +294,40 @@ class AttachmentViewSet(viewsets.ModelViewSet):
                 defaults={'assigned_by': user}
             )
         
-        # Mark as viewed
-        assignment.mark_as_viewed()
-        
-        # Increment download count
-        assignment.increment_download_count()
-        
-        # Log download
-        AttachmentDownloadLog.objects.create(
-            assignment=assignment,
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
-        )
-        
-        # Serve file
+        # Serve file (conditional and range requests via the shared media backend)
+        filename = attachment.file.name.split("/")[-1]
         try:
-            response = FileResponse(
-                attachment.file.open('rb'),
-                content_type='application/octet-stream'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{attachment.file.name.split("/")[-1]}"'
-            return response
+            try:
+                file_path = attachment.file.path
+            except NotImplementedError:
+                # Remote storage: no local path to validate or offload
+                file_path = None
+            if file_path:
+                response = serve_file(
+                    request, file_path,
+                    content_type='application/octet-stream',
+                    filename=filename,
+                    disposition='attachment',
+                    cache_control='private, no-cache',
+                )
+            else:
+                response = FileResponse(
+                    attachment.file.open('rb'),
+                    content_type='application/octet-stream'
+                )
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
         except Exception as e:
             raise Http404(f"File not found: {str(e)}")
+
+        # Revalidations and resumed ranges are not new downloads. Views, counts
+        # and the download log are buffered and written in batches.
+        if is_first_fetch(request, response):
+            tracking.record_download(
+                assignment,
+                ip_address=get_client_ip(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', '')
+            )
+        return response
     
     @swagger_auto_schema(
         method='post',
@@ -395,14 +409,10 @@ class AttachmentViewSet(viewsets.ModelViewSet):
         Admin only.
         """
         attachment = self.get_object()
-        assignments = attachment.assignments.all()
+        tracking.flush()
         
         stats = {
-            'total_assigned': assignments.count(),
-            'viewed_count': assignments.filter(viewed=True).count(),
-            'not_viewed_count': assignments.filter(viewed=False).count(),
-            'acknowledged_count': assignments.filter(acknowledged=True).count(),
-            'total_downloads': sum(a.download_count for a in assignments),
+            **assignment_totals(attachment.assignments.all()),
             'created_at': attachment.created_at,
             'status': attachment.status,
             'is_expired': attachment.is_expired,
@@ -49,3 +49,16 @@ class Farm(models.Model):
 
     def __str__(self):
         return f"{self.name} - {self.owner}"
+
+
+class FarmSearchToken(models.Model):
+    """Normalized search token of a Farm (see web_portal/search_index.py)."""
+    target = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        db_table = 'farm_farm_search_token'
+        indexes = [
+            models.Index(fields=['token', 'target'], name='farm_search_token_idx'),
+        ]
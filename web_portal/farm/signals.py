@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from web_portal import search_index, spatial_index
+from .models import Farm
+
+
+@receiver(post_save, sender=Farm)
+@receiver(post_delete, sender=Farm)
+def invalidate_farm_index(sender, **kwargs):
+    """Farm locations or soft-delete state changed: rebuild the 'farms' spatial index."""
+    spatial_index.invalidate('farms')
+
+
+@receiver(post_save, sender=Farm)
+def index_farm(sender, instance, **kwargs):
+    """Keep the farm's search tokens in step with its fields."""
+    search_index.reindex(instance)
@@ -1,5 +1,5 @@
 # farm/views.py
-from rest_framework import viewsets, status, permissions, filters
+from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
@@ -9,7 +9,6 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from drf_yasg.inspectors import SwaggerAutoSchema
 from django.utils import timezone
-from django.db.models import Q
 from accounts.hierarchy_filters import HierarchyFilterMixin
 from .models import Farm
 from .serializers import (
@@ -19,6 +18,9 @@ from .serializers import (
     FarmListSerializer
 )
 from accounts.permissions import IsOwnerOrAdmin, HasRolePermission
+from web_portal import search_index
+from web_portal.nearby import NearbyMixin
+from web_portal.search_filters import RankedOrderingFilter, SearchIndexFilter
 
 
 class FormDataAutoSchema(SwaggerAutoSchema):
@@ -51,7 +53,7 @@ class FormDataAutoSchema(SwaggerAutoSchema):
         return consumes or ['application/json']
 
 
-class FarmViewSet(HierarchyFilterMixin, viewsets.ModelViewSet):
+class FarmViewSet(NearbyMixin, HierarchyFilterMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing Farms.
     Filters data based on user's position in reporting hierarchy:
@@ -65,11 +67,11 @@ class FarmViewSet(HierarchyFilterMixin, viewsets.ModelViewSet):
     parser_classes = [JSONParser, MultiPartParser, FormParser]
     queryset = Farm.objects.all().order_by("-created_at")
     hierarchy_field = 'created_by'  # Filter by user who created the farm
+    spatial_layer = 'farms'
 
     # ✅ Filters & Searching
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchIndexFilter, RankedOrderingFilter]
     filterset_fields = ["soil_type", "owner", "created_at", "is_active"]
-    search_fields = ["name", "address", "soil_type", "owner__username"]
     ordering_fields = ["created_at", "size", "name"]
 
     def get_serializer_class(self):
@@ -100,16 +102,6 @@ class FarmViewSet(HierarchyFilterMixin, viewsets.ModelViewSet):
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active.lower() == 'true')
         
-        # Search functionality
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(address__icontains=search) |
-                Q(soil_type__icontains=search) |
-                Q(owner__username__icontains=search)
-            )
-        
         # Filter by owner
         owner_id = self.request.query_params.get('owner')
         if owner_id:
@@ -527,17 +519,12 @@ class FarmViewSet(HierarchyFilterMixin, viewsets.ModelViewSet):
         elif status_filter == 'deleted':
             queryset = queryset.filter(deleted_at__isnull=False)
         
+        queryset = queryset.order_by('-created_at')
+
         # Search functionality
         search = request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(address__icontains=search) |
-                Q(soil_type__icontains=search) |
-                Q(owner__username__icontains=search)
-            )
-        
-        queryset = queryset.order_by('-created_at')
+            queryset = search_index.ranked(search_index.search(queryset, search), '-created_at')
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Meeting, FarmerAttendance, MeetingAttachment, FieldDay, FieldDayAttendance, FieldDayAttachment, FieldDayAttendanceCrop
 from farmers.models import Farmer
+from web_portal.image_pipeline import normalize_upload
 import json
 
 
@@ -224,7 +225,7 @@ class MeetingSerializer(serializers.ModelSerializer):
         # ✅ Save uploaded files
         if request and request.FILES:
             for f in request.FILES.getlist("attachments"):
-                MeetingAttachment.objects.create(meeting=meeting, file=f)
+                MeetingAttachment.objects.create(meeting=meeting, file=normalize_upload(f))
 
         return meeting
 
@@ -285,7 +286,7 @@ class MeetingSerializer(serializers.ModelSerializer):
         # Handle file uploads
         if request and request.FILES:
             for f in request.FILES.getlist("attachments"):
-                MeetingAttachment.objects.create(meeting=instance, file=f)
+                MeetingAttachment.objects.create(meeting=instance, file=normalize_upload(f))
                 
         return instance
     
@@ -690,7 +691,7 @@ class FieldDaySerializer(serializers.ModelSerializer):
         # ✅ Save uploaded files
         if request and request.FILES:
             for f in request.FILES.getlist("attachments"):
-                FieldDayAttachment.objects.create(field_day=field_day, file=f)
+                FieldDayAttachment.objects.create(field_day=field_day, file=normalize_upload(f))
 
         return field_day
 
@@ -764,7 +765,7 @@ class FieldDaySerializer(serializers.ModelSerializer):
         # Handle file uploads
         if request and request.FILES:
             for f in request.FILES.getlist("attachments"):
-                FieldDayAttachment.objects.create(field_day=instance, file=f)
+                FieldDayAttachment.objects.create(field_day=instance, file=normalize_upload(f))
 
         return instance
 
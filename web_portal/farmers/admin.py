@@ -1,6 +1,6 @@
 from django.contrib import admin
 from attendance.models import Attendance
-from .models import Farmer, FarmingHistory
+from .models import Farmer, FarmerImport, FarmingHistory
 from web_portal.admin import admin_site
 
 class AttendanceAdmin(admin.ModelAdmin):
@@ -116,4 +116,19 @@ class FarmingHistoryAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('farmer')
\ No newline at end of file
+        return super().get_queryset(request).select_related('farmer')
+
+
+@admin.register(FarmerImport, site=admin_site)
+class FarmerImportAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'original_name', 'uploaded_by', 'dry_run', 'status',
+        'processed_rows', 'total_rows', 'created_count', 'error_count', 'created_at'
+    )
+    list_filter = ('status', 'dry_run', 'created_at')
+    search_fields = ('original_name', 'uploaded_by__username')
+    readonly_fields = (
+        'status', 'total_rows', 'processed_rows', 'created_count', 'error_count',
+        'errors', 'message', 'created_at', 'started_at', 'finished_at'
+    )
+    ordering = ['-id']
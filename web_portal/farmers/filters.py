@@ -1,5 +1,6 @@
 import django_filters
 from django.db.models import Q
+from web_portal import search_index
 from .models import Farmer, FarmingHistory
 
 
@@ -61,25 +62,11 @@ class FarmerFilter(django_filters.FilterSet):
         }
     
     def filter_search(self, queryset, name, value):
-        """Global search across multiple fields"""
+        """Global search over IDs, names, phones, CNIC and places, best matches first"""
         if not value:
             return queryset
         
-        return queryset.filter(
-            Q(farmer_id__icontains=value) |
-            Q(first_name__icontains=value) |
-            Q(last_name__icontains=value) |
-            Q(father_name__icontains=value) |
-            Q(primary_phone__icontains=value) |
-            Q(secondary_phone__icontains=value) |
-            Q(email__icontains=value) |
-            Q(village__icontains=value) |
-            Q(tehsil__icontains=value) |
-            Q(district__icontains=value) |
-            Q(province__icontains=value) |
-            Q(cnic__icontains=value) |
-            Q(name__icontains=value)
-        )
+        return search_index.ranked(search_index.search(queryset, value), '-id')
     
     def filter_created_by(self, queryset, name, value):
         """Alias filter to map created_by -> registered_by"""
@@ -0,0 +1,121 @@
+"""
+Benchmark the farmer search token index against the former LIKE search.
+
+Inserts synthetic farmers (Roman Urdu and Urdu script names, phones, CNICs,
+villages) with bulk_create, indexes them, and times typical mobile search
+box queries through the old ``icontains`` OR over thirteen columns and
+through web_portal.search_index. Everything runs in one transaction that
+is rolled back at the end unless --keep is given.
+
+    python manage.py bench_farmer_search --farmers 500000 --repeat 3
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from farmers.models import Farmer, FarmerSearchToken
+from web_portal import search_index
+
+FIRST_NAMES = ['Muhammad', 'Mohammad', 'Ahmed', 'Ali', 'Hussain', 'Usman', 'Bilal', 'Imran', 'Fatima',
+               'Ayesha', 'Ghulam', 'Abdul', 'Rashid', 'Waseem', 'Zahid', 'محمد', 'احمد', 'علی', 'غلام', 'فاطمہ']
+LAST_NAMES = ['Khan', 'Iqbal', 'Cheema', 'Bhatti', 'Rana', 'Shah', 'Jutt', 'Arain', 'Qureshi', 'Malik',
+              'Chaudhry', 'Gondal', 'Warraich', 'خان', 'اقبال', 'چیمہ', 'بھٹی', 'شاہ']
+DISTRICTS = ['Okara', 'Sahiwal', 'Multan', 'Vehari', 'Bahawalnagar', 'Faisalabad', 'Jhang', 'Kasur']
+
+QUERIES = ['muham', 'Mohammed Khan', 'محمد', 'cheema okara', '0300 12', '35202-00012', 'BX00004', 'chak 14']
+
+
+def like_search(queryset, value):
+    """The search FarmerFilter.filter_search used to run."""
+    return queryset.filter(
+        Q(farmer_id__icontains=value) | Q(first_name__icontains=value) | Q(last_name__icontains=value) |
+        Q(father_name__icontains=value) | Q(primary_phone__icontains=value) |
+        Q(secondary_phone__icontains=value) | Q(email__icontains=value) | Q(village__icontains=value) |
+        Q(tehsil__icontains=value) | Q(district__icontains=value) | Q(province__icontains=value) |
+        Q(cnic__icontains=value) | Q(name__icontains=value)
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark farmer search: search token index against icontains LIKEs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmers', type=int, default=500000, help='Synthetic farmers to insert')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per query (best is reported)')
+        parser.add_argument('--page-size', type=int, default=20, help='Rows fetched per query, like one API page')
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic rows instead of rolling back')
+
+    def farmers(self, count, rnd):
+        for i in range(count):
+            first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+            district = rnd.choice(DISTRICTS)
+            yield Farmer(
+                farmer_id=f'BX{i:07d}',
+                first_name=first,
+                last_name=last,
+                name=f'{first} {last}',
+                father_name=f'{rnd.choice(FIRST_NAMES)} {last}',
+                cnic=f'35202-{i:07d}-{rnd.randint(1, 9)}',
+                primary_phone=f'03{rnd.randint(0, 4)}{rnd.randint(0, 9999999):07d}',
+                village=f'Chak {rnd.randint(1, 400)}',
+                tehsil=district,
+                district=district,
+                province='Punjab',
+            )
+
+    def insert(self, batch, fields):
+        Farmer.objects.bulk_create(batch)
+        # MySQL does not return the new primary keys from a bulk insert
+        created = Farmer.objects.filter(farmer_id__in=[farmer.farmer_id for farmer in batch])
+        search_index.index_objects(created, FarmerSearchToken, fields)
+
+    def best_of(self, repeat, fn):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        rnd = random.Random(1)
+        count, batch_size = options['farmers'], options['batch_size']
+        fields = search_index.INDEXES['farmer'][2]
+        page = options['page_size']
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            batch = []
+            for farmer in self.farmers(count, rnd):
+                batch.append(farmer)
+                if len(batch) == batch_size:
+                    self.insert(batch, fields)
+                    batch = []
+            if batch:
+                self.insert(batch, fields)
+            self.stdout.write(f'inserted and indexed {count} farmers in {time.perf_counter() - start:.1f}s '
+                              f'({FarmerSearchToken.objects.count()} tokens)')
+
+            farmers = Farmer.objects.filter(farmer_id__startswith='BX')
+            self.stdout.write(f'{"query":<18} {"LIKE ms":>9} {"hits":>8} {"index ms":>9} {"hits":>8} {"speedup":>8}')
+            for query in QUERIES:
+                def like():
+                    qs = like_search(farmers, query)
+                    return qs.count(), list(qs.order_by('-id')[:page])
+
+                def indexed():
+                    qs = search_index.ranked(search_index.search(farmers, query), '-id')
+                    return qs.count(), list(qs[:page])
+
+                slow, (slow_hits, _) = self.best_of(options['repeat'], like)
+                fast, (fast_hits, _) = self.best_of(options['repeat'], indexed)
+                self.stdout.write(f'{query:<18} {slow * 1e3:9.1f} {slow_hits:8d} {fast * 1e3:9.1f} {fast_hits:8d} '
+                                  f'{slow / fast:7.1f}x')
+
+            if not options['keep']:
+                transaction.set_rollback(True)
@@ -0,0 +1,47 @@
+"""
+Run pending bulk farmer onboarding uploads (farmers/onboarding.py).
+
+Uploads run in a thread of the web process unless FARMER_IMPORT_IN_THREAD
+is off; then this command (cron or a supervised --loop) processes them.
+Each job is claimed before it runs, so several workers can share the queue.
+
+    python manage.py process_farmer_imports
+    python manage.py process_farmer_imports --job 12
+    python manage.py process_farmer_imports --loop --sleep 10
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from farmers import onboarding
+from farmers.models import FarmerImport
+
+
+class Command(BaseCommand):
+    help = 'Process pending bulk farmer onboarding uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, help='Run this job only, even when it failed before')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads')
+        parser.add_argument('--sleep', type=float, default=5, help='Seconds between polls with --loop')
+
+    def run(self, job):
+        job = onboarding.run_import(job)
+        style = self.style.SUCCESS if job.status == 'completed' else self.style.ERROR
+        self.stdout.write(style(f'import {job.pk} ({job.original_name}): {job.status} - {job.message}'))
+
+    def handle(self, *args, **options):
+        if options['job']:
+            job = FarmerImport.objects.filter(pk=options['job']).first()
+            if job is None:
+                raise CommandError(f'Import {options["job"]} does not exist')
+            self.run(job)
+            return
+
+        while True:
+            for job_id in FarmerImport.objects.filter(status='pending').order_by('id').values_list('id', flat=True):
+                if onboarding.claim(job_id):
+                    self.run(FarmerImport.objects.get(pk=job_id))
+            if not options['loop']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,31 @@
+"""
+Rewrite the search tokens of farmers, farms and dealers (web_portal/search_index.py).
+
+Saves keep the tokens current; run this after bulk imports or raw SQL
+updates that bypass model signals, or after changing the indexed fields.
+
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --index farmer --batch-size 5000
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from web_portal import search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the farmer, farm and dealer search token tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index', choices=sorted(search_index.INDEXES), action='append',
+                            help='Index to rebuild (repeatable; default: all)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows indexed per transaction')
+
+    def handle(self, *args, **options):
+        for name in options['index'] or sorted(search_index.INDEXES):
+            start = time.perf_counter()
+            objects, tokens = search_index.rebuild_index(name, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: {objects} rows, {tokens} tokens in {time.perf_counter() - start:.1f}s'
+            ))
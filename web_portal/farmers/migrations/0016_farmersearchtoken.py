@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_farmers(apps, schema_editor):
+    from web_portal import search_index
+
+    _, _, fields = search_index.INDEXES['farmer']
+    search_index.rebuild(apps.get_model('farmers', 'Farmer'), apps.get_model('farmers', 'FarmerSearchToken'), fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0015_alter_farmer_user_alter_farmer_table_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmerSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='farmers.Farmer')),
+            ],
+            options={
+                'db_table': 'farmers_farmer_search_token',
+                'indexes': [models.Index(fields=['token', 'target'], name='farmer_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_farmers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmers', '0016_farmersearchtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmerImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='farmer_imports/', verbose_name='File')),
+                ('original_name', models.CharField(blank=True, max_length=255, verbose_name='Original File Name')),
+                ('dry_run', models.BooleanField(default=False, help_text='Validate every row, then roll back', verbose_name='Dry Run')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Status')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='Total Rows')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='Processed Rows')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Farmers Created')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Rows With Errors')),
+                ('errors', models.JSONField(blank=True, default=list, help_text='[{"row": n, "errors": {...}}], first rows only', verbose_name='Row Errors')),
+                ('message', models.TextField(blank=True, verbose_name='Message')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='farmer_imports', to=settings.AUTH_USER_MODEL, verbose_name='Uploaded By')),
+            ],
+            options={
+                'verbose_name': 'Farmer Import',
+                'verbose_name_plural': 'Farmer Imports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
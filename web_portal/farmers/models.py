@@ -3,8 +3,23 @@ from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
 from django.utils.translation import gettext_lazy as _
 
+from accounts import sequences
+
 User = get_user_model()
 
+FARMER_ID_PREFIX = 'FM'
+FARMER_ID_SEQUENCE = sequences.sequence_key('farmer_id', FARMER_ID_PREFIX)
+
+
+def format_farmer_id(number):
+    # Format: FM + at least 2-digit sequential number (FM01, FM02, etc.)
+    return f"{FARMER_ID_PREFIX}{number:02d}"
+
+
+def _farmer_id_seed():
+    return sequences.max_suffix(Farmer.objects.all(), 'farmer_id', FARMER_ID_PREFIX)
+
+
 class Farmer(models.Model):
     # User Account (for login)
     user = models.ForeignKey(
@@ -119,26 +134,8 @@ class Farmer(models.Model):
         super().save(*args, **kwargs)
     
     def generate_unique_farmer_id(self):
-        """Generate a simple sequential farmer ID like FM01, FM02, etc."""
-        
-        # Find the highest existing farmer ID with FM prefix
-        existing_ids = Farmer.objects.filter(
-            farmer_id__startswith='FM'
-        ).values_list('farmer_id', flat=True)
-        
-        # Extract numbers from existing IDs and find the next sequential number
-        numbers = []
-        for farmer_id in existing_ids:
-            # Extract number part after 'FM' prefix
-            number_part = farmer_id[2:]  # Remove 'FM' prefix
-            if number_part.isdigit():
-                numbers.append(int(number_part))
-        
-        # Get next number (start from 1 if no existing IDs)
-        next_number = max(numbers) + 1 if numbers else 1
-        
-        # Format: FM + 2-digit sequential number (FM01, FM02, etc.)
-        return f"FM{next_number:02d}"
+        """Next sequential farmer ID like FM01, FM02, etc. from the 'farmer_id:FM' counter."""
+        return format_farmer_id(sequences.next_value(FARMER_ID_SEQUENCE, seed=_farmer_id_seed))
     
     @property
     def full_name(self):
@@ -186,4 +183,59 @@ class FarmingHistory(models.Model):
         ordering = ['-year', '-created_at']
     
     def __str__(self):
-        return f"{self.farmer.full_name} - {self.crop_name} ({self.season} {self.year})"
\ No newline at end of file
+        return f"{self.farmer.full_name} - {self.crop_name} ({self.season} {self.year})"
+
+
+class FarmerSearchToken(models.Model):
+    """Normalized search token of a Farmer (see web_portal/search_index.py)."""
+    target = models.ForeignKey(Farmer, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        db_table = 'farmers_farmer_search_token'
+        indexes = [
+            models.Index(fields=['token', 'target'], name='farmer_search_token_idx'),
+        ]
+
+
+class FarmerImport(models.Model):
+    """An uploaded farmer spreadsheet and the progress of its bulk onboarding (farmers/onboarding.py)."""
+
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('completed', _('Completed')),
+        ('failed', _('Failed')),
+    ]
+
+    file = models.FileField(upload_to='farmer_imports/', verbose_name=_('File'))
+    original_name = models.CharField(max_length=255, blank=True, verbose_name=_('Original File Name'))
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='farmer_imports', verbose_name=_('Uploaded By'))
+    dry_run = models.BooleanField(default=False, verbose_name=_('Dry Run'), help_text=_('Validate every row, then roll back'))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name=_('Status'))
+    total_rows = models.PositiveIntegerField(default=0, verbose_name=_('Total Rows'))
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name=_('Processed Rows'))
+    created_count = models.PositiveIntegerField(default=0, verbose_name=_('Farmers Created'))
+    error_count = models.PositiveIntegerField(default=0, verbose_name=_('Rows With Errors'))
+    errors = models.JSONField(default=list, blank=True, verbose_name=_('Row Errors'), help_text=_('[{"row": n, "errors": {...}}], first rows only'))
+    message = models.TextField(blank=True, verbose_name=_('Message'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Started At'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Finished At'))
+
+    class Meta:
+        verbose_name = _('Farmer Import')
+        verbose_name_plural = _('Farmer Imports')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.original_name or self.file.name} ({self.status})"
+
+    @property
+    def progress(self):
+        """Processed share of the rows, 0-100."""
+        if not self.total_rows:
+            return 100 if self.status == 'completed' else 0
+        return round(100 * self.processed_rows / self.total_rows, 1)
+
@@ -0,0 +1,346 @@
+"""
+Bulk farmer onboarding from a CSV or XLSX farmer list.
+
+``Farmer.save`` allocates an ID, looks up or creates the login user (with a
+password hash) and writes the farmer, one row at a time. A district's list
+of thousands of farmers therefore took thousands of save chains inside the
+upload request. ``run_import`` processes a ``FarmerImport`` in batches of
+FARMER_IMPORT_BATCH_SIZE rows instead:
+
+- every row is validated with the model fields' own validators and checked
+  for CNIC / farmer ID / email clashes with the file and the database;
+  invalid rows are reported with their spreadsheet row number and skipped;
+- farmer IDs come from the 'farmer_id:FM' sequence as one block per batch;
+- missing login users (username = phone, as ``Farmer.save`` does) are
+  bulk-created with unusable passwords, so no hashing happens during the
+  import; farmers set their password through the OTP reset flow;
+- Farmer, FarmingHistory (when the row has crop columns) and search token
+  rows are bulk-inserted.
+
+Each batch is one transaction; when it hits a database conflict its rows are
+retried one by one so a single bad row only fails itself. Progress and the
+first MAX_REPORTED_ERRORS row errors are saved on the job after every batch.
+
+Jobs run in a background thread of the web process (FARMER_IMPORT_IN_THREAD)
+or are left pending for ``python manage.py process_farmer_imports``.
+"""
+import csv
+import io
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from accounts import sequences
+from web_portal import search_index
+from .models import (
+    FARMER_ID_SEQUENCE, Farmer, FarmerImport, FarmerSearchToken, FarmingHistory,
+    _farmer_id_seed, format_farmer_id,
+)
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+EXTENSIONS = ('.csv', '.xlsx')
+MAX_REPORTED_ERRORS = 500
+
+FARMER_COLUMNS = (
+    'farmer_id', 'first_name', 'last_name', 'father_name', 'date_of_birth', 'gender', 'cnic',
+    'primary_phone', 'secondary_phone', 'email', 'address', 'village', 'tehsil', 'district',
+    'province', 'education_level', 'total_land_area', 'current_crops_and_acreage', 'crop_calendar', 'notes',
+)
+HISTORY_COLUMNS = (
+    'year', 'season', 'crop_name', 'area_cultivated', 'total_yield', 'yield_per_acre',
+    'input_cost', 'market_price', 'total_income', 'profit_loss',
+)
+REQUIRED_COLUMNS = ('first_name', 'last_name', 'primary_phone', 'village', 'tehsil', 'district')
+HEADER_ALIASES = {
+    'phone': 'primary_phone', 'mobile': 'primary_phone', 'phone_number': 'primary_phone',
+    'mobile_number': 'primary_phone', 'cnic_number': 'cnic', 'father': 'father_name',
+    'dob': 'date_of_birth', 'land_area': 'total_land_area', 'crop': 'crop_name', 'acres': 'area_cultivated',
+}
+PHONE_SEPARATORS = str.maketrans('', '', ' -()')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ---------------------------------------------------------------------------
+# Reading and validation
+# ---------------------------------------------------------------------------
+
+def header_key(header) -> str:
+    key = '_'.join(str(header or '').strip().lower().replace('-', ' ').split())
+    return HEADER_ALIASES.get(key, key)
+
+
+def read_rows(fileobj, filename: str):
+    """[(row number, {column: value})] of the sheet; row 1 is the header."""
+    ext = os.path.splitext(filename.lower())[1]
+    if ext == '.csv':
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        rows = csv.reader(text)
+    elif ext == '.xlsx':
+        from openpyxl import load_workbook
+        rows = load_workbook(fileobj, read_only=True, data_only=True).active.iter_rows(values_only=True)
+    else:
+        raise ValueError(f'Unsupported file type {ext or filename!r}; upload a CSV or XLSX file.')
+
+    rows = iter(rows)
+    headers = [header_key(h) for h in next(rows, [])]
+    missing = [column for column in REQUIRED_COLUMNS if column not in headers]
+    if missing:
+        raise ValueError(f'Missing required columns: {", ".join(missing)}')
+    limit = _setting('FARMER_IMPORT_MAX_ROWS', 100000)
+    result = []
+    for number, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+        if len(result) >= limit:
+            raise ValueError(f'The file has more than {limit} rows.')
+        result.append((number, dict(zip(headers, values))))
+    return result
+
+
+def _clean_fields(model, raw, columns, errors):
+    values = {}
+    for column in columns:
+        value = raw.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        field = model._meta.get_field(column)
+        if value in (None, ''):
+            if field.null:
+                value = None
+            elif field.has_default():
+                value = field.get_default()
+            else:
+                value = ''
+        elif field.choices and isinstance(value, str):
+            value = value.lower()
+        try:
+            values[column] = field.clean(value, None)
+        except ValidationError as exc:
+            errors[column] = exc.messages
+    return values
+
+
+def clean_row(raw):
+    """(farmer values, history values or None, {column: [messages]})."""
+    raw = dict(raw)
+    for column in ('primary_phone', 'secondary_phone'):
+        if raw.get(column) not in (None, ''):
+            raw[column] = str(raw[column]).translate(PHONE_SEPARATORS)
+            # Spreadsheets drop the leading zero of numeric cells
+            if raw[column].isdigit() and len(raw[column]) == 10 and raw[column].startswith('3'):
+                raw[column] = '0' + raw[column]
+    errors = {}
+    farmer = _clean_fields(Farmer, raw, [c for c in FARMER_COLUMNS if c != 'farmer_id'], errors)
+    farmer['farmer_id'] = str(raw.get('farmer_id') or '').strip()
+    if len(farmer['farmer_id']) > Farmer._meta.get_field('farmer_id').max_length:
+        errors['farmer_id'] = ['Farmer ID is too long.']
+    history = None
+    if any(raw.get(column) not in (None, '') for column in HISTORY_COLUMNS):
+        history = _clean_fields(FarmingHistory, raw, HISTORY_COLUMNS, errors)
+    return farmer, history, errors
+
+
+# ---------------------------------------------------------------------------
+# Batch import
+# ---------------------------------------------------------------------------
+
+class RowError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _default_role():
+    from accounts.models import Role
+    role = Role.objects.filter(name='FirstRole').first()
+    if role is None:
+        raise ValueError("Role 'FirstRole' does not exist.")
+    return role
+
+
+def _conflicts(rows):
+    """{row number: errors} for rows clashing with existing farmers or other users' emails."""
+    errors = {}
+    cnics = {farmer['cnic'] for _, farmer, _ in rows if farmer['cnic']}
+    ids = {farmer['farmer_id'] for _, farmer, _ in rows if farmer['farmer_id']}
+    taken_cnics = set(Farmer.objects.filter(cnic__in=cnics).values_list('cnic', flat=True))
+    taken_ids = set(Farmer.objects.filter(farmer_id__in=ids).values_list('farmer_id', flat=True))
+    emails = {_login_email(farmer) for _, farmer, _ in rows}
+    email_owner = dict(User.objects.filter(email__in=emails).values_list('email', 'username'))
+    for number, farmer, _ in rows:
+        row = {}
+        if farmer['cnic'] in taken_cnics:
+            row['cnic'] = ['A farmer with this CNIC already exists.']
+        if farmer['farmer_id'] in taken_ids:
+            row['farmer_id'] = ['A farmer with this ID already exists.']
+        owner = email_owner.get(_login_email(farmer))
+        if owner is not None and owner != farmer['primary_phone']:
+            row['email'] = ['This email belongs to another account.']
+        if row:
+            errors[number] = row
+    return errors
+
+
+def _login_email(farmer):
+    # The address Farmer.save gives the login user
+    return User.objects.normalize_email(farmer['email'] or f"{farmer['primary_phone']}@farmer.local")
+
+
+def _import_batch(rows, registered_by, role):
+    """Insert ``rows`` [(row number, farmer values, history values)]; returns created Farmer rows."""
+    phones = {farmer['primary_phone'] for _, farmer, _ in rows}
+    users = {user.username: user for user in User.objects.filter(username__in=phones)}
+    new_users = {}
+    for _, farmer, _ in rows:
+        phone = farmer['primary_phone']
+        if phone not in users and phone not in new_users:
+            user = User(
+                username=phone, email=_login_email(farmer), first_name=farmer['first_name'],
+                last_name=farmer['last_name'], role=role, is_active=True,
+            )
+            user.set_unusable_password()
+            new_users[phone] = user
+    if new_users:
+        User.objects.bulk_create(new_users.values())
+        # MySQL does not return primary keys from bulk inserts
+        users.update((user.username, user) for user in User.objects.filter(username__in=new_users))
+
+    missing_ids = sum(1 for _, values, _ in rows if not values['farmer_id'])
+    numbers = iter(sequences.allocate(FARMER_ID_SEQUENCE, missing_ids, seed=_farmer_id_seed) if missing_ids else ())
+    farmers = []
+    for _, values, _ in rows:
+        values = dict(values)
+        values['farmer_id'] = values['farmer_id'] or format_farmer_id(next(numbers))
+        farmers.append(Farmer(
+            **values,
+            name=f"{values['first_name']} {values['last_name']}",
+            user=users[values['primary_phone']],
+            registered_by=registered_by,
+        ))
+    Farmer.objects.bulk_create(farmers)
+    created = {farmer.farmer_id: farmer for farmer in Farmer.objects.filter(farmer_id__in=[f.farmer_id for f in farmers])}
+
+    FarmingHistory.objects.bulk_create([
+        FarmingHistory(farmer=created[farmer.farmer_id], **history)
+        for farmer, (_, _, history) in zip(farmers, rows)
+        if history
+    ])
+    search_index.index_objects(created.values(), FarmerSearchToken, search_index.INDEXES['farmer'][2])
+    return list(created.values())
+
+
+def import_rows(rows, registered_by=None, dry_run=False, seen=None):
+    """
+    Validate and insert parsed sheet ``rows`` [(row number, raw dict)].
+
+    Returns (created count, {row number: errors}). With ``dry_run`` every
+    batch is rolled back after its inserts, so database conflicts are
+    reported too but nothing is kept. ``seen`` carries the CNICs and farmer
+    IDs of earlier batches of the same file.
+    """
+    role = _default_role()
+    errors = {}
+    valid = []
+    seen = seen if seen is not None else {}
+    for number, raw in rows:
+        farmer, history, row_errors = clean_row(raw)
+        for column in ('cnic', 'farmer_id'):
+            owners = seen.setdefault(column, {})
+            value = farmer.get(column)
+            if value and not row_errors.get(column):
+                if value in owners:
+                    row_errors[column] = [f'Duplicate of row {owners[value]}.']
+                else:
+                    owners[value] = number
+        if row_errors:
+            errors[number] = row_errors
+        else:
+            valid.append((number, farmer, history))
+
+    conflicts = _conflicts(valid)
+    errors.update(conflicts)
+    valid = [row for row in valid if row[0] not in conflicts]
+    created = 0
+    try:
+        with transaction.atomic():
+            created = len(_import_batch(valid, registered_by, role)) if valid else 0
+            if dry_run:
+                transaction.set_rollback(True)
+    except (IntegrityError, ValidationError):
+        # A concurrent import or edit took a value; isolate the rows that clash
+        created = 0
+        for row in valid:
+            try:
+                with transaction.atomic():
+                    created += len(_import_batch([row], registered_by, role))
+                    if dry_run:
+                        transaction.set_rollback(True)
+            except (IntegrityError, ValidationError) as exc:
+                errors[row[0]] = {'__all__': [str(exc)]}
+    return created, errors
+
+
+def run_import(job):
+    """Process ``job`` in batches, saving its progress after each one."""
+    FarmerImport.objects.filter(pk=job.pk).update(status='running', started_at=timezone.now())
+    reported = []
+    created = failed = processed = 0
+    try:
+        with job.file.open('rb') as fileobj:
+            rows = read_rows(fileobj, job.original_name or job.file.name)
+        FarmerImport.objects.filter(pk=job.pk).update(total_rows=len(rows))
+        size = max(1, _setting('FARMER_IMPORT_BATCH_SIZE', 500))
+        seen = {}
+        for start in range(0, len(rows), size):
+            batch = rows[start:start + size]
+            batch_created, batch_errors = import_rows(batch, job.uploaded_by, job.dry_run, seen)
+            created += batch_created
+            failed += len(batch_errors)
+            processed += len(batch)
+            room = MAX_REPORTED_ERRORS - len(reported)
+            reported.extend({'row': number, 'errors': batch_errors[number]} for number in sorted(batch_errors)[:room])
+            FarmerImport.objects.filter(pk=job.pk).update(
+                processed_rows=processed, created_count=created, error_count=failed, errors=reported,
+            )
+    except Exception as exc:
+        if not isinstance(exc, ValueError):
+            logger.exception('Farmer import %s failed', job.pk)
+        FarmerImport.objects.filter(pk=job.pk).update(status='failed', message=str(exc), finished_at=timezone.now())
+    else:
+        message = f'{"Validated" if job.dry_run else "Created"} {created} farmers; {failed} rows with errors.'
+        FarmerImport.objects.filter(pk=job.pk).update(status='completed', message=message, finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def claim(job_id) -> bool:
+    """Mark a pending job as taken; False when another worker got it first."""
+    return bool(FarmerImport.objects.filter(pk=job_id, status='pending').update(status='running'))
+
+
+def _run_in_thread(job_id):
+    try:
+        if claim(job_id):
+            run_import(FarmerImport.objects.get(pk=job_id))
+    finally:
+        connection.close()
+
+
+def start_import(job) -> None:
+    """Run ``job`` in a background thread, or leave it for process_farmer_imports."""
+    if _setting('FARMER_IMPORT_IN_THREAD', True):
+        transaction.on_commit(lambda: threading.Thread(
+            target=_run_in_thread, args=(job.pk,), name=f'farmer-import-{job.pk}', daemon=True,
+        ).start())
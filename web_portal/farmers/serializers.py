@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Farmer, FarmingHistory
+from .models import Farmer, FarmerImport, FarmingHistory
 
 
 class FarmingHistorySerializer(serializers.ModelSerializer):
@@ -116,3 +116,18 @@ class FarmerCreateUpdateSerializer(serializers.ModelSerializer):
 class FarmerSerializer(FarmerDetailSerializer):
     """Main farmer serializer - inherits from detailed serializer for backward compatibility"""
     pass
+
+
+class FarmerImportSerializer(serializers.ModelSerializer):
+    """Bulk onboarding job status"""
+    progress = serializers.ReadOnlyField()
+    uploaded_by = serializers.StringRelatedField()
+
+    class Meta:
+        model = FarmerImport
+        fields = [
+            'id', 'original_name', 'uploaded_by', 'dry_run', 'status', 'progress',
+            'total_rows', 'processed_rows', 'created_count', 'error_count', 'errors',
+            'message', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
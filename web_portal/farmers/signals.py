@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from web_portal import search_index
+from .models import Farmer
+
+
+@receiver(post_save, sender=Farmer)
+def index_farmer(sender, instance, **kwargs):
+    """Keep the farmer's search tokens in step with its fields."""
+    search_index.reindex(instance)
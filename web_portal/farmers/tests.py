@@ -1,3 +1,214 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from accounts.models import Role
+from web_portal import search_index
+from . import onboarding
+from .models import Farmer, FarmerImport, FarmerSearchToken, FarmingHistory
+
+
+def farmer(first_name, last_name, phone, **extra):
+    return Farmer.objects.create(
+        first_name=first_name, last_name=last_name, primary_phone=phone,
+        village=extra.pop('village', 'Chak 12'), tehsil='Okara', district='Okara', **extra,
+    )
+
+
+class SearchIndexTokenTests(TestCase):
+    def test_phonetic_keys_meet_across_spellings_and_scripts(self):
+        for spellings in (['Muhammad', 'Mohammed', 'محمد'], ['Hussain', 'Husain', 'حسین'],
+                          ['Fatima', 'Fatimah', 'فاطمہ'], ['Cheema', 'چیمہ']):
+            keys = {search_index.phonetic_key(search_index.normalize(word)) for word in spellings}
+            self.assertEqual(len(keys), 1, spellings)
+
+    def test_phone_and_cnic_normalization(self):
+        self.assertEqual(search_index.phone_digits('+92 300-1234567'), '3001234567')
+        self.assertEqual(search_index.phone_digits('0300 1234567'), '3001234567')
+        self.assertEqual(list(search_index.field_tokens('0300-1234567', 'phone')), ['3001234567', '1234567'])
+        self.assertEqual(list(search_index.field_tokens('35202-1234567-1', 'digits')), ['3520212345671'])
+        self.assertEqual(list(search_index.field_tokens('FM07', 'text')), ['fm07', '07'])
+
+
+class FarmerSearchTests(TestCase):
+    def setUp(self):
+        Role.objects.create(name='FirstRole')
+        self.muhammad = farmer('Muhammad', 'Khan', '03001234567', cnic='35202-1234567-1')
+        self.urdu = farmer('محمد', 'اقبال', '03111111111', village='Chak 40')
+        self.ali = farmer('Ali', 'Mohammadi', '03219876543')
+
+    def search(self, text):
+        return list(search_index.ranked(search_index.search(Farmer.objects.all(), text)))
+
+    def test_tokens_follow_saves_and_deletes(self):
+        self.assertTrue(FarmerSearchToken.objects.filter(target=self.muhammad, token='~mhmd').exists())
+        self.muhammad.village = 'Basti Jadeed'
+        self.muhammad.save()
+        self.assertEqual(self.search('jadeed'), [self.muhammad])
+        self.assertEqual(self.search('chak 12'), [self.ali])
+        self.ali.delete()
+        self.assertFalse(FarmerSearchToken.objects.filter(target_id=self.ali.pk).exists())
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search('mohammed khan'), [self.muhammad])
+        self.assertEqual(self.search('محمد khan'), [self.muhammad])
+        self.assertEqual(self.search('khan chak 40'), [])
+
+    def test_transliterated_names_rank_exact_words_first(self):
+        results = self.search('Muhammad')
+        self.assertEqual(results[0], self.muhammad)
+        self.assertEqual(set(results), {self.muhammad, self.urdu, self.ali})
+        self.assertEqual(self.search('محمد')[0], self.urdu)
+
+    def test_phone_cnic_and_id_lookups(self):
+        self.assertEqual(self.search('0300-12'), [self.muhammad])
+        self.assertEqual(self.search('+923001234567'), [self.muhammad])
+        self.assertEqual(self.search('1234567'), [self.muhammad])
+        self.assertEqual(self.search('35202-12345'), [self.muhammad])
+        self.assertEqual(self.search(self.urdu.farmer_id), [self.urdu])
+
+    def test_rebuild_matches_incremental_index(self):
+        before = set(FarmerSearchToken.objects.values_list('target_id', 'token', 'weight'))
+        FarmerSearchToken.objects.all().delete()
+        self.assertEqual(search_index.rebuild_index('farmer', batch_size=2)[0], 3)
+        self.assertEqual(set(FarmerSearchToken.objects.values_list('target_id', 'token', 'weight')), before)
+
+
+class FarmerSearchApiTests(APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='FirstRole')
+        user = get_user_model().objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role,
+        )
+        self.client.force_authenticate(user)
+        self.cheema = farmer('Zahid', 'Cheema', '03001234567')
+        farmer('Bilal', 'Bhatti', '03007654321')
+
+    def test_list_search_uses_index_and_other_filters(self):
+        url = reverse('farmer-list')
+
+        response = self.client.get(url, {'search': 'چیمہ'})
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row['id'] for row in rows], [self.cheema.pk])
+
+        response = self.client.get(url, {'search': '0300', 'district': 'Lahore'})
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(rows, [])
+
+
+IMPORT_CSV = (
+    'First Name,Last Name,Phone,CNIC,Village,Tehsil,District,Crop,Season,Year,Acres\n'
+    'Zahid,Cheema,0300-1234567,35202-1234567-1,Chak 12,Okara,Okara,Wheat,rabi,2025,12.5\n'
+    'Bilal,Bhatti,3007654321,,Chak 14,Okara,Okara,,,,\n'
+    'Imran,Rana,12345,,Chak 15,Okara,Okara,,,,\n'
+    'Usman,Malik,03111111111,35202-1234567-1,Chak 16,Okara,Okara,,,,\n'
+    'Ghulam,Abbas,03001234567,,Chak 12,Okara,Okara,Cotton,kharif,2025,\n'
+)
+
+
+class FarmerOnboardingTests(TestCase):
+    def setUp(self):
+        Role.objects.create(name='FirstRole')
+        self.existing = farmer('Ali', 'Khan', '03219876543')
+
+    def rows(self, text=IMPORT_CSV):
+        return onboarding.read_rows(io.BytesIO(text.encode('utf-8-sig')), 'farmers.csv')
+
+    def test_valid_rows_are_created_and_bad_rows_reported(self):
+        created, errors = onboarding.import_rows(self.rows())
+        self.assertEqual(created, 2)
+        self.assertEqual(set(errors), {4, 5, 6})
+        self.assertIn('primary_phone', errors[4])
+        self.assertEqual(errors[5]['cnic'], ['Duplicate of row 2.'])
+        self.assertIn('area_cultivated', errors[6])
+
+        zahid = Farmer.objects.get(first_name='Zahid')
+        bilal = Farmer.objects.get(first_name='Bilal')
+        self.assertEqual(zahid.primary_phone, '03001234567')
+        self.assertEqual(bilal.primary_phone, '03007654321')
+        self.assertEqual(zahid.name, 'Zahid Cheema')
+        # IDs continue the series Farmer.save uses
+        number = int(self.existing.farmer_id[2:])
+        self.assertEqual([zahid.farmer_id, bilal.farmer_id],
+                         [f'FM{number + 1:02d}', f'FM{number + 2:02d}'])
+        self.assertEqual(farmer('Rashid', 'Shah', '03331234567').farmer_id, f'FM{number + 3:02d}')
+
+        self.assertEqual(zahid.user.username, '03001234567')
+        self.assertEqual(zahid.user.email, '03001234567@farmer.local')
+        self.assertFalse(zahid.user.has_usable_password())
+        self.assertEqual(zahid.user.role.name, 'FirstRole')
+        history = FarmingHistory.objects.get(farmer=zahid)
+        self.assertEqual((history.crop_name, history.season, history.year), ('Wheat', 'rabi', 2025))
+        self.assertFalse(FarmingHistory.objects.filter(farmer=bilal).exists())
+        self.assertEqual(list(search_index.search(Farmer.objects.all(), 'cheema')), [zahid])
+
+    def test_existing_farmers_and_users_are_respected(self):
+        onboarding.import_rows(self.rows())
+        user = get_user_model().objects.get(username='03001234567')
+        created, errors = onboarding.import_rows(self.rows(
+            'first_name,last_name,primary_phone,cnic,village,tehsil,district\n'
+            'Zahid,Cheema,03001234567,35202-1234567-1,Chak 12,Okara,Okara\n'
+            'Zahida,Cheema,03001234567,,Chak 12,Okara,Okara\n'
+        ))
+        self.assertEqual(created, 1)
+        self.assertEqual(errors[2]['cnic'], ['A farmer with this CNIC already exists.'])
+        self.assertEqual(Farmer.objects.get(first_name='Zahida').user, user)
+
+    def test_dry_run_creates_nothing(self):
+        before = Farmer.objects.count()
+        created, errors = onboarding.import_rows(self.rows(), dry_run=True)
+        self.assertEqual((created, len(errors)), (2, 3))
+        self.assertEqual(Farmer.objects.count(), before)
+        self.assertFalse(get_user_model().objects.filter(username='03001234567').exists())
+
+    def test_missing_columns_fail_the_file(self):
+        with self.assertRaisesMessage(ValueError, 'Missing required columns: tehsil, district'):
+            self.rows('first_name,last_name,phone,village\nA,B,03001234567,C\n')
+
+
+class FarmerBulkImportApiTests(APITestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, FARMER_IMPORT_BATCH_SIZE=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        role = Role.objects.create(name='FirstRole')
+        self.user = get_user_model().objects.create_user(
+            username='ali', email='ali@example.com', password='testpass123',
+            first_name='Ali', last_name='Khan', role=role,
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_upload_queues_a_job_that_reports_progress_and_errors(self):
+        upload = io.BytesIO(IMPORT_CSV.encode())
+        upload.name = 'okara.csv'
+        response = self.client.post(reverse('farmer-bulk-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+
+        # The thread starts on commit; run the job the way it would
+        job = onboarding.run_import(FarmerImport.objects.get(pk=response.data['id']))
+        self.assertEqual((job.status, job.total_rows, job.processed_rows), ('completed', 5, 5))
+        self.assertEqual((job.created_count, job.error_count), (2, 3))
+        self.assertEqual([error['row'] for error in job.errors], [4, 5, 6])
+        self.assertEqual(Farmer.objects.get(first_name='Zahid').registered_by, self.user)
+
+        response = self.client.get(reverse('farmer-bulk-import-status', args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['progress'], 100)
+
+    def test_rejects_other_file_types(self):
+        upload = io.BytesIO(b'not a sheet')
+        upload.name = 'farmers.pdf'
+        response = self.client.post(reverse('farmer-bulk-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FarmerImport.objects.exists())
@@ -21,5 +21,7 @@ urlpatterns = [
 # GET/POST    /api/farmers/                    - List/Create farmers with search & filtering
 # GET/PUT/PATCH/DELETE /api/farmers/{id}/     - Retrieve/Update/Delete specific farmer
 # GET         /api/farmers/statistics/         - Get farmer statistics
+# POST        /api/farmers/bulk-import/        - Upload a CSV/XLSX farmer list for onboarding
+# GET         /api/farmers/bulk-import/{job}/  - Progress and row errors of an upload
 # GET/POST    /api/farming-history/            - List/Create farming history records
 # GET/PUT/PATCH/DELETE /api/farming-history/{id}/ - Manage specific farming history record
\ No newline at end of file
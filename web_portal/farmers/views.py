@@ -4,12 +4,15 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
-from .models import Farmer, FarmingHistory
+from django.shortcuts import get_object_or_404
+from .models import Farmer, FarmerImport, FarmingHistory
 from .serializers import (
     FarmerSerializer, FarmerListSerializer, FarmerDetailSerializer,
-    FarmerCreateUpdateSerializer, FarmingHistorySerializer
+    FarmerCreateUpdateSerializer, FarmingHistorySerializer, FarmerImportSerializer
 )
+from . import onboarding
 from .filters import FarmerFilter, FarmingHistoryFilter
+from web_portal.search_filters import RankedOrderingFilter
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -30,13 +33,9 @@ class FarmerViewSet(viewsets.ModelViewSet):
     """
     queryset = Farmer.objects.all().select_related('registered_by')
     parser_classes = [MultiPartParser, FormParser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # ?search= is answered by FarmerFilter from the search token index
+    filter_backends = [DjangoFilterBackend, RankedOrderingFilter]
     filterset_class = FarmerFilter
-    search_fields = [
-        'farmer_id', 'first_name', 'last_name', 'father_name',
-        'primary_phone', 'email', 'village', 'district', 'province',
-        'cnic'
-    ]
     ordering_fields = [
         'registration_date', 'first_name', 'last_name', 'total_land_area',
         'education_level', 'id'
@@ -411,6 +410,55 @@ class FarmerViewSet(viewsets.ModelViewSet):
             'farmers_by_gender': farmers_by_gender,
         })
 
+    @action(detail=False, methods=['post'], url_path='bulk-import')
+    @swagger_auto_schema(
+        operation_description=(
+            "Upload a CSV or XLSX farmer list for bulk onboarding. Columns: first_name, last_name, "
+            "primary_phone, village, tehsil, district (required) and optionally farmer_id, father_name, "
+            "cnic, email, gender, date_of_birth, education_level, total_land_area and crop history "
+            "(year, season, crop_name, area_cultivated, ...). Rows are processed in the background; "
+            "poll the returned job for progress and per-row errors."
+        ),
+        manual_parameters=[
+            openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                              description='CSV or XLSX file, header in the first row'),
+            openapi.Parameter('dry_run', openapi.IN_FORM, type=openapi.TYPE_BOOLEAN, required=False,
+                              description='Validate every row without creating anything'),
+        ],
+        responses={
+            202: FarmerImportSerializer,
+            400: openapi.Response(description='No file or unsupported file type'),
+        },
+        tags=["06. Farmers"]
+    )
+    def bulk_import(self, request):
+        """Queue a farmer spreadsheet for onboarding"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the farmer list as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        if not upload.name.lower().endswith(onboarding.EXTENSIONS):
+            return Response({'error': 'Upload a CSV or XLSX file.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = FarmerImport.objects.create(
+            file=upload,
+            original_name=upload.name,
+            uploaded_by=request.user if request.user.is_authenticated else None,
+            dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes'),
+        )
+        onboarding.start_import(job)
+        return Response(FarmerImportSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'bulk-import/(?P<job_id>\d+)')
+    @swagger_auto_schema(
+        operation_description="Progress and per-row errors of a bulk onboarding upload",
+        responses={200: FarmerImportSerializer, 404: openapi.Response(description='Import not found')},
+        tags=["06. Farmers"]
+    )
+    def bulk_import_status(self, request, job_id=None):
+        """Bulk onboarding job status"""
+        job = get_object_or_404(FarmerImport, pk=job_id)
+        return Response(FarmerImportSerializer(job).data)
+
 # ✅ Farming History ViewSet
 class FarmingHistoryViewSet(viewsets.ModelViewSet):
     """
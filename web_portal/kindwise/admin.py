@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import KindwiseIdentification
+from .models import KindwiseIdentification, KindwiseJob
 from web_portal.admin import admin_site  # Use custom admin site
 import json
 
@@ -10,10 +10,11 @@ import json
 @admin.register(KindwiseIdentification, site=admin_site)
 class KindwiseIdentificationAdmin(admin.ModelAdmin):
     list_display = ('id', 'user_link', 'status_badge', 'image_name', 'created_at', 'view_details_link')
-    list_filter = ('status', 'created_at')
+    list_filter = ('status', 'cache_source', 'created_at')
     search_fields = ('user__username', 'user__email', 'image_name', 'source_ip')
     readonly_fields = ('id', 'user', 'image_name', 'request_payload_display', 'response_payload_display', 
-                      'status', 'source_ip', 'user_agent', 'created_at')
+                      'status', 'source_ip', 'user_agent', 'created_at',
+                      'image_sha256', 'image_phash', 'cache_source', 'cached_from')
     
     fieldsets = (
         ('Basic Information', {
@@ -26,6 +27,10 @@ class KindwiseIdentificationAdmin(admin.ModelAdmin):
         ('API Response', {
             'fields': ('response_payload_display',),
         }),
+        ('Identification Cache', {
+            'fields': ('image_sha256', 'image_phash', 'cache_source', 'cached_from'),
+            'classes': ('collapse',)
+        }),
     )
     
     def user_link(self, obj):
@@ -232,3 +237,17 @@ class KindwiseIdentificationAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         """Allow deletion of records"""
         return request.user.is_superuser
+
+
+@admin.register(KindwiseJob, site=admin_site)
+class KindwiseJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'attempts', 'identification', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('id', 'user__username', 'image_name')
+    readonly_fields = ('id', 'user', 'status', 'image', 'image_name', 'image_sha256', 'image_phash',
+                       'request_payload', 'include_recommendations', 'attempts', 'error', 'identification',
+                       'source_ip', 'user_agent', 'created_at', 'started_at', 'finished_at')
+
+    def has_add_permission(self, request):
+        """Jobs are only created through the API"""
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class KindwiseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'kindwise'
+
+    def ready(self):
+        import kindwise.signals  # noqa: F401
@@ -0,0 +1,213 @@
+"""
+In-memory name index over sap_integration.DiseaseIdentification.
+
+Every disease contributes its names as aliases: disease_name, item_name,
+scientific_name, each entry of ``synonyms``, the parts of combined names
+("Downy mildew, Late blight") and parenthesized abbreviations
+("Potato virus Y (PVY)"). Aliases are normalized (case, accents,
+punctuation) and indexed by exact text, token set and word trigrams, so a
+query is scored against all candidate aliases at once:
+
+    1.0   same normalized name
+    0.95  same words in another order
+    0.6 + 0.3 * coverage   all words of one name (or their prefixes) occur in the other
+    0.9 * trigram similarity (Dice coefficient) otherwise
+
+The index is built once per process on first use and rebuilt after a disease
+is saved or deleted (see kindwise.signals). Other processes notice the change
+through a version number kept in the Django cache, and rebuild at the latest
+after KINDWISE_DISEASE_INDEX_TTL seconds.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'kindwise:disease_index:version'
+
+_SPLIT = re.compile(r'[,;/|]|\band\b')
+_PARENS = re.compile(r'\(([^)]*)\)')
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text) -> str:
+    """Lower-case, accent-free, punctuation-free form of a name."""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def trigrams(text: str) -> set:
+    """Word trigrams, padded like PostgreSQL pg_trgm ("  ab", " ab", "ab ")."""
+    grams = set()
+    for word in text.split():
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def aliases_for(*names) -> set:
+    """Normalized aliases for a disease's raw name fields."""
+    out = set()
+    for name in names:
+        if not name:
+            continue
+        name = str(name)
+        candidates = [name, _PARENS.sub(' ', name)]
+        candidates.extend(_PARENS.findall(name))
+        for part in list(candidates):
+            candidates.extend(_SPLIT.split(_PARENS.sub(' ', part)))
+        for c in candidates:
+            n = normalize(c)
+            if n:
+                out.add(n)
+    return out
+
+
+class Match:
+    __slots__ = ('disease_id', 'score', 'alias')
+
+    def __init__(self, disease_id: int, score: float, alias: str):
+        self.disease_id = disease_id
+        self.score = score
+        self.alias = alias
+
+    def __repr__(self):
+        return f"Match({self.disease_id}, {self.score:.3f}, {self.alias!r})"
+
+
+def _covers(short: tuple, long: tuple) -> bool:
+    """Every word of ``short`` equals, or (from 3 letters) prefixes, a word of ``long``."""
+    return all(any(w == l or (len(w) >= 3 and l.startswith(w)) for l in long) for w in short)
+
+
+class DiseaseIndex:
+    def __init__(self, diseases=()):
+        """``diseases``: iterable of ``(id, is_active, [raw names...])``."""
+        self.active = {}
+        self.aliases = []          # [(alias, disease_id, tokens, trigram count)]
+        self.exact = defaultdict(set)
+        self.token_sets = defaultdict(set)
+        self.by_trigram = defaultdict(list)
+        for disease_id, is_active, names in diseases:
+            self.active[disease_id] = bool(is_active)
+            for alias in aliases_for(*names):
+                tokens = tuple(alias.split())
+                grams = trigrams(alias)
+                pos = len(self.aliases)
+                self.aliases.append((alias, disease_id, tokens, len(grams)))
+                self.exact[alias].add(disease_id)
+                self.token_sets[frozenset(tokens)].add(disease_id)
+                for g in grams:
+                    self.by_trigram[g].append(pos)
+
+    def __len__(self):
+        return len(self.active)
+
+    def match(self, query, threshold: float = 0.5, active_only: bool = True, limit: int | None = None) -> list:
+        """Diseases matching ``query``, best first, as ``Match`` objects."""
+        n = normalize(query)
+        if not n:
+            return []
+        best = {}
+
+        def offer(disease_id, score, alias):
+            if active_only and not self.active.get(disease_id):
+                return
+            current = best.get(disease_id)
+            if current is None or score > current.score:
+                best[disease_id] = Match(disease_id, score, alias)
+
+        for disease_id in self.exact.get(n, ()):
+            offer(disease_id, 1.0, n)
+        q_tokens = tuple(n.split())
+        for disease_id in self.token_sets.get(frozenset(q_tokens), ()):
+            offer(disease_id, 0.95, n)
+
+        q_grams = trigrams(n)
+        shared = Counter()
+        for g in q_grams:
+            shared.update(self.by_trigram.get(g, ()))
+        for pos, common in shared.items():
+            alias, disease_id, tokens, gram_count = self.aliases[pos]
+            score = 0.9 * 2.0 * common / (len(q_grams) + gram_count)
+            if _covers(q_tokens, tokens) or _covers(tokens, q_tokens):
+                coverage = min(len(q_tokens), len(tokens)) / max(len(q_tokens), len(tokens))
+                score = max(score, 0.6 + 0.3 * coverage)
+            if score >= threshold:
+                offer(disease_id, score, alias)
+
+        ranked = sorted(best.values(), key=lambda m: (-m.score, m.disease_id))
+        return ranked[:limit] if limit else ranked
+
+    def match_many(self, queries, threshold: float = 0.5, active_only: bool = True) -> list:
+        """
+        Best match for each query (or None), in one pass. A query may be a
+        string or a sequence of alternative names (e.g. common and scientific
+        name of one suggestion); the best-scoring alternative wins.
+        """
+        memo = {}
+        out = []
+        for q in queries:
+            alternatives = [q] if isinstance(q, str) or q is None else list(q)
+            top = None
+            for name in alternatives:
+                key = normalize(name)
+                if key not in memo:
+                    found = self.match(key, threshold=threshold, active_only=active_only, limit=1)
+                    memo[key] = found[0] if found else None
+                m = memo[key]
+                if m is not None and (top is None or m.score > top.score):
+                    top = m
+            out.append(top)
+        return out
+
+
+_index = None
+_built_at = 0.0
+_built_version = None
+_lock = threading.Lock()
+
+
+def _load() -> DiseaseIndex:
+    from sap_integration.models import DiseaseIdentification
+    rows = DiseaseIdentification.objects.values_list(
+        'id', 'is_active', 'disease_name', 'item_name', 'scientific_name', 'synonyms',
+    )
+    return DiseaseIndex(
+        (pk, active, [disease_name, item_name, scientific, *(synonyms or '').replace('\n', ',').split(',')])
+        for pk, active, disease_name, item_name, scientific, synonyms in rows
+    )
+
+
+def get_index() -> DiseaseIndex:
+    """The process-wide index, built or rebuilt as needed."""
+    global _index, _built_at, _built_version
+    ttl = getattr(settings, 'KINDWISE_DISEASE_INDEX_TTL', 300)
+    version = cache.get(VERSION_KEY)
+    index = _index
+    if index is not None and version == _built_version and (not ttl or time.monotonic() - _built_at < ttl):
+        return index
+    with _lock:
+        if _index is None or version != _built_version or (ttl and time.monotonic() - _built_at >= ttl):
+            _index = _load()
+            _built_at = time.monotonic()
+            _built_version = version
+        return _index
+
+
+def invalidate() -> None:
+    """Drop this process's index and tell other processes to rebuild theirs."""
+    global _index
+    with _lock:
+        _index = None
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
@@ -7,12 +7,76 @@ and provides recommended products with images from HANA catalog.
 import logging
 import os
 from typing import Dict, List, Optional
-from django.db.models import Q
+from django.db.models import Prefetch
 from django.conf import settings
+from django.core.cache import cache
 from pathlib import Path
 
+from . import disease_index
+
 logger = logging.getLogger(__name__)
 
+RECOMMENDATIONS_VERSION_KEY = 'kindwise:recommendations:version'
+
+_hana_env_loaded = False
+
+
+def _load_hana_env() -> None:
+    global _hana_env_loaded
+    if _hana_env_loaded:
+        return
+    from sap_integration.hana_connect import _load_env_file as _hana_load_env_file
+    try:
+        _hana_load_env_file(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'sap_integration', '.env'))
+        _hana_load_env_file(os.path.join(str(settings.BASE_DIR), '.env'))
+        _hana_load_env_file(os.path.join(str(Path(settings.BASE_DIR).parent), '.env'))
+    except Exception:
+        pass
+    _hana_env_loaded = True
+
+
+def _hana_schema(database: str = None) -> str:
+    """Company schema used for catalog lookups (HANA_SCHEMA when not given)."""
+    if database:
+        return database
+    _load_hana_env()
+    return os.environ.get('HANA_SCHEMA', '4B-BIO_APP')
+
+
+def fetch_product_catalog(product_codes, database: str = None) -> Dict:
+    """
+    Catalog rows (names, price, image URLs) for ``product_codes``, keyed by
+    ItemCode. One connection and one ``ItemCode IN (...)`` query however many
+    codes are asked for. Raises on connection or query errors.
+    """
+    codes = sorted({c for c in product_codes if c})
+    if not codes:
+        return {}
+    from sap_integration.hana_connect import products_catalog
+    from hdbcli import dbapi
+
+    database = _hana_schema(database)
+    _load_hana_env()
+    kwargs = {
+        'address': os.environ.get('HANA_HOST', ''),
+        'port': int(os.environ.get('HANA_PORT', '')),
+        'user': os.environ.get('HANA_USER', ''),
+        'password': os.environ.get('HANA_PASSWORD', ''),
+    }
+    if str(os.environ.get('HANA_ENCRYPT', '')).strip().lower() in ('true', '1', 'yes'):
+        kwargs['encrypt'] = True
+        kwargs['sslValidateCertificate'] = False  # Skip SSL validation
+
+    conn = dbapi.connect(**kwargs)
+    try:
+        cur = conn.cursor()
+        cur.execute(f'SET SCHEMA "{database}"')
+        cur.close()
+        catalog_result = products_catalog(conn, database, item_codes=codes)
+        return {item['ItemCode']: item for item in catalog_result.get('products', []) if item.get('ItemCode')}
+    finally:
+        conn.close()
+
 
 def get_product_catalog_data(product_codes: List[str], database: str = None) -> Dict:
     """
@@ -25,79 +89,94 @@ def get_product_catalog_data(product_codes: List[str], database: str = None) ->
     Returns:
         Dictionary mapping ItemCode to product data with images
     """
-    if not product_codes:
-        return {}
-    
     try:
-        from sap_integration.hana_connect import (
-            _load_env_file as _hana_load_env_file,
-            products_catalog
-        )
-        from hdbcli import dbapi
-        
-        # Load environment variables
-        try:
-            _hana_load_env_file(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'sap_integration', '.env'))
-            _hana_load_env_file(os.path.join(str(settings.BASE_DIR), '.env'))
-            _hana_load_env_file(os.path.join(str(Path(settings.BASE_DIR).parent), '.env'))
-        except Exception:
-            pass
-        
-        # Get database schema
-        if not database:
-            database = os.environ.get('HANA_SCHEMA', '4B-BIO_APP')
-        
-        cfg = {
-            'host': os.environ.get('HANA_HOST', ''),
-            'port': os.environ.get('HANA_PORT', ''),
-            'user': os.environ.get('HANA_USER', ''),
-            'encrypt': os.environ.get('HANA_ENCRYPT', ''),
-            'schema': database
-        }
-        
-        pwd = os.environ.get('HANA_PASSWORD', '')
-        kwargs = {
-            'address': cfg['host'],
-            'port': int(cfg['port']),
-            'user': cfg['user'],
-            'password': pwd
-        }
-        
-        if str(cfg['encrypt']).strip().lower() in ('true', '1', 'yes'):
-            kwargs['encrypt'] = True
-            kwargs['sslValidateCertificate'] = False  # Skip SSL validation
-        
-        conn = dbapi.connect(**kwargs)
-        
-        try:
-            # Set schema
-            if cfg['schema']:
-                cur = conn.cursor()
-                cur.execute(f'SET SCHEMA "{cfg["schema"]}"')
-                cur.close()
-            
-            # Fetch all products (we'll filter later)
-            catalog_result = products_catalog(conn, cfg['schema'])
-            # Handle new dictionary format
-            catalog_data = catalog_result.get('products', []) if isinstance(catalog_result, dict) else catalog_result
-            
-            # Create lookup dictionary
-            product_catalog = {}
-            for item in catalog_data:
-                item_code = item.get('ItemCode')
-                if item_code and item_code in product_codes:
-                    product_catalog[item_code] = item
-            
-            return product_catalog
-            
-        finally:
-            conn.close()
-            
+        return fetch_product_catalog(product_codes, database)
     except Exception as e:
         logger.error(f"Error fetching product catalog: {str(e)}")
         return {}
 
 
+def invalidate_recommendations() -> None:
+    """Forget cached disease -> products payloads in every process and schema."""
+    try:
+        cache.incr(RECOMMENDATIONS_VERSION_KEY)
+    except ValueError:
+        cache.set(RECOMMENDATIONS_VERSION_KEY, 1, None)
+
+
+def _active_products_prefetch():
+    from sap_integration.models import RecommendedProduct
+    return Prefetch(
+        'recommended_products',
+        queryset=RecommendedProduct.objects.filter(is_active=True).order_by('priority', '-effectiveness_rating'),
+        to_attr='active_products',
+    )
+
+
+def get_recommendations_for_diseases(disease_ids: List[int], include_images: bool = True,
+                                     database: str = None) -> Dict[int, Dict]:
+    """
+    Recommendation payloads for several diseases, keyed by disease id.
+
+    Payloads are cached per company schema for KINDWISE_RECOMMENDATION_CACHE_TTL
+    seconds. For the diseases not in the cache, the diseases and their active
+    products are loaded in one query each, and the catalog data of all their
+    products in a single HANA query, so the cost does not grow with the
+    number of diseases. A failed catalog lookup is not cached.
+    """
+    from sap_integration.models import DiseaseIdentification
+    from sap_integration.serializers import RecommendedProductSerializer
+
+    ids = set(disease_ids)
+    if not ids:
+        return {}
+    schema = _hana_schema(database) if include_images else '-'
+    ttl = getattr(settings, 'KINDWISE_RECOMMENDATION_CACHE_TTL', 600)
+    out = {}
+    keys = {}
+    if ttl:
+        version = cache.get(RECOMMENDATIONS_VERSION_KEY, 0)
+        keys = {pk: f'kindwise:recommendations:{version}:{schema}:{pk}' for pk in ids}
+        cached = cache.get_many(keys.values())
+        out = {pk: cached[key] for pk, key in keys.items() if key in cached}
+        if len(out) == len(ids):
+            return out
+
+    diseases = list(
+        DiseaseIdentification.objects.filter(pk__in=ids - out.keys()).prefetch_related(_active_products_prefetch())
+    )
+    product_catalog = {}
+    cacheable = True
+    if include_images:
+        codes = {p.product_item_code for d in diseases for p in d.active_products if p.product_item_code}
+        try:
+            product_catalog = fetch_product_catalog(codes, schema)
+        except Exception as e:
+            logger.error(f"Error fetching product catalog: {str(e)}")
+            cacheable = False
+
+    fresh = {}
+    for disease in diseases:
+        products = disease.active_products
+        if not products:
+            logger.debug(f"Disease {disease.disease_name} found but has no recommended products")
+        fresh[disease.id] = {
+            'disease_id': disease.id,
+            'disease_item_code': disease.item_code,
+            'disease_name': disease.disease_name,
+            'description': disease.description,
+            'recommended_products': RecommendedProductSerializer(
+                products,
+                many=True,
+                context={'product_catalog': product_catalog}
+            ).data,
+        }
+    if keys and cacheable:
+        cache.set_many({keys[pk]: payload for pk, payload in fresh.items()}, ttl)
+    out.update(fresh)
+    return out
+
+
 def get_disease_recommendations(disease_name: str, threshold: float = 0.5, include_images: bool = True) -> Optional[Dict]:
     """
     Match a disease name from Kindwise with local disease database
@@ -105,85 +184,54 @@ def get_disease_recommendations(disease_name: str, threshold: float = 0.5, inclu
     
     Args:
         disease_name: Disease name from Kindwise API
-        threshold: Minimum similarity threshold (not used in basic matching)
+        threshold: Minimum match score (0-1, see kindwise.disease_index)
         include_images: Whether to fetch product images from HANA catalog
     
     Returns:
         Dictionary with disease info and recommended products, or None if no match
     """
     try:
-        from sap_integration.models import DiseaseIdentification
-        from sap_integration.serializers import RecommendedProductSerializer
-        
-        # Try exact match first
-        disease = None
-        try:
-            disease = DiseaseIdentification.objects.get(
-                Q(disease_name__iexact=disease_name) |
-                Q(item_name__iexact=disease_name),
-                is_active=True
-            )
-        except DiseaseIdentification.DoesNotExist:
-            # Try partial match
-            disease = DiseaseIdentification.objects.filter(
-                Q(disease_name__icontains=disease_name) |
-                Q(item_name__icontains=disease_name) |
-                Q(description__icontains=disease_name),
-                is_active=True
-            ).first()
-        except DiseaseIdentification.MultipleObjectsReturned:
-            # If multiple matches, get the first one
-            disease = DiseaseIdentification.objects.filter(
-                Q(disease_name__iexact=disease_name) |
-                Q(item_name__iexact=disease_name),
-                is_active=True
-            ).first()
-        
-        if not disease:
+        matches = disease_index.get_index().match(disease_name, threshold=threshold, limit=1)
+        if not matches:
             logger.debug(f"No disease match found for: {disease_name}")
             return None
-        
-        # Get active recommended products
-        recommended_products = disease.recommended_products.filter(is_active=True).order_by('priority', '-effectiveness_rating')
-        
-        if not recommended_products.exists():
-            logger.debug(f"Disease {disease_name} found but has no recommended products")
-            return {
-                'disease_id': disease.id,
-                'disease_item_code': disease.item_code,
-                'disease_name': disease.disease_name,
-                'description': disease.description,
-                'recommended_products': []
-            }
-        
-        # Fetch product catalog data if requested
-        product_catalog = {}
-        if include_images:
-            product_codes = [p.product_item_code for p in recommended_products if p.product_item_code]
-            product_catalog = get_product_catalog_data(product_codes)
-        
-        # Serialize products with product catalog context
-        serializer = RecommendedProductSerializer(
-            recommended_products, 
-            many=True,
-            context={'product_catalog': product_catalog}
-        )
-        
-        return {
-            'disease_id': disease.id,
-            'disease_item_code': disease.item_code,
-            'disease_name': disease.disease_name,
-            'description': disease.description,
-            'recommended_products': serializer.data
-        }
+        match = matches[0]
+        payload = get_recommendations_for_diseases([match.disease_id], include_images).get(match.disease_id)
+        if payload is not None:
+            payload['match_score'] = round(match.score, 3)
+        return payload
         
     except Exception as e:
         logger.error(f"Error matching disease {disease_name}: {str(e)}")
-        import traceback
-        traceback.print_exc()
         return None
 
 
+def _suggestion_names(suggestion: Dict) -> list:
+    """Names a Kindwise disease suggestion can be matched by."""
+    details = suggestion.get('details') or {}
+    names = [suggestion.get('name'), suggestion.get('scientific_name')]
+    names.extend(details.get('common_names') or [])
+    return [n for n in names if n]
+
+
+def match_suggestions(suggestions: List[Dict], threshold: float = 0.5, include_images: bool = True) -> list:
+    """
+    Recommendation payload (or None) for each suggestion, matched against the
+    disease index in one pass; each disease's products are fetched once.
+    """
+    matches = disease_index.get_index().match_many(
+        [_suggestion_names(s) for s in suggestions], threshold=threshold,
+    )
+    payloads = get_recommendations_for_diseases([m.disease_id for m in matches if m], include_images)
+    out = []
+    for m in matches:
+        payload = payloads.get(m.disease_id) if m else None
+        if payload is not None:
+            payload = {**payload, 'match_score': round(m.score, 3)}
+        out.append(payload)
+    return out
+
+
 def enrich_kindwise_response(kindwise_result: Dict, include_recommendations: bool = True) -> Dict:
     """
     Enrich Kindwise API response with local disease recommendations.
@@ -208,22 +256,19 @@ def enrich_kindwise_response(kindwise_result: Dict, include_recommendations: boo
             logger.debug("No disease suggestions in Kindwise result")
             return kindwise_result
         
-        # Match each disease and add recommendations
+        # Only add recommendations for high-confidence matches (30% confidence threshold)
+        confident = [s for s in disease_suggestions if s.get('probability', 0) >= 0.3]
+        recommendations = iter(match_suggestions(confident))
+        
         enriched_suggestions = []
         for suggestion in disease_suggestions:
-            disease_name = suggestion.get('name', '')
-            probability = suggestion.get('probability', 0)
-            
             # Create enriched suggestion with original data
             enriched = {**suggestion}  # Copy all original fields
-            
-            # Only add recommendations for high-confidence matches
-            if probability >= 0.3:  # 30% confidence threshold
-                recommendations = get_disease_recommendations(disease_name)
-                if recommendations:
-                    enriched['local_disease_match'] = recommendations
-                    logger.info(f"Matched disease {disease_name} with {len(recommendations.get('recommended_products', []))} products")
-            
+            if suggestion.get('probability', 0) >= 0.3:
+                recommendation = next(recommendations)
+                if recommendation:
+                    enriched['local_disease_match'] = recommendation
+                    logger.info(f"Matched disease {suggestion.get('name', '')} with {len(recommendation.get('recommended_products', []))} products")
             enriched_suggestions.append(enriched)
         
         # Update the result with enriched suggestions
@@ -264,15 +309,11 @@ def get_recommendations_for_kindwise_record(record_id: int) -> List[Dict]:
         disease_suggestions = disease_data.get('suggestions', [])
         
         recommendations = []
-        for suggestion in disease_suggestions:
-            disease_name = suggestion.get('name', '')
-            probability = suggestion.get('probability', 0)
-            
-            disease_recs = get_disease_recommendations(disease_name)
+        for suggestion, disease_recs in zip(disease_suggestions, match_suggestions(disease_suggestions)):
             if disease_recs:
                 recommendations.append({
-                    'disease_name': disease_name,
-                    'kindwise_probability': probability,
+                    'disease_name': suggestion.get('name', ''),
+                    'kindwise_probability': suggestion.get('probability', 0),
                     **disease_recs
                 })
         
@@ -0,0 +1,152 @@
+"""
+Identification cache for Kindwise uploads.
+
+Each identification stores the SHA-256 of the uploaded bytes and a 64-bit
+perceptual hash (pHash) of the normalized image. Before calling the Kindwise
+API, ``lookup`` looks for an earlier successful identification of the same
+photo: first by exact SHA-256, then by pHash within
+KINDWISE_CACHE_MAX_DISTANCE bits (Hamming distance), so re-sent, re-encoded
+or slightly resized copies of a photo reuse the stored response.
+
+pHash: the image is EXIF-rotated, converted to grayscale and scaled to 32x32;
+the top-left 8x8 block of its 2-D DCT is compared against its median, one bit
+per coefficient.
+"""
+import hashlib
+import io
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import KindwiseIdentification
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+_SAMPLE_SIZE = HASH_SIZE * 4
+
+# DCT-II basis for the low frequencies only: _COS[k][n] = cos(pi * (2n + 1) * k / 2N)
+_COS = [
+    [math.cos(math.pi * (2 * n + 1) * k / (2 * _SAMPLE_SIZE)) for n in range(_SAMPLE_SIZE)]
+    for k in range(HASH_SIZE)
+]
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def enabled() -> bool:
+    return bool(_setting('KINDWISE_CACHE_ENABLED', True))
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def phash(data: bytes) -> str | None:
+    """Perceptual hash of an encoded image as 16 hex digits, or None if it cannot be decoded."""
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(data)) as img:
+            # Let the JPEG decoder downscale while decoding; we only need 32x32
+            img.draft('L', (_SAMPLE_SIZE * 2, _SAMPLE_SIZE * 2))
+            img = ImageOps.exif_transpose(img)
+            img = img.convert('L').resize((_SAMPLE_SIZE, _SAMPLE_SIZE), Image.Resampling.LANCZOS)
+            pixels = list(img.getdata())
+    except Exception as e:
+        logger.info(f"Could not compute image hash: {e}")
+        return None
+
+    rows = [pixels[i:i + _SAMPLE_SIZE] for i in range(0, len(pixels), _SAMPLE_SIZE)]
+    # Separable DCT: low frequencies of every row, then of every column of those
+    row_dct = [[sum(c * p for c, p in zip(basis, row)) for basis in _COS] for row in rows]
+    coeffs = []
+    for v in range(HASH_SIZE):
+        basis = _COS[v]
+        for u in range(HASH_SIZE):
+            coeffs.append(sum(basis[n] * row_dct[n][u] for n in range(_SAMPLE_SIZE)))
+    median = sorted(coeffs)[len(coeffs) // 2]
+    bits = 0
+    for c in coeffs:
+        bits = (bits << 1) | (1 if c > median else 0)
+    return f'{bits:016x}'
+
+
+def fingerprint(data: bytes) -> tuple:
+    """``(sha256, phash)`` of an uploaded image; phash is None for undecodable data."""
+    return sha256(data), phash(data)
+
+
+def hamming(a: str, b: str) -> int:
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+def _candidates():
+    """Successful, first-hand identifications young enough to be reused."""
+    qs = KindwiseIdentification.objects.filter(status='success', cache_source='')
+    max_age = _setting('KINDWISE_CACHE_MAX_AGE_DAYS', 30)
+    if max_age:
+        qs = qs.filter(created_at__gte=timezone.now() - timedelta(days=int(max_age)))
+    return qs
+
+
+def lookup(image_sha256: str, image_phash: str | None, max_distance: int | None = None) -> tuple:
+    """
+    Find a stored identification for this image.
+
+    Returns ``(record, source, distance)`` with source 'sha256' or 'phash',
+    or ``(None, None, None)`` on a miss.
+    """
+    candidates = _candidates()
+    record = candidates.filter(image_sha256=image_sha256).order_by('-id').first()
+    if record is not None:
+        return record, 'sha256', 0
+    if not image_phash:
+        return None, None, None
+
+    if max_distance is None:
+        max_distance = int(_setting('KINDWISE_CACHE_MAX_DISTANCE', 4))
+    if max_distance <= 0:
+        record = candidates.filter(image_phash=image_phash).order_by('-id').first()
+        return (record, 'phash', 0) if record is not None else (None, None, None)
+
+    # Hamming distance cannot be indexed portably; scan the most recent hashes
+    limit = int(_setting('KINDWISE_CACHE_SCAN_LIMIT', 5000))
+    target = int(image_phash, 16)
+    best_id, best = None, max_distance + 1
+    rows = candidates.exclude(image_phash__isnull=True).order_by('-id').values_list('id', 'image_phash')[:limit]
+    for pk, value in rows:
+        try:
+            d = (int(value, 16) ^ target).bit_count()
+        except (TypeError, ValueError):
+            continue
+        if d < best:
+            best_id, best = pk, d
+            if d == 0:
+                break
+    if best_id is None:
+        return None, None, None
+    return KindwiseIdentification.objects.get(pk=best_id), 'phash', best
+
+
+def stats(days: int | None = None) -> dict:
+    """Hit-rate figures for identifications (optionally only the last ``days`` days)."""
+    qs = KindwiseIdentification.objects.all()
+    if days:
+        qs = qs.filter(created_at__gte=timezone.now() - timedelta(days=int(days)))
+    counts = qs.aggregate(
+        total=Count('id'),
+        api_calls=Count('id', filter=Q(cache_source='')),
+        hits_sha256=Count('id', filter=Q(cache_source='sha256')),
+        hits_phash=Count('id', filter=Q(cache_source='phash')),
+    )
+    hits = counts['hits_sha256'] + counts['hits_phash']
+    counts['hits'] = hits
+    counts['hit_rate'] = round(hits / counts['total'], 4) if counts['total'] else 0.0
+    counts['days'] = days
+    return counts
@@ -0,0 +1,145 @@
+"""
+Background identification jobs.
+
+``POST /api/kindwise/jobs/`` stores the normalized photo on a KindwiseJob and
+returns the job id straight away; the Kindwise round trip (with timeout and
+retries), disease enrichment and the KindwiseIdentification record are done
+here. Clients poll ``/api/kindwise/jobs/<id>/`` or listen on
+``/api/kindwise/jobs/<id>/events/`` (server-sent events).
+
+Jobs run on a pool of KINDWISE_JOB_WORKERS threads in the web process, started
+once the job row is committed. With KINDWISE_JOB_WORKERS = 0 jobs are left for
+``python manage.py run_kindwise_worker``, which also picks up jobs stranded by
+a restarted web process. KINDWISE_JOB_EAGER runs jobs inline in the request
+(tests and local development).
+
+A job is claimed with a conditional UPDATE (queued -> running), so several
+workers can share the queue without running a job twice.
+"""
+import base64
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .disease_matcher import enrich_kindwise_response
+from .models import KindwiseIdentification, KindwiseJob
+from .services import identify_crop_with_retries
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(getattr(settings, 'KINDWISE_JOB_WORKERS', 2))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kindwise-job')
+        return _executor
+
+
+def enqueue(job: KindwiseJob) -> None:
+    """Schedule ``job`` once the surrounding transaction commits."""
+    job_id = job.pk
+    transaction.on_commit(lambda: dispatch(job_id))
+
+
+def dispatch(job_id) -> None:
+    if getattr(settings, 'KINDWISE_JOB_EAGER', False):
+        run_job(job_id)
+    elif int(getattr(settings, 'KINDWISE_JOB_WORKERS', 2)) > 0:
+        _pool().submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id) -> None:
+    close_old_connections()
+    try:
+        run_job(job_id)
+    except Exception:
+        logger.exception(f"Kindwise job {job_id} crashed")
+    finally:
+        close_old_connections()
+
+
+def claim(job_id) -> KindwiseJob | None:
+    """Move a queued job to running; None if another worker got it first."""
+    claimed = KindwiseJob.objects.filter(pk=job_id, status=KindwiseJob.STATUS_QUEUED).update(
+        status=KindwiseJob.STATUS_RUNNING, started_at=timezone.now(),
+    )
+    return KindwiseJob.objects.get(pk=job_id) if claimed else None
+
+
+def _finish(job: KindwiseJob, status: str, identification=None, error=None) -> None:
+    job.status = status
+    job.identification = identification
+    job.error = error
+    job.finished_at = timezone.now()
+    if job.image:
+        job.image.delete(save=False)
+    job.save(update_fields=['status', 'identification', 'error', 'finished_at', 'image', 'attempts'])
+
+
+def run_job(job_id) -> KindwiseJob | None:
+    """Run one queued job to completion. Returns the job, or None if it was not claimable."""
+    job = claim(job_id)
+    if job is None:
+        return None
+    try:
+        with job.image.open('rb') as f:
+            image_b64 = base64.b64encode(f.read()).decode('utf-8')
+        result, job.attempts = identify_crop_with_retries(image_b64)
+        status_str = 'error' if isinstance(result, dict) and result.get('error') else 'success'
+        if job.include_recommendations and status_str == 'success':
+            result = enrich_kindwise_response(result, include_recommendations=True)
+
+        record = KindwiseIdentification.objects.create(
+            user_id=job.user_id,
+            image_name=job.image_name,
+            request_payload={**job.request_payload, 'job_id': str(job.pk)},
+            response_payload=result,
+            status=status_str,
+            source_ip=job.source_ip,
+            user_agent=job.user_agent,
+            image_sha256=job.image_sha256,
+            image_phash=job.image_phash,
+        )
+        if status_str == 'success':
+            _finish(job, KindwiseJob.STATUS_SUCCEEDED, record)
+        else:
+            error = result.get('error') if isinstance(result, dict) else 'Kindwise API error'
+            _finish(job, KindwiseJob.STATUS_FAILED, record, str(error))
+    except Exception as e:
+        logger.exception(f"Kindwise job {job.pk} failed")
+        _finish(job, KindwiseJob.STATUS_FAILED, error=str(e))
+    return job
+
+
+def requeue_stale(older_than: timedelta) -> int:
+    """Put jobs that have been 'running' for longer than ``older_than`` back in the queue."""
+    return KindwiseJob.objects.filter(
+        status=KindwiseJob.STATUS_RUNNING, started_at__lt=timezone.now() - older_than,
+    ).update(status=KindwiseJob.STATUS_QUEUED, started_at=None)
+
+
+def job_status(job: KindwiseJob) -> dict:
+    """Public representation of a job; includes the result once it has finished."""
+    data = {
+        'job_id': str(job.pk),
+        'status': job.status,
+        'attempts': job.attempts,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'id': job.identification_id,
+    }
+    if job.status in KindwiseJob.FINISHED and job.identification_id:
+        data['result'] = job.identification.response_payload
+    return data
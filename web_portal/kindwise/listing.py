@@ -0,0 +1,100 @@
+"""
+Keyset (cursor) listing of Kindwise identification records.
+
+Records are read newest first on (created_at, id), which the
+``kindwise_ident_list_idx`` / ``kindwise_ident_user_list_idx`` indexes serve
+directly, so a page costs the same however deep the client has scrolled and
+no COUNT(*) is run. The cursor handed back to the client is the
+(created_at, id) of the last row on the page, base64-encoded.
+
+Rows are a summary projection; the stored Kindwise response is only included
+with ``expand=payload``, and ``/api/kindwise/records/<id>/`` serves the full
+record.
+"""
+import base64
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import KindwiseIdentification
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+SUMMARY_FIELDS = ('id', 'user_id', 'status', 'created_at', 'image_name', 'crop_name', 'cache_source')
+
+
+def encode_cursor(created_at, pk) -> str:
+    raw = json.dumps([created_at.isoformat(), pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """(created_at, id) from a cursor made by ``encode_cursor``; ValueError if it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if created_at is None:
+        raise ValueError('Invalid cursor')
+    return created_at, pk
+
+
+def _day_start(value: str, name: str):
+    try:
+        day = parse_date(value or '')
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def list_records(params) -> dict:
+    """
+    One page of identification records, newest first.
+
+    ``params`` is a query dict: ``cursor``, ``page_size`` (max 100),
+    ``user_id``, ``date_from`` / ``date_to`` (inclusive days), ``crop``
+    (case-insensitive crop name), ``status`` and ``expand=payload``.
+    Raises ValueError for malformed parameters.
+    """
+    try:
+        page_size = min(max(1, int(params.get('page_size') or DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except (ValueError, TypeError):
+        raise ValueError('page_size must be an integer')
+
+    qs = KindwiseIdentification.objects.all()
+    if params.get('user_id'):
+        try:
+            qs = qs.filter(user_id=int(params['user_id']))
+        except ValueError:
+            raise ValueError('Invalid user ID format. Must be a valid integer.')
+    if params.get('date_from'):
+        qs = qs.filter(created_at__gte=_day_start(params['date_from'], 'date_from'))
+    if params.get('date_to'):
+        qs = qs.filter(created_at__lt=_day_start(params['date_to'], 'date_to') + timedelta(days=1))
+    if params.get('crop'):
+        qs = qs.filter(crop_name__iexact=params['crop'])
+    if params.get('status'):
+        qs = qs.filter(status=params['status'])
+    if params.get('cursor'):
+        created_at, pk = decode_cursor(params['cursor'])
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    expand = {e.strip() for e in (params.get('expand') or '').split(',')}
+    fields = SUMMARY_FIELDS + (('response_payload',) if 'payload' in expand else ())
+    rows = list(qs.order_by('-created_at', '-id').values(*fields)[:page_size + 1])
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+    return {'page_size': page_size, 'next_cursor': next_cursor, 'results': rows}
@@ -0,0 +1,66 @@
+"""
+Management command to run queued Kindwise identification jobs.
+
+Usage:
+    python manage.py run_kindwise_worker                  # run until stopped
+    python manage.py run_kindwise_worker --once           # drain the queue and exit
+    python manage.py run_kindwise_worker --concurrency 4
+
+Use it with KINDWISE_JOB_WORKERS = 0 to keep upstream calls out of the web
+processes, or alongside the in-process pool to pick up jobs left behind by a
+restarted web process.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from kindwise import jobs
+from kindwise.models import KindwiseJob
+
+
+def _run(job_id):
+    close_old_connections()
+    try:
+        return jobs.run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Run queued Kindwise identification jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Jobs to run at once (default: KINDWISE_JOB_WORKERS, at least 1)')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between queue checks')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Re-queue jobs that have been running for more than N seconds')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or max(1, int(getattr(settings, 'KINDWISE_JOB_WORKERS', 2)))
+        stale_after = timedelta(seconds=options['stale_after'])
+        self.stdout.write(f"Kindwise worker running {concurrency} job(s) at a time")
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='kindwise-worker') as pool:
+            while True:
+                requeued = jobs.requeue_stale(stale_after)
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"Re-queued {requeued} stale job(s)"))
+                ids = list(
+                    KindwiseJob.objects.filter(status=KindwiseJob.STATUS_QUEUED)
+                    .order_by('created_at').values_list('pk', flat=True)[:concurrency * 4]
+                )
+                for job in pool.map(_run, ids):
+                    if job is not None:
+                        style = self.style.SUCCESS if job.status == KindwiseJob.STATUS_SUCCEEDED else self.style.ERROR
+                        self.stdout.write(style(f"{job.pk}: {job.status} after {job.attempts} attempt(s)"))
+                if not ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                close_old_connections()
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kindwise', '0002_fix_table_names_lowercase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kindwiseidentification',
+            name='image_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='kindwiseidentification',
+            name='image_phash',
+            field=models.CharField(blank=True, db_index=True, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='kindwiseidentification',
+            name='cache_source',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='kindwiseidentification',
+            name='cached_from',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cache_hits', to='kindwise.kindwiseidentification'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:40
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kindwise', '0003_identification_cache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KindwiseJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('image', models.FileField(blank=True, null=True, upload_to='kindwise_jobs/')),
+                ('image_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('image_sha256', models.CharField(blank=True, max_length=64, null=True)),
+                ('image_phash', models.CharField(blank=True, max_length=16, null=True)),
+                ('request_payload', models.JSONField(default=dict)),
+                ('include_recommendations', models.BooleanField(default=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('source_ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('identification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='kindwise.kindwiseidentification')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='kindwise_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'kindwise_kindwisejob',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='kindwise_job_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_crop_name(apps, schema_editor):
+    from kindwise.models import top_crop_name
+
+    KindwiseIdentification = apps.get_model('kindwise', 'KindwiseIdentification')
+    batch = []
+    for record in KindwiseIdentification.objects.only('id', 'response_payload').iterator(chunk_size=500):
+        record.crop_name = top_crop_name(record.response_payload)
+        if record.crop_name:
+            batch.append(record)
+        if len(batch) >= 500:
+            KindwiseIdentification.objects.bulk_update(batch, ['crop_name'])
+            batch = []
+    if batch:
+        KindwiseIdentification.objects.bulk_update(batch, ['crop_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kindwise', '0004_kindwisejob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kindwiseidentification',
+            name='crop_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='kindwiseidentification',
+            index=models.Index(fields=['-created_at', '-id'], name='kindwise_ident_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kindwiseidentification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='kindwise_ident_user_list_idx'),
+        ),
+        migrations.RunPython(backfill_crop_name, migrations.RunPython.noop),
+    ]
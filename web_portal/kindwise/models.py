@@ -1,7 +1,18 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 
 
+def top_crop_name(response_payload) -> str:
+	"""Name of the most likely crop in a Kindwise response, '' when there is none."""
+	try:
+		suggestions = response_payload['result']['crop']['suggestions']
+		return str(suggestions[0].get('name') or '')[:255]
+	except (KeyError, IndexError, TypeError, AttributeError):
+		return ''
+
+
 class KindwiseIdentification(models.Model):
 	user = models.ForeignKey(
 		settings.AUTH_USER_MODEL,
@@ -17,10 +28,88 @@ class KindwiseIdentification(models.Model):
 	source_ip = models.GenericIPAddressField(null=True, blank=True)
 	user_agent = models.TextField(null=True, blank=True)
 	created_at = models.DateTimeField(auto_now_add=True)
+	# Identification cache (see kindwise.image_cache)
+	image_sha256 = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+	image_phash = models.CharField(max_length=16, null=True, blank=True, db_index=True)
+	cache_source = models.CharField(max_length=16, blank=True, default='')
+	cached_from = models.ForeignKey(
+		'self',
+		on_delete=models.SET_NULL,
+		null=True,
+		blank=True,
+		related_name='cache_hits'
+	)
+	# Top crop suggestion, copied out of response_payload for listing filters
+	crop_name = models.CharField(max_length=255, blank=True, default='')
 
 	class Meta:
 		db_table = 'kindwise_kindwiseidentification'
 		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['-created_at', '-id'], name='kindwise_ident_list_idx'),
+			models.Index(fields=['user', '-created_at', '-id'], name='kindwise_ident_user_list_idx'),
+		]
+
+	def save(self, *args, **kwargs):
+		if not self.crop_name:
+			self.crop_name = top_crop_name(self.response_payload)
+		super().save(*args, **kwargs)
 
 	def __str__(self):
 		return f"KindwiseIdentification #{self.id} ({self.status})"
+
+
+class KindwiseJob(models.Model):
+	"""An identification queued for the background worker (see kindwise.jobs)."""
+	STATUS_QUEUED = 'queued'
+	STATUS_RUNNING = 'running'
+	STATUS_SUCCEEDED = 'succeeded'
+	STATUS_FAILED = 'failed'
+	STATUS_CHOICES = [
+		(STATUS_QUEUED, 'Queued'),
+		(STATUS_RUNNING, 'Running'),
+		(STATUS_SUCCEEDED, 'Succeeded'),
+		(STATUS_FAILED, 'Failed'),
+	]
+	FINISHED = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+	id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+	user = models.ForeignKey(
+		settings.AUTH_USER_MODEL,
+		on_delete=models.SET_NULL,
+		null=True,
+		blank=True,
+		related_name='kindwise_jobs'
+	)
+	status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+	# Normalized upload; removed once the job has finished
+	image = models.FileField(upload_to='kindwise_jobs/', null=True, blank=True)
+	image_name = models.CharField(max_length=255, null=True, blank=True)
+	image_sha256 = models.CharField(max_length=64, null=True, blank=True)
+	image_phash = models.CharField(max_length=16, null=True, blank=True)
+	request_payload = models.JSONField(default=dict)
+	include_recommendations = models.BooleanField(default=True)
+	attempts = models.PositiveIntegerField(default=0)
+	error = models.TextField(null=True, blank=True)
+	identification = models.ForeignKey(
+		KindwiseIdentification,
+		on_delete=models.SET_NULL,
+		null=True,
+		blank=True,
+		related_name='jobs'
+	)
+	source_ip = models.GenericIPAddressField(null=True, blank=True)
+	user_agent = models.TextField(null=True, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		db_table = 'kindwise_kindwisejob'
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['status', 'created_at'], name='kindwise_job_status_idx'),
+		]
+
+	def __str__(self):
+		return f"KindwiseJob {self.id} ({self.status})"
@@ -1,7 +1,26 @@
+import hashlib
 import http.client
 import json
+import logging
+import time
+from urllib.parse import urlsplit
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting and upstream/gateway failures
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def _connection():
+    """HTTP(S) connection to KINDWISE_API_URL (plain http is allowed for local stubs)."""
+    url = urlsplit(getattr(settings, 'KINDWISE_API_URL', '') or 'https://crop.kindwise.com')
+    timeout = getattr(settings, 'KINDWISE_API_TIMEOUT', 30)
+    if url.scheme == 'http':
+        return http.client.HTTPConnection(url.hostname, url.port, timeout=timeout)
+    return http.client.HTTPSConnection(url.hostname, url.port, timeout=timeout)
+
+
 def identify_crop(image_base64: str) -> dict:
     """
     Identifies a crop from a base64 encoded image using the Kindwise API.
@@ -12,7 +31,10 @@ def identify_crop(image_base64: str) -> dict:
     Returns:
         dict: The API response containing identification results.
     """
-    conn = http.client.HTTPSConnection("crop.kindwise.com")
+    if getattr(settings, 'KINDWISE_FAKE_UPSTREAM', False):
+        return fake_identification(image_base64)
+
+    conn = _connection()
     
     payload = json.dumps({
         "images": [image_base64],
@@ -48,3 +70,57 @@ def identify_crop(image_base64: str) -> dict:
             }
     except Exception as e:
         return {"error": str(e)}
+    finally:
+        conn.close()
+
+
+
+def fake_identification(image_base64: str) -> dict:
+    """
+    Canned identification used when KINDWISE_FAKE_UPSTREAM is on (local
+    development and tests). Deterministic per image; waits
+    KINDWISE_FAKE_DELAY seconds to mimic the upstream round trip.
+    """
+    delay = getattr(settings, 'KINDWISE_FAKE_DELAY', 0)
+    if delay:
+        time.sleep(delay)
+    token = hashlib.sha1((image_base64 or '').encode('utf-8')).hexdigest()[:16]
+    return {
+        "access_token": f"fake-{token}",
+        "status": "COMPLETED",
+        "result": {
+            "is_plant": {"binary": True, "probability": 0.99},
+            "crop": {"suggestions": [{"name": "wheat", "scientific_name": "Triticum aestivum", "probability": 0.91}]},
+            "disease": {"suggestions": [{"name": "leaf rust", "scientific_name": "Puccinia triticina", "probability": 0.74}]},
+        },
+    }
+
+
+def is_retryable(result: dict) -> bool:
+    """True for transient failures: network errors/timeouts and 408/429/5xx responses."""
+    if not isinstance(result, dict) or not result.get("error"):
+        return False
+    status = result.get("status")
+    return status is None or status in RETRYABLE_STATUSES
+
+
+def identify_crop_with_retries(image_base64: str, retries: int | None = None, backoff: float | None = None) -> tuple:
+    """
+    ``identify_crop`` with up to ``retries`` extra attempts on transient
+    failures, sleeping ``backoff * 2 ** attempt`` seconds in between.
+    Returns ``(result, attempts)`` with the last result.
+    """
+    if retries is None:
+        retries = getattr(settings, 'KINDWISE_JOB_RETRIES', 2)
+    if backoff is None:
+        backoff = getattr(settings, 'KINDWISE_JOB_RETRY_BACKOFF', 2.0)
+    attempt = 0
+    while True:
+        result = identify_crop(image_base64)
+        attempt += 1
+        if attempt > retries or not is_retryable(result):
+            break
+        logger.warning(f"Kindwise attempt {attempt} failed ({result.get('status') or result.get('error')}); retrying")
+        if backoff:
+            time.sleep(backoff * 2 ** (attempt - 1))
+    return result, attempt
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from sap_integration.models import DiseaseIdentification, RecommendedProduct
+
+from . import disease_index, disease_matcher
+
+
+@receiver(post_save, sender=DiseaseIdentification)
+@receiver(post_delete, sender=DiseaseIdentification)
+def invalidate_disease_index(sender, **kwargs):
+    """Rebuild the disease name index after any disease change."""
+    disease_index.invalidate()
+    disease_matcher.invalidate_recommendations()
+
+
+@receiver(post_save, sender=RecommendedProduct)
+@receiver(post_delete, sender=RecommendedProduct)
+def invalidate_recommendations(sender, **kwargs):
+    """Drop cached disease -> products payloads after any recommendation change."""
+    disease_matcher.invalidate_recommendations()
@@ -1,3 +1,443 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from sap_integration.models import DiseaseIdentification, RecommendedProduct
+
+from . import disease_index, disease_matcher, image_cache
+from .models import KindwiseIdentification, KindwiseJob
+
+STUB_RESPONSE = {
+    'result': {
+        'crop': {'suggestions': [{'name': 'Tomato', 'probability': 0.93}]},
+        'disease': {'suggestions': []},
+    },
+}
+
+
+class KindwiseStub:
+    """Local stand-in for the Kindwise identification endpoint."""
+
+    def __init__(self, statuses=()):
+        self.requests = []
+        # Status codes to answer with, in order; 201 once they run out
+        self.statuses = list(statuses)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                stub.requests.append((self.path, json.loads(body)))
+                status = stub.statuses.pop(0) if stub.statuses else 201
+                data = json.dumps(STUB_RESPONSE if status == 201 else {'error': 'unavailable'}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def leaf_photo(size=(640, 480), quality=90, flip=False, orientation=None) -> bytes:
+    """A synthetic photo: diagonal gradient with a dark blob, as JPEG."""
+    w, h = size
+    img = Image.new('RGB', size)
+    px = img.load()
+    for y in range(h):
+        for x in range(w):
+            g = int(255 * (x + y) / (w + h))
+            if (x - w // 3) ** 2 + (y - h // 2) ** 2 < (h // 4) ** 2:
+                g //= 4
+            px[x, y] = (g // 2, g, g // 3)
+    if flip:
+        img = img.transpose(Image.Transpose.ROTATE_180)
+    out = io.BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        exif[0x010F] = 'PhoneMaker'
+        img.save(out, 'JPEG', quality=quality, exif=exif.tobytes())
+    else:
+        img.save(out, 'JPEG', quality=quality)
+    return out.getvalue()
+
+
+class ImageHashTests(TestCase):
+    def test_phash_tolerates_recompression_and_resizing(self):
+        original = image_cache.phash(leaf_photo())
+        resized = image_cache.phash(leaf_photo(size=(320, 240), quality=60))
+        different = image_cache.phash(leaf_photo(flip=True))
+        self.assertEqual(len(original), 16)
+        self.assertLessEqual(image_cache.hamming(original, resized), 4)
+        self.assertGreater(image_cache.hamming(original, different), 10)
+        self.assertIsNone(image_cache.phash(b'not an image'))
+
+
+@override_settings(KINDWISE_API_ENABLED=True, KINDWISE_CACHE_ENABLED=True, KINDWISE_CACHE_MAX_DISTANCE=4)
+class IdentificationCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('kindwise_identify') + '?include_recommendations=false'
+
+    def upload(self, data: bytes, name='leaf.jpg'):
+        resp = self.client.post(
+            self.url, {'image': SimpleUploadedFile(name, data, content_type='image/jpeg')},
+            format='multipart', HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_repeat_and_near_duplicate_uploads_skip_the_api(self):
+        photo = leaf_photo()
+        with KindwiseStub() as stub, override_settings(KINDWISE_API_URL=stub.url):
+            first = self.upload(photo)
+            again = self.upload(photo)
+            near = self.upload(leaf_photo(size=(320, 240), quality=60))
+            other = self.upload(leaf_photo(flip=True))
+
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual(stub.requests[0][0], '/api/v1/identification')
+        self.assertFalse(first['cache']['hit'])
+        self.assertEqual(again['cache'], {'hit': True, 'source': 'sha256', 'distance': 0, 'record_id': first['id']})
+        self.assertEqual(near['cache']['source'], 'phash')
+        self.assertEqual(near['cache']['record_id'], first['id'])
+        self.assertEqual(near['result'], STUB_RESPONSE)
+        self.assertFalse(other['cache']['hit'])
+
+        stats = image_cache.stats()
+        self.assertEqual((stats['total'], stats['api_calls'], stats['hits']), (4, 2, 2))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_cache_hit_adds_recommendations_when_asked(self):
+        photo = leaf_photo()
+        enriched = {**STUB_RESPONSE, 'enriched': True}
+        with KindwiseStub() as stub, override_settings(KINDWISE_API_URL=stub.url), \
+                mock.patch('kindwise.views.enrich_kindwise_response', return_value=enriched) as enrich:
+            plain = self.upload(photo)
+            self.url = reverse('kindwise_identify') + '?include_recommendations=true'
+            near = self.upload(leaf_photo(size=(320, 240), quality=60))
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(plain['result'], STUB_RESPONSE)
+        self.assertEqual(near['cache']['source'], 'phash')
+        self.assertEqual(near['result'], enriched)
+        enrich.assert_called_once_with(STUB_RESPONSE, include_recommendations=True)
+
+    def test_distance_zero_only_matches_identical_hashes(self):
+        near_photo = leaf_photo(size=(320, 240), quality=60)
+        near_hash = image_cache.phash(near_photo)
+        with KindwiseStub() as stub, override_settings(KINDWISE_API_URL=stub.url, KINDWISE_CACHE_MAX_DISTANCE=0):
+            first = self.upload(leaf_photo())
+            near = self.upload(near_photo)
+        same = near_hash == KindwiseIdentification.objects.get(pk=first['id']).image_phash
+        self.assertEqual(near['cache']['hit'], same)
+        self.assertEqual(len(stub.requests), 1 if same else 2)
+
+    @override_settings(KINDWISE_IMAGE_MAX_SIDE=800)
+    def test_upload_is_rotated_downscaled_and_stripped_before_sending(self):
+        photo = leaf_photo(size=(2400, 1800), quality=95, orientation=6)
+        with KindwiseStub() as stub, override_settings(KINDWISE_API_URL=stub.url):
+            data = self.upload(photo, name='IMG_0001.JPG')
+        sent = base64.b64decode(stub.requests[0][1]['images'][0])
+        with Image.open(io.BytesIO(sent)) as img:
+            # orientation 6 means "rotate 90 degrees clockwise to display": portrait
+            self.assertEqual(img.size, (600, 800))
+            self.assertFalse(img.getexif())
+        record = KindwiseIdentification.objects.get(pk=data['id'])
+        self.assertEqual(record.request_payload['image_bytes'], len(photo))
+        self.assertEqual(record.request_payload['upload_bytes'], len(sent))
+        self.assertLess(len(sent), len(photo))
+
+    def test_errors_are_not_cached(self):
+        photo = leaf_photo()
+        with override_settings(KINDWISE_API_URL='http://127.0.0.1:9', KINDWISE_API_TIMEOUT=2):
+            failed = self.upload(photo)
+        self.assertEqual(failed['status'], 'error')
+        with KindwiseStub() as stub, override_settings(KINDWISE_API_URL=stub.url):
+            ok = self.upload(photo)
+        self.assertEqual(len(stub.requests), 1)
+        self.assertFalse(ok['cache']['hit'])
+
+    def test_cache_stats_endpoint_requires_staff(self):
+        url = reverse('kindwise_cache_stats')
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+        staff = get_user_model().objects.create(
+            email='staff@example.com', username='staff', first_name='Staff', last_name='User', is_staff=True,
+        )
+        KindwiseIdentification.objects.create(request_payload={}, response_payload=STUB_RESPONSE)
+        KindwiseIdentification.objects.create(request_payload={}, response_payload=STUB_RESPONSE, cache_source='phash')
+        self.client.force_authenticate(staff)
+        data = self.client.get(url, {'days': 7}).json()
+        self.assertEqual(data['hits_phash'], 1)
+        self.assertEqual(data['hit_rate'], 0.5)
+        self.assertTrue(data['enabled'])
+
+
+@override_settings(KINDWISE_API_ENABLED=True, KINDWISE_JOB_EAGER=True, KINDWISE_JOB_RETRY_BACKOFF=0)
+class IdentificationJobTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.client = APIClient()
+        self.url = reverse('kindwise_create_job') + '?include_recommendations=false'
+
+    def submit(self, data: bytes):
+        with self.settings(MEDIA_ROOT=self.media), self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                self.url, {'image': SimpleUploadedFile('leaf.jpg', data, content_type='image/jpeg')},
+                format='multipart',
+            )
+        self.assertEqual(resp.status_code, 202)
+        return resp.json()
+
+    @override_settings(KINDWISE_FAKE_UPSTREAM=True)
+    def test_job_runs_against_fake_upstream(self):
+        created = self.submit(leaf_photo())
+        self.assertIn('/api/kindwise/jobs/', created['status_url'])
+
+        data = self.client.get(reverse('kindwise_job_detail', args=[created['job_id']])).json()
+        self.assertEqual(data['status'], 'succeeded')
+        self.assertEqual(data['attempts'], 1)
+        self.assertEqual(data['result']['result']['crop']['suggestions'][0]['name'], 'wheat')
+        job = KindwiseJob.objects.get(pk=created['job_id'])
+        self.assertFalse(job.image)
+        self.assertEqual(job.identification.request_payload['job_id'], created['job_id'])
+
+        # The same photo again is answered from the identification cache without a job run
+        again = self.submit(leaf_photo())
+        self.assertEqual(again['status'], 'succeeded')
+        self.assertEqual(KindwiseIdentification.objects.get(pk=again['id']).cached_from_id, data['id'])
+
+    def test_transient_upstream_errors_are_retried(self):
+        with KindwiseStub(statuses=[503]) as stub, override_settings(KINDWISE_API_URL=stub.url, KINDWISE_JOB_RETRIES=2):
+            created = self.submit(leaf_photo())
+        job = KindwiseJob.objects.get(pk=created['job_id'])
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual((job.status, job.attempts), ('succeeded', 2))
+
+    def test_job_fails_after_retries(self):
+        with KindwiseStub(statuses=[500, 502, 400]) as stub, override_settings(KINDWISE_API_URL=stub.url, KINDWISE_JOB_RETRIES=5):
+            created = self.submit(leaf_photo())
+        job = KindwiseJob.objects.get(pk=created['job_id'])
+        # 400 is not retried
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertEqual(job.identification.status, 'error')
+        self.assertTrue(job.error)
+
+    @override_settings(KINDWISE_FAKE_UPSTREAM=True)
+    def test_events_stream_ends_with_final_status(self):
+        created = self.submit(leaf_photo())
+        resp = self.client.get(reverse('kindwise_job_events', args=[created['job_id']]))
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        body = b''.join(resp.streaming_content).decode('utf-8')
+        self.assertEqual(body.count('event: status'), 1)
+        self.assertIn('"status": "succeeded"', body)
+
+
+class DiseaseIndexTests(TestCase):
+    def setUp(self):
+        disease_index.invalidate()
+        self.rust = DiseaseIdentification.objects.create(
+            doc_entry='1', item_code='FG00001', item_name='Rust', disease_name='Wheat leaf rust',
+            scientific_name='Puccinia triticina', synonyms='Brown rust, Orange rust',
+        )
+        self.pvy = DiseaseIdentification.objects.create(
+            doc_entry='2', item_code='FG00002', item_name='PVY', disease_name='Potato virus Y (PVY)',
+        )
+        self.mildew = DiseaseIdentification.objects.create(
+            doc_entry='3', item_code='FG00003', item_name='Mildew', disease_name='Downy mildew, Late blight',
+        )
+        self.inactive = DiseaseIdentification.objects.create(
+            doc_entry='4', item_code='FG00004', item_name='Smut', disease_name='Loose smut', is_active=False,
+        )
+        RecommendedProduct.objects.create(disease=self.rust, product_item_code='FG10001', product_name='Rust Guard')
+
+    def test_normalized_synonym_scientific_and_fuzzy_names(self):
+        index = disease_index.get_index()
+        self.assertEqual(index.match('WHEAT  leaf-rust')[0].score, 1.0)
+        self.assertEqual(index.match('rust leaf wheat')[0].score, 0.95)
+        self.assertEqual(index.match('puccinia triticina')[0].disease_id, self.rust.id)
+        self.assertEqual(index.match('brown rust')[0].disease_id, self.rust.id)
+        self.assertEqual(index.match('late blight')[0].disease_id, self.mildew.id)
+        self.assertEqual(index.match('pvy')[0].disease_id, self.pvy.id)
+        # misspelled
+        self.assertEqual(index.match('downy mildw')[0].disease_id, self.mildew.id)
+        self.assertEqual(index.match('loose smut'), [])
+        self.assertEqual(index.match('loose smut', active_only=False)[0].disease_id, self.inactive.id)
+        self.assertEqual(index.match('bacterial wilt'), [])
+
+    def test_index_is_rebuilt_after_disease_changes(self):
+        self.assertEqual(disease_index.get_index().match('stem canker'), [])
+        self.mildew.synonyms = 'Stem canker'
+        self.mildew.save()
+        self.assertEqual(disease_index.get_index().match('stem canker')[0].disease_id, self.mildew.id)
+        self.mildew.delete()
+        self.assertEqual(disease_index.get_index().match('stem canker'), [])
+
+    def test_enrich_matches_all_suggestions_in_one_pass(self):
+        result = {'result': {'disease': {'suggestions': [
+            {'name': 'leaf rust', 'scientific_name': 'Puccinia triticina', 'probability': 0.8},
+            {'name': 'brown rust', 'probability': 0.5},
+            {'name': 'potato virus y', 'probability': 0.4},
+            {'name': 'late blight', 'probability': 0.1},
+        ]}}}
+        disease_index.get_index()
+        # one query for the diseases, one for their products, whatever the suggestion count
+        with self.assertNumQueries(2):
+            enriched = disease_matcher.enrich_kindwise_response(result)
+        suggestions = enriched['result']['disease']['suggestions']
+        self.assertEqual(suggestions[0]['local_disease_match']['disease_id'], self.rust.id)
+        self.assertEqual(suggestions[0]['local_disease_match']['match_score'], 1.0)
+        self.assertEqual(suggestions[1]['local_disease_match']['disease_id'], self.rust.id)
+        self.assertEqual(suggestions[2]['local_disease_match']['disease_id'], self.pvy.id)
+        self.assertNotIn('local_disease_match', suggestions[3])
+
+    def test_disease_list_search_is_ranked(self):
+        resp = self.client.get(reverse('disease_list_api'), {'search': 'rust'})
+        data = resp.json()['data']
+        self.assertEqual([d['id'] for d in data], [self.rust.id])
+        resp = self.client.get(reverse('disease_list_api'), {'search': 'FG0000'})
+        self.assertEqual(resp.json()['count'], 4)
+
+
+def fake_catalog(codes, database=None):
+    return {c: {'ItemCode': c, 'U_BrandName': f'{c} brand', 'product_image_url': f'/media/{database}/{c}.jpg'}
+            for c in codes}
+
+
+@override_settings(KINDWISE_RECOMMENDATION_CACHE_TTL=600)
+class RecommendationResolverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rust = DiseaseIdentification.objects.create(
+            doc_entry='1', item_code='FG00001', item_name='Rust', disease_name='Wheat leaf rust',
+        )
+        self.blight = DiseaseIdentification.objects.create(
+            doc_entry='2', item_code='FG00002', item_name='Blight', disease_name='Late blight',
+        )
+        RecommendedProduct.objects.create(disease=self.rust, product_item_code='FG10001', product_name='Rust Guard')
+        RecommendedProduct.objects.create(disease=self.rust, product_item_code='FG10002', product_name='Cover')
+        RecommendedProduct.objects.create(disease=self.blight, product_item_code='FG10002', product_name='Cover')
+        RecommendedProduct.objects.create(disease=self.blight, product_item_code='FG10003', product_name='Old', is_active=False)
+
+    def resolve(self, database='4B-BIO_APP'):
+        return disease_matcher.get_recommendations_for_diseases([self.rust.id, self.blight.id], database=database)
+
+    def test_one_catalog_lookup_for_all_diseases(self):
+        with mock.patch.object(disease_matcher, 'fetch_product_catalog', side_effect=fake_catalog) as fetch:
+            payloads = self.resolve()
+        fetch.assert_called_once_with({'FG10001', 'FG10002'}, '4B-BIO_APP')
+        rust_products = payloads[self.rust.id]['recommended_products']
+        self.assertEqual([p['product_item_code'] for p in rust_products], ['FG10001', 'FG10002'])
+        self.assertEqual(rust_products[0]['product_image_url'], '/media/4B-BIO_APP/FG10001.jpg')
+        self.assertEqual(payloads[self.blight.id]['recommended_products'][0]['brand_name'], 'FG10002 brand')
+
+    def test_cached_per_schema_until_recommendations_change(self):
+        with mock.patch.object(disease_matcher, 'fetch_product_catalog', side_effect=fake_catalog) as fetch:
+            first = self.resolve()
+            with self.assertNumQueries(0):
+                self.assertEqual(self.resolve(), first)
+            self.assertEqual(fetch.call_count, 1)
+
+            other = self.resolve('4B-ORANG_APP')
+            self.assertEqual(fetch.call_count, 2)
+            self.assertEqual(other[self.rust.id]['recommended_products'][0]['product_image_url'],
+                             '/media/4B-ORANG_APP/FG10001.jpg')
+
+            RecommendedProduct.objects.filter(product_item_code='FG10001').get().delete()
+            payloads = self.resolve()
+            self.assertEqual(fetch.call_count, 3)
+            self.assertEqual(len(payloads[self.rust.id]['recommended_products']), 1)
+
+    def test_failed_catalog_lookup_is_not_cached(self):
+        with mock.patch.object(disease_matcher, 'fetch_product_catalog', side_effect=OSError('HANA down')):
+            payloads = self.resolve()
+        self.assertIsNone(payloads[self.rust.id]['recommended_products'][0]['product_image_url'])
+        with mock.patch.object(disease_matcher, 'fetch_product_catalog', side_effect=fake_catalog) as fetch:
+            self.resolve()
+        fetch.assert_called_once()
+
+
+class RecordListingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.alice = User.objects.create(email='alice@example.com', username='alice', first_name='Alice', last_name='A')
+        self.bob = User.objects.create(email='bob@example.com', username='bob', first_name='Bob', last_name='B')
+        wheat = {'result': {'crop': {'suggestions': [{'name': 'Wheat', 'probability': 0.9}]}}}
+        self.records = [
+            KindwiseIdentification.objects.create(
+                user=self.alice if i % 2 else self.bob, request_payload={},
+                response_payload=wheat if i in (0, 3, 5) else STUB_RESPONSE,  # newest (6) is tomato
+            )
+            for i in range(7)
+        ]
+        # Several records share a timestamp: the cursor must break ties on id
+        stamp = timezone.make_aware(datetime(2024, 3, 10, 12, 0))
+        KindwiseIdentification.objects.filter(pk__in=[r.pk for r in self.records[:4]]).update(created_at=stamp)
+        KindwiseIdentification.objects.filter(pk__in=[r.pk for r in self.records[4:]]).update(
+            created_at=stamp + timedelta(days=1))
+
+    def walk(self, **params):
+        ids, cursor = [], None
+        while True:
+            data = self.client.get(reverse('kindwise_record_list'), {**params, 'cursor': cursor or ''}).json()
+            ids += [r['id'] for r in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_cursor_walks_every_record_once_newest_first(self):
+        expected = [r.pk for r in sorted(self.records, key=lambda r: r.pk, reverse=True)]
+        self.assertEqual(self.walk(page_size=3), expected)
+        first = self.client.get(reverse('kindwise_record_list'), {'page_size': 2}).json()['results'][0]
+        self.assertEqual(first['crop_name'], 'Tomato')
+        self.assertNotIn('response_payload', first)
+
+    def test_filters_and_payload_expansion(self):
+        self.assertEqual(len(self.walk(user_id=self.alice.pk)), 3)
+        self.assertEqual(len(self.walk(crop='wheat')), 3)
+        self.assertEqual(len(self.walk(date_from='2024-03-11')), 3)
+        self.assertEqual(len(self.walk(date_to='2024-03-10', crop='tomato')), 2)
+        data = self.client.get(reverse('kindwise_record_list'), {'expand': 'payload', 'page_size': 1}).json()
+        self.assertEqual(data['results'][0]['response_payload'], STUB_RESPONSE)
+
+    def test_bad_cursor_and_dates_are_rejected(self):
+        url = reverse('kindwise_record_list')
+        self.assertEqual(self.client.get(url, {'cursor': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_from': '2024-13-45'}).status_code, 400)
+
+    @override_settings(KINDWISE_API_ENABLED=True)
+    def test_identify_get_lists_one_users_records(self):
+        data = self.client.get(reverse('kindwise_identify'), {'user_id': self.bob.pk, 'page_size': 10}).json()
+        self.assertEqual(len(data['results']), 4)
+        self.assertIsNone(data['next_cursor'])
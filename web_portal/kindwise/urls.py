@@ -3,6 +3,11 @@ from . import views
 
 urlpatterns = [
     path('identify/', views.identify_view, name='kindwise_identify'),
+    path('identifications/', views.record_list, name='kindwise_record_list'),
     path('records/', views.records_by_user, name='kindwise_records_by_user'),
     path('records/<int:record_id>/', views.record_detail, name='kindwise_record_detail'),
+    path('cache-stats/', views.cache_stats, name='kindwise_cache_stats'),
+    path('jobs/', views.create_job, name='kindwise_create_job'),
+    path('jobs/<uuid:job_id>/', views.job_detail, name='kindwise_job_detail'),
+    path('jobs/<uuid:job_id>/events/', views.job_events, name='kindwise_job_events'),
 ]
@@ -1,16 +1,51 @@
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
 from .services import identify_crop
-from .models import KindwiseIdentification
+from .models import KindwiseIdentification, KindwiseJob
+from . import image_cache, jobs, listing
+from web_portal import image_pipeline
 from .disease_matcher import enrich_kindwise_response
 import base64
 import json
+import time
 from drf_yasg.utils import swagger_auto_schema, no_body
 from drf_yasg import openapi
-from rest_framework.decorators import api_view, parser_classes
-from rest_framework.parsers import MultiPartParser
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser, JSONParser
+from rest_framework.permissions import IsAdminUser
+
+
+def _normalize_for_upload(image_data: bytes, image_name: str | None) -> bytes:
+    """Orient, downscale and recompress a photo; Kindwise does not need full-size images."""
+    normalized = image_pipeline.normalize(
+        image_data, image_name or 'upload.jpg',
+        max_side=getattr(settings, 'KINDWISE_IMAGE_MAX_SIDE', 1280),
+        quality=getattr(settings, 'KINDWISE_IMAGE_QUALITY', 85),
+    )
+    return normalized.data if normalized.changed else image_data
+
+
+LISTING_PARAMETERS = [
+    openapi.Parameter(name="cursor", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="`next_cursor` from the previous page", required=False),
+    openapi.Parameter(name="page_size", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description="Number of items per page (default: 20, max: 100)", required=False),
+    openapi.Parameter(name="date_from", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Only records created on or after this day (YYYY-MM-DD)", required=False),
+    openapi.Parameter(name="date_to", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Only records created on or before this day (YYYY-MM-DD)", required=False),
+    openapi.Parameter(name="crop", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Top crop suggestion, case-insensitive (e.g. Tomato)", required=False),
+    openapi.Parameter(name="status", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="success or error", required=False),
+    openapi.Parameter(name="expand", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="`payload` to include the stored Kindwise response", required=False),
+]
+
 
 @swagger_auto_schema(
     method='post',
@@ -52,7 +87,7 @@ from rest_framework.parsers import MultiPartParser
 )
 @swagger_auto_schema(
     method='get',
-    operation_description="List identification records for a user.",
+    operation_description="List identification records for a user, newest first (cursor-paginated, see /api/kindwise/identifications/).",
     manual_parameters=[
         openapi.Parameter(
             name="user_id",
@@ -61,7 +96,7 @@ from rest_framework.parsers import MultiPartParser
             description="User ID to filter records",
             required=True
         )
-    ],
+    ] + LISTING_PARAMETERS,
     responses={200: openapi.Response(description="List of records")}
 )
 @api_view(['GET', 'POST'])
@@ -88,12 +123,12 @@ def identify_view(request):
 
         image_b64 = None
         image_name = None
+        image_data = None
         # Multipart path
         if request.FILES.get('image'):
             image_file = request.FILES['image']
             image_name = getattr(image_file, 'name', None)
             image_data = image_file.read()
-            image_b64 = base64.b64encode(image_data).decode('utf-8')
         # JSON path
         elif request.content_type == 'application/json':
             try:
@@ -109,22 +144,48 @@ def identify_view(request):
                 image_b64 = image_b64.split('base64,', 1)[1]
             except Exception:
                 pass
+        if image_b64 and image_data is None:
+            try:
+                image_data = base64.b64decode(image_b64)
+            except Exception:
+                image_data = None
 
-        if not image_b64:
+        if not image_b64 and not image_data:
             return JsonResponse({'detail': 'Missing image data'}, status=400)
 
         try:
-            result = identify_crop(image_b64)
-            status_str = 'error' if isinstance(result, dict) and result.get('error') else 'success'
+            image_bytes = upload_bytes = None
+            if image_data:
+                image_bytes = len(image_data)
+                image_data = _normalize_for_upload(image_data, image_name)
+                upload_bytes = len(image_data)
+                image_b64 = base64.b64encode(image_data).decode('utf-8')
+
+            # Fingerprint the upload and reuse an earlier identification of the same photo
+            image_sha256 = image_phash = None
+            cached, cache_source, cache_distance = None, None, None
+            if image_cache.enabled() and image_data:
+                image_sha256, image_phash = image_cache.fingerprint(image_data)
+                cached, cache_source, cache_distance = image_cache.lookup(image_sha256, image_phash)
 
             # Build request payload snapshot (do not store raw image data)
             request_payload = {
                 'has_image': True,
                 'user_id': user_id,
+                'image_bytes': image_bytes,
+                'upload_bytes': upload_bytes,
             }
-            
-            # Enrich result with disease recommendations if requested
+
             include_recommendations = request.GET.get('include_recommendations', 'true').lower() in ['true', '1', 'yes']
+            if cached is not None:
+                # The stored payload may have been identified without recommendations
+                result = cached.response_payload
+                status_str = 'success'
+            else:
+                result = identify_crop(image_b64)
+                status_str = 'error' if isinstance(result, dict) and result.get('error') else 'success'
+
+            # Enrich result with disease recommendations if requested
             if include_recommendations and status_str == 'success':
                 result = enrich_kindwise_response(result, include_recommendations=True)
 
@@ -137,6 +198,10 @@ def identify_view(request):
                 status=status_str,
                 source_ip=request.META.get('REMOTE_ADDR'),
                 user_agent=request.META.get('HTTP_USER_AGENT'),
+                image_sha256=image_sha256,
+                image_phash=image_phash,
+                cache_source=cache_source or '',
+                cached_from=cached,
             )
 
             response_data = {
@@ -144,6 +209,12 @@ def identify_view(request):
                 'status': record.status,
                 'created_at': record.created_at,
                 'result': result,
+                'cache': {
+                    'hit': cached is not None,
+                    'source': cache_source,
+                    'distance': cache_distance,
+                    'record_id': cached.id if cached is not None else None,
+                },
             }
 
             # If client prefers JSON
@@ -160,10 +231,10 @@ def identify_view(request):
     if not user_id:
         return JsonResponse({'detail': 'user_id is required'}, status=400)
 
-    qs = KindwiseIdentification.objects.filter(user_id=user_id).values(
-        'id', 'status', 'created_at', 'image_name', 'response_payload'
-    )
-    return JsonResponse({'count': qs.count(), 'results': list(qs)}, safe=False)
+    try:
+        return JsonResponse(listing.list_records(request.GET))
+    except ValueError as e:
+        return JsonResponse({'detail': str(e)}, status=400)
 
 
 @swagger_auto_schema(
@@ -378,6 +449,59 @@ def records_by_user(request):
         )
 
 
+@swagger_auto_schema(
+    method='get',
+    operation_description="""
+    Kindwise identification records, newest first, with cursor pagination.
+
+    Rows are summaries (no stored Kindwise response) unless `expand=payload`
+    is given; `/api/kindwise/records/<id>/` returns the full record. Pass the
+    `next_cursor` of a page as `cursor` to get the next one; it is null on the
+    last page.
+    """,
+    manual_parameters=[
+        openapi.Parameter(
+            name="user_id",
+            in_=openapi.IN_QUERY,
+            type=openapi.TYPE_INTEGER,
+            description="User ID to filter records (optional)",
+            required=False
+        )
+    ] + LISTING_PARAMETERS,
+    responses={
+        200: openapi.Response(
+            description="One page of identification records",
+            examples={
+                "application/json": {
+                    "page_size": 20,
+                    "next_cursor": "WyIyMDI0LTAxLTE1VDEwOjMwOjAwKzAwOjAwIiwgMTBd",
+                    "results": [
+                        {
+                            "id": 10,
+                            "user_id": 5,
+                            "status": "success",
+                            "created_at": "2024-01-15T10:30:00Z",
+                            "image_name": "tomato.jpg",
+                            "crop_name": "Tomato",
+                            "cache_source": ""
+                        }
+                    ]
+                }
+            }
+        ),
+        400: "Invalid filter or cursor"
+    },
+    tags=["kindwise"]
+)
+@api_view(['GET'])
+def record_list(request):
+    """Cursor-paginated identification records"""
+    try:
+        return JsonResponse(listing.list_records(request.GET))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
 @swagger_auto_schema(
     method='get',
     operation_description="""
@@ -467,3 +591,219 @@ def record_detail(request, record_id):
             {'error': f'Error retrieving record: {str(e)}'},
             status=500
         )
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Identification cache hit rate (exact SHA-256 and perceptual-hash matches).",
+    manual_parameters=[
+        openapi.Parameter(
+            name="days",
+            in_=openapi.IN_QUERY,
+            type=openapi.TYPE_INTEGER,
+            description="Only count identifications from the last N days (default: all)",
+            required=False
+        )
+    ],
+    responses={
+        200: openapi.Response(
+            description="Cache statistics",
+            examples={
+                "application/json": {
+                    "total": 120,
+                    "api_calls": 84,
+                    "hits": 36,
+                    "hits_sha256": 21,
+                    "hits_phash": 15,
+                    "hit_rate": 0.3,
+                    "days": 30
+                }
+            }
+        )
+    },
+    tags=["kindwise"]
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """Hit-rate statistics for the Kindwise identification cache"""
+    try:
+        days = int(request.GET['days']) if request.GET.get('days') else None
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    data = image_cache.stats(days)
+    data['enabled'] = image_cache.enabled()
+    data['max_distance'] = getattr(settings, 'KINDWISE_CACHE_MAX_DISTANCE', 4)
+    # Process-wide upload normalization figures (all apps), since this worker started
+    data['image_normalization'] = image_pipeline.stats()
+    return JsonResponse(data)
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="""
+    Queue a crop identification and return immediately with a job id.
+
+    The photo is normalized and checked against the identification cache first;
+    on a cache hit the job is returned already succeeded. Otherwise a background
+    worker calls Kindwise (with timeout and retries), adds disease
+    recommendations and stores the identification. Poll `status_url` or listen
+    on `events_url` (server-sent events) for the result.
+    """,
+    consumes=['multipart/form-data', 'application/json'],
+    manual_parameters=[
+        openapi.Parameter(name="image", in_=openapi.IN_FORM, type=openapi.TYPE_FILE, description="Image file upload", required=True),
+        openapi.Parameter(name="include_recommendations", in_=openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, description="Add local disease recommendations (default: true)", required=False),
+    ],
+    request_body=no_body,
+    responses={
+        202: openapi.Response(
+            description="Job accepted",
+            examples={
+                "application/json": {
+                    "job_id": "5f0c6b8e-8d1f-4a51-9a57-0d2f8f0f5c1e",
+                    "status": "queued",
+                    "status_url": "http://localhost:8000/api/kindwise/jobs/5f0c6b8e-8d1f-4a51-9a57-0d2f8f0f5c1e/",
+                    "events_url": "http://localhost:8000/api/kindwise/jobs/5f0c6b8e-8d1f-4a51-9a57-0d2f8f0f5c1e/events/"
+                }
+            }
+        ),
+        400: "Bad Request"
+    },
+    tags=["kindwise"]
+)
+@api_view(['POST'])
+@parser_classes([MultiPartParser, JSONParser])
+@csrf_exempt
+def create_job(request):
+    """Queue an identification job"""
+    if not getattr(settings, 'KINDWISE_API_ENABLED', True):
+        return JsonResponse({'detail': 'Kindwise API is disabled'}, status=503)
+
+    user_id = request.data.get('user_id') or request.GET.get('user_id')
+    if not user_id and request.user and request.user.is_authenticated:
+        user_id = request.user.id
+
+    image_name = None
+    if request.FILES.get('image'):
+        image_file = request.FILES['image']
+        image_name = getattr(image_file, 'name', None)
+        image_data = image_file.read()
+    else:
+        image_b64 = request.data.get('image_base64') or request.data.get('image')
+        if not image_b64 or not isinstance(image_b64, str):
+            return JsonResponse({'detail': 'No image provided'}, status=400)
+        if 'base64,' in image_b64:
+            image_b64 = image_b64.split('base64,', 1)[1]
+        try:
+            image_data = base64.b64decode(image_b64, validate=True)
+        except Exception:
+            return JsonResponse({'detail': 'Invalid base64 image data'}, status=400)
+    if not image_data:
+        return JsonResponse({'detail': 'Missing image data'}, status=400)
+
+    image_bytes = len(image_data)
+    image_data = _normalize_for_upload(image_data, image_name)
+    include_recommendations = request.GET.get('include_recommendations', 'true').lower() in ['true', '1', 'yes']
+    request_payload = {
+        'has_image': True,
+        'user_id': user_id,
+        'image_bytes': image_bytes,
+        'upload_bytes': len(image_data),
+    }
+    job = KindwiseJob(
+        user_id=user_id,
+        image_name=image_name,
+        request_payload=request_payload,
+        include_recommendations=include_recommendations,
+        source_ip=request.META.get('REMOTE_ADDR'),
+        user_agent=request.META.get('HTTP_USER_AGENT'),
+    )
+
+    cached, cache_source = None, None
+    if image_cache.enabled():
+        job.image_sha256, job.image_phash = image_cache.fingerprint(image_data)
+        cached, cache_source, _ = image_cache.lookup(job.image_sha256, job.image_phash)
+
+    if cached is not None:
+        # Answer from the identification cache without queuing
+        result = cached.response_payload
+        if include_recommendations:
+            result = enrich_kindwise_response(result, include_recommendations=True)
+        record = KindwiseIdentification.objects.create(
+            user_id=user_id,
+            image_name=image_name,
+            request_payload=request_payload,
+            response_payload=result,
+            status='success',
+            source_ip=job.source_ip,
+            user_agent=job.user_agent,
+            image_sha256=job.image_sha256,
+            image_phash=job.image_phash,
+            cache_source=cache_source,
+            cached_from=cached,
+        )
+        job.status = KindwiseJob.STATUS_SUCCEEDED
+        job.identification = record
+        job.started_at = job.finished_at = record.created_at
+        job.save()
+    else:
+        job.image.save(f"{job.pk}.jpg", ContentFile(image_data), save=False)
+        job.save()
+        jobs.enqueue(job)
+
+    data = jobs.job_status(job)
+    data['status_url'] = request.build_absolute_uri(f"/api/kindwise/jobs/{job.pk}/")
+    data['events_url'] = request.build_absolute_uri(f"/api/kindwise/jobs/{job.pk}/events/")
+    return JsonResponse(data, status=202, encoder=DjangoJSONEncoder)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Status of an identification job; includes `result` once it has finished.",
+    responses={200: openapi.Response(description="Job status"), 404: "Job not found"},
+    tags=["kindwise"]
+)
+@api_view(['GET'])
+def job_detail(request, job_id):
+    """Poll an identification job"""
+    job = KindwiseJob.objects.select_related('identification').filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({'error': f'Job {job_id} not found'}, status=404)
+    return JsonResponse(jobs.job_status(job), encoder=DjangoJSONEncoder)
+
+
+def _job_event_stream(job_id):
+    interval = float(getattr(settings, 'KINDWISE_JOB_SSE_INTERVAL', 1.0))
+    deadline = time.monotonic() + float(getattr(settings, 'KINDWISE_JOB_SSE_TIMEOUT', 60))
+    last = None
+    while True:
+        job = KindwiseJob.objects.select_related('identification').filter(pk=job_id).first()
+        if job is None:
+            yield 'event: error\ndata: {"error": "Job not found"}\n\n'
+            return
+        if job.status != last:
+            last = job.status
+            yield 'event: status\ndata: ' + json.dumps(jobs.job_status(job), cls=DjangoJSONEncoder) + '\n\n'
+        if job.status in KindwiseJob.FINISHED:
+            return
+        if time.monotonic() >= deadline:
+            # Client reconnects (EventSource does this by itself) or falls back to polling
+            yield 'event: timeout\ndata: {}\n\n'
+            return
+        time.sleep(interval)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Server-sent events for an identification job: a `status` event on every status change, ending when the job finishes.",
+    responses={200: openapi.Response(description="text/event-stream")},
+    tags=["kindwise"]
+)
+@api_view(['GET'])
+def job_events(request, job_id):
+    """Stream job status changes as server-sent events"""
+    response = StreamingHttpResponse(_job_event_stream(job_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -289,7 +289,7 @@ class DiseaseIdentificationAdmin(admin.ModelAdmin):
     """Admin for Disease Identification"""
     list_display = ('item_code', 'disease_name', 'item_name', 'is_active', 'recommended_count', 'updated_at')
     list_filter = ('is_active', 'created_at', 'updated_at')
-    search_fields = ('item_code', 'disease_name', 'item_name', 'description')
+    search_fields = ('item_code', 'disease_name', 'item_name', 'scientific_name', 'synonyms', 'description')
     readonly_fields = ('created_at', 'updated_at')
     inlines = [RecommendedProductInline]
     actions = ['sync_diseases_from_sap']
@@ -300,7 +300,7 @@ class DiseaseIdentificationAdmin(admin.ModelAdmin):
             'fields': ('doc_entry', 'item_code', 'item_name')
         }),
         (_('Disease Details'), {
-            'fields': ('disease_name', 'description', 'is_active')
+            'fields': ('disease_name', 'scientific_name', 'synonyms', 'description', 'is_active')
         }),
         (_('Timestamps'), {
             'fields': ('created_at', 'updated_at'),
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class SapIntegrationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "sap_integration"
+
+    def ready(self):
+        from django.conf import settings
+
+        mirror_dir = getattr(settings, 'SAP_ANALYTICS_MIRROR_DIR', '')
+        if mirror_dir:
+            from . import hana_connect, hana_mirror
+            hana_connect.set_report_backend(hana_mirror.MirrorBackend(mirror_dir))
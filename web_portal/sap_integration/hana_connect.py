@@ -6,6 +6,13 @@ from decimal import Decimal
 from datetime import date, datetime, time
 import logging
 
+try:
+    from . import hana_mirror, hana_rows, hana_statements
+except ImportError:
+    import hana_mirror
+    import hana_rows
+    import hana_statements
+
 IS_CLI = not os.environ.get("REQUEST_METHOD")
 logger = logging.getLogger("hana")
 
@@ -56,53 +63,72 @@ def _get_b4_schema() -> str:
         v = os.environ.get('SAP_COMPANY_DB') or os.environ.get('HANA_B4_SCHEMA') or '4B-BIO_APP'
     return str(v)
 
-def _fetch_all(db, sql: str, params=()):
+def _fetch_all(db, sql: str, params=(), shape: str = 'dicts', convert: str | None = None):
+    """
+    Run ``sql`` and return every row. ``shape`` is 'dicts' (default), 'tuples'
+    or 'columns'; ``convert='json'`` turns Decimal into float and dates into
+    ISO strings while reading (see hana_rows).
+    """
     cur = db.cursor()
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    cols = [d[0] for d in cur.description] if cur.description else []
-    out = []
-    for r in rows:
-        if isinstance(r, dict):
-            out.append(dict(r))
-        else:
-            row = {}
-            for i, c in enumerate(cols):
-                v = None
-                try:
-                    v = r[i]
-                except Exception:
-                    try:
-                        v = getattr(r, c)
-                    except Exception:
-                        v = None
-                row[c] = v
-            out.append(row)
-    cur.close()
-    return out
+    try:
+        cur.execute(sql, params)
+        return hana_rows.fetch(cur, shape=shape, convert=convert)
+    finally:
+        cur.close()
 
-def _fetch_one(db, sql: str, params=()):
+def _iter_all(db, sql: str, params=(), convert: str | None = None, batch_size: int = hana_rows.DEFAULT_BATCH_SIZE):
+    """Stream rows of ``sql`` as dicts, fetching ``batch_size`` rows at a time."""
     cur = db.cursor()
-    cur.execute(sql, params)
-    row = cur.fetchone()
-    cols = [d[0] for d in cur.description] if cur.description else []
-    cur.close()
-    if row is None:
-        return None
-    if isinstance(row, dict):
-        return dict(row)
-    out = {}
-    for i, c in enumerate(cols):
-        v = None
-        try:
-            v = row[i]
-        except Exception:
-            try:
-                v = getattr(row, c)
-            except Exception:
-                v = None
-        out[c] = v
-    return out
+    try:
+        cur.execute(sql, params)
+        yield from hana_rows.RowReader(cur, convert=convert, batch_size=batch_size).iter_dicts()
+    finally:
+        cur.close()
+
+def _fetch_one(db, sql: str, params=(), convert: str | None = None):
+    cur = db.cursor()
+    try:
+        cur.execute(sql, params)
+        return hana_rows.fetch_first(cur, convert=convert)
+    finally:
+        cur.close()
+
+# Serves closed months of the sales/invoice reports locally (see hana_mirror);
+# installed by the sap_integration app when SAP_ANALYTICS_MIRROR_DIR is set.
+_report_backend = None
+
+def set_report_backend(backend) -> None:
+    global _report_backend
+    _report_backend = backend
+
+def _mirror_for(db, fact: str, schema: str | None = None):
+    """
+    ``(store, cutoff)`` when closed periods of ``fact`` can be read from the
+    local mirror: rows before ``cutoff`` come from ``store``, the rest from
+    HANA. ``(None, None)`` when there is no backend or it has no data.
+    Without a connection (``db`` None) the store is looked up by ``schema``.
+    """
+    backend = _report_backend
+    if backend is None:
+        return None, None
+    try:
+        store = backend.store_for(db) if db is not None else backend.synced_store(schema)
+        cutoff = backend.cutoff(store, fact) if store is not None else None
+    except Exception as e:
+        logger.warning(f"HANA mirror unavailable, using live data: {e}")
+        return None, None
+    if cutoff is None:
+        return None, None
+    return store, cutoff
+
+def _stmt_all(db, name: str, sql: str, params=(), shape: str = 'dicts', convert: str | None = None):
+    """Run ``sql`` as the named, parameterized statement ``name`` (see hana_statements)."""
+    hana_statements.register(name, sql)
+    return hana_statements.fetch_all(db, name, params, shape=shape, convert=convert)
+
+def _stmt_one(db, name: str, sql: str, params=(), convert: str | None = None):
+    hana_statements.register(name, sql)
+    return hana_statements.fetch_one(db, name, params, convert=convert)
 
 def select_oitm(db, schema: str) -> list:
     sch = schema.strip() if schema is not None else ''
@@ -1000,13 +1026,31 @@ def territory_summary(db, emp_id: int | None = None, territory_name: str | None
         next_str = next_start.strftime('%Y-%m-%d')
         where_clauses.append(" inv.\"DocDate\" >= TO_DATE(?, 'YYYY-MM-DD') AND inv.\"DocDate\" < TO_DATE(?, 'YYYY-MM-DD') ")
         params.extend([start_str, next_str])
+    store, cutoff = _mirror_for(db, 'invoice')
+    if cutoff is not None:
+        # Days before the cutoff are summed from the mirror, the rest live
+        where_clauses.append(" inv.\"DocDate\" >= TO_DATE(?, 'YYYY-MM-DD') ")
+        params.append(cutoff.isoformat())
     where_sql = ''
     if len(where_clauses) > 0:
         where_sql = ' AND ' + ' AND '.join(where_clauses)
     tail = ''
     sql = base + where_sql + tail
-    rows = _fetch_all(db, sql, tuple(params))
-    return rows
+    if cutoff is None:
+        return _fetch_all(db, sql, tuple(params))
+    if start_date and end_date:
+        lo, hi, hi_inclusive = start_date.strip(), end_date.strip(), True
+    elif year is not None and month is not None and 1 <= int(month) <= 12:
+        lo, hi, hi_inclusive = start_str, next_str, False
+    else:
+        lo, hi, hi_inclusive = None, None, True
+    local = store.invoice_summary(lo, hi, end_inclusive=hi_inclusive)
+    hi_day = hana_mirror.to_day(hi)
+    if hi_day is not None and (hi_day < cutoff.isoformat() or (not hi_inclusive and hi_day == cutoff.isoformat())):
+        rows = []
+    else:
+        rows = _fetch_all(db, sql, tuple(params))
+    return hana_mirror.merge_summary_rows(local, rows)
 
 def territory_names(db) -> list:
     sql = (
@@ -1014,7 +1058,7 @@ def territory_names(db) -> list:
         ' from "OTER" O '
         ' order by O."descript"'
     )
-    rows = _fetch_all(db, sql)
+    rows = _stmt_all(db, 'territory_names', sql)
     for r in rows:
         for k in list(r.keys()):
             if k.upper() == 'TERRITORYNAME':
@@ -1148,7 +1192,7 @@ def get_item_groups(db) -> list:
     )
     return _fetch_all(db, sql, None)
 
-def products_catalog(db, schema_name: str = '', search: str | None = None, item_group: str | None = None, item_groups: list | None = None, brand: str | None = None, limit: int | None = None, offset: int = 0, fetch_prices: bool = True, only_priced: bool = False, is_active: str | None = 'Y') -> dict:
+def products_catalog(db, schema_name: str = '', search: str | None = None, item_group: str | None = None, item_groups: list | None = None, brand: str | None = None, limit: int | None = None, offset: int = 0, fetch_prices: bool = True, only_priced: bool = False, is_active: str | None = 'Y', item_codes: list | None = None) -> dict:
     """
     Fetch products catalog with image URLs based on database name.
     Images are stored in media/product_images/{DB_NAME}/{FileName}.{FileExt}
@@ -1165,6 +1209,7 @@ def products_catalog(db, schema_name: str = '', search: str | None = None, item_
         fetch_prices: Whether to fetch prices (default True)
         only_priced: If True, show only products with price > 0 (default False)
         is_active: Filter by active status ('Y', 'N', or None for all)
+        item_codes: Only these ItemCodes, fetched in one IN (...) query (no count query)
 
     Returns:
         dict with 'products' list, 'total_count', 'limit', 'offset'
@@ -1288,6 +1333,14 @@ def products_catalog(db, schema_name: str = '', search: str | None = None, item_
         params.append(item_group)
         count_params.append(item_group)
     
+    if item_codes:
+        codes_list = list(dict.fromkeys(c for c in item_codes if c))
+        filter_clause = f' AND T0."ItemCode" IN ({",".join("?" for _ in codes_list)})'
+        sql += filter_clause
+        count_sql += filter_clause
+        params.extend(codes_list)
+        count_params.extend(codes_list)
+
     # Full-text search across all name fields (ItemCode, ItemName, GenericName, BrandName)
     # Using UPPER() for case-insensitive search, COALESCE to handle NULLs
     if search:
@@ -1305,9 +1358,12 @@ def products_catalog(db, schema_name: str = '', search: str | None = None, item_
         params.extend([search_param, search_param, search_param, search_param])
         count_params.extend([search_param, search_param, search_param, search_param])
     
-    # Get total count
-    count_result = _fetch_all(db, count_sql, tuple(count_params) if count_params else None)
-    total_count = count_result[0].get('total', 0) if count_result else 0
+    # Get total count (a lookup by item codes is never paginated)
+    if item_codes:
+        total_count = None
+    else:
+        count_result = _fetch_all(db, count_sql, tuple(count_params) if count_params else None)
+        total_count = count_result[0].get('total', 0) if count_result else 0
     
     sql += (
         ' GROUP BY'
@@ -1425,6 +1481,8 @@ def products_catalog(db, schema_name: str = '', search: str | None = None, item_
         # Urdu description (matched by U_IMG_C = 'Product Description Urdu')
         row['product_description_urdu_url'] = _resolve_url('urdu', row.get('Product_Description_Urdu') or '', item_code, item_name)
 
+    if total_count is None:
+        total_count = len(results)
     return {'products': results, 'total_count': total_count, 'limit': limit, 'offset': offset}
 
 
@@ -1978,6 +2036,12 @@ def sales_vs_achievement(db, emp_id: int | None = None, territory_name: str | No
         params.extend([end_date.strip(), start_date.strip()])
         print(f"DEBUG: Added date filter: {start_date} to {end_date}")
 
+    store, cutoff = _mirror_for(db, 'sales_target')
+    if cutoff is not None:
+        # Targets that ended before the cutoff are read from the mirror
+        where_clauses.append(" c.\"T_REFDATE\" >= TO_TIMESTAMP(?, 'YYYY-MM-DD') ")
+        params.append(cutoff.isoformat())
+
     where_sql = ''
     if len(where_clauses) > 0:
         where_sql = ' where ' + ' AND '.join(where_clauses)
@@ -1988,6 +2052,9 @@ def sales_vs_achievement(db, emp_id: int | None = None, territory_name: str | No
     )
     sql = base + where_sql + tail
     rows = _fetch_all(db, sql, tuple(params))
+    if cutoff is not None and not (start_date and hana_mirror.to_day(start_date) >= cutoff.isoformat()):
+        local = store.sales_vs_achievement(emp_id, territory_name, start_date, end_date, by_emp=False)
+        rows = hana_mirror.merge_sales_rows(local, rows, ('TERRITORYID', 'TERRITORYNAME'))
     for r in rows:
         for k in list(r.keys()):
             if k.upper() == 'TERRITORYNAME':
@@ -2055,6 +2122,12 @@ def sales_vs_achievement_by_emp(db, emp_id: int | None = None, territory_name: s
         params.extend([end_date.strip(), start_date.strip()])
         print(f"DEBUG: Added date filter: {start_date} to {end_date}")
         
+    store, cutoff = _mirror_for(db, 'sales_target')
+    if cutoff is not None:
+        # Targets that ended before the cutoff are read from the mirror
+        where_clauses.append(" c.\"T_REFDATE\" >= TO_TIMESTAMP(?, 'YYYY-MM-DD') ")
+        params.append(cutoff.isoformat())
+
     where_sql = ''
     if len(where_clauses) > 0:
         where_sql = ' where ' + ' AND '.join(where_clauses)
@@ -2064,6 +2137,9 @@ def sales_vs_achievement_by_emp(db, emp_id: int | None = None, territory_name: s
     )
     sql = base + where_sql + tail
     rows = _fetch_all(db, sql, tuple(params))
+    if cutoff is not None and not (start_date and hana_mirror.to_day(start_date) >= cutoff.isoformat()):
+        local = store.sales_vs_achievement(emp_id, territory_name, start_date, end_date, by_emp=True)
+        rows = hana_mirror.merge_sales_rows(local, rows, ('EMPID', 'TERRITORYID', 'TERRITORYNAME'))
     for r in rows:
         for k in list(r.keys()):
             if k.upper() == 'TERRITORYNAME':
@@ -2452,7 +2528,7 @@ def territories_lov(db) -> list:
         'WHERE T0."CardType" = \'C\' '
         'ORDER BY O."descript" '
     )
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'territories_lov', sql)
 
 def customer_lov(db, search: str | None = None, limit: int = 1000, status: str | None = 'active', territory: str | None = None, territory_name: str | None = None, hana_territory_id: int | None = None) -> list:
     """Customer List of Values
@@ -2478,32 +2554,40 @@ def customer_lov(db, search: str | None = None, limit: int = 1000, status: str |
     )
     
     params = []
+    # Each filter combination is its own named statement
+    name = 'customer_lov'
     if status:
         status_val = str(status).strip().lower()
         if status_val in ('active', 'inactive'):
             sql += ' AND T0."validFor" = ? '
             params.append('Y' if status_val == 'active' else 'N')
+            name += ':status'
     # Filter by territory ID, name, or code (priority order: hana_territory_id > territory_name > territory)
     if hana_territory_id:
         # Filter by HANA territory ID (numeric)
         sql += ' AND T0."Territory" = ? '
         params.append(str(hana_territory_id))
+        name += ':territory'
     elif territory_name and str(territory_name).strip():
         # Filter by territory name (for Django-mapped territories)
         sql += ' AND O."descript" = ? '
         params.append(str(territory_name).strip())
+        name += ':territory_name'
     elif territory and str(territory).strip():
         # Filter by territory code (for direct HANA territory codes)
         sql += ' AND T0."Territory" = ? '
         params.append(str(territory).strip())
+        name += ':territory'
     if search and search.strip():
         sql += ' AND (T0."CardCode" LIKE ? OR T0."CardName" LIKE ?) '
         search_param = f'%{search.strip()}%'
         params.extend([search_param, search_param])
+        name += ':search'
     
-    sql += ' ORDER BY T0."CardCode" LIMIT ' + str(int(limit or 1000))
+    sql += ' ORDER BY T0."CardCode" LIMIT ?'
+    params.append(int(limit or 1000))
     
-    return _fetch_all(db, sql, tuple(params))
+    return _stmt_all(db, name, sql, tuple(params))
 
 def customer_codes_all(db, limit: int = 1000) -> list:
     sql = (
@@ -2514,9 +2598,9 @@ def customer_codes_all(db, limit: int = 1000) -> list:
         'WHERE T0."CardType" = \'C\' '
         'AND T0."validFor" = \'Y\' '
         'ORDER BY T0."CardCode" '
-        'LIMIT ' + str(int(limit or 1000))
+        'LIMIT ?'
     )
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'customer_codes_all', sql, (int(limit or 1000),))
 
 def parents_with_children(db, limit: int = 1000) -> list:
     sql = (
@@ -2530,9 +2614,9 @@ def parents_with_children(db, limit: int = 1000) -> list:
         'GROUP BY p."CardCode", p."CardName" '
         'HAVING COUNT(c."CardCode") > 0 '
         'ORDER BY COUNT(c."CardCode") DESC '
-        'LIMIT ' + str(int(limit or 1000))
+        'LIMIT ?'
     )
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'parents_with_children', sql, (int(limit or 1000),))
 
 def customer_addresses(db, card_code: str) -> list:
     """Get billing address for a customer"""
@@ -2547,7 +2631,7 @@ def customer_addresses(db, card_code: str) -> list:
         'INNER JOIN OCRY T2 ON T1."Country" = T2."Code" '
         'WHERE T1."CardCode" = ? '
     )
-    return _fetch_all(db, sql, (card_code,))
+    return _stmt_all(db, 'customer_addresses', sql, (card_code,))
 
 def customer_addresses_all(db, limit: int = 500) -> list:
     sql = (
@@ -2560,14 +2644,49 @@ def customer_addresses_all(db, limit: int = 500) -> list:
         'INNER JOIN OCRD T1 ON T0."CardCode" = T1."CardCode" AND T0."Address" = T1."BillToDef" '
         'INNER JOIN OCRY T2 ON T1."Country" = T2."Code" '
         'ORDER BY T1."CardCode" '
-        'LIMIT ' + str(int(limit or 500))
+        'LIMIT ?'
     )
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'customer_addresses_all', sql, (int(limit or 500),))
 
 def contact_person_name(db, card_code: str, contact_code: str) -> dict:
     """Get contact person name by CardCode and ContactCode"""
     sql = 'SELECT T0."Name" FROM OCPR T0 WHERE T0."CardCode" = ? AND T0."CntctCode" = ?'
-    return _fetch_one(db, sql, (card_code, contact_code))
+    return _stmt_one(db, 'contact_person_name', sql, (card_code, contact_code))
+
+def customer_address(db, card_code: str) -> dict:
+    """First address line (Address, Street) of a customer"""
+    sql = 'SELECT T0."Address", T0."Street" FROM CRD1 T0 WHERE T0."CardCode" = ?'
+    return _stmt_one(db, 'customer_address', sql, (card_code,))
+
+def customer_details(db, card_code: str) -> dict:
+    """Basic customer header fields used by the sales order form"""
+    sql = (
+        'SELECT '
+        ' T0."CardName", '
+        ' T0."CntctPrsn", '
+        ' T0."LicTradNum", '
+        ' T0."BillToDef", '
+        ' T0."Address" '
+        'FROM OCRD T0 '
+        'WHERE T0."CardCode" = ?'
+    )
+    return _stmt_one(db, 'customer_details', sql, (card_code,))
+
+def contact_code_by_name(db, card_code: str, name: str) -> dict:
+    sql = 'SELECT T0."CntctCode" FROM OCPR T0 WHERE T0."CardCode" = ? AND T0."Name" = ?'
+    return _stmt_one(db, 'contact_code_by_name', sql, (card_code, name))
+
+def customer_bill_to_address(db, card_code: str) -> dict:
+    """Formatted billing address (Street, Country) of a customer"""
+    sql = (
+        'SELECT '
+        " T0.\"Street\"||', '||T2.\"Name\" AS \"Address\" "
+        'FROM CRD1 T0 '
+        'INNER JOIN OCRD T1 ON T0."CardCode" = T1."CardCode" AND T0."Address" = T1."BillToDef" '
+        'INNER JOIN OCRY T2 ON T1."Country" = T2."Code" '
+        'WHERE T1."CardCode" = ?'
+    )
+    return _stmt_one(db, 'customer_bill_to_address', sql, (card_code,))
 
 def contacts_by_card(db, card_code: str, limit: int = 200) -> list:
     sql = (
@@ -2580,9 +2699,9 @@ def contacts_by_card(db, card_code: str, limit: int = 200) -> list:
         'INNER JOIN OCRD T1 ON T1."CardCode" = T0."CardCode" '
         'WHERE T0."CardCode" = ? '
         'ORDER BY T0."CntctCode" '
-        'LIMIT ' + str(int(limit or 200))
+        'LIMIT ?'
     )
-    return _fetch_all(db, sql, (card_code,))
+    return _stmt_all(db, 'contacts_by_card', sql, (card_code, int(limit or 200)))
 
 def contacts_all(db, limit: int = 200) -> list:
     sql = (
@@ -2594,9 +2713,9 @@ def contacts_all(db, limit: int = 200) -> list:
         'FROM OCPR T0 '
         'INNER JOIN OCRD T1 ON T1."CardCode" = T0."CardCode" '
         'ORDER BY T0."CardCode", T0."CntctCode" '
-        'LIMIT ' + str(int(limit or 200))
+        'LIMIT ?'
     )
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'contacts_all', sql, (int(limit or 200),))
 
 def item_lov(db, search: str | None = None) -> list:
     """Item List of Values"""
@@ -2613,14 +2732,16 @@ def item_lov(db, search: str | None = None) -> list:
     )
     
     params = []
+    name = 'item_lov'
     if search and search.strip():
         sql += ' AND (T0."ItemCode" LIKE ? OR T0."ItemName" LIKE ?) '
         search_param = f'%{search.strip()}%'
         params.extend([search_param, search_param])
+        name += ':search'
     
     sql += ' ORDER BY T0."ItemCode" LIMIT 100'
     
-    return _fetch_all(db, sql, tuple(params))
+    return _stmt_all(db, name, sql, tuple(params))
 
 def warehouse_for_item(db, item_code: str, search: str | None = None) -> list:
     """Get warehouses for an item with optional search"""
@@ -2633,11 +2754,13 @@ def warehouse_for_item(db, item_code: str, search: str | None = None) -> list:
         'WHERE T0."ItemCode" = ? '
     )
     params = [item_code]
+    name = 'warehouse_for_item'
     if search:
         sql += ' AND (T0."WhsCode" LIKE ? OR T1."WhsName" LIKE ?)'
         search_param = f'%{search}%'
         params.extend([search_param, search_param])
-    return _fetch_all(db, sql, tuple(params))
+        name += ':search'
+    return _stmt_all(db, name, sql, tuple(params))
 
 def warehouses_all(db, limit: int = 500, search: str | None = None) -> list:
     sql = (
@@ -2647,12 +2770,15 @@ def warehouses_all(db, limit: int = 500, search: str | None = None) -> list:
         'FROM OWHS T0 '
     )
     params = []
+    name = 'warehouses_all'
     if search:
         sql += ' WHERE T0."WhsCode" LIKE ? OR T0."WhsName" LIKE ? '
         search_param = f'%{search}%'
         params.extend([search_param, search_param])
-    sql += ' ORDER BY T0."WhsCode" LIMIT ' + str(int(limit or 500))
-    return _fetch_all(db, sql, tuple(params) if params else None)
+        name += ':search'
+    sql += ' ORDER BY T0."WhsCode" LIMIT ?'
+    params.append(int(limit or 500))
+    return _stmt_all(db, name, sql, tuple(params))
 
 def sales_tax_codes(db) -> list:
     """Get sales tax codes"""
@@ -2665,7 +2791,7 @@ def sales_tax_codes(db) -> list:
         'WHERE T0."Category" = \'O\' '
         'AND T0."Inactive" = \'N\' '
     )
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'sales_tax_codes', sql)
 
 def projects_lov(db, search: str | None = None) -> list:
     """Project List of Values"""
@@ -2678,14 +2804,16 @@ def projects_lov(db, search: str | None = None) -> list:
     )
     
     params = []
+    name = 'projects_lov'
     if search and search.strip():
         sql += ' AND (T0."PrjCode" LIKE ? OR T0."PrjName" LIKE ?) '
         search_param = f'%{search.strip()}%'
         params.extend([search_param, search_param])
+        name += ':search'
     
     sql += ' ORDER BY T0."PrjCode" LIMIT 100'
     
-    return _fetch_all(db, sql, tuple(params))
+    return _stmt_all(db, name, sql, tuple(params))
 
 def policy_link(db, bp_code: str = None, show_all: bool = False) -> list:
     """
@@ -2707,12 +2835,14 @@ def policy_link(db, bp_code: str = None, show_all: bool = False) -> list:
     ]
     
     params = []
+    name = 'policy_link'
     if bp_code and not show_all:
         sql_parts.insert(5, 'AND T0."U_bp" = ? ')  # Insert after WHERE clause
         params.append(bp_code)
+        name += ':bp'
     
     sql = ''.join(sql_parts)
-    return _fetch_all(db, sql, tuple(params) if params else None)
+    return _stmt_all(db, name, sql, tuple(params))
 
 def all_child_customers(db, limit: int = 5000) -> list:
     """Get all child customers (customers with FatherCard set) from all parents"""
@@ -2725,9 +2855,9 @@ def all_child_customers(db, limit: int = 5000) -> list:
         'WHERE T0."FatherCard" IS NOT NULL '
         'AND TRIM(T0."FatherCard") <> \'\' '
         'ORDER BY T0."FatherCard", T0."CardCode" '
-        'LIMIT ' + str(int(limit or 5000))
+        'LIMIT ?'
     )
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'all_child_customers', sql, (int(limit or 5000),))
 
 def child_card_code(db, father_card: str, search: str | None = None) -> list:
     """Get child CardCode and CardName by FatherCard with optional search"""
@@ -2740,7 +2870,7 @@ def child_card_code(db, father_card: str, search: str | None = None) -> list:
         'WHERE UPPER(TRIM(T0."FatherCard")) = UPPER(TRIM(?)) '
         'ORDER BY T0."CardCode" '
     )
-    rows = _fetch_all(db, sql_primary, (father_card,))
+    rows = _stmt_all(db, 'child_card_code', sql_primary, (father_card,))
     if rows and isinstance(rows, list) and len(rows) > 0:
         # Optional search filter applied in Python to avoid changing SQL
         if search and search.strip():
@@ -2763,7 +2893,7 @@ def child_card_code(db, father_card: str, search: str | None = None) -> list:
         'WHERE p."CardCode" = ? '
         'ORDER BY c."CardCode" '
     )
-    rows = _fetch_all(db, sql_join, (father_card,))
+    rows = _stmt_all(db, 'child_card_code:join', sql_join, (father_card,))
     if rows and isinstance(rows, list) and len(rows) > 0:
         return rows
 
@@ -2776,7 +2906,7 @@ def child_card_code(db, father_card: str, search: str | None = None) -> list:
         'WHERE T0."FatherCard" = ? '
         'ORDER BY T0."CardCode" '
     )
-    rows = _fetch_all(db, sql_eq, (father_card,))
+    rows = _stmt_all(db, 'child_card_code:exact', sql_eq, (father_card,))
     if rows and isinstance(rows, list) and len(rows) > 0:
         return rows
 
@@ -2789,7 +2919,7 @@ def child_card_code(db, father_card: str, search: str | None = None) -> list:
         'WHERE TRIM(T0."FatherCard") LIKE TRIM(?) || %s '
         'ORDER BY T0."CardCode" '
     ) % ("'%'")
-    return _fetch_all(db, sql_like, (father_card,))
+    return _stmt_all(db, 'child_card_code:like', sql_like, (father_card,))
 
 def item_lov_by_policy(db, doc_entry: str) -> list:
     """Get items by policy DocEntry"""
@@ -2805,7 +2935,12 @@ def item_lov_by_policy(db, doc_entry: str) -> list:
         'WHERE T0."DocEntry" = ? '
         'AND T2."validFor" = \'Y\' '
     )
-    return _fetch_all(db, sql, (doc_entry,))
+    return _stmt_all(db, 'item_lov_by_policy', sql, (doc_entry,))
+
+def policy_doc_entry(db, project_code: str) -> dict:
+    """Policy link (DocEntry) for a project"""
+    sql = 'SELECT a."DocEntry" FROM "@PL1" a WHERE a."U_proj" = ?'
+    return _stmt_one(db, 'policy_doc_entry', sql, (project_code,))
 
 def unit_price_by_policy(db, doc_entry: str, item_code: str) -> dict:
     """Get unit price (U_np) by policy DocEntry and ItemCode"""
@@ -2816,7 +2951,7 @@ def unit_price_by_policy(db, doc_entry: str, item_code: str) -> dict:
         'WHERE T0."DocEntry" = ? '
         'AND T1."U_itc" = ? '
     )
-    return _fetch_one(db, sql, (doc_entry, item_code))
+    return _stmt_one(db, 'unit_price_by_policy', sql, (doc_entry, item_code))
 
 def additional_discount(db, policy: str, item_code: str, pl_entry: str) -> dict:
     """Get additional discount (U_AD) for policy, item, and PL entry"""
@@ -2828,7 +2963,7 @@ def additional_discount(db, policy: str, item_code: str, pl_entry: str) -> dict:
         'AND b."U_itc" = ? '
         'AND a."DocEntry" = ?'
     )
-    return _fetch_one(db, sql, (policy, item_code, pl_entry))
+    return _stmt_one(db, 'additional_discount', sql, (policy, item_code, pl_entry))
 
 def extra_discount(db, policy: str, item_code: str, pl_entry: str) -> dict:
     """Get extra discount (U_ED) for policy, item, and PL entry"""
@@ -2840,7 +2975,19 @@ def extra_discount(db, policy: str, item_code: str, pl_entry: str) -> dict:
         'AND b."U_itc" = ? '
         'AND a."DocEntry" = ?'
     )
-    return _fetch_one(db, sql, (policy, item_code, pl_entry))
+    return _stmt_one(db, 'extra_discount', sql, (policy, item_code, pl_entry))
+
+def policy_item_discounts(db, policy: str, item_code: str, pl_entry: str) -> dict:
+    """Additional (U_ad) and extra (U_ed) discount for policy, item, and PL entry in one lookup"""
+    sql = (
+        'SELECT b."U_ad", b."U_ed" '
+        'FROM "@PL1" a '
+        'INNER JOIN "@PLR4" b ON a."DocEntry" = b."DocEntry" '
+        'WHERE a."U_proj" = ? '
+        'AND b."U_itc" = ? '
+        'AND a."DocEntry" = ?'
+    )
+    return _stmt_one(db, 'policy_item_discounts', sql, (policy, item_code, pl_entry))
 
 def phase_discount(db, project_code: str) -> dict:
     """Get phase discount (U_zerop) based on project code and payment collection"""
@@ -2856,7 +3003,119 @@ def phase_discount(db, project_code: str) -> dict:
         '    AND a."Canceled" = \'N\' '
         '), 0) BETWEEN c."U_lsb" AND c."U_upslb"'
     )
-    return _fetch_one(db, sql, (project_code, project_code))
+    return _stmt_one(db, 'phase_discount', sql, (project_code, project_code))
+
+def _placeholders(values) -> str:
+    return ', '.join(['?'] * len(values))
+
+def order_line_pricing(db, lines: list, card_code: str | None = None) -> list:
+    """
+    Resolve price, discounts, warehouses and policy link for every order line at once.
+
+    Each line is a dict with ``item_code``, ``policy`` (project code) and optionally
+    ``pl`` (policy DocEntry). Runs a fixed number of set-based queries regardless of
+    how many lines are passed, instead of one round trip per line per lookup.
+    Returns one dict per input line, in the same order.
+    """
+    lines = [l for l in (lines or []) if isinstance(l, dict)]
+    if not lines:
+        return []
+
+    item_codes = sorted({str(l.get('item_code') or '').strip() for l in lines} - {''})
+    policies = sorted({str(l.get('policy') or '').strip() for l in lines} - {''})
+
+    # Policy links (DocEntry per project), optionally limited to the customer's policies
+    links = {}
+    if policies:
+        sql = (
+            'SELECT a."U_proj", a."DocEntry" '
+            'FROM "@PL1" a '
+        )
+        params = []
+        if card_code:
+            sql += 'INNER JOIN "@PLR8" r ON r."DocEntry" = a."DocEntry" AND r."U_bp" = ? '
+            params.append(card_code)
+        sql += 'WHERE a."U_proj" IN (' + _placeholders(policies) + ') ORDER BY a."DocEntry"'
+        params.extend(policies)
+        for r in _fetch_all(db, sql, tuple(params)):
+            links.setdefault(str(r.get('U_proj')), r.get('DocEntry'))
+
+    # Unit price and discount tiers for every (policy DocEntry, item) pair
+    prices = {}
+    if policies and item_codes:
+        sql = (
+            'SELECT a."U_proj", a."DocEntry", b."U_itc", b."U_np", b."U_ad", b."U_ed" '
+            'FROM "@PL1" a '
+            'INNER JOIN "@PLR4" b ON a."DocEntry" = b."DocEntry" '
+            'WHERE a."U_proj" IN (' + _placeholders(policies) + ') '
+            'AND b."U_itc" IN (' + _placeholders(item_codes) + ')'
+        )
+        for r in _fetch_all(db, sql, tuple(policies) + tuple(item_codes)):
+            prices.setdefault((str(r.get('DocEntry')), str(r.get('U_itc'))), r)
+
+    # Phase discount per project, based on total collections against the project
+    phases = {}
+    balances = {}
+    if policies:
+        in_sql = _placeholders(policies)
+        sql = (
+            'SELECT b."PrjCode", c."U_zdis" '
+            'FROM OPRJ b '
+            'INNER JOIN "@PLR3" c ON b."U_pc" = c."DocEntry" '
+            'LEFT JOIN ( '
+            '    SELECT a."PrjCode", SUM(a."DocTotal") AS "Collected" '
+            '    FROM ORCT a '
+            '    WHERE a."Canceled" = \'N\' AND a."PrjCode" IN (' + in_sql + ') '
+            '    GROUP BY a."PrjCode" '
+            ') p ON p."PrjCode" = b."PrjCode" '
+            'WHERE b."PrjCode" IN (' + in_sql + ') '
+            'AND IFNULL(p."Collected", 0) BETWEEN c."U_lsb" AND c."U_upslb"'
+        )
+        for r in _fetch_all(db, sql, tuple(policies) + tuple(policies)):
+            phases.setdefault(str(r.get('PrjCode')), r.get('U_zdis'))
+
+        sql = (
+            'SELECT a."Project", IFNULL(SUM(a."Debit" - a."Credit"), 0) AS "Balance" '
+            'FROM JDT1 a '
+            'WHERE a."Project" IN (' + in_sql + ') '
+            'GROUP BY a."Project"'
+        )
+        for r in _fetch_all(db, sql, tuple(policies)):
+            balances[str(r.get('Project'))] = r.get('Balance')
+
+    warehouses = {}
+    if item_codes:
+        sql = (
+            'SELECT T0."ItemCode", T0."WhsCode", T1."WhsName" '
+            'FROM OITW T0 '
+            'INNER JOIN OWHS T1 ON T0."WhsCode" = T1."WhsCode" '
+            'WHERE T0."ItemCode" IN (' + _placeholders(item_codes) + ') '
+            'ORDER BY T0."ItemCode", T0."WhsCode"'
+        )
+        for r in _fetch_all(db, sql, tuple(item_codes)):
+            warehouses.setdefault(str(r.get('ItemCode')), []).append(
+                {'WhsCode': r.get('WhsCode'), 'WhsName': r.get('WhsName')}
+            )
+
+    out = []
+    for l in lines:
+        item_code = str(l.get('item_code') or '').strip()
+        policy = str(l.get('policy') or '').strip()
+        pl = str(l.get('pl') or '').strip() or (links.get(policy) if policy else None)
+        price = prices.get((str(pl), item_code)) if pl and item_code else None
+        out.append({
+            'key': l.get('key'),
+            'item_code': item_code,
+            'policy': policy,
+            'policy_link': pl or None,
+            'unit_price': price.get('U_np') if price else None,
+            'u_ad': price.get('U_ad') if price else None,
+            'u_ed': price.get('U_ed') if price else None,
+            'phase_discount': phases.get(policy) if policy else None,
+            'project_balance': balances.get(policy, 0) if policy else None,
+            'warehouses': warehouses.get(item_code, []) if item_code else [],
+        })
+    return out
 
 def project_balance(db, project_code: str) -> dict:
     """Get project balance with project name"""
@@ -2870,7 +3129,16 @@ def project_balance(db, project_code: str) -> dict:
         'WHERE a."Project" = ? '
         'GROUP BY a."Project", b."PrjName"'
     )
-    return _fetch_one(db, sql, (project_code,))
+    return _stmt_one(db, 'project_balance', sql, (project_code,))
+
+def project_balance_total(db, project_code: str) -> dict:
+    """Journal balance (Debit - Credit) posted against a project"""
+    sql = (
+        'SELECT IFNULL(SUM(a."Debit" - a."Credit"), 0) AS "Balance" '
+        'FROM JDT1 a '
+        'WHERE a."Project" = ?'
+    )
+    return _stmt_one(db, 'project_balance_total', sql, (project_code,))
 
 def project_balances_all(db, limit: int = 500) -> list:
     """Get balances for all projects"""
@@ -2885,9 +3153,9 @@ def project_balances_all(db, limit: int = 500) -> list:
         'GROUP BY a."Project", b."PrjName" '
         'HAVING SUM(a."Debit" - a."Credit") <> 0 '
         'ORDER BY a."Project" '
-        'LIMIT ' + str(int(limit or 500))
+        'LIMIT ?'
     )
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'project_balances_all', sql, (int(limit or 500),))
 
 def policy_balance_by_customer(db, card_code: str = None) -> list:
     """Get policy-wise balance for a specific customer (ShortName) or all customers"""
@@ -2906,7 +3174,7 @@ def policy_balance_by_customer(db, card_code: str = None) -> list:
             'HAVING SUM(a."Debit" - a."Credit") <> 0 '
             'ORDER BY a."Project"'
         )
-        return _fetch_all(db, sql, (card_code.strip(),))
+        return _stmt_all(db, 'policy_balance_by_customer', sql, (card_code.strip(),))
     else:
         # All customers with policy balances
         sql = (
@@ -2922,7 +3190,7 @@ def policy_balance_by_customer(db, card_code: str = None) -> list:
             'ORDER BY a."Project", a."ShortName" '
             'LIMIT 500'
         )
-        return _fetch_all(db, sql)
+        return _stmt_all(db, 'policy_balance_by_customer:all', sql)
 
 def crop_lov(db, search: str | None = None) -> list:
     """Crop List of Values with optional search"""
@@ -2931,9 +3199,9 @@ def crop_lov(db, search: str | None = None) -> list:
     if search:
         sql += ' WHERE T1."Code" LIKE ? OR T1."Name" LIKE ?'
         search_param = f'%{search}%'
-        return _fetch_all(db, sql, (search_param, search_param))
+        return _stmt_all(db, 'crop_lov:search', sql, (search_param, search_param))
     
-    return _fetch_all(db, sql)
+    return _stmt_all(db, 'crop_lov', sql)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,482 @@
+"""
+Local analytical mirror of SAP sales target and invoice facts.
+
+Closed months of ``B4_SALES_TARGET_NEW3``, OINV/ORIN and ORCT are copied per
+company schema into a SQLite file (one file per schema) indexed on territory,
+employee and month. Report functions in hana_connect ask the registered
+backend for the closed part of a date range and only send the still-open part
+(the current month, or anything newer than the last sync) to HANA.
+
+Amounts are stored as integer millionths so SUMs are exact and come back as
+Decimal, the same type HANA returns. Timestamps are stored as fixed-width
+ISO text, so range filters compare like HANA's TO_TIMESTAMP / TO_DATE.
+
+Enable it with the SAP_ANALYTICS_MIRROR_DIR setting and fill it with
+``python manage.py sync_sap_mirror``.
+"""
+import os
+import re
+import sqlite3
+import threading
+import logging
+from decimal import Decimal
+from datetime import date, datetime
+
+try:
+    from . import hana_rows
+except ImportError:
+    import hana_rows
+
+logger = logging.getLogger("hana")
+
+AMOUNT_SCALE = 6
+_TS_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+FACT_TABLES = ('sales_target', 'invoice', 'receipt')
+
+SCHEMA_SQL = (
+    'CREATE TABLE IF NOT EXISTS territory ('
+    ' territory_id INTEGER PRIMARY KEY, descript TEXT, parent INTEGER, inactive TEXT)',
+    'CREATE TABLE IF NOT EXISTS employee_territory (emp_id INTEGER NOT NULL, territory_id INTEGER)',
+    'CREATE INDEX IF NOT EXISTS ix_emp_territory_emp ON employee_territory (emp_id)',
+    'CREATE INDEX IF NOT EXISTS ix_emp_territory_territory ON employee_territory (territory_id)',
+    'CREATE TABLE IF NOT EXISTS sales_target ('
+    ' territory_id INTEGER, month TEXT, f_refdate TEXT, t_refdate TEXT,'
+    ' sales_target INTEGER, doc_total INTEGER)',
+    'CREATE INDEX IF NOT EXISTS ix_sales_target_territory ON sales_target (territory_id, month)',
+    'CREATE INDEX IF NOT EXISTS ix_sales_target_month ON sales_target (month)',
+    'CREATE INDEX IF NOT EXISTS ix_sales_target_t_refdate ON sales_target (t_refdate)',
+    'CREATE TABLE IF NOT EXISTS invoice ('
+    ' doc_type TEXT NOT NULL, doc_entry INTEGER NOT NULL, doc_date TEXT, month TEXT,'
+    ' doc_total INTEGER, canceled TEXT, card_code TEXT, slp_code INTEGER, territory_id INTEGER,'
+    ' PRIMARY KEY (doc_type, doc_entry))',
+    'CREATE INDEX IF NOT EXISTS ix_invoice_territory ON invoice (territory_id, month)',
+    'CREATE INDEX IF NOT EXISTS ix_invoice_slp ON invoice (slp_code, month)',
+    'CREATE INDEX IF NOT EXISTS ix_invoice_date ON invoice (doc_date)',
+    'CREATE TABLE IF NOT EXISTS receipt ('
+    ' doc_entry INTEGER PRIMARY KEY, doc_date TEXT, month TEXT, doc_total INTEGER,'
+    ' canceled TEXT, card_code TEXT, territory_id INTEGER)',
+    'CREATE INDEX IF NOT EXISTS ix_receipt_territory ON receipt (territory_id, month)',
+    'CREATE INDEX IF NOT EXISTS ix_receipt_date ON receipt (doc_date)',
+    'CREATE TABLE IF NOT EXISTS sync_state ('
+    ' fact TEXT PRIMARY KEY, synced_until TEXT NOT NULL, synced_at TEXT NOT NULL, row_count INTEGER)',
+)
+
+
+def to_amount(value):
+    """Decimal/float/int amount as integer millionths (None stays None)."""
+    if value is None:
+        return None
+    return int(Decimal(str(value)).scaleb(AMOUNT_SCALE).to_integral_value())
+
+
+def from_amount(value):
+    if value is None:
+        return None
+    return Decimal(int(value)).scaleb(-AMOUNT_SCALE)
+
+
+def to_timestamp(value):
+    """date/datetime/ISO string as fixed-width text that sorts like a timestamp."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    elif not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value.strftime(_TS_FORMAT)
+
+
+def from_timestamp(value):
+    if value is None:
+        return None
+    return datetime.strptime(value, _TS_FORMAT)
+
+
+def to_day(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.strip()[:10]
+    return value.strftime('%Y-%m-%d')
+
+
+def from_day(value):
+    if value is None:
+        return None
+    return date.fromisoformat(value)
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def previous_month(day: date) -> date:
+    if day.month == 1:
+        return date(day.year - 1, 12, 1)
+    return date(day.year, day.month - 1, 1)
+
+
+def store_filename(schema: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_-]', '_', schema.strip().strip('"')) + '.sqlite3'
+
+
+class MirrorStore:
+    """SQLite file holding the mirrored facts of one company schema."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute('PRAGMA journal_mode=WAL' if self.path != ':memory:' else 'PRAGMA journal_mode=MEMORY')
+            for stmt in SCHEMA_SQL:
+                conn.execute(stmt)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def synced_until(self, fact: str):
+        """Exclusive upper bound (date) of the mirrored rows of ``fact``, or None."""
+        row = self.connect().execute(
+            'SELECT synced_until FROM sync_state WHERE fact = ?', (fact,)
+        ).fetchone()
+        return date.fromisoformat(row[0]) if row else None
+
+    def mark_synced(self, fact: str, until: date) -> None:
+        self.connect().execute(
+            'INSERT OR REPLACE INTO sync_state (fact, synced_until, synced_at, row_count) '
+            'VALUES (?, ?, ?, (SELECT COUNT(*) FROM ' + fact + '))',
+            (fact, until.isoformat(), datetime.now().isoformat(timespec='seconds')),
+        )
+
+    def state(self) -> list:
+        cur = self.connect().execute(
+            'SELECT fact, synced_until, synced_at, row_count FROM sync_state ORDER BY fact'
+        )
+        return [dict(zip(('fact', 'synced_until', 'synced_at', 'row_count'), r)) for r in cur]
+
+    # ------------------------------------------------------------------
+    # Closed-period queries (mirror hana_connect report SQL)
+    # ------------------------------------------------------------------
+
+    def sales_vs_achievement(self, emp_id=None, territory_name=None, start_date=None, end_date=None, by_emp=False) -> list:
+        sql = ['SELECT']
+        if by_emp:
+            sql.append(' e.emp_id AS EMPID,')
+        sql.append(
+            ' c.territory_id AS TERRITORYID, O.descript AS TERRITORYNAME,'
+            ' SUM(c.sales_target) AS SALES_TARGET, SUM(c.doc_total) AS ACCHIVEMENT,'
+            ' MIN(c.f_refdate) AS F_REFDATE, MAX(c.t_refdate) AS T_REFDATE'
+            ' FROM sales_target c JOIN territory O ON O.territory_id = c.territory_id'
+        )
+        if by_emp:
+            sql.append(' JOIN employee_territory e ON e.territory_id = c.territory_id')
+        where = []
+        params = []
+        if emp_id is not None:
+            if by_emp:
+                where.append('e.emp_id = ?')
+            else:
+                where.append('c.territory_id IN (SELECT territory_id FROM employee_territory WHERE emp_id = ?)')
+            params.append(int(emp_id))
+        if territory_name is not None and territory_name.strip() != '':
+            val = territory_name.strip()
+            where.append('(O.descript = ? OR O.descript = ?)')
+            params.extend([val, val + ' Territory'])
+        if start_date and end_date:
+            where.append('c.f_refdate <= ?')
+            where.append('c.t_refdate >= ?')
+            params.extend([to_timestamp(end_date), to_timestamp(start_date)])
+        if where:
+            sql.append(' WHERE ' + ' AND '.join(where))
+        if by_emp:
+            sql.append(' GROUP BY e.emp_id, c.territory_id, O.descript ORDER BY e.emp_id, c.territory_id')
+        else:
+            sql.append(' GROUP BY c.territory_id, O.descript ORDER BY c.territory_id')
+        cur = self.connect().execute(''.join(sql), params)
+        rows = hana_rows.fetch(cur)
+        for r in rows:
+            r['SALES_TARGET'] = from_amount(r['SALES_TARGET'])
+            r['ACCHIVEMENT'] = from_amount(r['ACCHIVEMENT'])
+            r['F_REFDATE'] = from_timestamp(r['F_REFDATE'])
+            r['T_REFDATE'] = from_timestamp(r['T_REFDATE'])
+        return rows
+
+    def invoice_summary(self, start_date=None, end_date=None, end_inclusive=True) -> dict:
+        sql = (
+            "SELECT SUM(doc_total), MIN(doc_date), MAX(doc_date) FROM invoice"
+            " WHERE doc_type = 'INV' AND canceled = 'N'"
+        )
+        params = []
+        if start_date:
+            sql += ' AND doc_date >= ?'
+            params.append(to_day(start_date))
+        if end_date:
+            sql += ' AND doc_date <= ?' if end_inclusive else ' AND doc_date < ?'
+            params.append(to_day(end_date))
+        total, first, last = self.connect().execute(sql, params).fetchone()
+        return {
+            'DOCTOTAL': from_amount(total),
+            'F_REFDATE': from_day(first),
+            'T_REFDATE': from_day(last),
+        }
+
+
+class MirrorBackend:
+    """
+    Closed-period backend for hana_connect report functions.
+
+    Holds one MirrorStore per company schema under ``directory``. The schema
+    of a HANA connection is read with ``CURRENT_SCHEMA`` since callers select
+    the company with ``SET SCHEMA``.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def store(self, schema: str) -> MirrorStore:
+        with self._lock:
+            store = self._stores.get(schema)
+            if store is None:
+                store = MirrorStore(os.path.join(self.directory, store_filename(schema)))
+                self._stores[schema] = store
+            return store
+
+    def store_for(self, db):
+        """Store of the schema ``db`` is connected to, or None if it was never synced."""
+        cur = db.cursor()
+        try:
+            cur.execute('SELECT CURRENT_SCHEMA FROM DUMMY')
+            row = cur.fetchone()
+        finally:
+            cur.close()
+        return self.synced_store(row[0] if row else None)
+
+    def synced_store(self, schema):
+        """Store of ``schema``, or None if it was never synced."""
+        if not schema:
+            return None
+        if not os.path.exists(os.path.join(self.directory, store_filename(schema))):
+            return None
+        return self.store(schema)
+
+    def cutoff(self, store: MirrorStore, fact: str, today: date | None = None):
+        """
+        First day that still has to come from HANA for ``fact``: the current
+        month, or the end of the last sync if that is older. None when the
+        fact has not been synced yet.
+        """
+        until = store.synced_until(fact)
+        if until is None:
+            return None
+        return min(until, month_start(today or date.today()))
+
+
+# ----------------------------------------------------------------------
+# Merging local and live partial results
+# ----------------------------------------------------------------------
+
+def _add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+
+def _min(a, b):
+    return b if a is None or (b is not None and b < a) else a
+
+
+def _max(a, b):
+    return b if a is None or (b is not None and b > a) else a
+
+
+def _date_only(row: dict) -> dict:
+    for k in ('F_REFDATE', 'T_REFDATE'):
+        if isinstance(row.get(k), datetime):
+            row[k] = row[k].date()
+    return row
+
+
+def merge_sales_rows(local_rows: list, live_rows: list, key_columns: tuple) -> list:
+    """Combine per-territory target/achievement rows from the mirror and HANA."""
+    live_rows = [{k.upper(): v for k, v in r.items()} for r in live_rows]
+    # Match HANA's value types when its columns come back as plain dates
+    if any(isinstance(r.get('F_REFDATE'), date) and not isinstance(r.get('F_REFDATE'), datetime) for r in live_rows):
+        local_rows = [_date_only(dict(r)) for r in local_rows]
+    merged = {}
+    for norm in list(local_rows) + live_rows:
+        norm = dict(norm)
+        key = tuple(norm.get(k) for k in key_columns)
+        acc = merged.get(key)
+        if acc is None:
+            merged[key] = norm
+            continue
+        acc['SALES_TARGET'] = _add(acc.get('SALES_TARGET'), norm.get('SALES_TARGET'))
+        acc['ACCHIVEMENT'] = _add(acc.get('ACCHIVEMENT'), norm.get('ACCHIVEMENT'))
+        acc['F_REFDATE'] = _min(acc.get('F_REFDATE'), norm.get('F_REFDATE'))
+        acc['T_REFDATE'] = _max(acc.get('T_REFDATE'), norm.get('T_REFDATE'))
+    order = [k for k in key_columns if k != 'TERRITORYNAME']
+    return sorted(merged.values(), key=lambda r: tuple(r.get(k) or 0 for k in order))
+
+
+def merge_summary_rows(local: dict, live_rows: list) -> list:
+    """Combine the single-row invoice summary of the mirror and HANA."""
+    live = {k.upper(): v for k, v in (live_rows[0].items() if live_rows else ())}
+    total = _add(local.get('DOCTOTAL'), live.get('DOCTOTAL'))
+    first, last = local.get('F_REFDATE'), local.get('T_REFDATE')
+    if isinstance(live.get('F_REFDATE'), datetime):
+        # DocDate read back as a timestamp: match it
+        first = datetime(first.year, first.month, first.day) if first else None
+        last = datetime(last.year, last.month, last.day) if last else None
+    return [{
+        'COLLETION_TARGET': total,
+        'DOCTOTAL': total,
+        'F_REFDATE': _min(first, live.get('F_REFDATE')),
+        'T_REFDATE': _max(last, live.get('T_REFDATE')),
+    }]
+
+
+# ----------------------------------------------------------------------
+# Sync from HANA
+# ----------------------------------------------------------------------
+
+_DIMENSION_SQL = {
+    'territory': (
+        'SELECT "territryID", "descript", "parent", "inactive" FROM "OTER"',
+        'INSERT INTO territory (territory_id, descript, parent, inactive) VALUES (?, ?, ?, ?)',
+    ),
+    'employee_territory': (
+        'SELECT empID, U_TID FROM "B4_EMP"',
+        'INSERT INTO employee_territory (emp_id, territory_id) VALUES (?, ?)',
+    ),
+}
+
+_FACT_SQL = {
+    'sales_target': (
+        'SELECT c.TerritoryId, c.F_REFDATE, c.T_REFDATE, c.Sales_Target, c.DocTotal'
+        ' FROM "B4_SALES_TARGET_NEW3" c'
+        ' WHERE c."T_REFDATE" >= TO_TIMESTAMP(?, \'YYYY-MM-DD\') AND c."T_REFDATE" < TO_TIMESTAMP(?, \'YYYY-MM-DD\')',
+        't_refdate',
+    ),
+    'invoice': (
+        'SELECT \'INV\', T0."DocEntry", T0."DocDate", T0."DocTotal", T0."CANCELED", T0."CardCode", T0."SlpCode", C."Territory"'
+        ' FROM "OINV" T0 LEFT JOIN "OCRD" C ON C."CardCode" = T0."CardCode"'
+        ' WHERE T0."DocDate" >= TO_DATE(?, \'YYYY-MM-DD\') AND T0."DocDate" < TO_DATE(?, \'YYYY-MM-DD\')'
+        ' UNION ALL '
+        'SELECT \'CRN\', T0."DocEntry", T0."DocDate", T0."DocTotal", T0."CANCELED", T0."CardCode", T0."SlpCode", C."Territory"'
+        ' FROM "ORIN" T0 LEFT JOIN "OCRD" C ON C."CardCode" = T0."CardCode"'
+        ' WHERE T0."DocDate" >= TO_DATE(?, \'YYYY-MM-DD\') AND T0."DocDate" < TO_DATE(?, \'YYYY-MM-DD\')',
+        'doc_date',
+    ),
+    'receipt': (
+        'SELECT T0."DocEntry", T0."DocDate", T0."DocTotal", T0."Canceled", T0."CardCode", C."Territory"'
+        ' FROM "ORCT" T0 LEFT JOIN "OCRD" C ON C."CardCode" = T0."CardCode"'
+        ' WHERE T0."DocDate" >= TO_DATE(?, \'YYYY-MM-DD\') AND T0."DocDate" < TO_DATE(?, \'YYYY-MM-DD\')',
+        'doc_date',
+    ),
+}
+
+
+def _sales_target_row(r):
+    f_ref = to_timestamp(r[1])
+    return (r[0], f_ref[:7] if f_ref else None, f_ref, to_timestamp(r[2]), to_amount(r[3]), to_amount(r[4]))
+
+
+def _invoice_row(r):
+    day = to_day(r[2])
+    return (r[0], r[1], day, day[:7] if day else None, to_amount(r[3]), r[4], r[5], r[6], r[7])
+
+
+def _receipt_row(r):
+    day = to_day(r[1])
+    return (r[0], day, day[:7] if day else None, to_amount(r[2]), r[3], r[4], r[5])
+
+
+_FACT_INSERT = {
+    'sales_target': (
+        'INSERT INTO sales_target (territory_id, month, f_refdate, t_refdate, sales_target, doc_total)'
+        ' VALUES (?, ?, ?, ?, ?, ?)',
+        _sales_target_row,
+    ),
+    'invoice': (
+        'INSERT OR REPLACE INTO invoice (doc_type, doc_entry, doc_date, month, doc_total, canceled,'
+        ' card_code, slp_code, territory_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        _invoice_row,
+    ),
+    'receipt': (
+        'INSERT OR REPLACE INTO receipt (doc_entry, doc_date, month, doc_total, canceled, card_code,'
+        ' territory_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        _receipt_row,
+    ),
+}
+
+
+def _copy(db, sql: str, params, conn: sqlite3.Connection, insert_sql: str, transform=None) -> int:
+    cur = db.cursor()
+    count = 0
+    try:
+        cur.execute(sql, params)
+        for batch in hana_rows.RowReader(cur).batches():
+            if transform is not None:
+                batch = [transform(r) for r in batch]
+            conn.executemany(insert_sql, batch)
+            count += len(batch)
+    finally:
+        cur.close()
+    return count
+
+
+def sync(db, store: MirrorStore, since: date | None = None, full: bool = False, today: date | None = None) -> dict:
+    """
+    Copy closed months from HANA (``db``, schema already set) into ``store``.
+
+    Facts are refreshed from ``since`` up to the start of the current month.
+    By default that is the last mirrored month, so late postings to it are
+    picked up; ``full`` re-copies everything. Territory and employee tables
+    are always replaced. Returns the number of rows copied per table.
+    """
+    cutoff = month_start(today or date.today())
+    conn = store.connect()
+    copied = {}
+    with conn:
+        for table, (select_sql, insert_sql) in _DIMENSION_SQL.items():
+            conn.execute('DELETE FROM ' + table)
+            copied[table] = _copy(db, select_sql, (), conn, insert_sql)
+
+    for fact in FACT_TABLES:
+        start = since
+        if start is None and not full:
+            until = store.synced_until(fact)
+            if until is not None:
+                start = previous_month(min(until, cutoff))
+        select_sql, column = _FACT_SQL[fact]
+        insert_sql, transform = _FACT_INSERT[fact]
+        lower = start.isoformat() if start else '1900-01-01'
+        bounds = (lower, cutoff.isoformat())
+        params = bounds * (select_sql.count('?') // 2)
+        with conn:
+            if start is None:
+                conn.execute('DELETE FROM ' + fact)
+            else:
+                bound = to_timestamp(start) if column == 't_refdate' else to_day(start)
+                conn.execute('DELETE FROM ' + fact + ' WHERE ' + column + ' >= ?', (bound,))
+            copied[fact] = _copy(db, select_sql, params, conn, insert_sql, transform)
+            store.mark_synced(fact, cutoff)
+        logger.info(f"HANA mirror {store.path}: {fact} {copied[fact]} rows from {lower} to {cutoff}")
+    return copied
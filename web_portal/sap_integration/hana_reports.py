@@ -0,0 +1,453 @@
+"""
+Report engine for the sales / collection vs achievement family.
+
+A report is a fact source (sales targets, collection targets, invoices or
+incoming payments) grouped by any of the dimensions region, zone, territory,
+employee, month and day, with one or more measures (target, achievement,
+profit, collection). The engine composes a single HANA statement: grouping,
+ROLLUP subtotals, scaling to millions and the achievement percentage are all
+computed in SQL, so callers get pre-aggregated rows back.
+
+    rows = hana_reports.run(db, 'sales_target', ['region', 'zone', 'territory'],
+                            start_date='2025-01-01', end_date='2025-03-31',
+                            rollup=True, in_millions=True)
+
+Each row holds the dimension columns (see ``DIMENSIONS``), one column per
+measure ("Target", "Achievement", ...), "Percentage" when both target and
+achievement are requested, "From_Date" / "To_Date", and with ``rollup`` a
+"Grouping" bitmask: 0 for detail rows, and bit ``n - 1 - i`` set when
+dimension ``i`` of ``n`` is rolled up (so the grand total has all bits set).
+
+Statements are registered with hana_statements under a name derived from
+their text, so each distinct report shape is prepared once per connection.
+
+``report`` takes a function that opens the connection instead of the
+connection itself: a range that ends before the closed-month mirror's cutoff
+(see hana_mirror) is answered from the mirror of the company schema, with the
+same grouping and columns, and HANA is not contacted at all.
+
+    rows = hana_reports.report(connect, schema, 'invoice', ['territory'], ['achievement'],
+                               start_date='2025-01-01', end_date='2025-03-31')
+"""
+import hashlib
+from decimal import Decimal, ROUND_HALF_UP
+
+try:
+    from . import hana_connect, hana_mirror, hana_rows, hana_statements
+except ImportError:
+    import hana_connect
+    import hana_mirror
+    import hana_rows
+    import hana_statements
+
+# Territory hierarchy: T -> Z (parent) -> R1 -> R2 -> R3, as used by the
+# territory and collection reports. Zone is R1, region the topmost of R3/R2/R1.
+_HIERARCHY_JOINS = (
+    'LEFT JOIN "OTER" Z ON Z."territryID" = T."parent" '
+    'LEFT JOIN "OTER" R1 ON R1."territryID" = Z."parent" '
+    'LEFT JOIN "OTER" R2 ON R2."territryID" = R1."parent" '
+    'LEFT JOIN "OTER" R3 ON R3."territryID" = R2."parent" '
+)
+
+_REGION = 'COALESCE(R3."descript", R2."descript", R1."descript")'
+_ZONE = 'R1."descript"'
+
+
+class Fact:
+    """A fact table joined to its territory, with its period columns and measures."""
+
+    def __init__(self, source: str, territory: str, period: tuple, measures: dict, where: tuple = (), dated: bool = False):
+        self.source = source
+        self.territory = territory
+        self.period = period
+        self.measures = measures
+        self.where = where
+        # dated facts have a single DATE column, period facts F/T timestamps
+        self.dated = dated
+
+
+FACTS = {
+    'sales_target': Fact(
+        '"B4_SALES_TARGET_NEW3" c', 'c.TerritoryId', ('c."F_REFDATE"', 'c."T_REFDATE"'),
+        {'target': 'c.Sales_Target', 'achievement': 'c.DocTotal'},
+    ),
+    'collection_target': Fact(
+        '"B4_COLLECTION_TARGET_FINAL" c', 'c.TerritoryId', ('c."F_REFDATE"', 'c."T_REFDATE"'),
+        {'target': 'c."COLLETION_TARGET"', 'achievement': 'c."DOCTOTAL"'},
+    ),
+    'invoice': Fact(
+        '"OINV" T0 INNER JOIN "OCRD" C0 ON C0."CardCode" = T0."CardCode"', 'C0."Territory"',
+        ('T0."DocDate"', 'T0."DocDate"'),
+        {'achievement': 'T0."DocTotal"', 'profit': 'T0."GrosProfit"'},
+        where=('T0."CANCELED" = \'N\'',), dated=True,
+    ),
+    'collection': Fact(
+        '"ORCT" T0 INNER JOIN "OCRD" C0 ON C0."CardCode" = T0."CardCode"', 'C0."Territory"',
+        ('T0."DocDate"', 'T0."DocDate"'),
+        {'collection': 'T0."DocTotal"'},
+        where=('T0."Canceled" = \'N\'',), dated=True,
+    ),
+}
+
+# name -> (column alias, group expression); {date} is the fact's period start
+DIMENSIONS = {
+    'region': ('Region', _REGION),
+    'zone': ('Zone', _ZONE),
+    'territory': ('TerritoryId', 'T."territryID"'),
+    'employee': ('EmployeeID', 'E.empID'),
+    'month': ('Month', "TO_VARCHAR({date}, 'YYYY-MM')"),
+    'day': ('Day', 'TO_DATE({date})'),
+}
+
+# The same facts over the mirror's SQLite tables, keyed like FACTS, with the
+# mirror table whose cutoff applies. Gross profit and collection targets are
+# not mirrored, so reports on them always go to HANA.
+MIRROR_FACTS = {
+    'sales_target': ('sales_target', Fact(
+        'sales_target c', 'c.territory_id', ('c.f_refdate', 'c.t_refdate'),
+        {'target': 'c.sales_target', 'achievement': 'c.doc_total'},
+    )),
+    'invoice': ('invoice', Fact(
+        'invoice c', 'c.territory_id', ('c.doc_date', 'c.doc_date'),
+        {'achievement': 'c.doc_total'},
+        where=("c.doc_type = 'INV'", "c.canceled = 'N'"), dated=True,
+    )),
+    'collection': ('receipt', Fact(
+        'receipt c', 'c.territory_id', ('c.doc_date', 'c.doc_date'),
+        {'collection': 'c.doc_total'},
+        where=("c.canceled = 'N'",), dated=True,
+    )),
+}
+
+_MIRROR_HIERARCHY_JOINS = (
+    'LEFT JOIN territory Z ON Z.territory_id = T.parent '
+    'LEFT JOIN territory R1 ON R1.territory_id = Z.parent '
+    'LEFT JOIN territory R2 ON R2.territory_id = R1.parent '
+    'LEFT JOIN territory R3 ON R3.territory_id = R2.parent '
+)
+
+MIRROR_DIMENSIONS = {
+    'region': 'COALESCE(R3.descript, R2.descript, R1.descript)',
+    'zone': 'R1.descript',
+    'territory': 'T.territory_id',
+    'employee': 'E.emp_id',
+    'month': 'substr({date}, 1, 7)',
+    'day': 'substr({date}, 1, 10)',
+}
+
+MEASURE_COLUMNS = {
+    'target': 'Target',
+    'achievement': 'Achievement',
+    'profit': 'Profit',
+    'collection': 'Collection',
+}
+
+MILLION = 1000000
+
+
+def _timestamp_format(value: str, end: bool = False) -> str:
+    if end and '.' in value:
+        return 'YYYY-MM-DD HH24:MI:SS.FF3'
+    return 'YYYY-MM-DD HH24:MI:SS' if ' ' in value else 'YYYY-MM-DD'
+
+
+def _measure_sql(expr: str, in_millions: bool) -> str:
+    if in_millions:
+        return 'ROUND(SUM(' + expr + ') / ' + str(MILLION) + ', 2)'
+    return 'SUM(' + expr + ')'
+
+
+def _validate(facts: dict, fact: str, dimensions, measures) -> tuple:
+    try:
+        f = facts[fact]
+    except KeyError:
+        raise ValueError(f'Unknown report fact: {fact!r}') from None
+    dims = list(dimensions or ())
+    for d in dims:
+        if d not in DIMENSIONS:
+            raise ValueError(f'Unknown report dimension: {d!r}')
+    if len(set(dims)) != len(dims):
+        raise ValueError('Report dimensions must not repeat')
+    measures = list(measures or f.measures.keys())
+    for m in measures:
+        if m not in f.measures:
+            raise ValueError(f'Measure {m!r} is not available for {fact}')
+    return f, dims, measures
+
+
+def build(fact: str, dimensions=(), measures=None, emp_id: int | None = None,
+          region: str | None = None, zone: str | None = None, territory: str | None = None,
+          territory_name: str | None = None, start_date: str | None = None, end_date: str | None = None,
+          active_only: bool = False, rollup: bool = False, in_millions: bool = False) -> tuple:
+    """
+    Compose the report statement. Returns ``(sql, params)``.
+
+    ``region`` / ``zone`` / ``territory`` match by prefix (so "Lahore" matches
+    "Lahore Territory"); ``territory_name`` matches exactly, with or without
+    the " Territory" suffix. ``active_only`` drops inactive territories.
+    """
+    f, dims, measures = _validate(FACTS, fact, dimensions, measures)
+    group_exprs = [DIMENSIONS[d][1].format(date=f.period[0]) for d in dims]
+    select = []
+    positions = []
+    for d, expr in zip(dims, group_exprs):
+        select.append(expr + ' AS "' + DIMENSIONS[d][0] + '"')
+        positions.append(len(select))
+        if d == 'territory':
+            name = 'MIN(TRIM(REPLACE(T."descript", \' Territory\', \'\')))'
+            if rollup:
+                name = 'CASE WHEN GROUPING_ID(' + expr + ') = 1 THEN NULL ELSE ' + name + ' END'
+            select.append(name + ' AS "TerritoryName"')
+    for m in measures:
+        select.append(_measure_sql(f.measures[m], in_millions) + ' AS "' + MEASURE_COLUMNS[m] + '"')
+    if 'target' in measures and 'achievement' in measures:
+        t, a = f.measures['target'], f.measures['achievement']
+        select.append(
+            'CASE WHEN SUM(' + t + ') > 0 THEN ROUND(SUM(' + a + ') * 100.0 / SUM(' + t + '), 2) ELSE 0 END AS "Percentage"'
+        )
+    select.append('MIN(' + f.period[0] + ') AS "From_Date"')
+    select.append('MAX(' + f.period[1] + ') AS "To_Date"')
+    if rollup and group_exprs:
+        select.append('GROUPING_ID(' + ', '.join(group_exprs) + ') AS "Grouping"')
+
+    by_employee = 'employee' in dims
+    needs_hierarchy = bool({'region', 'zone'} & set(dims)) or bool((region or '').strip() or (zone or '').strip())
+    sql = (
+        'SELECT ' + ', '.join(select) + ' '
+        'FROM ' + f.source + ' '
+        'INNER JOIN "OTER" T ON T."territryID" = ' + f.territory + ' '
+    )
+    if by_employee:
+        sql += 'INNER JOIN "B4_EMP" E ON E.U_TID = T."territryID" '
+    if needs_hierarchy:
+        sql += _HIERARCHY_JOINS
+
+    where = list(f.where)
+    params = []
+    if emp_id is not None:
+        if by_employee:
+            where.append('E.empID = ?')
+        else:
+            where.append('T."territryID" IN (SELECT U_TID FROM "B4_EMP" WHERE empID = ?)')
+        params.append(int(emp_id))
+    if active_only:
+        where.append('T."inactive" = ?')
+        params.append('N')
+    if region and region.strip():
+        pattern = region.strip() + '%'
+        where.append('(UPPER(R3."descript") LIKE UPPER(?) OR UPPER(R2."descript") LIKE UPPER(?) OR UPPER(R1."descript") LIKE UPPER(?))')
+        params.extend([pattern, pattern, pattern])
+    if zone and zone.strip():
+        where.append('UPPER(R1."descript") LIKE UPPER(?)')
+        params.append(zone.strip() + '%')
+    if territory and territory.strip():
+        where.append('UPPER(T."descript") LIKE UPPER(?)')
+        params.append(territory.strip() + '%')
+    if territory_name and territory_name.strip():
+        where.append('(T."descript" = ? OR T."descript" = ?)')
+        params.extend([territory_name.strip(), territory_name.strip() + ' Territory'])
+    if start_date and end_date:
+        start, end = start_date.strip(), end_date.strip()
+        if f.dated:
+            where.append(f.period[0] + " >= TO_DATE(?, 'YYYY-MM-DD')")
+            where.append(f.period[0] + " <= TO_DATE(?, 'YYYY-MM-DD')")
+            params.extend([start[:10], end[:10]])
+        else:
+            # Period facts overlap the range: starts before its end, ends after its start
+            where.append(f.period[0] + " <= TO_TIMESTAMP(?, '" + _timestamp_format(end, end=True) + "')")
+            where.append(f.period[1] + " >= TO_TIMESTAMP(?, '" + _timestamp_format(start) + "')")
+            params.extend([end, start])
+    if where:
+        sql += 'WHERE ' + ' AND '.join(where) + ' '
+
+    if group_exprs:
+        if rollup:
+            sql += 'GROUP BY ROLLUP (' + ', '.join(group_exprs) + ') '
+        else:
+            sql += 'GROUP BY ' + ', '.join(group_exprs) + ' '
+        # Subtotals follow their detail rows; the grand total comes last
+        order = [str(p) + ' NULLS LAST' for p in positions]
+        if rollup:
+            # Tie-break real NULL dimension values against subtotal rows
+            order.append(str(len(select)))
+        sql += 'ORDER BY ' + ', '.join(order)
+    return sql.strip(), tuple(params)
+
+
+def statement_name(fact: str, sql: str) -> str:
+    return 'report:' + fact + ':' + hashlib.sha1(sql.encode('utf-8')).hexdigest()[:12]
+
+
+def run(db, fact: str, dimensions=(), measures=None, **filters) -> list:
+    """Build and execute a report (see ``build`` for the arguments)."""
+    sql, params = build(fact, dimensions, measures, **filters)
+    name = statement_name(fact, sql)
+    hana_statements.register(name, sql)
+    return hana_statements.fetch_all(db, name, params)
+
+
+def build_mirror(fact: str, dimensions=(), measures=None, emp_id: int | None = None,
+                 region: str | None = None, zone: str | None = None, territory: str | None = None,
+                 territory_name: str | None = None, start_date: str | None = None, end_date: str | None = None,
+                 active_only: bool = False, rollup: bool = False, in_millions: bool = False) -> tuple:
+    """
+    Compose the statement ``build`` would send to HANA against the SQLite
+    mirror. Returns ``(sql, params)``. SQLite has no ROLLUP, so each subtotal
+    level is its own SELECT joined with UNION ALL and carries its "Grouping"
+    value as a constant. Measures come back as raw sums in millionths;
+    scaling and the percentage are left to ``_mirror_rows``.
+    """
+    f, dims, measures = _validate({k: v[1] for k, v in MIRROR_FACTS.items()}, fact, dimensions, measures)
+    group_exprs = [MIRROR_DIMENSIONS[d].format(date=f.period[0]) for d in dims]
+
+    by_employee = 'employee' in dims
+    needs_hierarchy = bool({'region', 'zone'} & set(dims)) or bool((region or '').strip() or (zone or '').strip())
+    source = 'FROM ' + f.source + ' JOIN territory T ON T.territory_id = ' + f.territory + ' '
+    if by_employee:
+        source += 'JOIN employee_territory E ON E.territory_id = T.territory_id '
+    if needs_hierarchy:
+        source += _MIRROR_HIERARCHY_JOINS
+
+    where = list(f.where)
+    params = []
+    if emp_id is not None:
+        if by_employee:
+            where.append('E.emp_id = ?')
+        else:
+            where.append('T.territory_id IN (SELECT territory_id FROM employee_territory WHERE emp_id = ?)')
+        params.append(int(emp_id))
+    if active_only:
+        where.append('T.inactive = ?')
+        params.append('N')
+    if region and region.strip():
+        pattern = region.strip() + '%'
+        where.append('(UPPER(R3.descript) LIKE UPPER(?) OR UPPER(R2.descript) LIKE UPPER(?) OR UPPER(R1.descript) LIKE UPPER(?))')
+        params.extend([pattern, pattern, pattern])
+    if zone and zone.strip():
+        where.append('UPPER(R1.descript) LIKE UPPER(?)')
+        params.append(zone.strip() + '%')
+    if territory and territory.strip():
+        where.append('UPPER(T.descript) LIKE UPPER(?)')
+        params.append(territory.strip() + '%')
+    if territory_name and territory_name.strip():
+        where.append('(T.descript = ? OR T.descript = ?)')
+        params.extend([territory_name.strip(), territory_name.strip() + ' Territory'])
+    if start_date and end_date:
+        if f.dated:
+            where.append(f.period[0] + ' >= ?')
+            where.append(f.period[0] + ' <= ?')
+            params.extend([hana_mirror.to_day(start_date), hana_mirror.to_day(end_date)])
+        else:
+            where.append(f.period[0] + ' <= ?')
+            where.append(f.period[1] + ' >= ?')
+            params.extend([hana_mirror.to_timestamp(end_date), hana_mirror.to_timestamp(start_date)])
+    if where:
+        source += 'WHERE ' + ' AND '.join(where) + ' '
+
+    # Number of leading dimensions grouped by each SELECT: all of them, then
+    # one fewer per subtotal level down to the grand total
+    levels = range(len(dims), -1, -1) if rollup and dims else [len(dims)]
+    selects = []
+    for level in levels:
+        select = []
+        for i, (d, expr) in enumerate(zip(dims, group_exprs)):
+            select.append((expr if i < level else 'NULL') + ' AS "' + DIMENSIONS[d][0] + '"')
+            if d == 'territory':
+                name = "MIN(TRIM(REPLACE(T.descript, ' Territory', '')))" if i < level else 'NULL'
+                select.append(name + ' AS "TerritoryName"')
+        for m in measures:
+            select.append('SUM(' + f.measures[m] + ') AS "' + MEASURE_COLUMNS[m] + '"')
+        select.append('MIN(' + f.period[0] + ') AS "From_Date"')
+        select.append('MAX(' + f.period[1] + ') AS "To_Date"')
+        if rollup and dims:
+            select.append(str((1 << (len(dims) - level)) - 1) + ' AS "Grouping"')
+        sql = 'SELECT ' + ', '.join(select) + ' ' + source
+        if level:
+            sql += 'GROUP BY ' + ', '.join(group_exprs[:level]) + ' '
+        selects.append(sql.strip())
+
+    sql = ' UNION ALL '.join(selects)
+    if dims:
+        positions = []
+        column = 0
+        for d in dims:
+            column += 1
+            positions.append(column)
+            if d == 'territory':
+                column += 1
+        order = [str(p) + ' NULLS LAST' for p in positions]
+        if rollup:
+            order.append('"Grouping"')
+        sql += ' ORDER BY ' + ', '.join(order)
+    return sql, tuple(params) * len(selects)
+
+
+def _scaled(total, in_millions: bool):
+    value = hana_mirror.from_amount(total)
+    if value is None or not in_millions:
+        return value
+    return (value / MILLION).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _mirror_rows(rows: list, fact: str, measures, in_millions: bool) -> list:
+    """Convert mirror sums and dates to what HANA returns for the same report."""
+    f = MIRROR_FACTS[fact][1]
+    measures = list(measures or f.measures.keys())
+    as_date = hana_mirror.from_day if f.dated else hana_mirror.from_timestamp
+    for r in rows:
+        target, achievement = r.get('Target'), r.get('Achievement')
+        for m in measures:
+            r[MEASURE_COLUMNS[m]] = _scaled(r[MEASURE_COLUMNS[m]], in_millions)
+        if 'target' in measures and 'achievement' in measures:
+            if target and target > 0:
+                r['Percentage'] = (Decimal(achievement or 0) * 100 / Decimal(target)).quantize(
+                    Decimal('0.01'), rounding=ROUND_HALF_UP)
+            else:
+                r['Percentage'] = Decimal(0)
+        r['From_Date'] = as_date(r['From_Date'])
+        r['To_Date'] = as_date(r['To_Date'])
+        if r.get('Day') is not None:
+            r['Day'] = hana_mirror.from_day(r['Day'])
+    return rows
+
+
+def closed_report(schema: str, fact: str, dimensions=(), measures=None, **filters):
+    """
+    The report from the closed-month mirror of ``schema``, or None when it has
+    to come from HANA: the fact or a measure is not mirrored, the range is
+    open-ended, or it reaches the mirror's cutoff.
+    """
+    start_date, end_date = filters.get('start_date'), filters.get('end_date')
+    if fact not in MIRROR_FACTS or not (start_date and end_date):
+        return None
+    table, f = MIRROR_FACTS[fact]
+    if any(m not in f.measures for m in (measures or FACTS[fact].measures)):
+        return None
+    store, cutoff = hana_connect._mirror_for(None, table, schema=schema)
+    if cutoff is None or hana_mirror.to_day(end_date) >= cutoff.isoformat():
+        return None
+    sql, params = build_mirror(fact, dimensions, measures, **filters)
+    rows = hana_rows.fetch(store.connect().execute(sql, params))
+    return _mirror_rows(rows, fact, measures, filters.get('in_millions', False))
+
+
+def report(connect, schema: str, fact: str, dimensions=(), measures=None, **filters) -> list:
+    """
+    Run a report, from the mirror when the period is closed (``closed_report``)
+    and otherwise on the connection ``connect()`` opens, which is then closed.
+    """
+    rows = closed_report(schema, fact, dimensions, measures, **filters)
+    if rows is not None:
+        return rows
+    db = connect()
+    try:
+        return run(db, fact, dimensions, measures, **filters)
+    finally:
+        db.close()
+
+
+def is_total(row: dict, dimensions, dimension: str) -> bool:
+    """True when ``row`` is a ROLLUP subtotal over ``dimension`` (or a coarser level)."""
+    dims = list(dimensions)
+    bit = len(dims) - 1 - dims.index(dimension)
+    return bool(int(row.get('Grouping') or 0) & (1 << bit))
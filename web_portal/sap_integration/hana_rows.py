@@ -0,0 +1,183 @@
+"""
+Result materialization for HANA cursors.
+
+Column names are read from ``cursor.description`` once per cursor and rows are
+pulled with ``fetchmany`` in batches. Optional value conversion (Decimal to
+float, dates/times to ISO strings) is resolved once per column from the first
+non-null value instead of being re-checked on every cell, so views no longer
+need a second pass over the rows to make them JSON-friendly. A column that is
+null throughout a batch is looked at again in the next one.
+
+Shapes:
+    'dicts'   - list of {column: value} (default, same as hana_connect._fetch_all)
+    'tuples'  - list of value tuples, in column order
+    'columns' - {column: [values...]}, one list per column
+"""
+from decimal import Decimal
+from datetime import date, datetime, time
+from itertools import repeat
+from operator import methodcaller
+
+DEFAULT_BATCH_SIZE = 2000
+
+SHAPES = ('dicts', 'tuples', 'columns')
+
+
+_isoformat = methodcaller('isoformat')
+
+
+def _column_to_float(values) -> list:
+    try:
+        return list(map(float, values))
+    except TypeError:
+        return [float(v) if v is not None else None for v in values]
+
+
+def _column_to_isoformat(values) -> list:
+    try:
+        return list(map(_isoformat, values))
+    except AttributeError:
+        return [v.isoformat() if v is not None else None for v in values]
+
+
+def _json_converter(sample):
+    """Column converter for a column whose first non-null value is ``sample``."""
+    if isinstance(sample, Decimal):
+        return _column_to_float
+    if isinstance(sample, (date, datetime, time)):
+        return _column_to_isoformat
+    return None
+
+
+CONVERTERS = {
+    None: None,
+    'json': _json_converter,
+}
+
+
+def column_names(cur) -> list:
+    return [d[0] for d in cur.description] if cur.description else []
+
+
+class RowReader:
+    """Reads all rows of an executed cursor in batches."""
+
+    def __init__(self, cur, convert: str | None = None, batch_size: int = DEFAULT_BATCH_SIZE):
+        if convert not in CONVERTERS:
+            raise ValueError(f'Unknown conversion: {convert!r}')
+        self.cur = cur
+        self.columns = column_names(cur)
+        self.batch_size = batch_size
+        self._factory = CONVERTERS[convert]
+        self._converters = []
+        # Columns whose converter is not known yet (None until the first batch)
+        self._pending = None
+
+    def _resolve_converters(self, batch) -> None:
+        if self._pending is None:
+            self._pending = set(range(len(self.columns))) if self._factory is not None else set()
+        pending = self._pending
+        for row in batch:
+            if not pending:
+                break
+            for i in list(pending):
+                v = row[i]
+                if v is not None:
+                    converter = self._factory(v)
+                    if converter is not None:
+                        self._converters.append((i, converter))
+                    pending.discard(i)
+
+    def _normalize(self, batch) -> list:
+        if batch and isinstance(batch[0], dict):
+            if not self.columns:
+                self.columns = list(batch[0].keys())
+            cols = self.columns
+            batch = [tuple(r.get(c) for c in cols) for r in batch]
+        self._resolve_converters(batch)
+        return batch
+
+    def _as_columns(self, batch) -> list:
+        """Converted values of ``batch`` as one sequence per column."""
+        columns = list(zip(*self._normalize(batch)))
+        for i, conv in self._converters:
+            columns[i] = conv(columns[i])
+        return columns
+
+    def _as_tuples(self, batch) -> list:
+        batch = self._normalize(batch)
+        if not self._converters:
+            return list(map(tuple, batch))
+        # Convert column by column, then transpose back into rows
+        return list(zip(*self._as_columns(batch)))
+
+    def _raw_batches(self):
+        fetchmany = getattr(self.cur, 'fetchmany', None)
+        if fetchmany is None:
+            rows = self.cur.fetchall()
+            if rows:
+                yield list(rows)
+            return
+        while True:
+            rows = fetchmany(self.batch_size)
+            if not rows:
+                return
+            yield list(rows)
+
+    def batches(self):
+        """Yield lists of value tuples, one ``fetchmany`` batch at a time."""
+        for rows in self._raw_batches():
+            yield self._as_tuples(rows)
+
+    def iter_tuples(self):
+        for batch in self.batches():
+            yield from batch
+
+    def iter_dicts(self):
+        for batch in self.batches():
+            yield from map(dict, map(zip, repeat(self.columns), batch))
+
+    def tuples(self) -> list:
+        out = []
+        for batch in self.batches():
+            out.extend(batch)
+        return out
+
+    def dicts(self) -> list:
+        out = []
+        for batch in self.batches():
+            out.extend(map(dict, map(zip, repeat(self.columns), batch)))
+        return out
+
+    def column_arrays(self) -> dict:
+        arrays = None
+        for rows in self._raw_batches():
+            columns = self._as_columns(rows)
+            if arrays is None:
+                arrays = [[] for _ in self.columns]
+            for arr, values in zip(arrays, columns):
+                arr.extend(values)
+        return dict(zip(self.columns, arrays or [[] for _ in self.columns]))
+
+    def read(self, shape: str = 'dicts'):
+        if shape == 'dicts':
+            return self.dicts()
+        if shape == 'tuples':
+            return self.tuples()
+        if shape == 'columns':
+            return self.column_arrays()
+        raise ValueError(f'Unknown result shape: {shape!r}')
+
+
+def fetch(cur, shape: str = 'dicts', convert: str | None = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Materialize every remaining row of ``cur`` in the requested shape."""
+    return RowReader(cur, convert=convert, batch_size=batch_size).read(shape)
+
+
+def fetch_first(cur, convert: str | None = None):
+    """First row of ``cur`` as a dict, or None."""
+    row = cur.fetchone()
+    if row is None:
+        return None
+    reader = RowReader(cur, convert=convert)
+    return dict(zip(reader.columns, reader._as_tuples([row])[0]))
@@ -0,0 +1,196 @@
+"""
+Registry of named, parameterized HANA statements.
+
+Every lookup registers its SQL once under a stable name, using ``?`` placeholders
+for all values. Because the statement text never changes between calls, HANA
+reuses the cached plan instead of compiling a new one per value, and values are
+always sent as bound parameters.
+
+On hdbcli connections each statement is prepared once per connection and the
+prepared cursor is reused for later executions on that connection. Execution
+counts and latency are recorded per statement name (see ``stats()``).
+"""
+import threading
+import time
+import logging
+
+try:
+    from . import hana_rows
+except ImportError:
+    import hana_rows
+
+logger = logging.getLogger("hana")
+
+# Statements slower than this are logged as warnings
+SLOW_STATEMENT_MS = 2000
+
+
+class Statement:
+    __slots__ = ('name', 'sql', 'calls', 'errors', 'total_ms', 'max_ms')
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 3),
+        }
+
+
+_statements = {}
+_lock = threading.Lock()
+# id(connection) -> (connection, {statement name: prepared cursor})
+# hdbcli connections cannot be weakly referenced, so entries hold the
+# connection and are dropped once it reports itself closed.
+_prepared = {}
+
+
+def register(name: str, sql: str) -> Statement:
+    """Register ``sql`` under ``name``. Registering the same text again is a no-op."""
+    with _lock:
+        stmt = _statements.get(name)
+        if stmt is None:
+            stmt = Statement(name, sql)
+            _statements[name] = stmt
+        elif stmt.sql != sql:
+            raise ValueError(f'HANA statement {name!r} is already registered with different SQL')
+        return stmt
+
+
+def get(name: str) -> Statement:
+    try:
+        return _statements[name]
+    except KeyError:
+        raise KeyError(f'Unknown HANA statement: {name}') from None
+
+
+def _is_open(db) -> bool:
+    check = getattr(db, 'isconnected', None)
+    if check is None:
+        return False
+    try:
+        return bool(check())
+    except Exception:
+        return False
+
+
+def _cursor_cache(db):
+    """Prepared cursor cache for ``db``, or None when it cannot be tracked."""
+    entry = _prepared.get(id(db))
+    if entry is not None and entry[0] is db:
+        return entry[1]
+    if not _is_open(db):
+        return None
+    with _lock:
+        for key, (conn, cursors) in list(_prepared.items()):
+            if not _is_open(conn):
+                _prepared.pop(key, None)
+        cache = {}
+        _prepared[id(db)] = (db, cache)
+    return cache
+
+
+def _prepared_cursor(db, stmt: Statement):
+    """Return ``(cursor, prepared, cached)`` for running ``stmt`` on ``db``."""
+    cache = _cursor_cache(db)
+    if cache is not None and stmt.name in cache:
+        return cache[stmt.name], True, True
+
+    cur = db.cursor()
+    if hasattr(cur, 'prepare') and hasattr(cur, 'executeprepared'):
+        try:
+            cur.prepare(stmt.sql)
+        except Exception as e:
+            logger.warning(f"Could not prepare HANA statement {stmt.name}: {e}")
+            return cur, False, False
+        if cache is not None:
+            cache[stmt.name] = cur
+        return cur, True, cache is not None
+    return cur, False, False
+
+
+def _run(db, name: str, params, one: bool, shape: str = 'dicts', convert: str | None = None):
+    stmt = get(name)
+    params = tuple(params or ())
+    start = time.perf_counter()
+    failed = False
+    try:
+        cur, prepared, cached = _prepared_cursor(db, stmt)
+        try:
+            if prepared:
+                cur.executeprepared(params)
+            else:
+                cur.execute(stmt.sql, params)
+            if one:
+                return hana_rows.fetch_first(cur, convert=convert)
+            return hana_rows.fetch(cur, shape=shape, convert=convert)
+        finally:
+            if not cached:
+                cur.close()
+    except Exception:
+        failed = True
+        # Drop a possibly broken prepared cursor so the next call re-prepares
+        entry = _prepared.get(id(db))
+        if entry is not None and entry[0] is db:
+            entry[1].pop(stmt.name, None)
+        raise
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000.0
+        with _lock:
+            stmt.calls += 1
+            stmt.total_ms += elapsed
+            if elapsed > stmt.max_ms:
+                stmt.max_ms = elapsed
+            if failed:
+                stmt.errors += 1
+        if elapsed > SLOW_STATEMENT_MS:
+            logger.warning(f"Slow HANA statement {stmt.name}: {elapsed:.0f} ms")
+
+
+def fetch_all(db, name: str, params=(), shape: str = 'dicts', convert: str | None = None):
+    """Execute the named statement and return all rows (see hana_rows for shapes)."""
+    return _run(db, name, params, one=False, shape=shape, convert=convert)
+
+
+def fetch_one(db, name: str, params=(), convert: str | None = None):
+    """Execute the named statement and return the first row as a dict, or None."""
+    return _run(db, name, params, one=True, convert=convert)
+
+
+def release(db) -> None:
+    """Close the prepared cursors held for ``db`` (call before closing it)."""
+    with _lock:
+        entry = _prepared.pop(id(db), None)
+    if entry is None or entry[0] is not db:
+        return
+    for cur in entry[1].values():
+        try:
+            cur.close()
+        except Exception:
+            pass
+
+
+def stats() -> list:
+    """Per-statement execution counts and latency, slowest total first."""
+    with _lock:
+        rows = [s.as_dict() for s in _statements.values() if s.calls]
+    return sorted(rows, key=lambda r: r['total_ms'], reverse=True)
+
+
+def reset_stats() -> None:
+    with _lock:
+        for s in _statements.values():
+            s.calls = 0
+            s.errors = 0
+            s.total_ms = 0.0
+            s.max_ms = 0.0
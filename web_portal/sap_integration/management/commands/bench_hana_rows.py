@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for HANA result materialization.
+
+Feeds a fake cursor producing N report-like rows (strings, Decimals, dates)
+through the previous per-column row building plus a JSON conversion pass, and
+through hana_rows in each shape. No database connection is needed.
+
+    python manage.py bench_hana_rows --rows 100000
+"""
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from sap_integration import hana_rows
+
+
+class FakeCursor:
+    description = [
+        ('TERRITORYID', None), ('TERRITORYNAME', None), ('EMPID', None),
+        ('SALES_TARGET', None), ('ACCHIVEMENT', None), ('F_REFDATE', None), ('T_REFDATE', None),
+    ]
+
+    def __init__(self, rows: int):
+        start = date(2025, 1, 1)
+        self._rows = [
+            (i % 120, f'Territory {i % 120}', i % 900, Decimal('150000.25') + i, Decimal('90000.75') + i,
+             start + timedelta(days=i % 365), start + timedelta(days=i % 365 + 30))
+            for i in range(rows)
+        ]
+        self._pos = 0
+
+    def fetchall(self):
+        rows, self._pos = self._rows[self._pos:], len(self._rows)
+        return rows
+
+    def fetchmany(self, size):
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+
+def legacy_fetch_all(cur):
+    """Row building as hana_connect._fetch_all did it, plus the usual view pass."""
+    rows = cur.fetchall()
+    cols = [d[0] for d in cur.description]
+    out = []
+    for r in rows:
+        row = {}
+        for i, c in enumerate(cols):
+            v = None
+            try:
+                v = r[i]
+            except Exception:
+                try:
+                    v = getattr(r, c)
+                except Exception:
+                    v = None
+            row[c] = v
+        out.append(row)
+    for row in out:
+        for k, v in row.items():
+            if isinstance(v, Decimal):
+                row[k] = float(v)
+            elif hasattr(v, 'isoformat'):
+                row[k] = v.isoformat()
+    return out
+
+
+class Command(BaseCommand):
+    help = 'Benchmark HANA row materialization against a fake cursor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Number of fake rows')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant (best is reported)')
+
+    def handle(self, *args, **options):
+        n = options['rows']
+        cases = [
+            ('legacy dicts + view conversion', lambda cur: legacy_fetch_all(cur)),
+            ('hana_rows dicts (json)', lambda cur: hana_rows.fetch(cur, convert='json')),
+            ('hana_rows tuples (json)', lambda cur: hana_rows.fetch(cur, shape='tuples', convert='json')),
+            ('hana_rows columns (json)', lambda cur: hana_rows.fetch(cur, shape='columns', convert='json')),
+            ('hana_rows stream (json)', lambda cur: sum(1 for _ in hana_rows.RowReader(cur, convert='json').iter_dicts())),
+            ('hana_rows dicts (raw)', lambda cur: hana_rows.fetch(cur)),
+        ]
+        self.stdout.write(f'{n} rows, best of {options["repeat"]}')
+        baseline = None
+        for label, fn in cases:
+            best = None
+            for _ in range(options['repeat']):
+                cur = FakeCursor(n)
+                start = time.perf_counter()
+                fn(cur)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            baseline = baseline or best
+            self.stdout.write(f'{label:<34} {best * 1000:9.1f} ms  {baseline / best:5.2f}x')
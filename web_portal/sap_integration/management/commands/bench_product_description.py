@@ -0,0 +1,84 @@
+"""
+Micro-benchmark for the product document page's product lookup.
+
+Compares the former in-process dispatch (RequestFactory request through
+get_product_description_api, DRF negotiation and rendering, JSON parsed back)
+with calling the product description service directly. The HANA lookup is
+replaced by a canned result, so only the dispatch overhead is measured and no
+database connection is needed.
+
+    python manage.py bench_product_description --calls 2000
+"""
+import json
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from sap_integration import views
+
+SAMPLE = {
+    'item_code': 'FG00904',
+    'item_name': 'BAAP- 18-Ltrs.',
+    'description': 'Broad spectrum fungicide ' * 20,
+    'price': 1850.0,
+    'atc_entry': 1083,
+    'product_image': 'Baap-3-Ltr.png',
+    'product_description_urdu': 'باپ.docx',
+    'product_description_english': 'BAAP.docx',
+    'image_file': 'Baap-3-Ltr',
+    'image_ext': 'png',
+    'urdu_file': 'باپ',
+    'urdu_ext': 'docx',
+    'english_file': 'BAAP',
+    'english_ext': 'docx',
+    'product_image_url': '/media/product_images/4B-AGRI/Baap-3-Ltr.png',
+    'product_description_urdu_url': '/media/product_images/4B-AGRI/urdu/باپ.png',
+    'product_description_english_url': '/media/product_images/4B-AGRI/english/BAAP.png',
+    'has_document': True,
+    'attachments': [
+        {'file_name': 'Baap-3-Ltr', 'file_ext': 'png', 'category': 'Product Image', 'has_description': True},
+        {'file_name': 'باپ', 'file_ext': 'docx', 'category': 'Product Description Urdu', 'has_description': False},
+    ],
+}
+
+
+def via_request_factory(factory, item_code, database):
+    """The lookup as product_document_view used to do it."""
+    api_request = factory.get('/api/sap/product-description/', {'item_code': item_code, 'database': database})
+    api_request.session = {}
+    api_request.user = AnonymousUser()
+    api_response = views.get_product_description_api(api_request)
+    api_response.render()
+    return json.loads(api_response.content)['data']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark RequestFactory self-dispatch against a direct product description service call'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=2000, help='Lookups per variant')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant (best is reported)')
+
+    def handle(self, *args, **options):
+        n = options['calls']
+        factory = RequestFactory()
+        cases = [
+            ('RequestFactory -> API view -> JSON', lambda: via_request_factory(factory, 'FG00904', '4B-AGRI_LIVE')),
+            ('direct service call', lambda: views.get_product_description('FG00904', '4B-AGRI_LIVE')),
+        ]
+        self.stdout.write(f'{n} lookups, best of {options["repeat"]}')
+        baseline = None
+        with mock.patch.object(views, 'get_product_description', return_value=SAMPLE):
+            for label, fn in cases:
+                best = None
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    for _ in range(n):
+                        fn()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                baseline = baseline or best
+                self.stdout.write(f'{label:<36} {best / n * 1e6:9.1f} us/call  {baseline / best:7.1f}x')
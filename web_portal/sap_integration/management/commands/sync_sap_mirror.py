@@ -0,0 +1,90 @@
+"""
+Django Management Command: Sync the local SAP analytics mirror
+==============================================================
+Copies closed months of B4_SALES_TARGET_NEW3, OINV/ORIN and ORCT (plus the
+OTER / B4_EMP lookups) from HANA into SQLite files under
+SAP_ANALYTICS_MIRROR_DIR, one file per company schema.
+
+Usage:
+    python manage.py sync_sap_mirror                 # every configured company
+    python manage.py sync_sap_mirror --db 4B-BIO     # one company (SAP_COMPANY_DB key)
+    python manage.py sync_sap_mirror --since 2025-01 # re-copy from a month on
+    python manage.py sync_sap_mirror --full          # re-copy everything
+
+Run it nightly (and shortly after month end) from cron.
+"""
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sap_integration import hana_mirror, hana_statements
+
+
+def _company_keys() -> list:
+    """Keys of the SAP_COMPANY_DB setting, or [None] for the default schema."""
+    try:
+        from preferences.models import Setting
+        s = Setting.objects.filter(slug='SAP_COMPANY_DB').first()
+        raw = s.value if s else None
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+        if isinstance(raw, dict) and raw:
+            return [str(k).strip().strip('"').strip("'") for k in raw.keys()]
+    except Exception:
+        pass
+    return [None]
+
+
+class Command(BaseCommand):
+    help = 'Copy closed-month SAP sales target, invoice and receipt facts into the local analytics mirror'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--db', action='append', dest='dbs', help='Company key to sync (repeatable; default: all)')
+        parser.add_argument('--since', type=str, help='Re-copy facts from this month on (YYYY-MM)')
+        parser.add_argument('--full', action='store_true', help='Re-copy all closed months')
+        parser.add_argument('--dir', type=str, help='Mirror directory (default: SAP_ANALYTICS_MIRROR_DIR)')
+
+    def handle(self, *args, **options):
+        from FieldAdvisoryService.views import get_hana_connection
+
+        directory = options['dir'] or getattr(settings, 'SAP_ANALYTICS_MIRROR_DIR', '')
+        if not directory:
+            raise CommandError('Set SAP_ANALYTICS_MIRROR_DIR or pass --dir')
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--since must look like YYYY-MM')
+
+        backend = hana_mirror.MirrorBackend(directory)
+        failed = False
+        for key in options['dbs'] or _company_keys():
+            label = key or 'default'
+            conn = get_hana_connection(None, key)
+            if conn is None:
+                self.stdout.write(self.style.ERROR(f"{label}: could not connect to HANA"))
+                failed = True
+                continue
+            try:
+                cur = conn.cursor()
+                cur.execute('SELECT CURRENT_SCHEMA FROM DUMMY')
+                schema = cur.fetchone()[0]
+                cur.close()
+                store = backend.store(schema)
+                started = datetime.now()
+                copied = hana_mirror.sync(conn, store, since=since, full=options['full'])
+                elapsed = (datetime.now() - started).total_seconds()
+                counts = ', '.join(f"{k}={v}" for k, v in copied.items())
+                self.stdout.write(self.style.SUCCESS(f"{label} ({schema}): {counts} in {elapsed:.1f}s -> {store.path}"))
+                store.close()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"{label}: sync failed: {e}"))
+                failed = True
+            finally:
+                hana_statements.release(conn)
+                conn.close()
+        if failed:
+            raise CommandError('Mirror sync failed for one or more companies')
@@ -0,0 +1,62 @@
+"""
+Django Management Command: Pre-render product description documents
+====================================================================
+Converts every .docx under media/product_images (all company folders and
+their urdu/english sub-folders) to HTML and stores it in the product document
+cache, so the first visitor of a product page does not pay for the conversion.
+Documents already cached for their current version are skipped.
+
+Usage:
+    python manage.py warm_product_documents                  # mammoth HTML
+    python manage.py warm_product_documents --method custom  # custom parser HTML
+    python manage.py warm_product_documents --folder 4B-BIO  # one company folder
+    python manage.py warm_product_documents --clear          # drop the cache first
+
+Run it after uploading new product documents.
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sap_integration.utils import document_cache
+
+
+class Command(BaseCommand):
+    help = 'Convert product description documents to HTML ahead of time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=['mammoth', 'custom'], default='mammoth',
+                            help='Parser mode to render (default: mammoth)')
+        parser.add_argument('--folder', action='append', dest='folders',
+                            help='Company folder under product_images (repeatable; default: all)')
+        parser.add_argument('--clear', action='store_true', help='Remove every cached document first')
+
+    def handle(self, *args, **options):
+        if not document_cache.enabled():
+            raise CommandError('PRODUCT_DOCUMENT_CACHE_ENABLED is off')
+        if options['clear']:
+            document_cache.clear()
+
+        root = os.path.join(settings.MEDIA_ROOT, 'product_images')
+        roots = [os.path.join(root, f) for f in options['folders']] if options['folders'] else [root]
+        mode = options['method']
+        rendered = cached = failed = 0
+        for folder in roots:
+            if not os.path.isdir(folder):
+                raise CommandError(f'No such folder: {folder}')
+            for path in document_cache.product_documents(folder):
+                if document_cache.get(path, mode) is not None:
+                    cached += 1
+                elif document_cache.render(path, mode) is not None:
+                    rendered += 1
+                    self.stdout.write(f'  rendered {os.path.relpath(path, root)}')
+                else:
+                    failed += 1
+                    self.stderr.write(f'  failed   {os.path.relpath(path, root)}')
+
+        stats = document_cache.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'{rendered} rendered, {cached} already cached, {failed} failed; '
+            f"cache holds {stats['entries']} documents ({stats['bytes'] // 1024} KB of {stats['max_bytes'] // 1024} KB)"
+        ))
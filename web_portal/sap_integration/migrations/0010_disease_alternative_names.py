@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sap_integration', '0009_policy_company_aware'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diseaseidentification',
+            name='scientific_name',
+            field=models.CharField(blank=True, default='', help_text="Scientific name of the pathogen, e.g. 'Puccinia triticina'", max_length=255),
+        ),
+        migrations.AddField(
+            model_name='diseaseidentification',
+            name='synonyms',
+            field=models.TextField(blank=True, default='', help_text='Other names for this disease, comma-separated'),
+        ),
+    ]
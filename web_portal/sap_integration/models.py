@@ -91,6 +91,10 @@ class DiseaseIdentification(models.Model):
     description = models.TextField(blank=True, null=True, help_text="U_Description - Detailed disease description")
     disease_name = models.CharField(max_length=255, help_text="U_Disease - Disease scientific/common name")
     
+    # Alternative names used when matching Kindwise identifications (kindwise.disease_index)
+    scientific_name = models.CharField(max_length=255, blank=True, default='', help_text="Scientific name of the pathogen, e.g. 'Puccinia triticina'")
+    synonyms = models.TextField(blank=True, default='', help_text="Other names for this disease, comma-separated")
+    
     # Additional fields for better management
     is_active = models.BooleanField(default=True, help_text="Is this disease entry active?")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,303 @@
+"""
+Product description lookup shared by the product description API and the
+product document page.
+
+``get_product_description`` returns plain Python data (the same dict the API
+sends as ``data``), so HTML views call it directly instead of dispatching a
+fake request through the API view and parsing its JSON back.
+"""
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+from .hana_connect import _fetch_all, _load_env_file as _hana_load_env_file, quote_ident
+
+IMAGE_EXTS = ('png', 'jpg', 'jpeg', 'webp', 'gif')
+
+# Image and descriptions matched by U_IMG_C category. Join ATC1 directly (no OATC intermediate).
+DESCRIPTION_SQL = """
+SELECT
+    T0."ItemCode",
+    T0."ItemName",
+    T0."AtcEntry",
+    MAX(
+        CASE
+            WHEN A."U_IMG_C" = 'Product Image'
+            THEN A."FreeText"
+        END
+    ) AS "Description",
+    MIN(
+        CASE
+            WHEN A."U_IMG_C" = 'Product Image'
+            THEN A."FileName" || '.' || A."FileExt"
+        END
+    ) AS "Product_Image",
+    MAX(
+        CASE
+            WHEN A."U_IMG_C" = 'Product Description Urdu'
+            THEN A."FileName" || '.' || A."FileExt"
+        END
+    ) AS "Product_Description_Urdu",
+    MAX(
+        CASE
+            WHEN A."U_IMG_C" = 'Product Description English'
+            THEN A."FileName" || '.' || A."FileExt"
+        END
+    ) AS "Product_Description_English"
+FROM OITM T0
+LEFT JOIN ATC1 A
+    ON A."AbsEntry" = T0."AtcEntry"
+WHERE
+    T0."ItemCode" = ?
+GROUP BY
+    T0."ItemCode",
+    T0."ItemName",
+    T0."AtcEntry"
+"""
+
+PRICE_SQL = (
+    'SELECT T1."U_np" AS "Price" '
+    'FROM "@PLR4" T1 '
+    'INNER JOIN "@PL1" T0 ON T0."DocEntry" = T1."DocEntry" '
+    'WHERE T1."U_itc" = ?'
+)
+
+
+class ProductDescriptionError(Exception):
+    """Lookup failure; ``status`` is the HTTP status the API answers with."""
+
+    def __init__(self, message: str, status: int = 500):
+        super().__init__(message)
+        self.status = status
+
+
+def _load_env() -> None:
+    try:
+        _hana_load_env_file(os.path.join(os.path.dirname(__file__), '.env'))
+        _hana_load_env_file(os.path.join(str(settings.BASE_DIR), '.env'))
+        _hana_load_env_file(os.path.join(str(Path(settings.BASE_DIR).parent), '.env'))
+        _hana_load_env_file(os.path.join(os.getcwd(), '.env'))
+    except Exception:
+        pass
+
+
+def connect(database: str = ''):
+    """HANA connection with ``database`` as current schema (HANA_SCHEMA when empty)."""
+    _load_env()
+    cfg = {
+        'host': os.environ.get('HANA_HOST', ''),
+        'port': os.environ.get('HANA_PORT', '30015'),
+        'user': os.environ.get('HANA_USER', ''),
+        'encrypt': os.environ.get('HANA_ENCRYPT', ''),
+        'ssl_validate': os.environ.get('HANA_SSL_VALIDATE', ''),
+    }
+    pwd = os.environ.get('HANA_PASSWORD', '')
+    if not all([cfg['host'], cfg['port'], cfg['user'], pwd]):
+        raise ProductDescriptionError('SAP HANA configuration is incomplete')
+
+    from hdbcli import dbapi
+
+    kwargs = {
+        'address': cfg['host'],
+        'port': int(cfg['port']),
+        'user': cfg['user'],
+        'password': pwd
+    }
+    if str(cfg['encrypt']).strip().lower() in ('true', '1', 'yes'):
+        kwargs['encrypt'] = True
+        if cfg['ssl_validate']:
+            kwargs['sslValidateCertificate'] = (str(cfg['ssl_validate']).strip().lower() in ('true', '1', 'yes'))
+    try:
+        conn = dbapi.connect(**kwargs)
+    except Exception as e:
+        raise ProductDescriptionError(f'Database connection failed: {str(e)}')
+
+    if database:
+        # Schema names can contain hyphens in HANA
+        cur = conn.cursor()
+        try:
+            cur.execute(f'SET SCHEMA {quote_ident(database)}')
+        finally:
+            cur.close()
+    return conn
+
+
+def _split_file(combined):
+    """'Name.ext' -> ('Name', 'ext')"""
+    if not combined:
+        return None, None
+    parts = combined.rsplit('.', 1)
+    return (parts[0], parts[1]) if len(parts) == 2 else (parts[0], None)
+
+
+def _scan_disk(disk_dir: str, base: str):
+    """Exact match: {base}.{ext} for any image ext."""
+    if not base:
+        return None
+    for ext in IMAGE_EXTS:
+        candidate = f'{base}.{ext}'
+        if os.path.isfile(os.path.join(disk_dir, candidate)):
+            return candidate
+    return None
+
+
+def _scan_disk_digit_suffix(disk_dir: str, base: str):
+    """Match {base}{digits}.{ext} (e.g. Greenia -> greenia2.jpeg). Picks alphabetically first."""
+    if not base or not os.path.isdir(disk_dir):
+        return None
+    base_lower = base.lower()
+    candidates = []
+    try:
+        for fname in os.listdir(disk_dir):
+            name, _dot, ext = fname.rpartition('.')
+            if not _dot or ext.lower() not in IMAGE_EXTS:
+                continue
+            if not name.lower().startswith(base_lower):
+                continue
+            rest = name[len(base):]
+            # Require the part after `base` to be purely digits (allow empty so exact match also lands here)
+            if rest.isdigit() or rest == '':
+                candidates.append(fname)
+    except OSError:
+        return None
+    return sorted(candidates)[0] if candidates else None
+
+
+def _simple_name(name: str) -> str:
+    if not name:
+        return ''
+    return name.split()[0].split('-')[0].split('(')[0].strip()
+
+
+def _resolve_url(folder_name: str, subfolder: str, sap_full: str, item_code: str, item_name: str) -> str | None:
+    """
+    Media URL of a product file, in priority order:
+      1. SAP's FileName (without extension) -> scan disk for any image extension
+      2. ItemCode (e.g. FG00682) -> scan disk for any image extension
+      3. Simplified item name (first word before space/dash/paren) -> scan disk
+      4. Fallback: SAP's verbatim filename URL when SAP holds an attachment
+    """
+    try:
+        media_root = settings.MEDIA_ROOT
+    except Exception:
+        media_root = 'media'
+    sub_path = f'{subfolder}/' if subfolder else ''
+    disk_dir = (os.path.join(media_root, 'product_images', folder_name, subfolder)
+                if subfolder else os.path.join(media_root, 'product_images', folder_name))
+    if sap_full:
+        found = _scan_disk(disk_dir, sap_full.rsplit('.', 1)[0])
+        if found:
+            return f'/media/product_images/{folder_name}/{sub_path}{found}'
+    found = _scan_disk(disk_dir, item_code or '')
+    if found:
+        return f'/media/product_images/{folder_name}/{sub_path}{found}'
+    # Also matches with trailing digits (Greenia -> greenia2.jpeg)
+    simple = _simple_name(item_name or '')
+    if simple and len(simple) > 2:
+        found = _scan_disk_digit_suffix(disk_dir, simple)
+        if found:
+            return f'/media/product_images/{folder_name}/{sub_path}{found}'
+    if sap_full:
+        return f'/media/product_images/{folder_name}/{sub_path}{sap_full}'
+    return None
+
+
+def _best_price(conn, item_code: str) -> float:
+    """Highest @PLR4 price of the item, 0 when there is none or the lookup fails."""
+    price = 0.0
+    try:
+        for pr in _fetch_all(conn, PRICE_SQL, (item_code,)):
+            try:
+                price_val = float(pr.get('Price')) if pr.get('Price') is not None else 0.0
+            except (ValueError, TypeError):
+                price_val = 0.0
+            price = max(price, price_val)
+    except Exception:
+        pass
+    return price
+
+
+def fetch_product_description(conn, item_code: str, database: str = '') -> dict | None:
+    """Description, attachments, media URLs and price of one item; None if it does not exist."""
+    cur = conn.cursor()
+    try:
+        cur.execute(DESCRIPTION_SQL, (item_code,))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+    if not rows or not rows[0][0]:
+        return None
+
+    row = rows[0]
+    item_code_result = row[0]
+    item_name = row[1]
+    atc_entry = row[2]
+    description = row[3]                 # FreeText from Product Image line
+    product_image = row[4]               # e.g. "Black-Gold.png"
+    product_desc_urdu = row[5]           # e.g. "بلیک گولڈ 5.docx"
+    product_desc_english = row[6]        # e.g. "Black-Gold-English.docx"
+
+    image_file, image_ext = _split_file(product_image)
+    urdu_file, urdu_ext = _split_file(product_desc_urdu)
+    english_file, english_ext = _split_file(product_desc_english)
+
+    # Folder name from schema/database name (e.g., "4B-AGRI_LIVE" -> "4B-AGRI")
+    folder_name = 'default'
+    if database:
+        folder_name = database.replace('_APP', '').replace('_LIVE', '').replace('_TEST', '').strip()
+
+    def resolve(subfolder, sap_full):
+        return _resolve_url(folder_name, subfolder, sap_full or '', item_code_result, item_name)
+
+    all_attachments = []
+    if product_image:
+        all_attachments.append({'file_name': image_file, 'file_ext': image_ext, 'category': 'Product Image', 'has_description': bool(description)})
+    if product_desc_urdu:
+        all_attachments.append({'file_name': urdu_file, 'file_ext': urdu_ext, 'category': 'Product Description Urdu', 'has_description': False})
+    if product_desc_english:
+        all_attachments.append({'file_name': english_file, 'file_ext': english_ext, 'category': 'Product Description English', 'has_description': False})
+
+    return {
+        'item_code': item_code_result,
+        'item_name': item_name,
+        'description': description,  # FreeText - Product Description
+        'price': _best_price(conn, item_code),  # Price from @PLR4 or 0 if not found
+        'atc_entry': atc_entry,
+        'product_image': product_image,          # e.g. "Black-Gold.png"  (FileName.FileExt)
+        'product_description_urdu': product_desc_urdu,  # e.g. "بلیک گولڈ 5.docx"
+        'product_description_english': product_desc_english,  # e.g. "Black-Gold-English.docx"
+        'image_file': image_file,
+        'image_ext': image_ext,
+        'urdu_file': urdu_file,
+        'urdu_ext': urdu_ext,
+        'english_file': english_file,
+        'english_ext': english_ext,
+        'product_image_url': resolve('', product_image),  # Full URL to product image
+        'product_description_urdu_url': resolve('urdu', product_desc_urdu),  # Full URL to Urdu description
+        'product_description_english_url': resolve('english', product_desc_english),  # Full URL to English description
+        'has_document': bool(description or urdu_file or english_file),  # True if has description or Urdu/English file
+        'attachments': all_attachments  # All attachment details
+    }
+
+
+def get_product_description(item_code: str, database: str = '') -> dict:
+    """
+    Product description for ``item_code`` in ``database`` (HANA_SCHEMA when empty).
+
+    Raises ProductDescriptionError: status 404 for an unknown item, 500 for
+    missing configuration or connection failures.
+    """
+    _load_env()
+    database = (database or os.environ.get('HANA_SCHEMA') or '').strip()
+    conn = connect(database)
+    try:
+        data = fetch_product_description(conn, item_code, database)
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    if data is None:
+        raise ProductDescriptionError(f'Product with ItemCode {item_code} not found', status=404)
+    return data
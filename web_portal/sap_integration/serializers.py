@@ -82,7 +82,7 @@ class DiseaseIdentificationSerializer(serializers.ModelSerializer):
         model = DiseaseIdentification
         fields = (
             'id', 'doc_entry', 'item_code', 'item_name', 'description',
-            'disease_name', 'is_active', 'created_at', 'updated_at',
+            'disease_name', 'scientific_name', 'synonyms', 'is_active', 'created_at', 'updated_at',
             'recommended_products', 'recommended_products_count'
         )
         read_only_fields = ('created_at', 'updated_at')
@@ -1,3 +1,5 @@
+import os
+
 from django.test import TestCase
 
 # Create your tests here.
@@ -103,16 +105,16 @@ class SalesVsAchievementApiTests(TestCase):
         else:
             sys.modules.pop('hdbcli', None)
 
-    @patch('sap_integration.views.sales_vs_achievement')
-    def test_territory_dg_khan_unscaled_by_default(self, mock_sales):
-        mock_sales.return_value = [
+    @patch('sap_integration.views.hana_reports.run')
+    def test_territory_dg_khan_unscaled_by_default(self, mock_report):
+        mock_report.return_value = [
             {
-                'TERRITORYID': 45,
-                'TERRITORYNAME': 'D.G Khan Territory',
-                'SALES_TARGET': 5000000.0,
-                'ACCHIVEMENT': 3500000.0,
-                'F_REFDATE': '2025-10-01',
-                'T_REFDATE': '2025-10-30',
+                'TerritoryId': 45,
+                'TerritoryName': 'D.G Khan Territory',
+                'Target': 5000000.0,
+                'Achievement': 3500000.0,
+                'From_Date': '2025-10-01',
+                'To_Date': '2025-10-30',
             }
         ]
         url = reverse('sales_vs_achievement_api')
@@ -127,17 +129,21 @@ class SalesVsAchievementApiTests(TestCase):
         self.assertEqual(row.get('ACCHIVEMENT'), 3500000.0)
         self.assertNotIn('Sales_Target', row)
         self.assertNotIn('Achievement', row)
+        args, kwargs = mock_report.call_args
+        self.assertEqual(args[1:3], ('sales_target', ['territory']))
+        self.assertEqual(kwargs['territory_name'], 'D.G Khan Territory')
+        self.assertFalse(kwargs['in_millions'])
 
-    @patch('sap_integration.views.sales_vs_achievement')
-    def test_in_millions_true_scales_values(self, mock_sales):
-        mock_sales.return_value = [
+    @patch('sap_integration.views.hana_reports.run')
+    def test_in_millions_true_scales_in_sql(self, mock_report):
+        mock_report.return_value = [
             {
-                'TERRITORYID': 45,
-                'TERRITORYNAME': 'D.G Khan Territory',
-                'SALES_TARGET': 5000000.0,
-                'ACCHIVEMENT': 3500000.0,
-                'F_REFDATE': '2025-10-01',
-                'T_REFDATE': '2025-10-30',
+                'TerritoryId': 45,
+                'TerritoryName': 'D.G Khan Territory',
+                'Target': 5.0,
+                'Achievement': 3.5,
+                'From_Date': '2025-10-01',
+                'To_Date': '2025-10-30',
             }
         ]
         url = reverse('sales_vs_achievement_api')
@@ -147,58 +153,516 @@ class SalesVsAchievementApiTests(TestCase):
         self.assertTrue(payload.get('success'))
         self.assertEqual(payload.get('count'), 1)
         row = payload['data'][0]
-        self.assertEqual(row.get('TERRITORYNAME'), 'D.G Khan Territory')
         self.assertEqual(row.get('SALES_TARGET'), 5.0)
         self.assertEqual(row.get('ACCHIVEMENT'), 3.5)
+        self.assertTrue(mock_report.call_args.kwargs['in_millions'])
 
-    @patch('sap_integration.views.sales_vs_achievement')
-    def test_in_millions_false_keeps_raw_values(self, mock_sales):
-        mock_sales.return_value = [
+    @patch('sap_integration.views.hana_reports.run')
+    def test_legacy_keys(self, mock_report):
+        mock_report.return_value = [
             {
-                'TERRITORYID': 45,
-                'TERRITORYNAME': 'D.G Khan Territory',
-                'SALES_TARGET': 12000000.0,
-                'ACCHIVEMENT': 9000000.0,
-                'F_REFDATE': '2025-01-01',
-                'T_REFDATE': '2025-12-31',
+                'TerritoryId': 45,
+                'TerritoryName': 'D.G Khan Territory',
+                'Target': 12000000.0,
+                'Achievement': 9000000.0,
+                'From_Date': '2025-01-01',
+                'To_Date': '2025-12-31',
             }
         ]
         url = reverse('sales_vs_achievement_api')
-        resp = self.client.get(url, {'territory': 'D.G Khan Territory', 'in_millions': 'false'})
+        resp = self.client.get(url, {'territory': 'D.G Khan Territory', 'in_millions': 'false', 'legacy': 'true'})
         self.assertEqual(resp.status_code, 200)
-        payload = resp.json()
-        self.assertTrue(payload.get('success'))
-        row = payload['data'][0]
+        row = resp.json()['data'][0]
         self.assertEqual(row.get('SALES_TARGET'), 12000000.0)
-        self.assertEqual(row.get('ACCHIVEMENT'), 9000000.0)
+        self.assertEqual(row.get('Sales_Target'), 12000000.0)
+        self.assertEqual(row.get('Achievement'), 9000000.0)
 
-    @patch('sap_integration.views.sales_vs_achievement')
-    def test_group_by_territory_aggregates_rows(self, mock_sales):
-        mock_sales.return_value = [
-            {
-                'TERRITORYID': 45,
-                'TERRITORYNAME': 'D.G Khan Territory',
-                'SALES_TARGET': 1000000.0,
-                'ACCHIVEMENT': 500000.0,
-                'F_REFDATE': '2025-10-01',
-                'T_REFDATE': '2025-10-30',
-            },
-            {
-                'TERRITORYID': 45,
-                'TERRITORYNAME': 'D.G Khan Territory',
-                'SALES_TARGET': 2000000.0,
-                'ACCHIVEMENT': 1000000.0,
-                'F_REFDATE': '2025-11-01',
-                'T_REFDATE': '2025-11-30',
-            }
+    @patch('sap_integration.views.hana_reports.run')
+    def test_sum_all_groups_in_sql(self, mock_report):
+        mock_report.return_value = [
+            {'Target': 3000000.0, 'Achievement': 1500000.0, 'From_Date': '2025-10-01', 'To_Date': '2025-11-30'}
         ]
         url = reverse('sales_vs_achievement_api')
-        resp = self.client.get(url, {'group_by': 'territory'})
+        resp = self.client.get(url, {'sum_all': 'true', 'start_date': '2025-10-01', 'end_date': '2025-11-30'})
         self.assertEqual(resp.status_code, 200)
         payload = resp.json()
-        self.assertTrue(payload.get('success'))
         self.assertEqual(payload.get('count'), 1)
         row = payload['data'][0]
-        self.assertEqual(row.get('TERRITORYNAME'), 'D.G Khan Territory')
+        self.assertEqual(row.get('TERRITORYNAME'), 'All Territories')
         self.assertEqual(row.get('SALES_TARGET'), 3000000.0)
-        self.assertEqual(row.get('ACCHIVEMENT'), 1500000.0)
+        self.assertEqual(row.get('F_REFDATE'), '2025-10-01')
+        self.assertEqual(mock_report.call_args.args[2], [])
+
+        self.client.get(url, {'sum_all': 'true', 'group_by': 'month'})
+        self.assertEqual(mock_report.call_args.args[2], ['month'])
+        self.client.get(url, {'group_by': 'territory'})
+        self.assertEqual(mock_report.call_args.args[2], ['territory'])
+
+
+class HanaRowsTests(TestCase):
+    class Cursor:
+        description = [('CODE', None), ('AMOUNT', None), ('DOC_DATE', None)]
+
+        def __init__(self, rows):
+            self._rows = list(rows)
+            self.fetchmany_calls = 0
+
+        def fetchmany(self, size):
+            self.fetchmany_calls += 1
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return rows
+
+        def fetchone(self):
+            return self._rows.pop(0) if self._rows else None
+
+    def rows(self):
+        from datetime import date
+        from decimal import Decimal
+        return [
+            ('A', None, None),
+            ('B', Decimal('10.50'), date(2025, 1, 31)),
+            ('C', Decimal('2'), None),
+        ]
+
+    def test_shapes_and_json_conversion(self):
+        from sap_integration import hana_rows
+        dicts = hana_rows.fetch(self.Cursor(self.rows()), convert='json', batch_size=2)
+        self.assertEqual(dicts[1], {'CODE': 'B', 'AMOUNT': 10.5, 'DOC_DATE': '2025-01-31'})
+        self.assertEqual(dicts[0], {'CODE': 'A', 'AMOUNT': None, 'DOC_DATE': None})
+
+        tuples = hana_rows.fetch(self.Cursor(self.rows()), shape='tuples', convert='json')
+        self.assertEqual(tuples[2], ('C', 2.0, None))
+
+        columns = hana_rows.fetch(self.Cursor(self.rows()), shape='columns', convert='json', batch_size=2)
+        self.assertEqual(columns['AMOUNT'], [None, 10.5, 2.0])
+        self.assertEqual(columns['CODE'], ['A', 'B', 'C'])
+
+    def test_column_null_in_first_batch_is_converted_later(self):
+        from decimal import Decimal
+        from sap_integration import hana_rows
+
+        class Cursor(self.Cursor):
+            description = [('A', None)]
+
+        rows = [{'A': None}, {'A': None}, {'A': None}, {'A': Decimal('1.5')}]
+        self.assertEqual(
+            hana_rows.fetch(Cursor(rows), convert='json', batch_size=3),
+            [{'A': None}, {'A': None}, {'A': None}, {'A': 1.5}],
+        )
+        columns = hana_rows.fetch(Cursor([(None,), (None,), (None,), (Decimal('1.5'),)]),
+                                  shape='columns', convert='json', batch_size=3)
+        self.assertEqual(columns['A'], [None, None, None, 1.5])
+
+    def test_raw_values_and_streaming(self):
+        from decimal import Decimal
+        from sap_integration import hana_rows
+        cur = self.Cursor(self.rows())
+        reader = hana_rows.RowReader(cur, batch_size=1)
+        streamed = list(reader.iter_dicts())
+        self.assertEqual(streamed[2]['AMOUNT'], Decimal('2'))
+        self.assertEqual(cur.fetchmany_calls, 4)
+        self.assertIsNone(hana_rows.fetch_first(self.Cursor([])))
+
+
+class FakeHanaSqlite:
+    """
+    HANA stand-in backed by in-memory SQLite: TO_TIMESTAMP / TO_DATE become
+    SQLite datetime() / date(), amounts come back as Decimal and dates as
+    date/datetime like hdbcli returns them.
+    """
+    AMOUNTS = {'SALES_TARGET', 'ACCHIVEMENT', 'DOCTOTAL', 'COLLETION_TARGET'}
+    TIMESTAMPS = {'F_REFDATE', 'T_REFDATE'}
+
+    class Cursor:
+        def __init__(self, hana):
+            self.hana = hana
+            self.description = None
+            self._rows = []
+
+        def execute(self, sql, params=()):
+            import re
+            self.hana.statements.append(sql)
+            if 'CURRENT_SCHEMA' in sql:
+                self.description = [('CURRENT_SCHEMA',)]
+                self._rows = [(self.hana.schema,)]
+                return
+            sql = re.sub(r"TO_TIMESTAMP\(\?, '[^']*'\)", 'datetime(?)', sql)
+            sql = re.sub(r"TO_DATE\(\?, '[^']*'\)", 'date(?)', sql)
+            cur = self.hana.db.execute(sql, params)
+            self.description = [(d[0].upper(),) for d in cur.description]
+            self._rows = [self.hana.convert(self.description, r) for r in cur.fetchall()]
+
+        def fetchmany(self, size):
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return rows
+
+        def fetchone(self):
+            return self._rows.pop(0) if self._rows else None
+
+        def close(self):
+            pass
+
+    def __init__(self, schema='TESTCO'):
+        import sqlite3
+        self.schema = schema
+        self.statements = []
+        self.db = sqlite3.connect(':memory:')
+        self.db.executescript(
+            'CREATE TABLE "OTER" ("territryID" INTEGER, "descript" TEXT, "parent" INTEGER, "inactive" TEXT);'
+            'CREATE TABLE "B4_EMP" (empID INTEGER, U_TID INTEGER);'
+            'CREATE TABLE "B4_SALES_TARGET_NEW3" (TerritoryId INTEGER, Sales_Target NUMERIC, DocTotal NUMERIC,'
+            ' F_REFDATE TEXT, T_REFDATE TEXT);'
+            'CREATE TABLE "OCRD" ("CardCode" TEXT, "Territory" INTEGER);'
+            'CREATE TABLE "OINV" ("DocEntry" INTEGER, "DocDate" TEXT, "DocTotal" NUMERIC, "CANCELED" TEXT,'
+            ' "CardCode" TEXT, "SlpCode" INTEGER);'
+            'CREATE TABLE "ORIN" ("DocEntry" INTEGER, "DocDate" TEXT, "DocTotal" NUMERIC, "CANCELED" TEXT,'
+            ' "CardCode" TEXT, "SlpCode" INTEGER);'
+            'CREATE TABLE "ORCT" ("DocEntry" INTEGER, "DocDate" TEXT, "DocTotal" NUMERIC, "Canceled" TEXT,'
+            ' "CardCode" TEXT);'
+        )
+
+    def convert(self, description, row):
+        from datetime import date, datetime
+        from decimal import Decimal
+        out = []
+        for (name,), v in zip(description, row):
+            if v is not None and name in self.AMOUNTS:
+                v = Decimal(str(v))
+            elif isinstance(v, str) and (name in self.TIMESTAMPS or name == 'DOCDATE'):
+                v = datetime.fromisoformat(v) if len(v) > 10 else date.fromisoformat(v)
+            out.append(v)
+        return tuple(out)
+
+    def cursor(self):
+        return self.Cursor(self)
+
+    def close(self):
+        pass
+
+    def count(self, table):
+        return sum(1 for s in self.statements if table in s)
+
+
+class HanaMirrorParityTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from datetime import date
+        from sap_integration import hana_connect, hana_mirror
+
+        self.today = date.today()
+        self.current = hana_mirror.month_start(self.today)
+        self.months = [self.current]
+        for _ in range(3):
+            self.months.insert(0, hana_mirror.previous_month(self.months[0]))
+
+        self.hana = FakeHanaSqlite()
+        db = self.hana.db
+        db.executemany('INSERT INTO "OTER" VALUES (?, ?, ?, ?)', [
+            (1, 'Lahore Territory', 10, 'N'), (2, 'Multan Territory', 10, 'N'), (3, 'Sahiwal', 11, 'N'),
+        ])
+        db.executemany('INSERT INTO "B4_EMP" VALUES (?, ?)', [(100, 1), (100, 2), (200, 3), (300, 1)])
+        db.executemany('INSERT INTO "OCRD" VALUES (?, ?)', [('C1', 1), ('C2', 2), ('C3', 3)])
+        doc = 0
+        for i, m in enumerate(self.months):
+            end_day = date.fromordinal(self._next_month(m).toordinal() - 1)
+            for t in (1, 2, 3):
+                db.execute('INSERT INTO "B4_SALES_TARGET_NEW3" VALUES (?, ?, ?, ?, ?)', (
+                    t, 1000.25 * t + i, 700.125 * t + i * 3,
+                    m.isoformat() + ' 00:00:00', end_day.isoformat() + ' 00:00:00',
+                ))
+                for day in (1, 15):
+                    doc += 1
+                    db.execute('INSERT INTO "OINV" VALUES (?, ?, ?, ?, ?, ?)', (
+                        doc, m.replace(day=day).isoformat(), 99.5 * t + day, 'Y' if doc % 7 == 0 else 'N', f'C{t}', t,
+                    ))
+                    db.execute('INSERT INTO "ORIN" VALUES (?, ?, ?, ?, ?, ?)', (
+                        doc, m.replace(day=day).isoformat(), 5.0 * t, 'N', f'C{t}', t,
+                    ))
+                    db.execute('INSERT INTO "ORCT" VALUES (?, ?, ?, ?, ?)', (
+                        doc, m.replace(day=day).isoformat(), 80.0 * t, 'N', f'C{t}',
+                    ))
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = hana_mirror.MirrorBackend(self.tmp.name)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(hana_connect.set_report_backend, None)
+
+    @staticmethod
+    def _next_month(m):
+        from datetime import date
+        return date(m.year + 1, 1, 1) if m.month == 12 else date(m.year, m.month + 1, 1)
+
+    def _sync(self, **kwargs):
+        from sap_integration import hana_mirror
+        store = self.backend.store('TESTCO')
+        copied = hana_mirror.sync(self.hana, store, **kwargs)
+        self.addCleanup(store.close)
+        return copied
+
+    def _both(self, func, *args, **kwargs):
+        from sap_integration import hana_connect
+        hana_connect.set_report_backend(None)
+        live = func(self.hana, *args, **kwargs)
+        hana_connect.set_report_backend(self.backend)
+        mirrored = func(self.hana, *args, **kwargs)
+        return live, mirrored
+
+    def _cases(self):
+        from datetime import date
+        first = self.months[0]
+        closed_end = date.fromordinal(self.current.toordinal() - 1).isoformat()
+        return [
+            (None, None, None, None),
+            (None, None, first.isoformat(), closed_end),
+            (None, None, self.months[1].isoformat(), self.today.isoformat()),
+            (None, None, self.current.isoformat(), self.today.isoformat()),
+            (100, None, None, None),
+            (None, 'Lahore', first.isoformat(), self.today.isoformat()),
+            (200, None, self.months[2].isoformat() + ' 00:00:00', closed_end + ' 23:59:59'),
+        ]
+
+    def test_sales_vs_achievement_parity(self):
+        from sap_integration import hana_connect
+        copied = self._sync()
+        self.assertEqual(copied['sales_target'], 9)
+        for emp_id, territory, start, end in self._cases():
+            for func in (hana_connect.sales_vs_achievement, hana_connect.sales_vs_achievement_by_emp):
+                live, mirrored = self._both(func, emp_id, territory, None, None, start, end)
+                self.assertTrue(live, (func.__name__, emp_id, territory, start, end))
+                self.assertEqual(mirrored, live, (func.__name__, emp_id, territory, start, end))
+
+    def test_territory_summary_parity_and_closed_ranges_skip_hana(self):
+        from sap_integration import hana_connect
+        self._sync()
+        prev = self.months[2]
+        for args in (
+            (None, None, None, None, None, None),
+            (None, None, prev.year, prev.month, None, None),
+            (None, None, self.current.year, self.current.month, None, None),
+            (None, None, None, None, self.months[0].isoformat(), self.today.isoformat()),
+        ):
+            live, mirrored = self._both(hana_connect.territory_summary, *args)
+            self.assertEqual(mirrored, live, args)
+
+        self.hana.statements.clear()
+        hana_connect.set_report_backend(self.backend)
+        rows = hana_connect.territory_summary(self.hana, None, None, prev.year, prev.month)
+        self.assertEqual(self.hana.count('"OINV"'), 0)
+        self.assertIsNotNone(rows[0]['DOCTOTAL'])
+
+    def test_incremental_sync_refreshes_last_closed_month(self):
+        from sap_integration import hana_connect
+        self._sync()
+        prev = self.months[2]
+        self.hana.db.execute(
+            'UPDATE "B4_SALES_TARGET_NEW3" SET DocTotal = DocTotal + 50 WHERE F_REFDATE LIKE ?',
+            (prev.strftime('%Y-%m') + '%',),
+        )
+        copied = self._sync()
+        self.assertEqual(copied['sales_target'], 3)
+        live, mirrored = self._both(hana_connect.sales_vs_achievement_by_emp, None, None, None, None, None, None)
+        self.assertEqual(mirrored, live)
+
+    def test_unsynced_schema_uses_hana(self):
+        from sap_integration import hana_connect
+        live, mirrored = self._both(hana_connect.sales_vs_achievement, None, None, None, None, None, None)
+        self.assertEqual(mirrored, live)
+
+    def test_closed_month_report_never_opens_hana(self):
+        from datetime import date
+        from sap_integration import hana_connect, hana_reports
+        self._sync()
+        hana_connect.set_report_backend(self.backend)
+        start = self.months[0].isoformat()
+        closed_end = date.fromordinal(self.current.toordinal() - 1).isoformat()
+
+        def refuse():
+            raise AssertionError('closed-month report opened a live HANA connection')
+
+        args = ('sales_target', ['territory'], ['target', 'achievement'])
+        filters = {'emp_id': 100, 'start_date': start, 'end_date': closed_end}
+        mirrored = hana_reports.report(refuse, 'TESTCO', *args, **filters)
+        live = hana_reports.run(self.hana, *args, **filters)
+        self.assertEqual(
+            [(r['TerritoryId'], r['TerritoryName'], r['Target'], r['Achievement']) for r in mirrored],
+            [(r['TERRITORYID'], r['TERRITORYNAME'], r['TARGET'], r['ACHIEVEMENT']) for r in live],
+        )
+        self.assertAlmostEqual(float(mirrored[0]['Percentage']), float(live[0]['PERCENTAGE']))
+
+        rows = hana_reports.report(refuse, 'TESTCO', 'invoice', ['territory', 'day'], ['achievement'],
+                                   start_date=start, end_date=closed_end, rollup=True)
+        self.assertEqual(rows[-1]['Grouping'], 3)
+        self.assertIsNone(rows[-1]['TerritoryName'])
+        self.assertEqual(rows[-1]['Achievement'], sum(r['Achievement'] for r in rows if r['Grouping'] == 0))
+        self.assertIsInstance(rows[0]['Day'], date)
+
+        opened = []
+
+        def connect():
+            opened.append(self.hana)
+            return self.hana
+
+        hana_reports.report(connect, 'TESTCO', *args, start_date=start, end_date=self.today.isoformat())
+        hana_reports.report(connect, 'TESTCO', *args)
+        self.assertEqual(len(opened), 2)
+
+
+class HanaReportsTests(TestCase):
+    def test_build_pushes_grouping_rollup_and_scaling_into_sql(self):
+        from sap_integration import hana_reports
+        sql, params = hana_reports.build(
+            'sales_target', ['region', 'zone', 'territory'], emp_id=7, region='Punjab',
+            start_date='2025-01-01', end_date='2025-01-31 23:59:59', active_only=True,
+            rollup=True, in_millions=True,
+        )
+        self.assertIn('GROUP BY ROLLUP (COALESCE(R3."descript", R2."descript", R1."descript"), R1."descript", T."territryID")', sql)
+        self.assertIn('ROUND(SUM(c.Sales_Target) / 1000000, 2) AS "Target"', sql)
+        self.assertIn('AS "Percentage"', sql)
+        self.assertIn('AS "Grouping"', sql)
+        self.assertIn("TO_TIMESTAMP(?, 'YYYY-MM-DD HH24:MI:SS')", sql)
+        self.assertEqual(params, (7, 'N', 'Punjab%', 'Punjab%', 'Punjab%', '2025-01-31 23:59:59', '2025-01-01'))
+
+        sql, params = hana_reports.build('invoice', ['month'], ['profit'])
+        self.assertIn('TO_VARCHAR(T0."DocDate", \'YYYY-MM\') AS "Month"', sql)
+        self.assertNotIn('OTER" Z', sql)
+        self.assertEqual(params, ())
+
+        with self.assertRaises(ValueError):
+            hana_reports.build('invoice', ['territory'], ['target'])
+        with self.assertRaises(ValueError):
+            hana_reports.build('sales_target', ['city'])
+
+    def test_is_total_reads_grouping_bits(self):
+        from sap_integration import hana_reports
+        dims = ['region', 'zone', 'territory']
+        self.assertFalse(hana_reports.is_total({'Grouping': 0}, dims, 'territory'))
+        self.assertTrue(hana_reports.is_total({'Grouping': 1}, dims, 'territory'))
+        self.assertFalse(hana_reports.is_total({'Grouping': 1}, dims, 'zone'))
+        self.assertTrue(hana_reports.is_total({'Grouping': 7}, dims, 'region'))
+
+    def test_territory_totals_match_legacy_query(self):
+        from sap_integration import hana_connect, hana_reports
+        hana = FakeHanaSqlite()
+        hana.db.executemany('INSERT INTO "OTER" VALUES (?, ?, ?, ?)', [
+            (1, 'Lahore Territory', None, 'N'), (2, 'Multan Territory', None, 'N'),
+        ])
+        hana.db.executemany('INSERT INTO "B4_EMP" VALUES (?, ?)', [(100, 1), (100, 2)])
+        hana.db.executemany('INSERT INTO "B4_SALES_TARGET_NEW3" VALUES (?, ?, ?, ?, ?)', [
+            (1, 100, 80, '2025-01-01 00:00:00', '2025-01-31 00:00:00'),
+            (1, 120, 90, '2025-02-01 00:00:00', '2025-02-28 00:00:00'),
+            (2, 50, 60, '2025-01-01 00:00:00', '2025-01-31 00:00:00'),
+        ])
+        legacy = hana_connect.sales_vs_achievement(hana, 100, None, None, None, '2025-01-01', '2025-02-28')
+        rows = hana_reports.run(hana, 'sales_target', ['territory'], emp_id=100,
+                                start_date='2025-01-01', end_date='2025-02-28')
+        self.assertEqual(
+            [(r['TERRITORYID'], r['SALES_TARGET'], r['ACCHIVEMENT']) for r in legacy],
+            [(r['TERRITORYID'], r['TARGET'], r['ACHIEVEMENT']) for r in rows],
+        )
+        self.assertEqual(rows[0]['TERRITORYNAME'], 'Lahore')
+        self.assertAlmostEqual(float(rows[0]['PERCENTAGE']), 77.27)
+
+
+class ProductDocumentCacheTests(TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.media = self.tmp.name
+        folder = os.path.join(self.media, 'product_images', '4B-BIO', 'urdu')
+        os.makedirs(folder)
+        self.doc_path = os.path.join(folder, 'Badar.docx')
+        self._write_doc('پہلا ورژن')
+
+    def _write_doc(self, text):
+        import io
+        from docx import Document
+        from PIL import Image
+        png = io.BytesIO()
+        Image.new('RGB', (8, 8), (0, 128, 0)).save(png, 'PNG')
+        png.seek(0)
+        doc = Document()
+        doc.add_paragraph(text)
+        doc.add_picture(png)
+        doc.save(self.doc_path)
+
+    def test_converted_once_per_file_version(self):
+        import mammoth
+        from sap_integration.utils import document_cache, document_parser
+        with self.settings(MEDIA_ROOT=self.media, MEDIA_URL='/media/'), \
+                patch.object(mammoth, 'convert_to_html', wraps=mammoth.convert_to_html) as convert:
+            first = document_parser.parse_product_document(self.doc_path)
+            again = document_parser.parse_product_document(self.doc_path)
+            self.assertEqual(first, again)
+            self.assertEqual(convert.call_count, 1)
+            self.assertIn('پہلا ورژن', first)
+            self.assertNotIn('data:image', first)
+            self.assertIn('/media/cache/product_documents/', first)
+
+            self._write_doc('دوسرا ورژن')
+            self.assertIn('دوسرا ورژن', document_parser.parse_product_document(self.doc_path))
+            self.assertEqual(convert.call_count, 2)
+            self.assertEqual(document_cache.stats()['entries'], 2)
+
+            self.assertEqual(document_cache.evict(limit=0), 2)
+            self.assertIsNone(document_cache.get(self.doc_path))
+
+    def test_warm_up_command_renders_every_document(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from sap_integration.utils import document_cache
+        with self.settings(MEDIA_ROOT=self.media, MEDIA_URL='/media/'):
+            out = StringIO()
+            call_command('warm_product_documents', stdout=out)
+            self.assertIn('1 rendered, 0 already cached', out.getvalue())
+            self.assertIsNotNone(document_cache.get(self.doc_path))
+            call_command('warm_product_documents', stdout=out)
+            self.assertIn('0 rendered, 1 already cached', out.getvalue())
+
+    def test_document_lookup_notices_new_company_folders(self):
+        from sap_integration.utils import document_parser
+        with self.settings(MEDIA_ROOT=self.media):
+            self.assertIsNone(document_parser.get_product_document_path('Map', 'docx'))
+            root = os.path.join(self.media, 'product_images')
+            before = os.stat(root).st_mtime_ns
+            os.makedirs(os.path.join(root, '4B-ORANG'))
+            # Same clock tick as the first listing on coarse-timestamp filesystems
+            os.utime(root, ns=(before + 1, before + 1))
+            path = os.path.join(self.media, 'product_images', '4B-ORANG', 'Map.docx')
+            open(path, 'wb').close()
+            self.assertEqual(document_parser.get_product_document_path('Map', 'docx'), path)
+
+
+class ProductDescriptionServiceTests(TestCase):
+    def test_document_page_calls_service_directly(self):
+        from sap_integration import views
+        from sap_integration.management.commands.bench_product_description import SAMPLE
+        with patch.object(views, 'get_product_description', return_value=SAMPLE) as service, \
+                patch.object(views, 'get_product_description_api') as api:
+            resp = views.product_document_view(self._request('FG00904'), 'FG00904')
+        service.assert_called_once_with('FG00904', '4B-AGRI_LIVE')
+        api.assert_not_called()
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('BAAP- 18-Ltrs.', resp.content.decode('utf-8'))
+
+    def _request(self, item_code):
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import RequestFactory
+        request = RequestFactory().get(f'/sap/product-document/{item_code}/', {'database': '4B-AGRI_LIVE'})
+        request.session = {}
+        request.user = AnonymousUser()
+        return request
+
+    def test_api_maps_service_errors_to_status(self):
+        from sap_integration import views
+        from sap_integration.product_descriptions import ProductDescriptionError
+        error = ProductDescriptionError('Product with ItemCode FG0 not found', status=404)
+        with patch.object(views, 'get_product_description', side_effect=error):
+            resp = views.get_product_description_api(self._api_request('FG0'))
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp.data, {'success': False, 'error': 'Product with ItemCode FG0 not found'})
+        self.assertEqual(views.get_product_description_api(self._api_request('')).status_code, 400)
+
+    def _api_request(self, item_code):
+        from django.test import RequestFactory
+        return RequestFactory().get('/api/sap/product-description/', {'item_code': item_code})
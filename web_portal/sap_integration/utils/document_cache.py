@@ -0,0 +1,241 @@
+"""
+On-disk cache of product documents converted to HTML.
+
+A converted document is stored under PRODUCT_DOCUMENT_CACHE_DIR, keyed by
+the source file's absolute path, mtime, size and the parser mode, so an
+edited or replaced .docx gets a fresh entry and stale ones simply stop being
+read. Each entry is a directory holding ``document.html`` plus the images
+mammoth extracted from the document. When the cache directory lies inside
+MEDIA_ROOT the HTML links to those image files; otherwise images stay inline
+as data URIs.
+
+Entries are written to a temporary directory and renamed into place, so
+concurrent workers never read a half-written entry. After each write the
+least recently used entries are removed until the cache fits in
+PRODUCT_DOCUMENT_CACHE_MAX_BYTES.
+
+Fill the cache ahead of traffic with ``python manage.py warm_product_documents``.
+"""
+import base64
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HTML_NAME = 'document.html'
+DOCUMENT_EXTS = ('docx', 'DOCX')
+
+_IMAGE_EXTS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/gif': 'gif',
+    'image/bmp': 'bmp',
+    'image/webp': 'webp',
+    'image/x-emf': 'emf',
+    'image/x-wmf': 'wmf',
+}
+
+_evict_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, 'PRODUCT_DOCUMENT_CACHE_ENABLED', True))
+
+
+def cache_dir() -> str:
+    directory = getattr(settings, 'PRODUCT_DOCUMENT_CACHE_DIR', '')
+    return str(directory or os.path.join(settings.MEDIA_ROOT, 'cache', 'product_documents'))
+
+
+def max_bytes() -> int:
+    return int(getattr(settings, 'PRODUCT_DOCUMENT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+
+def _media_url(path: str) -> str | None:
+    """MEDIA_URL for a file under MEDIA_ROOT, None when it is outside."""
+    media_root = os.path.abspath(str(settings.MEDIA_ROOT))
+    path = os.path.abspath(path)
+    if os.path.commonpath([media_root, path]) != media_root:
+        return None
+    rel = os.path.relpath(path, media_root).replace(os.sep, '/')
+    return f"{settings.MEDIA_URL.rstrip('/')}/{rel}"
+
+
+def cache_key(file_path: str, mode: str) -> str | None:
+    """Key for the current version of ``file_path``; None if it does not exist."""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    raw = f'{os.path.abspath(file_path)}|{st.st_mtime_ns}|{st.st_size}|{mode}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _entry_dir(key: str) -> str:
+    return os.path.join(cache_dir(), key[:2], key)
+
+
+def get(file_path: str, mode: str = 'mammoth') -> str | None:
+    """Cached HTML for ``file_path`` or None; never converts."""
+    key = cache_key(file_path, mode)
+    if key is None:
+        return None
+    html_path = os.path.join(_entry_dir(key), HTML_NAME)
+    try:
+        with open(html_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+    except OSError:
+        return None
+    try:
+        # Recency for eviction (atime is often disabled)
+        os.utime(html_path)
+    except OSError:
+        pass
+    return html
+
+
+def _convert(file_path: str, mode: str, image_dir: str, image_url: str | None) -> str | None:
+    from .document_parser import WordDocumentParser
+
+    parser = WordDocumentParser(file_path)
+    if mode != 'mammoth':
+        return parser.parse_custom_formatting()
+
+    counter = [0]
+
+    def store_image(image):
+        with image.open() as image_bytes:
+            data = image_bytes.read()
+        content_type = image.content_type or 'image/png'
+        if image_url is None:
+            return {'src': f"data:{content_type};base64,{base64.b64encode(data).decode('utf-8')}"}
+        counter[0] += 1
+        name = f'image-{counter[0]}.{_IMAGE_EXTS.get(content_type, "bin")}'
+        with open(os.path.join(image_dir, name), 'wb') as f:
+            f.write(data)
+        return {'src': f'{image_url}/{name}'}
+
+    html, _messages = parser.parse_to_html_mammoth(image_converter=store_image)
+    return html if html else parser.parse_custom_formatting()
+
+
+def render(file_path: str, mode: str = 'mammoth') -> str | None:
+    """
+    HTML for a product document, converted at most once per file version.
+
+    Returns None when the file does not exist or cannot be converted.
+    """
+    if not enabled():
+        from .document_parser import WordDocumentParser
+        parser = WordDocumentParser(file_path)
+        html = parser.parse_to_html_mammoth()[0] if mode == 'mammoth' else None
+        return html or parser.parse_custom_formatting()
+
+    html = get(file_path, mode)
+    if html is not None:
+        return html
+    key = cache_key(file_path, mode)
+    if key is None:
+        return None
+
+    entry = _entry_dir(key)
+    parent = os.path.dirname(entry)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f'.{key}-', dir=parent)
+    try:
+        image_url = _media_url(entry)
+        html = _convert(file_path, mode, tmp, image_url)
+        if html is None:
+            return None
+        with open(os.path.join(tmp, HTML_NAME), 'w', encoding='utf-8') as f:
+            f.write(html)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Another worker stored the same entry first
+            return html
+        tmp = None
+    except Exception as e:
+        logger.error(f"Error converting product document {file_path}: {e}")
+        return None
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+    evict()
+    return html
+
+
+def _entries():
+    """(last used, bytes, path) for every cache entry."""
+    root = cache_dir()
+    out = []
+    try:
+        shards = os.listdir(root)
+    except OSError:
+        return out
+    for shard in shards:
+        shard_dir = os.path.join(root, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for name in os.listdir(shard_dir):
+            entry = os.path.join(shard_dir, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            size, used = 0, 0.0
+            try:
+                for fname in os.listdir(entry):
+                    st = os.stat(os.path.join(entry, fname))
+                    size += st.st_size
+                    if fname == HTML_NAME:
+                        used = st.st_mtime
+            except OSError:
+                # Evicted by another worker meanwhile
+                continue
+            out.append((used, size, entry))
+    return out
+
+
+def evict(limit: int | None = None) -> int:
+    """Remove least recently used entries until the cache fits; returns entries removed."""
+    limit = max_bytes() if limit is None else limit
+    with _evict_lock:
+        entries = sorted(_entries())
+        total = sum(size for _used, size, _path in entries)
+        removed = 0
+        for _used, size, path in entries:
+            if total <= limit:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+def clear() -> None:
+    shutil.rmtree(cache_dir(), ignore_errors=True)
+
+
+def stats() -> dict:
+    entries = _entries()
+    return {
+        'entries': len(entries),
+        'bytes': sum(size for _used, size, _path in entries),
+        'max_bytes': max_bytes(),
+        'directory': cache_dir(),
+    }
+
+
+def product_documents(product_images_dir: str | None = None):
+    """Paths of every .docx under media/product_images (all company folders)."""
+    root = product_images_dir or os.path.join(settings.MEDIA_ROOT, 'product_images')
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for fname in sorted(filenames):
+            if fname.rpartition('.')[2] in DOCUMENT_EXTS and not fname.startswith('~$'):
+                yield os.path.join(dirpath, fname)
@@ -30,8 +30,13 @@ class WordDocumentParser:
             except Exception as e:
                 logger.error(f"Error loading document {file_path}: {e}")
     
-    def parse_to_html_mammoth(self):
-        """Convert Word document to HTML using mammoth (best for complex formatting)"""
+    def parse_to_html_mammoth(self, image_converter=None):
+        """
+        Convert Word document to HTML using mammoth (best for complex formatting)
+
+        image_converter: mammoth image callback returning img attributes;
+        images are inlined as base64 data URIs by default.
+        """
         try:
             with open(self.file_path, 'rb') as doc_file:
                 result = mammoth.convert_to_html(
@@ -46,7 +51,7 @@ class WordDocumentParser:
                         r[style-name='Strong'] => strong
                         r[style-name='Emphasis'] => em
                     """,
-                    convert_image=mammoth.images.img_element(self._image_converter)
+                    convert_image=mammoth.images.img_element(image_converter or self._image_converter)
                 )
                 
                 # Add RTL wrapper
@@ -262,17 +267,26 @@ def parse_product_document(file_path, method='mammoth'):
     if not os.path.exists(file_path):
         return f'<div class="alert alert-warning rtl-content">دستاویز فائل نہیں ملی: {file_path}</div>'
     
-    parser = WordDocumentParser(file_path)
-    
-    if method == 'mammoth':
-        html, messages = parser.parse_to_html_mammoth()
-        if html:
-            return html
-        else:
-            # Fallback to custom parser
-            return parser.parse_custom_formatting()
-    else:
-        return parser.parse_custom_formatting()
+    # Converted once per file version, then read from the on-disk cache
+    # (mammoth falls back to the custom parser, see document_cache)
+    from . import document_cache
+    return document_cache.render(file_path, 'mammoth' if method == 'mammoth' else 'custom')
+
+
+# product_images_dir -> (mtime_ns, company folders); refreshed when a folder is added or removed
+_folder_listing = {}
+
+
+def _company_folders(product_images_dir):
+    """Sub-folders of product_images, listed again only when the directory changes"""
+    mtime = os.stat(product_images_dir).st_mtime_ns
+    cached = _folder_listing.get(product_images_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    folders = [d for d in sorted(os.listdir(product_images_dir))
+               if os.path.isdir(os.path.join(product_images_dir, d)) and not d.startswith('.')]
+    _folder_listing[product_images_dir] = (mtime, folders)
+    return folders
 
 
 def get_product_document_path(product_urdu_name, product_urdu_ext, database_name=''):
@@ -308,8 +322,7 @@ def get_product_document_path(product_urdu_name, product_urdu_ext, database_name
     
     # Get all available folders in product_images directory dynamically
     try:
-        all_folders = [d for d in os.listdir(product_images_dir) 
-                      if os.path.isdir(os.path.join(product_images_dir, d)) and not d.startswith('.')]
+        all_folders = _company_folders(product_images_dir)
         # Add any folders not already in the list
         for folder in all_folders:
             if folder not in possible_folders:
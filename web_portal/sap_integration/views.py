@@ -25,6 +25,8 @@ import re
 import logging
 import mimetypes
 from .hana_connect import _load_env_file as _hana_load_env_file, territory_summary, products_catalog, policy_customer_balance, policy_customer_balance_all, ar_invoices_by_customer, ar_invoice_resolve_docentry, ar_invoice_header, ar_invoice_lines, sales_vs_achievement, territory_names, territories_all, territories_all_full, cwl_all_full, table_columns, sales_orders_all, customer_lov, customer_addresses, contact_person_name, item_lov, warehouse_for_item, sales_tax_codes, projects_lov, policy_link, project_balance, policy_balance_by_customer, crop_lov, child_card_code, sales_vs_achievement_geo, sales_vs_achievement_geo_inv, geo_options, sales_vs_achievement_geo_profit, collection_vs_achievement, sales_vs_achievement_territory, unit_price_by_policy, territories_lov
+from . import hana_reports, hana_rows
+from .product_descriptions import ProductDescriptionError, get_product_description
 from django.conf import settings
 from pathlib import Path
 import sys
@@ -4334,207 +4336,80 @@ def sales_vs_achievement_api(request):
             kwargs['encrypt'] = True
             if cfg['ssl_validate']:
                 kwargs['sslValidateCertificate'] = (str(cfg['ssl_validate']).strip().lower() in ('true','1','yes'))
-        conn = dbapi.connect(**kwargs)
-        try:
+
+        def connect():
+            conn = dbapi.connect(**kwargs)
             if cfg['schema']:
                 sch = cfg['schema']
                 cur = conn.cursor()
                 cur.execute(f'SET SCHEMA "{sch}"')
                 cur.close()
-            data = sales_vs_achievement(conn, emp_id, territory or None, None, None, start_date or None, end_date or None)
-            if in_millions_param in ('true','1','yes','y'):
-                scaled = []
-                for row in data or []:
-                    if isinstance(row, dict):
-                        r = dict(row)
-                        try:
-                            v = r.get('Sales_Target', None)
-                            if v is None:
-                                v = r.get('SALES_TARGET', None)
-                            if v is not None:
-                                val = round((float(v) / 1000000.0), 2)
-                                r['SALES_TARGET'] = val
-                                if include_legacy:
-                                    r['Sales_Target'] = r['SALES_TARGET']
-                                else:
-                                    r.pop('Sales_Target', None)
-                        except Exception:
-                            pass
-                        try:
-                            v = r.get('Achievement', None)
-                            if v is None:
-                                v = r.get('ACHIEVEMENT', None)
-                            if v is None:
-                                v = r.get('ACCHIVEMENT', None)
-                            if v is not None:
-                                val2 = round((float(v) / 1000000.0), 2)
-                                r['ACCHIVEMENT'] = val2
-                                if include_legacy:
-                                    r['Achievement'] = r['ACCHIVEMENT']
-                                else:
-                                    r.pop('Achievement', None)
-                        except Exception:
-                            pass
-                        scaled.append(r)
-                    else:
-                        scaled.append(row)
-                data = scaled
-            if group_by_param == 'territory' and not do_sum_all:
-                grouped = {}
-                for r in (data or []):
-                    if isinstance(r, dict):
-                        tid = r.get('TERRITORYID')
-                        tname = r.get('TERRITORYNAME')
-                        k = (tid, tname)
-                        if k not in grouped:
-                            grouped[k] = {'SALES_TARGET': 0.0, 'ACCHIVEMENT': 0.0, 'TERRITORYID': tid, 'TERRITORYNAME': tname, 'F_REFDATE': r.get('F_REFDATE'), 'T_REFDATE': r.get('T_REFDATE')}
-                        st = r.get('SALES_TARGET') or 0.0
-                        ac = r.get('ACCHIVEMENT') or 0.0
-                        try:
-                            grouped[k]['SALES_TARGET'] += float(st)
-                        except Exception:
-                            pass
-                        try:
-                            grouped[k]['ACCHIVEMENT'] += float(ac)
-                        except Exception:
-                            pass
-                        f = r.get('F_REFDATE')
-                        t = r.get('T_REFDATE')
-                        if f and (grouped[k]['F_REFDATE'] is None or str(f) < str(grouped[k]['F_REFDATE'])):
-                            grouped[k]['F_REFDATE'] = f
-                        if t and (grouped[k]['T_REFDATE'] is None or str(t) > str(grouped[k]['T_REFDATE'])):
-                            grouped[k]['T_REFDATE'] = t
-                data = []
-                for k, g in grouped.items():
-                    row = {'TERRITORYID': g['TERRITORYID'] or 0, 'TERRITORYNAME': g['TERRITORYNAME'] or '', 'SALES_TARGET': g['SALES_TARGET'], 'ACCHIVEMENT': g['ACCHIVEMENT'], 'F_REFDATE': g['F_REFDATE'], 'T_REFDATE': g['T_REFDATE']}
-                    if include_legacy:
-                        row['Sales_Target'] = row['SALES_TARGET']
-                        row['Achievement'] = row['ACCHIVEMENT']
-                    data.append(row)
-            if do_sum_all:
-                if group_by_param == 'month':
-                    grouped = {}
-                    for r in (data or []):
-                        if isinstance(r, dict):
-                            k = (r.get('F_REFDATE'), r.get('T_REFDATE'))
-                            if k not in grouped:
-                                grouped[k] = {'SALES_TARGET': 0.0, 'ACCHIVEMENT': 0.0, 'F_REFDATE': k[0], 'T_REFDATE': k[1]}
-                            st = r.get('SALES_TARGET') or 0.0
-                            ac = r.get('ACCHIVEMENT') or 0.0
-                            try:
-                                grouped[k]['SALES_TARGET'] += float(st)
-                            except Exception:
-                                pass
-                            try:
-                                grouped[k]['ACCHIVEMENT'] += float(ac)
-                            except Exception:
-                                pass
-                    agg = []
-                    for k, g in grouped.items():
-                        row = {'TERRITORYID': 0, 'TERRITORYNAME': 'All Territories', 'SALES_TARGET': g['SALES_TARGET'], 'ACCHIVEMENT': g['ACCHIVEMENT'], 'F_REFDATE': g['F_REFDATE'], 'T_REFDATE': g['T_REFDATE']}
-                        if include_legacy:
-                            row['Sales_Target'] = row['SALES_TARGET']
-                            row['Achievement'] = row['ACCHIVEMENT']
-                        agg.append(row)
-                    data = agg
-                elif group_by_param == 'territory':
-                    grouped = {}
-                    for r in (data or []):
-                        if isinstance(r, dict):
-                            tid = r.get('TERRITORYID')
-                            tname = r.get('TERRITORYNAME')
-                            k = (tid, tname)
-                            if k not in grouped:
-                                grouped[k] = {'SALES_TARGET': 0.0, 'ACCHIVEMENT': 0.0, 'TERRITORYID': tid, 'TERRITORYNAME': tname, 'F_REFDATE': r.get('F_REFDATE'), 'T_REFDATE': r.get('T_REFDATE')}
-                            st = r.get('SALES_TARGET') or 0.0
-                            ac = r.get('ACCHIVEMENT') or 0.0
-                            try:
-                                grouped[k]['SALES_TARGET'] += float(st)
-                            except Exception:
-                                pass
-                            try:
-                                grouped[k]['ACCHIVEMENT'] += float(ac)
-                            except Exception:
-                                pass
-                            f = r.get('F_REFDATE')
-                            t = r.get('T_REFDATE')
-                            if f and (grouped[k]['F_REFDATE'] is None or str(f) < str(grouped[k]['F_REFDATE'])):
-                                grouped[k]['F_REFDATE'] = f
-                            if t and (grouped[k]['T_REFDATE'] is None or str(t) > str(grouped[k]['T_REFDATE'])):
-                                grouped[k]['T_REFDATE'] = t
-                    data = []
-                    for k, g in grouped.items():
-                        row = {'TERRITORYID': g['TERRITORYID'] or 0, 'TERRITORYNAME': g['TERRITORYNAME'] or '', 'SALES_TARGET': g['SALES_TARGET'], 'ACCHIVEMENT': g['ACCHIVEMENT'], 'F_REFDATE': g['F_REFDATE'], 'T_REFDATE': g['T_REFDATE']}
-                        if include_legacy:
-                            row['Sales_Target'] = row['SALES_TARGET']
-                            row['Achievement'] = row['ACCHIVEMENT']
-                        data.append(row)
-                else:
-                    total_st = 0.0
-                    total_ac = 0.0
-                    min_f = None
-                    max_t = None
-                    for r in (data or []):
-                        if isinstance(r, dict):
-                            st = r.get('SALES_TARGET') or 0.0
-                            ac = r.get('ACCHIVEMENT') or 0.0
-                            try:
-                                total_st += float(st)
-                            except Exception:
-                                pass
-                            try:
-                                total_ac += float(ac)
-                            except Exception:
-                                pass
-                            f = r.get('F_REFDATE')
-                            t = r.get('T_REFDATE')
-                            if f and (min_f is None or str(f) < str(min_f)):
-                                min_f = f
-                            if t and (max_t is None or str(t) > str(max_t)):
-                                max_t = t
-                    one = {'TERRITORYID': 0, 'TERRITORYNAME': 'All Territories', 'SALES_TARGET': total_st, 'ACCHIVEMENT': total_ac, 'F_REFDATE': (start_date or min_f), 'T_REFDATE': (end_date or max_t)}
-                    if include_legacy:
-                        one['Sales_Target'] = one['SALES_TARGET']
-                        one['Achievement'] = one['ACCHIVEMENT']
-                    data = [one]
-            page_param = (request.query_params.get('page') or '1').strip()
-            page_size_param = (request.query_params.get('page_size') or '').strip()
-            try:
-                page_num = int(page_param) if page_param else 1
-            except Exception:
-                page_num = 1
-            default_page_size = 10
-            try:
-                default_page_size = int(getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE', 10) or 10)
-            except Exception:
-                default_page_size = 10
-            try:
-                page_size = int(page_size_param) if page_size_param else default_page_size
-            except Exception:
-                page_size = default_page_size
-            paginator = Paginator(list(data or []), page_size)
-            try:
-                page_obj = paginator.page(page_num)
-                paged_rows = list(page_obj.object_list)
-            except Exception:
-                paged_rows = list(data or [])
-                page_obj = None
-            pagination = {
-                'page': (page_obj.number if page_obj else 1),
-                'num_pages': (paginator.num_pages if paginator else 1),
-                'has_next': (page_obj.has_next() if page_obj else False),
-                'has_prev': (page_obj.has_previous() if page_obj else False),
-                'next_page': ((page_obj.next_page_number() if page_obj and page_obj.has_next() else None)),
-                'prev_page': ((page_obj.previous_page_number() if page_obj and page_obj.has_previous() else None)),
-                'count': (paginator.count if paginator else len(data or [])),
-                'page_size': page_size,
+            return conn
+
+        # Grouping, totals and scaling are done in SQL (see hana_reports)
+        if do_sum_all and group_by_param == 'month':
+            dims = ['month']
+        elif do_sum_all and group_by_param != 'territory':
+            dims = []
+        else:
+            dims = ['territory']
+        # Closed months come from the local mirror without connecting to HANA
+        rows = hana_reports.report(
+            connect, cfg['schema'], 'sales_target', dims, ['target', 'achievement'],
+            emp_id=emp_id, territory_name=territory or None,
+            start_date=start_date or None, end_date=end_date or None,
+            in_millions=(in_millions_param in ('true','1','yes','y')),
+        )
+        data = []
+        for r in rows:
+            row = {
+                'TERRITORYID': r.get('TerritoryId') or 0,
+                'TERRITORYNAME': r.get('TerritoryName') or ('' if 'territory' in dims else 'All Territories'),
+                'SALES_TARGET': float(r.get('Target') or 0.0),
+                'ACCHIVEMENT': float(r.get('Achievement') or 0.0),
+                'F_REFDATE': r.get('From_Date'),
+                'T_REFDATE': r.get('To_Date'),
             }
-            return Response({'success': True, 'count': (paginator.count if paginator else len(data or [])), 'data': paged_rows, 'pagination': pagination}, status=status.HTTP_200_OK)
-        finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
+            if not dims:
+                row['F_REFDATE'] = start_date or row['F_REFDATE']
+                row['T_REFDATE'] = end_date or row['T_REFDATE']
+            if include_legacy:
+                row['Sales_Target'] = row['SALES_TARGET']
+                row['Achievement'] = row['ACCHIVEMENT']
+            data.append(row)
+        page_param = (request.query_params.get('page') or '1').strip()
+        page_size_param = (request.query_params.get('page_size') or '').strip()
+        try:
+            page_num = int(page_param) if page_param else 1
+        except Exception:
+            page_num = 1
+        default_page_size = 10
+        try:
+            default_page_size = int(getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE', 10) or 10)
+        except Exception:
+            default_page_size = 10
+        try:
+            page_size = int(page_size_param) if page_size_param else default_page_size
+        except Exception:
+            page_size = default_page_size
+        paginator = Paginator(list(data or []), page_size)
+        try:
+            page_obj = paginator.page(page_num)
+            paged_rows = list(page_obj.object_list)
+        except Exception:
+            paged_rows = list(data or [])
+            page_obj = None
+        pagination = {
+            'page': (page_obj.number if page_obj else 1),
+            'num_pages': (paginator.num_pages if paginator else 1),
+            'has_next': (page_obj.has_next() if page_obj else False),
+            'has_prev': (page_obj.has_previous() if page_obj else False),
+            'next_page': ((page_obj.next_page_number() if page_obj and page_obj.has_next() else None)),
+            'prev_page': ((page_obj.previous_page_number() if page_obj and page_obj.has_previous() else None)),
+            'count': (paginator.count if paginator else len(data or [])),
+            'page_size': page_size,
+        }
+        return Response({'success': True, 'count': (paginator.count if paginator else len(data or [])), 'data': paged_rows, 'pagination': pagination}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({
             'success': False,
@@ -7251,306 +7126,19 @@ def get_product_description_api(request):
     Returns:
         JSON response with product information and description
     """
-    try:
-        # Load environment variables
-        try:
-            _hana_load_env_file(os.path.join(os.path.dirname(__file__), '.env'))
-            _hana_load_env_file(os.path.join(str(settings.BASE_DIR), '.env'))
-            _hana_load_env_file(os.path.join(str(Path(settings.BASE_DIR).parent), '.env'))
-            _hana_load_env_file(os.path.join(os.getcwd(), '.env'))
-        except Exception:
-            pass
-        
-        # Get parameters from request
-        item_code = request.GET.get('item_code', '').strip()
-        
-        # Validate item_code parameter
-        if not item_code:
-            return Response({
-                'success': False,
-                'error': 'item_code parameter is required'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Use database param directly (same as products_catalog_api) to get the actual HANA schema name
-        database = (request.GET.get('database') or os.environ.get('HANA_SCHEMA') or '').strip()
-        
-        # logger.info(f"Fetching product description for ItemCode: {item_code}, Database: {database}")
-        
-        # Get SAP HANA connection configuration
-        cfg = {
-            'host': os.environ.get('HANA_HOST', ''),
-            'port': os.environ.get('HANA_PORT', '30015'),
-            'user': os.environ.get('HANA_USER', ''),
-            'encrypt': os.environ.get('HANA_ENCRYPT', ''),
-            'ssl_validate': os.environ.get('HANA_SSL_VALIDATE', ''),
-            'schema': database
-        }
-        
-        pwd = os.environ.get('HANA_PASSWORD', '')
-        
-        # Validate configuration
-        if not all([cfg['host'], cfg['port'], cfg['user'], pwd]):
-            # logger.error("SAP HANA configuration incomplete")
-            return Response({
-                'success': False,
-                'error': 'SAP HANA configuration is incomplete'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        # Connect to SAP HANA
-        from hdbcli import dbapi
-        
-        kwargs = {
-            'address': cfg['host'],
-            'port': int(cfg['port']),
-            'user': cfg['user'],
-            'password': pwd
-        }
-        
-        if str(cfg['encrypt']).strip().lower() in ('true', '1', 'yes'):
-            kwargs['encrypt'] = True
-            if cfg['ssl_validate']:
-                kwargs['sslValidateCertificate'] = (str(cfg['ssl_validate']).strip().lower() in ('true', '1', 'yes'))
-        
-        try:
-            conn = dbapi.connect(**kwargs)
-        except Exception as e:
-            # logger.error(f"Failed to connect to SAP HANA: {e}")
-            return Response({
-                'success': False,
-                'error': f'Database connection failed: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        try:
-            # Set schema
-            cur = conn.cursor()
-            if cfg['schema']:
-                # Quote schema name properly (schema names can contain hyphens in HANA)
-                from sap_integration.hana_connect import quote_ident
-                schema_name = cfg['schema']
-                set_schema_sql = f'SET SCHEMA {quote_ident(schema_name)}'
-                cur.execute(set_schema_sql)
-            
-            # Match image and descriptions by U_IMG_C category. Join ATC1 directly (no OATC intermediate).
-            sql = """
-            SELECT
-                T0."ItemCode",
-                T0."ItemName",
-                T0."AtcEntry",
-                MAX(
-                    CASE
-                        WHEN A."U_IMG_C" = 'Product Image'
-                        THEN A."FreeText"
-                    END
-                ) AS "Description",
-                MIN(
-                    CASE
-                        WHEN A."U_IMG_C" = 'Product Image'
-                        THEN A."FileName" || '.' || A."FileExt"
-                    END
-                ) AS "Product_Image",
-                MAX(
-                    CASE
-                        WHEN A."U_IMG_C" = 'Product Description Urdu'
-                        THEN A."FileName" || '.' || A."FileExt"
-                    END
-                ) AS "Product_Description_Urdu",
-                MAX(
-                    CASE
-                        WHEN A."U_IMG_C" = 'Product Description English'
-                        THEN A."FileName" || '.' || A."FileExt"
-                    END
-                ) AS "Product_Description_English"
-            FROM OITM T0
-            LEFT JOIN ATC1 A
-                ON A."AbsEntry" = T0."AtcEntry"
-            WHERE
-                T0."ItemCode" = ?
-            GROUP BY
-                T0."ItemCode",
-                T0."ItemName",
-                T0."AtcEntry"
-            """
-            
-            cur.execute(sql, (item_code,))
-            rows = cur.fetchall()
-            
-            if not rows or not rows[0][0]:
-                # logger.warning(f"Product not found: {item_code}")
-                return Response({
-                    'success': False,
-                    'error': f'Product with ItemCode {item_code} not found'
-                }, status=status.HTTP_404_NOT_FOUND)
-            
-            row = rows[0]
-            item_code_result = row[0]
-            item_name        = row[1]
-            atc_entry        = row[2]
-            description      = row[3]          # FreeText from Product Image line
-            product_image    = row[4]          # e.g. "Black-Gold.png"
-            product_desc_urdu = row[5]         # e.g. "بلیک گولڈ 5.docx"
-            product_desc_english = row[6]      # e.g. "Black-Gold-English.docx"
-
-            # Split combined FileName.FileExt back into parts for backward-compat fields
-            def _split_file(combined):
-                if not combined:
-                    return None, None
-                parts = combined.rsplit('.', 1)
-                return (parts[0], parts[1]) if len(parts) == 2 else (parts[0], None)
-
-            image_file, image_ext = _split_file(product_image)
-            urdu_file,  urdu_ext  = _split_file(product_desc_urdu)
-            english_file, english_ext = _split_file(product_desc_english)
-
-            # Extract folder name from schema/database name (e.g., "4B-AGRI_LIVE" -> "4B-AGRI")
-            folder_name = 'default'
-            if database:
-                folder_name = database.replace('_APP', '').replace('_LIVE', '').replace('_TEST', '').strip()
-
-            # Resolve URLs in priority order:
-            #   1. SAP's FileName (without extension) -> scan disk for any image extension
-            #   2. ItemCode (e.g. FG00682) -> scan disk for any image extension
-            #   3. Simplified item name (first word before space/dash/paren) -> scan disk
-            #   4. Fallback: SAP's verbatim filename URL when SAP holds an attachment
-            try:
-                media_root = settings.MEDIA_ROOT
-            except Exception:
-                media_root = 'media'
-
-            _IMAGE_EXTS = ('png', 'jpg', 'jpeg', 'webp', 'gif')
+    item_code = request.GET.get('item_code', '').strip()
+    if not item_code:
+        return Response({
+            'success': False,
+            'error': 'item_code parameter is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-            def _scan_disk(disk_dir: str, base: str):
-                """Exact match: {base}.{ext} for any image ext."""
-                if not base:
-                    return None
-                for ext in _IMAGE_EXTS:
-                    candidate = f'{base}.{ext}'
-                    if os.path.isfile(os.path.join(disk_dir, candidate)):
-                        return candidate
-                return None
-
-            def _scan_disk_digit_suffix(disk_dir: str, base: str):
-                """Match {base}{digits}.{ext} (e.g. Greenia -> greenia2.jpeg). Picks alphabetically first."""
-                if not base or not os.path.isdir(disk_dir):
-                    return None
-                base_lower = base.lower()
-                candidates = []
-                try:
-                    for fname in os.listdir(disk_dir):
-                        name, _dot, ext = fname.rpartition('.')
-                        if not _dot or ext.lower() not in _IMAGE_EXTS:
-                            continue
-                        if not name.lower().startswith(base_lower):
-                            continue
-                        rest = name[len(base):]
-                        # Require the part after `base` to be purely digits (allow empty so exact match also lands here)
-                        if rest.isdigit() or rest == '':
-                            candidates.append(fname)
-                except OSError:
-                    return None
-                return sorted(candidates)[0] if candidates else None
-
-            def _simple_name(name: str) -> str:
-                if not name:
-                    return ''
-                return name.split()[0].split('-')[0].split('(')[0].strip()
-
-            def _resolve_url(subfolder: str, sap_full: str) -> str | None:
-                sub_path = f'{subfolder}/' if subfolder else ''
-                disk_dir = (os.path.join(media_root, 'product_images', folder_name, subfolder)
-                            if subfolder else os.path.join(media_root, 'product_images', folder_name))
-                # 1. SAP filename (without extension)
-                if sap_full:
-                    sap_base = sap_full.rsplit('.', 1)[0]
-                    found = _scan_disk(disk_dir, sap_base)
-                    if found:
-                        return f'/media/product_images/{folder_name}/{sub_path}{found}'
-                # 2. ItemCode
-                found = _scan_disk(disk_dir, item_code_result or '')
-                if found:
-                    return f'/media/product_images/{folder_name}/{sub_path}{found}'
-                # 3. Simplified item name (e.g. "Parwaz-10-Grm" -> "Parwaz")
-                #    Also matches with trailing digits (Greenia -> greenia2.jpeg)
-                simple = _simple_name(item_name or '')
-                if simple and len(simple) > 2:
-                    found = _scan_disk_digit_suffix(disk_dir, simple)
-                    if found:
-                        return f'/media/product_images/{folder_name}/{sub_path}{found}'
-                # 4. Fallback: SAP exact filename verbatim
-                if sap_full:
-                    return f'/media/product_images/{folder_name}/{sub_path}{sap_full}'
-                return None
-
-            product_image_url = _resolve_url('', product_image or '')
-            product_description_urdu_url = _resolve_url('urdu', product_desc_urdu or '')
-            product_description_english_url = _resolve_url('english', product_desc_english or '')
-
-            all_attachments = []
-            if product_image:
-                all_attachments.append({'file_name': image_file, 'file_ext': image_ext, 'category': 'Product Image', 'has_description': bool(description)})
-            if product_desc_urdu:
-                all_attachments.append({'file_name': urdu_file, 'file_ext': urdu_ext, 'category': 'Product Description Urdu', 'has_description': False})
-            if product_desc_english:
-                all_attachments.append({'file_name': english_file, 'file_ext': english_ext, 'category': 'Product Description English', 'has_description': False})
-            
-            # Fetch price from @PLR4 for this item
-            price = 0.0
-            try:
-                from sap_integration.hana_connect import _fetch_all
-                price_rows = _fetch_all(conn, 
-                    'SELECT T1."U_np" AS "Price" '
-                    'FROM "@PLR4" T1 '
-                    'INNER JOIN "@PL1" T0 ON T0."DocEntry" = T1."DocEntry" '
-                    'WHERE T1."U_itc" = ?',
-                    (item_code,)
-                )
-                if price_rows:
-                    # Get the highest price if multiple entries exist
-                    for pr in price_rows:
-                        price_val = pr.get('Price', 0)
-                        try:
-                            price_val = float(price_val) if price_val is not None else 0.0
-                        except (ValueError, TypeError):
-                            price_val = 0.0
-                        if price_val > price:
-                            price = price_val
-            except Exception:
-                pass  # If price fetch fails, use 0
-            
-            result = {
-                'item_code': item_code_result,
-                'item_name': item_name,
-                'description': description,  # FreeText - Product Description
-                'price': price,  # Price from @PLR4 or 0 if not found
-                'atc_entry': atc_entry,
-                'product_image': product_image,          # e.g. "Black-Gold.png"  (FileName.FileExt)
-                'product_description_urdu': product_desc_urdu,  # e.g. "بلیک گولڈ 5.docx"
-                'product_description_english': product_desc_english,  # e.g. "Black-Gold-English.docx"
-                'image_file': image_file,
-                'image_ext': image_ext,
-                'urdu_file': urdu_file,
-                'urdu_ext': urdu_ext,
-                'english_file': english_file,
-                'english_ext': english_ext,
-                'product_image_url': product_image_url,  # Full URL to product image
-                'product_description_urdu_url': product_description_urdu_url,  # Full URL to Urdu description
-                'product_description_english_url': product_description_english_url,  # Full URL to English description
-                'has_document': bool(description or urdu_file or english_file),  # True if has description or Urdu/English file
-                'attachments': all_attachments  # All attachment details
-            }
-            
-            # logger.info(f"Product found: {item_code}, Description: {'Yes' if description else 'No'}")
-            return Response({
-                'success': True,
-                'data': result
-            }, status=status.HTTP_200_OK)
-                
-        finally:
-            try:
-                cur.close()
-                conn.close()
-            except Exception:
-                pass
-            
+    # Use database param directly (same as products_catalog_api) to get the actual HANA schema name
+    database = (request.GET.get('database') or '').strip()
+    try:
+        result = get_product_description(item_code, database)
+    except ProductDescriptionError as e:
+        return Response({'success': False, 'error': str(e)}, status=e.status)
     except Exception as e:
         # logger.error(f"Error in get_product_description_api: {e}", exc_info=True)
         return Response({
@@ -7558,6 +7146,11 @@ def get_product_description_api(request):
             'error': f'An error occurred: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    return Response({
+        'success': True,
+        'data': result
+    }, status=status.HTTP_200_OK)
+
 @swagger_auto_schema(
     tags=['SAP - Products'], 
     method='get',
@@ -8459,27 +8052,10 @@ def general_ledger_api(request):
             else:
                 cur.execute(query)
             
-            columns = [desc[0] for desc in cur.description]
-            rows = cur.fetchall()
+            # Dates to ISO strings, Decimal to float
+            data = hana_rows.fetch(cur, convert='json')
             cur.close()
             
-            data = []
-            for row in rows:
-                row_dict = {}
-                for idx, col in enumerate(columns):
-                    val = row[idx]
-                    # Convert date objects to string
-                    if hasattr(val, 'isoformat'):
-                        val = val.isoformat()
-                    # Convert Decimal to float
-                    elif hasattr(val, '__float__'):
-                        try:
-                            val = float(val)
-                        except:
-                            pass
-                    row_dict[col] = val
-                data.append(row_dict)
-            
             # Paginate results
             paginator = Paginator(data, page_size)
             page_obj = paginator.get_page(page_num)
@@ -9228,22 +8804,10 @@ def policy_items_for_customer_api(request):
                 params = [doc_entry]
             
             cursor.execute(sql_query, params)
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
+            # Convert rows to list of dicts (dates as ISO strings)
+            data = hana_rows.fetch(cursor, convert='json')
             cursor.close()
 
-            # Convert rows to list of dicts
-            data = []
-            for row in rows:
-                item_dict = {}
-                for idx, col in enumerate(columns):
-                    val = row[idx]
-                    # Convert date/datetime to string
-                    if hasattr(val, 'isoformat'):
-                        val = val.isoformat()
-                    item_dict[col] = val
-                data.append(item_dict)
-
             # Check if no records found
             if not data:
                 return Response({
@@ -9395,22 +8959,10 @@ def policy_project_link_api(request):
             """
             
             cursor.execute(sql_query, [card_code])
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
+            # Convert rows to list of dicts (dates as ISO strings)
+            data = hana_rows.fetch(cursor, convert='json')
             cursor.close()
 
-            # Convert rows to list of dicts
-            data = []
-            for row in rows:
-                item_dict = {}
-                for idx, col in enumerate(columns):
-                    val = row[idx]
-                    # Convert date/datetime to string
-                    if hasattr(val, 'isoformat'):
-                        val = val.isoformat()
-                    item_dict[col] = val
-                data.append(item_dict)
-
             # Paginate results
             from django.core.paginator import Paginator
             paginator = Paginator(data, page_size)
@@ -9871,22 +9423,10 @@ def customer_policies_api(request):
             # logger.info(f"[CUSTOMER_POLICIES] Querying policies for CardCode: {card_code}")
             
             cursor.execute(sql_query, [card_code])
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
+            # Convert rows to list of dicts (dates as ISO strings)
+            data = hana_rows.fetch(cursor, convert='json')
             cursor.close()
 
-            # Convert rows to list of dicts
-            data = []
-            for row in rows:
-                item_dict = {}
-                for idx, col in enumerate(columns):
-                    val = row[idx]
-                    # Convert date/datetime to string
-                    if hasattr(val, 'isoformat'):
-                        val = val.isoformat()
-                    item_dict[col] = val
-                data.append(item_dict)
-
             # logger.info(f"[CUSTOMER_POLICIES] Found {len(data)} policies for {card_code}")
 
             # Check if no records found
@@ -9948,7 +9488,7 @@ def customer_policies_api(request):
         openapi.Parameter(
             'search',
             openapi.IN_QUERY,
-            description="Search by disease name or item code",
+            description="Search by disease name, synonym, scientific name (fuzzy, ranked) or item code",
             type=openapi.TYPE_STRING,
             required=False
         ),
@@ -9991,21 +9531,31 @@ def disease_list_api(request):
             is_active_bool = is_active.lower() in ['true', '1', 'yes']
             queryset = queryset.filter(is_active=is_active_bool)
         
+        scores = {}
         if search:
+            # Names (incl. synonyms and scientific names) are ranked by the disease index,
+            # item codes still match as substrings
             from django.db.models import Q
-            queryset = queryset.filter(
-                Q(disease_name__icontains=search) |
-                Q(item_code__icontains=search) |
-                Q(item_name__icontains=search)
-            )
+            from kindwise.disease_index import get_index
+            matches = get_index().match(search, threshold=0.4, active_only=False)
+            scores = {m.disease_id: m.score for m in matches}
+            queryset = queryset.filter(Q(pk__in=list(scores)) | Q(item_code__icontains=search))
+        
+        diseases = list(queryset)
+        if scores:
+            diseases.sort(key=lambda d: -scores.get(d.id, 0.0))
         
         # Serialize
-        serializer = DiseaseIdentificationListSerializer(queryset, many=True)
+        serializer = DiseaseIdentificationListSerializer(diseases, many=True)
+        data = serializer.data
+        if scores:
+            for row in data:
+                row['match_score'] = round(scores.get(row['id'], 0.0), 3)
         
         return Response({
             'success': True,
-            'count': queryset.count(),
-            'data': serializer.data
+            'count': len(diseases),
+            'data': data
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -10397,90 +9947,89 @@ def recommended_products_api(request):
                     _series = 77
                 _series_clause = f"T0.\"Series\" = '{_series}'"
 
+                # All products in one query, then back in @ODID order
+                placeholders = ','.join(['?' for _ in product_item_codes])
+                cur = conn.cursor()
+                try:
+                    sql = f'''
+                    SELECT 
+                        T0."ItemCode",
+                        T0."ItemName",
+                        T1."ItmsGrpNam",
+                        T0."SalPackMsr",
+                        T0."InvntryUom",
+                        T0."U_GenericName",
+                        T0."U_BrandName",
+                        MIN(CASE WHEN LOWER(TRIM(A."FileExt")) IN ('jpeg', 'jpg', 'png', 'webp')
+                                 THEN A."FileName" || '.' || A."FileExt" END) AS "Product_Image",
+                        MAX(CASE WHEN A."U_IMG_C" = 'Product Description Urdu'
+                                 THEN A."FileName" || '.' || A."FileExt" END) AS "Product_Description_Urdu"
+                    FROM {_oitm} T0
+                    INNER JOIN {_oitb} T1 ON T0."ItmsGrpCod" = T1."ItmsGrpCod"
+                    LEFT JOIN {_atc1} A ON A."AbsEntry" = T0."AtcEntry"
+                    WHERE T0."ItemCode" IN ({placeholders})
+                                                AND {_series_clause}
+                                                AND T0."validFor" = 'Y'
+                                                AND T0."U_IsActive" = 'Y'
+                    GROUP BY
+                        T0."ItemCode",
+                        T0."ItemName",
+                        T1."ItmsGrpNam",
+                        T0."SalPackMsr",
+                        T0."InvntryUom",
+                        T0."U_GenericName",
+                        T0."U_BrandName"
+                    '''
+                    cur.execute(sql, tuple(product_item_codes))
+                    rows_by_code = {row[0]: row for row in cur.fetchall()}
+                finally:
+                    cur.close()
+
                 for idx, prod_code in enumerate(product_item_codes, 1):
-                    try:
-                        cur = conn.cursor()
-                        sql = f'''
-                        SELECT 
-                            T0."ItemCode",
-                            T0."ItemName",
-                            T1."ItmsGrpNam",
-                            T0."SalPackMsr",
-                            T0."InvntryUom",
-                            T0."U_GenericName",
-                            T0."U_BrandName",
-                            MIN(CASE WHEN LOWER(TRIM(A."FileExt")) IN ('jpeg', 'jpg', 'png', 'webp')
-                                     THEN A."FileName" || '.' || A."FileExt" END) AS "Product_Image",
-                            MAX(CASE WHEN A."U_IMG_C" = 'Product Description Urdu'
-                                     THEN A."FileName" || '.' || A."FileExt" END) AS "Product_Description_Urdu"
-                        FROM {_oitm} T0
-                        INNER JOIN {_oitb} T1 ON T0."ItmsGrpCod" = T1."ItmsGrpCod"
-                        LEFT JOIN {_atc1} A ON A."AbsEntry" = T0."AtcEntry"
-                        WHERE T0."ItemCode" = ?
-                                                    AND {_series_clause}
-                                                    AND T0."validFor" = 'Y'
-                                                    AND T0."U_IsActive" = 'Y'
-                        GROUP BY
-                            T0."ItemCode",
-                            T0."ItemName",
-                            T1."ItmsGrpNam",
-                            T0."SalPackMsr",
-                            T0."InvntryUom",
-                            T0."U_GenericName",
-                            T0."U_BrandName"
-                        '''
-                        cur.execute(sql, (prod_code,))
-                        row = cur.fetchone()
+                    row = rows_by_code.get(prod_code)
+                    if row:
+                        # Extract product name - use only the part before " - " if exists
+                        full_product_name = row[1].strip() if row[1] else prod_code
+                        # Split by " - " and take first part (e.g., "Map" from "Map - 25-Kgs.")
+                        product_name = full_product_name.split(' - ')[0].strip() if ' - ' in full_product_name else full_product_name
                         
-                        if row:
-                            # Extract product name - use only the part before " - " if exists
-                            full_product_name = row[1].strip() if row[1] else prod_code
-                            # Split by " - " and take first part (e.g., "Map" from "Map - 25-Kgs.")
-                            product_name = full_product_name.split(' - ')[0].strip() if ' - ' in full_product_name else full_product_name
-                            
-                            # Build image URLs
-                            product_image = row[7]
-                            if product_image:
-                                product_image_url = f'/media/product_images/{folder_name}/{product_image}'
-                            else:
-                                # Fallback to product name-based naming (e.g., Badar.jpg, Haryali.jpg, Map.jpg)
-                                product_image_url = f'/media/product_images/{folder_name}/{product_name}.jpg'
-                            
-                            # Follow products_catalog logic: only use explicit Urdu attachment label.
-                            product_desc_urdu = row[8]
-                            if product_desc_urdu:
-                                urdu_url = f'/media/product_images/{folder_name}/{product_desc_urdu}'
-                            else:
-                                urdu_url = None
-
-                            product_image_url = _media_url(product_image_url)
-                            urdu_url = _media_url(urdu_url)
-                            # Keep only relative URLs in response (requested by client).
-                            # product_image_url_full = request.build_absolute_uri(product_image_url)
-                            # urdu_url_full = request.build_absolute_uri(urdu_url)
-                            
-                            product = {
-                                'priority': idx,
-                                'product_item_code': row[0],
-                                'product_name': row[1],
-                                'item_group_name': row[2],
-                                'unit_of_measure': row[3] or row[4],
-                                'generic_name': row[5],
-                                'brand_name': row[6],
-                                'product_image_url': product_image_url,
-                                'product_description_urdu_url': urdu_url,
-                                # Additional fields
-                                'dosage': f'As per product label',
-                                'application_method': 'Follow product instructions',
-                                'timing': 'At first symptoms or preventively',
-                            }
-                            products_data.append(product)
+                        # Build image URLs
+                        product_image = row[7]
+                        if product_image:
+                            product_image_url = f'/media/product_images/{folder_name}/{product_image}'
+                        else:
+                            # Fallback to product name-based naming (e.g., Badar.jpg, Haryali.jpg, Map.jpg)
+                            product_image_url = f'/media/product_images/{folder_name}/{product_name}.jpg'
                         
-                        cur.close()
+                        # Follow products_catalog logic: only use explicit Urdu attachment label.
+                        product_desc_urdu = row[8]
+                        if product_desc_urdu:
+                            urdu_url = f'/media/product_images/{folder_name}/{product_desc_urdu}'
+                        else:
+                            urdu_url = None
+
+                        product_image_url = _media_url(product_image_url)
+                        urdu_url = _media_url(urdu_url)
+                        # Keep only relative URLs in response (requested by client).
+                        # product_image_url_full = request.build_absolute_uri(product_image_url)
+                        # urdu_url_full = request.build_absolute_uri(urdu_url)
                         
-                    except Exception as e:
-                        #logger.warning(f"Could not fetch product {prod_code}: {str(e)}")
-                        continue
+                        product = {
+                            'priority': idx,
+                            'product_item_code': row[0],
+                            'product_name': row[1],
+                            'item_group_name': row[2],
+                            'unit_of_measure': row[3] or row[4],
+                            'generic_name': row[5],
+                            'brand_name': row[6],
+                            'product_image_url': product_image_url,
+                            'product_description_urdu_url': urdu_url,
+                            # Additional fields
+                            'dosage': f'As per product label',
+                            'application_method': 'Follow product instructions',
+                            'timing': 'At first symptoms or preventively',
+                        }
+                        products_data.append(product)
             
             return Response({
                 'success': True,
@@ -11241,10 +10790,9 @@ def product_catalog_list_view(request):
 def product_document_view(request, item_code):
     """
     Display product details with parsed Word document content
-    Uses the product description API to get product info and description
+    Uses the product description service (same data as the API) for product info and description
     """
     from .utils.document_parser import get_product_document_path
-    import json
     
     # Get database from query param
     database = request.GET.get('database', '').strip() or request.session.get('selected_database', '')
@@ -11276,90 +10824,49 @@ def product_document_view(request, item_code):
     english_ext = None
     
     try:
-        # Call the product description API internally
-        from django.test import RequestFactory
-        factory = RequestFactory()
-        
-        # Create API request with proper GET parameters
-        api_request = factory.get('/api/sap/product-description/', {
-            'item_code': item_code,
-            'database': database
-        })
-        
-        # Copy session and user if they exist
-        if hasattr(request, 'session'):
-            api_request.session = request.session
-        if hasattr(request, 'user'):
-            api_request.user = request.user
-        
-        # logger.info(f"Calling get_product_description_api with item_code={item_code}, database={database}")
-        
-        # Call the API view
-        api_response = get_product_description_api(api_request)
-        
-        # Render the response before accessing content
-        api_response.render()
-        
-        # logger.info(f"API response status: {api_response.status_code}")
+        data = get_product_description(item_code, database)
+
+        # Extract description
+        product_description = data.get('description')
+
+        # Extract document file info
+        doc_file_name = data.get('urdu_file')
+        doc_file_ext = data.get('urdu_ext')
+        english_file = data.get('english_file')
+        english_ext = data.get('english_ext')
+
+        # Service-provided URLs (already include /urdu/ and /english/ subfolders)
+        urdu_url = data.get('product_description_urdu_url')
+        english_url = data.get('product_description_english_url')
+
+        # Determine folder for image URL
+        folder = database.replace('_APP', '').replace('_LIVE', '').replace('_TEST', '').strip()
+
+        # Build basic product info for display
+        product = {
+            'ItemCode': data.get('item_code'),
+            'ItemName': data.get('item_name'),
+            'product_image_url': data.get('product_image_url') or (
+                f"/media/product_images/{folder}/{data.get('image_file')}.{data.get('image_ext')}"
+                if data.get('image_file') and data.get('image_ext') else None
+            ),
+            'product_description_urdu_url': urdu_url,
+            'product_description_english_url': english_url,
+        }
         
-        if api_response.status_code == 200:
-            response_data = json.loads(api_response.content)
+        # Build download URL only if document file exists
+        if doc_file_name and doc_file_ext:
+            file_path = get_product_document_path(doc_file_name, doc_file_ext, database)
             
-            if response_data.get('success'):
-                data = response_data.get('data', {})
-                
-                # Extract description
-                product_description = data.get('description')
-                
-                # Extract document file info
-                doc_file_name = data.get('urdu_file')
-                doc_file_ext = data.get('urdu_ext')
-                english_file = data.get('english_file')
-                english_ext = data.get('english_ext')
-
-                # API-provided URLs (already include /urdu/ and /english/ subfolders)
-                urdu_url = data.get('product_description_urdu_url')
-                english_url = data.get('product_description_english_url')
-
-                # Determine folder for image URL
-                folder = database.replace('_APP', '').replace('_LIVE', '').replace('_TEST', '').strip()
-
-                # Build basic product info for display
-                product = {
-                    'ItemCode': data.get('item_code'),
-                    'ItemName': data.get('item_name'),
-                    'product_image_url': data.get('product_image_url') or (
-                        f"/media/product_images/{folder}/{data.get('image_file')}.{data.get('image_ext')}"
-                        if data.get('image_file') and data.get('image_ext') else None
-                    ),
-                    'product_description_urdu_url': urdu_url,
-                    'product_description_english_url': english_url,
-                }
-                
-                # Build download URL only if document file exists
-                if doc_file_name and doc_file_ext:
-                    file_path = get_product_document_path(doc_file_name, doc_file_ext, database)
-                    
-                    if file_path and os.path.exists(file_path):
-                        download_url = f"/api/sap/product-description-download/?item_code={item_code}&database={database}"
-                        # logger.info(f"Document file found for {item_code}: {file_path}")
-                    else:
-                        pass
-                        # logger.warning(f"Document file not found: {doc_file_name}.{doc_file_ext}")
+            if file_path and os.path.exists(file_path):
+                download_url = f"/api/sap/product-description-download/?item_code={item_code}&database={database}"
+                # logger.info(f"Document file found for {item_code}: {file_path}")
             else:
-                error_msg = response_data.get('error', 'Failed to load product description')
-                # logger.error(f"API returned success=false: {error_msg}")
-        else:
-            # Try to extract error from response
-            try:
-                response_data = json.loads(api_response.content)
-                error_msg = response_data.get('error', f"API returned status {api_response.status_code}")
-                # logger.error(f"API error response: {response_data}")
-            except Exception as parse_err:
-                error_msg = f"API returned status {api_response.status_code}"
-                # logger.error(f"Could not parse API error response: {parse_err}")
-                # logger.error(f"Raw response: {api_response.content[:500]}")
-            
+                pass
+                # logger.warning(f"Document file not found: {doc_file_name}.{doc_file_ext}")
+
+    except ProductDescriptionError as e:
+        error_msg = str(e)
     except Exception as e:
         # logger.error(f"Error loading product document: {e}")
         error_msg = str(e)
@@ -11552,6 +11059,11 @@ def dealer_analytics_api(request):
         # Get total Kindwise records for this user
         kindwise_count = KindwiseIdentification.objects.filter(user_id=user_id).count()
         
+        # Portal orders placed by this dealer (cached, computed in the database)
+        from cart import statistics as order_stats
+        from cart.models import Order
+        portal_orders = order_stats.order_statistics(Order.objects.filter(user_id=user_id), f'dealer:{dealer.pk}')
+        
         # Get total policies from SAP HANA
         database = get_hana_schema_from_request(request)
         
@@ -11639,6 +11151,7 @@ def dealer_analytics_api(request):
                 'total_policies': total_policies,
                 'total_kindwise_records': kindwise_count,
                 'total_balance': total_balance,
+                'portal_orders': portal_orders,
             }
         }
         
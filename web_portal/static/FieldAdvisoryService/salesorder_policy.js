@@ -114,6 +114,13 @@
     if(desc) desc.value = info.name || '';
     if(mu) mu.value = info.uom || '';
 
+    // Price and warehouses are resolved for all lines in one batched request
+    // when the change form provides the order pricing queue
+    if(window.__queueOrderPricing){
+      window.__queueOrderPricing(row);
+      return;
+    }
+
     // Fetch price by policy + item
     var uPlInput = qsInRow(row, 'input[name$="u_pl"]');
     var docEntry = uPlInput ? (uPlInput.value || '') : '';
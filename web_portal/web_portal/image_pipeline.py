@@ -0,0 +1,227 @@
+"""
+Server-side normalization of uploaded photos.
+
+Phone photos arrive as 8-12 MB JPEGs, often rotated only through their EXIF
+orientation tag and carrying GPS / camera metadata. ``normalize`` fixes the
+orientation, downscales so the longer side is at most IMAGE_NORMALIZE_MAX_SIDE,
+re-encodes as JPEG (or WebP) at IMAGE_NORMALIZE_QUALITY and drops EXIF and
+other metadata. Non-image files and images that cannot be decoded pass through
+unchanged, as do already-small images without metadata when re-encoding would
+not make them smaller.
+
+Decoding and encoding run on a small worker pool (IMAGE_NORMALIZE_WORKERS
+threads), so no more than that many full-size photos are decoded at once;
+a request waits at most IMAGE_NORMALIZE_TIMEOUT seconds and otherwise
+keeps the original upload.
+
+Serializers opt in with ``NormalizeUploadsMixin`` (model ImageFields, and
+image uploads to model FileFields, are normalized before the size and
+extension validators run); views that save uploads themselves call
+``normalize_upload``. ``stats()`` reports the bytes saved so far.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import models
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff'}
+
+FORMATS = {
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class NormalizedImage:
+    """Outcome of normalizing one upload. ``data`` is None when the original is kept."""
+
+    __slots__ = ('name', 'content_type', 'data', 'original_size', 'size')
+
+    def __init__(self, name: str, content_type: str | None, data: bytes | None, original_size: int, size: int):
+        self.name = name
+        self.content_type = content_type
+        self.data = data
+        self.original_size = original_size
+        self.size = size
+
+    @property
+    def changed(self) -> bool:
+        return self.data is not None
+
+    @property
+    def saved(self) -> int:
+        return self.original_size - self.size
+
+
+_stats = {'images': 0, 'normalized': 0, 'kept': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0}
+_stats_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _record(outcome: str, original_size: int, size: int) -> None:
+    with _stats_lock:
+        _stats['images'] += 1
+        _stats[outcome] += 1
+        _stats['bytes_in'] += original_size
+        _stats['bytes_out'] += size
+
+
+def stats() -> dict:
+    """Counts and bytes for every image seen by this process."""
+    with _stats_lock:
+        data = dict(_stats)
+    data['bytes_saved'] = data['bytes_in'] - data['bytes_out']
+    data['ratio'] = round(data['bytes_out'] / data['bytes_in'], 4) if data['bytes_in'] else 1.0
+    return data
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+
+def is_image_name(name: str) -> bool:
+    return os.path.splitext(name or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def _read(source) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    return data
+
+
+def _encode(data: bytes, max_side: int, quality: int, fmt: str) -> tuple:
+    """Decode, orient, downscale and re-encode. Returns ``(bytes, needed)``."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as img:
+        if getattr(img, 'n_frames', 1) > 1:
+            raise ValueError('animated images are not normalized')
+        exif = img.getexif()
+        has_metadata = bool(exif or img.info.get('exif') or img.info.get('xmp'))
+        orientation = exif.get(0x0112, 1)
+        too_large = max(img.size) > max_side
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale directly, which keeps memory low
+        img.draft('RGB', (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        if fmt == 'JPEG' and (img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)):
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        elif img.mode not in ('RGB', 'L') and not (fmt == 'WEBP' and img.mode == 'RGBA'):
+            img = img.convert('RGB')
+
+        out = io.BytesIO()
+        if fmt == 'WEBP':
+            img.save(out, 'WEBP', quality=quality, method=4)
+        else:
+            img.save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+    needed = has_metadata or too_large or orientation not in (None, 1)
+    return out.getvalue(), needed
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = max(1, int(_setting('IMAGE_NORMALIZE_WORKERS', 2)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-normalize')
+        return _executor
+
+
+def normalize(source, name: str = '', max_side: int | None = None, quality: int | None = None,
+              fmt: str | None = None) -> NormalizedImage:
+    """
+    Normalize an encoded image given as bytes or a file object.
+
+    Returns a ``NormalizedImage``; when nothing is gained, or the image cannot
+    be processed in time, ``data`` is None and the caller keeps the original.
+    """
+    # Workers get their own copy, so a timed-out job never touches the caller's file
+    source = _read(source)
+    original_size = len(source)
+    kept = NormalizedImage(name, None, None, original_size, original_size)
+    if not _setting('IMAGE_NORMALIZE_ENABLED', True):
+        return kept
+    max_side = int(max_side or _setting('IMAGE_NORMALIZE_MAX_SIDE', 1600))
+    quality = int(quality or _setting('IMAGE_NORMALIZE_QUALITY', 82))
+    fmt = (fmt or _setting('IMAGE_NORMALIZE_FORMAT', 'JPEG')).upper()
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported image format: {fmt!r}')
+
+    future = _pool().submit(_encode, source, max_side, quality, fmt)
+    try:
+        data, needed = future.result(timeout=_setting('IMAGE_NORMALIZE_TIMEOUT', 30))
+    except FutureTimeout:
+        logger.warning(f"Image normalization timed out for {name or 'upload'}; keeping original")
+        _record('failed', original_size, original_size)
+        return kept
+    except Exception as e:
+        logger.info(f"Image not normalized ({name or 'upload'}): {e}")
+        _record('failed', original_size, original_size)
+        return kept
+
+    if not needed and len(data) >= original_size:
+        _record('kept', original_size, original_size)
+        return kept
+
+    ext, content_type = FORMATS[fmt]
+    new_name = os.path.splitext(os.path.basename(name or 'image'))[0] + ext
+    _record('normalized', original_size, len(data))
+    logger.info(f"Normalized {name or 'upload'}: {original_size} -> {len(data)} bytes")
+    return NormalizedImage(new_name, content_type, data, original_size, len(data))
+
+
+def normalize_upload(uploaded, **options):
+    """
+    Normalized copy of a Django ``UploadedFile`` (or the upload itself when it
+    is not an image or nothing was gained).
+    """
+    if uploaded is None or not is_image_name(getattr(uploaded, 'name', '')):
+        return uploaded
+    result = normalize(uploaded, uploaded.name, **options)
+    if not result.changed:
+        uploaded.seek(0)
+        return uploaded
+    return SimpleUploadedFile(result.name, result.data, content_type=result.content_type)
+
+
+class NormalizedImageField(serializers.ImageField):
+    def to_internal_value(self, data):
+        return super().to_internal_value(normalize_upload(data) if hasattr(data, 'read') else data)
+
+
+class NormalizedFileField(serializers.FileField):
+    """FileField that normalizes uploads with an image extension and passes other files through."""
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(normalize_upload(data) if hasattr(data, 'read') else data)
+
+
+class NormalizeUploadsMixin:
+    """ModelSerializer mixin: image uploads are normalized before field validation."""
+
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: NormalizedImageField,
+        models.FileField: NormalizedFileField,
+    }
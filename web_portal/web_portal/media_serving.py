@@ -0,0 +1,220 @@
+"""
+File responses for media and downloads.
+
+``serve_file`` answers with strong validators (an ETag made of the file's
+mtime and size, plus Last-Modified), turns matching If-None-Match /
+If-Modified-Since requests into 304s and serves single byte ranges (206,
+honouring If-Range), so large PDFs and videos can be resumed and seeked.
+
+Only files that are written once under a versioned name get a year-long
+immutable Cache-Control: those under MEDIA_IMMUTABLE_DIRS (the product
+document cache, whose entries are keyed by the source file's version) and
+hashed copies under STATIC_ROOT when static files are collected with
+ManifestStaticFilesStorage. Uploads and synced product images can be
+replaced under the same name, so other files are revalidated with the ETag
+on every use ('no-cache'), or after MEDIA_CACHE_MAX_AGE seconds when it is set.
+
+With MEDIA_SENDFILE_BACKEND set the body is left to the front server:
+'xsendfile' (Apache mod_xsendfile, lighttpd) sends the absolute path in
+X-Sendfile, 'nginx' sends MEDIA_SENDFILE_URL + the path relative to
+MEDIA_SENDFILE_ROOT in X-Accel-Redirect (an ``internal`` nginx location
+aliased to that root). 304s are still answered here without touching the
+front server.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# ManifestStaticFilesStorage copies: name.<12 hex digits>.ext
+_STATIC_HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[A-Za-z0-9]+$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def etag_for(st) -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def _within(path: str, directory) -> bool:
+    directory = os.path.abspath(str(directory))
+    return os.path.commonpath([directory, path]) == directory
+
+
+def is_immutable(path: str) -> bool:
+    """True when ``path`` (absolute, or relative to MEDIA_ROOT) is never rewritten in place."""
+    path = os.path.abspath(os.path.join(str(settings.MEDIA_ROOT), path))
+    for directory in _setting('MEDIA_IMMUTABLE_DIRS', ()):
+        if _within(path, os.path.join(str(settings.MEDIA_ROOT), directory)):
+            return True
+    static_root = _setting('STATIC_ROOT', None)
+    storage = _setting('STORAGES', {}).get('staticfiles', {}).get('BACKEND', '')
+    return bool(
+        static_root and 'Manifest' in storage and _within(path, static_root)
+        and _STATIC_HASHED_NAME.search(os.path.basename(path))
+    )
+
+
+def default_cache_control(path: str) -> str:
+    if is_immutable(path):
+        return IMMUTABLE_CACHE_CONTROL
+    max_age = int(_setting('MEDIA_CACHE_MAX_AGE', 0))
+    return f'public, max-age={max_age}' if max_age > 0 else 'public, no-cache'
+
+
+def _not_modified(request, etag: str, mtime: int) -> bool:
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        tags = parse_etags(if_none_match)
+        # Weak comparison, as RFC 9110 asks for If-None-Match
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and mtime <= since
+
+
+def _byte_range(request, size: int, etag: str, mtime: int):
+    """
+    (start, end) inclusive for a satisfiable single range, 'unsatisfiable',
+    or None to send the whole file (no Range, stale If-Range, several ranges).
+    """
+    header = request.META.get('HTTP_RANGE', '').strip()
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != mtime:
+            return None
+    match = _RANGE.match(header)
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        start, end = max(size - length, 0), size - 1
+    else:
+        return None
+    if start >= size:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _read_range(file_path: str, start: int, length: int):
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload(file_path: str):
+    """Response header for the front server, or None when serving from Django."""
+    backend = _setting('MEDIA_SENDFILE_BACKEND', '')
+    if backend == 'xsendfile':
+        return 'X-Sendfile', os.path.abspath(file_path)
+    if backend == 'nginx':
+        root = os.path.abspath(str(_setting('MEDIA_SENDFILE_ROOT', '') or settings.MEDIA_ROOT))
+        rel = os.path.relpath(os.path.abspath(file_path), root).replace(os.sep, '/')
+        url = _setting('MEDIA_SENDFILE_URL', '/protected-media/').rstrip('/')
+        return 'X-Accel-Redirect', f'{url}/{quote(rel)}'
+    return None
+
+
+def serve_file(request, file_path: str, *, content_type: str | None = None, filename: str | None = None,
+               disposition: str = 'inline', cache_control: str | None = None):
+    """
+    Response for ``file_path``: 200, 206, 304 or 416.
+
+    Raises OSError when the file cannot be read; callers decide how to report
+    a missing file.
+    """
+    st = os.stat(file_path)
+    etag = etag_for(st)
+    mtime = int(st.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(mtime),
+        'Cache-Control': cache_control or default_cache_control(file_path),
+    }
+
+    if _not_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    if content_type is None:
+        content_type, encoding = mimetypes.guess_type(file_path)
+        if encoding == 'gzip':
+            content_type = 'application/gzip'
+        content_type = content_type or 'application/octet-stream'
+
+    offload = _offload(file_path)
+    if offload:
+        # The front server handles ranges and transfers the body
+        response = HttpResponse(content_type=content_type)
+        response[offload[0]] = offload[1]
+    else:
+        byte_range = _byte_range(request, st.st_size, etag, mtime)
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{st.st_size}'
+        elif byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(_read_range(file_path, start, length), status=206,
+                                             content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+            response['Content-Length'] = str(st.st_size)
+        response['Accept-Ranges'] = 'bytes'
+
+    for name, value in headers.items():
+        response[name] = value
+    name = filename or os.path.basename(file_path)
+    try:
+        name.encode('ascii')
+        response['Content-Disposition'] = f'{disposition}; filename="{name}"'
+    except UnicodeEncodeError:
+        response['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(name)}"
+    return response
+
+
+def is_first_fetch(request, response) -> bool:
+    """False for 304s and for range requests that continue an earlier download."""
+    if response.status_code == 304:
+        return False
+    if response.status_code == 206:
+        return response['Content-Range'].startswith('bytes 0-')
+    if response.status_code != 200:
+        return False
+    if response.has_header('X-Sendfile') or response.has_header('X-Accel-Redirect'):
+        # The front server answers the Range header itself
+        byte_range = request.META.get('HTTP_RANGE', '').replace(' ', '')
+        return not byte_range or byte_range.startswith('bytes=0-')
+    return True
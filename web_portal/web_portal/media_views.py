@@ -1,24 +1,31 @@
 """
 Custom media file serving with graceful error handling for missing files
 """
-from django.http import FileResponse, JsonResponse, HttpResponse
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import JsonResponse
 from django.conf import settings
+from django.utils._os import safe_join
 from django.views.decorators.http import require_http_methods
 import os
-import mimetypes
 
+from .media_serving import serve_file
 
-@require_http_methods(["GET"])
+
+@require_http_methods(["GET", "HEAD"])
 def serve_media_file(request, path):
     """
     Serve media files with graceful handling of missing files.
     Returns a friendly JSON error message instead of 404 page when file doesn't exist.
+    Caching, conditional requests and byte ranges are handled by media_serving.
     """
-    # Construct the full file path
-    file_path = os.path.join(settings.MEDIA_ROOT, path)
+    # Construct the full file path (refusing paths that escape MEDIA_ROOT)
+    try:
+        file_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        file_path = None
 
     # Check if file exists
-    if not os.path.exists(file_path):
+    if not file_path or not os.path.exists(file_path):
         # Return a friendly JSON error message
         return JsonResponse({
             'error': 'File not found',
@@ -36,13 +43,7 @@ def serve_media_file(request, path):
 
     # Serve the file
     try:
-        # Guess the content type
-        content_type, _ = mimetypes.guess_type(file_path)
-
-        # Open and serve the file
-        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
-        response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_path)}"'
-        return response
+        return serve_file(request, file_path)
     except Exception as e:
         return JsonResponse({
             'error': 'Error serving file',
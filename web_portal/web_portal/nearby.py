@@ -0,0 +1,88 @@
+"""
+``GET .../nearby/?lat=..&lng=..&radius_km=..&limit=..`` for viewsets over a
+spatial layer (see spatial_index.py).
+
+The index answers which ids lie within the radius; the rows are then loaded
+through the viewset's own filtered queryset, so hierarchy and ownership
+filters still apply, and serialized with a ``distance_km`` field, nearest
+first.
+"""
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import spatial_index
+
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Candidate ids loaded per query; more are fetched only when the filtered
+# queryset hides so many that the limit is not reached yet
+CHUNK_SIZE = 500
+
+NEARBY_PARAMETERS = [
+    openapi.Parameter('lat', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, required=True, description='Latitude'),
+    openapi.Parameter('lng', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, required=True, description='Longitude'),
+    openapi.Parameter('radius_km', openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                      description=f'Search radius in km (default {DEFAULT_RADIUS_KM}, max {MAX_RADIUS_KM})'),
+    openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description=f'Most results to return (default {DEFAULT_LIMIT}, max {MAX_LIMIT})'),
+]
+
+
+def _number(params, name, default, cast, low, high):
+    raw = params.get(name)
+    if raw in (None, ''):
+        if default is None:
+            raise ValueError(f'{name} is required.')
+        return default
+    try:
+        value = cast(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number.')
+    if not low <= value <= high:
+        raise ValueError(f'{name} must be between {low} and {high}.')
+    return value
+
+
+class NearbyMixin:
+    """Adds a ``nearby`` list action; set ``spatial_layer`` to a spatial_index layer name."""
+
+    spatial_layer = None
+
+    def nearby_rows(self, lat, lng, radius_km, limit):
+        """[(distance_km, obj)] of visible rows within ``radius_km``, nearest first."""
+        hits = spatial_index.get_index(self.spatial_layer).within(lat, lng, radius_km)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = []
+        for start in range(0, len(hits), CHUNK_SIZE):
+            chunk = hits[start:start + CHUNK_SIZE]
+            found = queryset.in_bulk([pk for _, pk in chunk])
+            rows.extend((distance, found[pk]) for distance, pk in chunk if pk in found)
+            if len(rows) >= limit:
+                break
+        return rows[:limit]
+
+    @swagger_auto_schema(
+        operation_description='Rows within radius_km of a point, nearest first, each with its distance_km.',
+        manual_parameters=NEARBY_PARAMETERS,
+    )
+    @action(detail=False, methods=['get'], url_path='nearby')
+    def nearby(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            lat = _number(params, 'lat', None, float, -90, 90)
+            lng = _number(params, 'lng', None, float, -180, 180)
+            radius_km = _number(params, 'radius_km', DEFAULT_RADIUS_KM, float, 0, MAX_RADIUS_KM)
+            limit = _number(params, 'limit', DEFAULT_LIMIT, int, 1, MAX_LIMIT)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = self.nearby_rows(lat, lng, radius_km, limit)
+        data = self.get_serializer([obj for _, obj in rows], many=True).data
+        for item, (distance, _) in zip(data, rows):
+            item['distance_km'] = round(distance, 3)
+        return Response({'count': len(data), 'results': data})
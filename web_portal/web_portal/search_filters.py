@@ -0,0 +1,37 @@
+"""
+DRF filter backends over web_portal.search_index.
+
+``SearchIndexFilter`` answers ``?search=`` from the view model's token
+table instead of ``SearchFilter``'s OR of ``icontains`` lookups.
+``RankedOrderingFilter`` keeps the relevance order of searched querysets
+unless the client asks for an explicit ``?ordering=``.
+"""
+from rest_framework import filters
+
+from . import search_index
+
+
+class SearchIndexFilter(filters.BaseFilterBackend):
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search_index.ranked(search_index.search(queryset, text))
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Search terms; every word must match a name, id, phone, CNIC or place',
+            'schema': {'type': 'string'},
+        }]
+
+
+class RankedOrderingFilter(filters.OrderingFilter):
+    def filter_queryset(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(self.ordering_param):
+            return queryset
+        return super().filter_queryset(request, queryset, view)
@@ -0,0 +1,289 @@
+"""
+Token search index for farmers, farms and dealers.
+
+Searching used to OR ``icontains`` over a dozen columns, i.e. a full scan
+with leading-wildcard LIKEs per keystroke. Each searchable model now has a
+token table (farmers.FarmerSearchToken, farm.FarmSearchToken,
+FieldAdvisoryService.DealerSearchToken) holding the normalized words of its
+searchable fields, indexed on (token, target). A query term then is an
+index range scan (``token LIKE 'term%'``) and every term must match.
+
+Tokens per field, by field type:
+
+- ``text``: lowercased, accent/diacritic-stripped words, plus the digit runs
+  of mixed ids (FM07 -> 'fm07', '07'), plus a phonetic key prefixed with '~'
+  (see ``phonetic_key``) so Roman Urdu spellings and Urdu script meet:
+  Muhammad, Mohammed and محمد all index '~mhmd'.
+- ``phone``: the number without separators, country code or trunk zero
+  (+92 300-1234567 -> '3001234567') and its last 7 digits.
+- ``digits``: the digits only (CNIC 35202-1234567-1 -> '3520212345671').
+
+Results are ranked by the summed field weights of the matched tokens: an
+exact word counts three times its field weight, a prefix twice, a phonetic
+match once.
+
+Tokens are rewritten on save (signals in each app) and can be rebuilt with
+``python manage.py rebuild_search_index``; ``bench_farmer_search`` compares
+the index with the old LIKE search.
+"""
+import re
+import unicodedata
+from functools import reduce
+from operator import or_
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Sum, When, F, Value
+
+TOKEN_MAX_LENGTH = 64
+MAX_QUERY_TERMS = 6
+
+# name: (model, token model, [(field path, field type, weight)])
+INDEXES = {
+    'farmer': ('farmers.Farmer', 'farmers.FarmerSearchToken', [
+        ('farmer_id', 'text', 4),
+        ('first_name', 'text', 3),
+        ('last_name', 'text', 3),
+        ('father_name', 'text', 1),
+        ('primary_phone', 'phone', 4),
+        ('secondary_phone', 'phone', 2),
+        ('cnic', 'digits', 4),
+        ('email', 'text', 1),
+        ('village', 'text', 2),
+        ('tehsil', 'text', 1),
+        ('district', 'text', 1),
+        ('province', 'text', 1),
+    ]),
+    'farm': ('farm.Farm', 'farm.FarmSearchToken', [
+        ('name', 'text', 3),
+        ('address', 'text', 1),
+        ('soil_type', 'text', 1),
+        ('owner.username', 'text', 2),
+    ]),
+    'dealer': ('FieldAdvisoryService.Dealer', 'FieldAdvisoryService.DealerSearchToken', [
+        ('card_code', 'text', 4),
+        ('name', 'text', 3),
+        ('business_name', 'text', 3),
+        ('cnic_number', 'digits', 4),
+        ('contact_number', 'phone', 3),
+        ('mobile_phone', 'phone', 3),
+        ('city', 'text', 1),
+        ('address', 'text', 1),
+    ]),
+}
+
+_WORD = re.compile(r'[^\W_]+')
+_DIGITS = re.compile(r'[0-9]+')
+
+# Arabic code points that Urdu text often carries instead of the Urdu letters
+_ARABIC_TO_URDU = str.maketrans({'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ه': 'ہ', 'ة': 'ہ'})
+
+# Urdu letters to Latin consonant classes; '' drops letters that are vowels or
+# silent in Roman Urdu spellings (alif, waw, ye, ain, hamza, do-chashmi he)
+_URDU_KEY = str.maketrans({
+    'ا': '', 'آ': '', 'أ': '', 'إ': '', 'و': '', 'ؤ': '', 'ی': '', 'ے': '', 'ئ': '', 'ع': '', 'ء': '', 'ھ': '',
+    'ب': 'b', 'پ': 'p', 'ت': 't', 'ٹ': 't', 'ط': 't', 'ث': 's', 'س': 's', 'ص': 's', 'ش': 's',
+    'ج': 'j', 'چ': 'c', 'ح': 'h', 'ہ': 'h', 'خ': 'x', 'د': 'd', 'ڈ': 'd', 'ذ': 'z', 'ز': 'z',
+    'ژ': 'z', 'ض': 'z', 'ظ': 'z', 'ر': 'r', 'ڑ': 'r', 'غ': 'g', 'گ': 'g', 'ف': 'f', 'ق': 'k',
+    'ک': 'k', 'ل': 'l', 'م': 'm', 'ن': 'n', 'ں': 'n',
+})
+_LATIN_DIGRAPHS = (('kh', 'x'), ('gh', 'g'), ('sh', 's'), ('ch', 'c'), ('th', 't'), ('dh', 'd'),
+                   ('ph', 'f'), ('bh', 'b'), ('jh', 'j'), ('q', 'k'))
+_LATIN_DROPPED = str.maketrans('', '', 'aeiouyvw')
+_REPEATS = re.compile(r'(.)\1+')
+
+
+def normalize(text) -> str:
+    """Casefolded text without diacritics, with Arabic letter forms mapped to Urdu."""
+    text = unicodedata.normalize('NFKD', str(text)).translate(_ARABIC_TO_URDU)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return text.casefold()
+
+
+def words(text) -> list:
+    return _WORD.findall(normalize(text)) if text else []
+
+
+def phonetic_key(word: str) -> str:
+    """
+    Consonant skeleton shared by Roman Urdu and Urdu script spellings of a name.
+
+    Vowels (and the letters Urdu uses as vowels) are dropped, similar sounds
+    share a letter, doubled letters collapse and a final 'h' / ہ is ignored.
+    """
+    if word.isascii():
+        if not word.isalpha():
+            return ''
+        word = word.rstrip('h') if len(word) > 2 else word
+        for digraph, letter in _LATIN_DIGRAPHS:
+            word = word.replace(digraph, letter)
+        key = word.translate(_LATIN_DROPPED)
+    else:
+        if word.endswith('ہ') and len(word) > 2:
+            word = word[:-1]
+        key = word.translate(_URDU_KEY)
+        if not key.isascii() or not key.isalpha():
+            return ''
+    return _REPEATS.sub(r'\1', key)
+
+
+def phone_digits(value) -> str:
+    """Local number without separators, country code or trunk zero."""
+    digits = ''.join(_DIGITS.findall(str(value or '')))
+    if digits.startswith('92') and len(digits) >= 12:
+        digits = digits[2:]
+    return digits.lstrip('0')
+
+
+def field_tokens(value, field_type: str):
+    """Tokens of one field value."""
+    if value in (None, ''):
+        return
+    if field_type == 'phone':
+        digits = phone_digits(value)
+        if digits:
+            yield digits
+            if len(digits) > 7:
+                yield digits[-7:]
+        return
+    if field_type == 'digits':
+        digits = ''.join(_DIGITS.findall(str(value)))
+        if digits:
+            yield digits
+        return
+    for word in words(value):
+        yield word[:TOKEN_MAX_LENGTH]
+        if not word.isdigit():
+            for run in _DIGITS.findall(word):
+                yield run
+            key = phonetic_key(word)
+            if len(key) >= 2:
+                yield '~' + key[:TOKEN_MAX_LENGTH - 1]
+
+
+def _resolve(obj, path: str):
+    for attr in path.split('.'):
+        obj = getattr(obj, attr, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def document(obj, fields) -> dict:
+    """{token: weight} of ``obj``; a token found in several fields keeps its highest weight."""
+    tokens = {}
+    for path, field_type, weight in fields:
+        for token in field_tokens(_resolve(obj, path), field_type):
+            if tokens.get(token, 0) < weight:
+                tokens[token] = weight
+    return tokens
+
+
+def _index_for(model):
+    label = model._meta.label
+    for name, (model_label, token_label, fields) in INDEXES.items():
+        if model_label == label:
+            return name, apps.get_model(token_label), fields
+    raise LookupError(f'{label} has no search index')
+
+
+def index_objects(objs, token_model, fields) -> int:
+    """Replace the tokens of ``objs``; returns the number of token rows written."""
+    objs = list(objs)
+    if not objs:
+        return 0
+    rows = [
+        token_model(target_id=obj.pk, token=token, weight=weight)
+        for obj in objs
+        for token, weight in document(obj, fields).items()
+    ]
+    with transaction.atomic():
+        token_model.objects.filter(target_id__in=[obj.pk for obj in objs]).delete()
+        token_model.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def reindex(obj) -> None:
+    """Rewrite the tokens of one saved object."""
+    _, token_model, fields = _index_for(type(obj))
+    index_objects([obj], token_model, fields)
+
+
+def rebuild(model, token_model, fields, batch_size: int = 1000, queryset=None) -> tuple:
+    """Index every row of ``model`` in primary-key batches; returns (objects, tokens)."""
+    related = sorted({path.rsplit('.', 1)[0] for path, _, _ in fields if '.' in path})
+    queryset = (queryset if queryset is not None else model.objects.all()).select_related(*related).order_by('pk')
+    objects = tokens = 0
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return objects, tokens
+        tokens += index_objects(batch, token_model, fields)
+        objects += len(batch)
+        last_pk = batch[-1].pk
+
+
+def rebuild_index(name: str, batch_size: int = 1000) -> tuple:
+    model_label, token_label, fields = INDEXES[name]
+    return rebuild(apps.get_model(model_label), apps.get_model(token_label), fields, batch_size)
+
+
+def query_terms(text) -> list:
+    """[(exact tokens, prefix tokens, phonetic key)] per query word; at most MAX_QUERY_TERMS."""
+    terms = []
+    for word in words(text)[:MAX_QUERY_TERMS]:
+        if word.isdigit():
+            forms = {word}
+            if phone_digits(word):
+                forms.add(phone_digits(word))
+            terms.append((forms, forms, ''))
+        else:
+            key = phonetic_key(word)
+            terms.append(({word}, {word}, '~' + key if len(key) >= 2 else ''))
+    return terms
+
+
+def _term_q(exact, prefixes, key):
+    q = Q(token__in=exact)
+    for prefix in prefixes:
+        q |= Q(token__startswith=prefix)
+    if key:
+        q |= Q(token__startswith=key)
+    return q
+
+
+def search(queryset, text):
+    """
+    ``queryset`` narrowed to rows matching every word of ``text``, annotated
+    with ``search_rank``. Ordering is left to the caller.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return queryset
+    _, token_model, _ = _index_for(queryset.model)
+    tokens = token_model.objects.all()
+    for term in terms:
+        queryset = queryset.filter(pk__in=tokens.filter(_term_q(*term)).values('target_id'))
+
+    exact = set().union(*(term[0] for term in terms))
+    prefix_q = reduce(or_, (Q(token__startswith=p) for term in terms for p in term[1]))
+    keys = [term[2] for term in terms if term[2]]
+    whens = [When(token__in=exact, then=F('weight') * 3), When(prefix_q, then=F('weight') * 2)]
+    if keys:
+        whens.append(When(reduce(or_, (Q(token__startswith=key) for key in keys)), then=F('weight')))
+    rank = (
+        tokens.filter(target_id=OuterRef('pk'))
+        .values('target_id')
+        .annotate(rank=Sum(Case(*whens, default=Value(0), output_field=IntegerField())))
+        .values('rank')
+    )
+    return queryset.annotate(search_rank=Subquery(rank, output_field=IntegerField()))
+
+
+def ranked(queryset, *tiebreak):
+    """Best matches first, when ``queryset`` came from ``search``."""
+    if 'search_rank' not in queryset.query.annotations:
+        return queryset
+    return queryset.order_by('-search_rank', *(tiebreak or ('-pk',)))
@@ -25,6 +25,73 @@ config = Config(RepositoryEnv(str(ENV_FILE)))
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media responses (web_portal/media_serving.py). Files under MEDIA_IMMUTABLE_DIRS
+# (relative to MEDIA_ROOT, written once under versioned names) are cached for a
+# year; others are revalidated with their ETag, or cached for MEDIA_CACHE_MAX_AGE
+# seconds when it is above 0.
+# MEDIA_SENDFILE_BACKEND: '' (Django streams the file), 'xsendfile' or 'nginx'
+# (X-Accel-Redirect to MEDIA_SENDFILE_URL, an internal location aliased to
+# MEDIA_SENDFILE_ROOT, default MEDIA_ROOT).
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', cast=int, default=0)
+MEDIA_IMMUTABLE_DIRS = config('MEDIA_IMMUTABLE_DIRS', cast=Csv(), default='cache/product_documents')
+MEDIA_SENDFILE_BACKEND = config('MEDIA_SENDFILE_BACKEND', default='')
+MEDIA_SENDFILE_ROOT = config('MEDIA_SENDFILE_ROOT', default='')
+MEDIA_SENDFILE_URL = config('MEDIA_SENDFILE_URL', default='/protected-media/')
+
+# Attachment download counters and logs are buffered per process and written in
+# batches (document_management/tracking.py): after FLUSH_SIZE events or
+# FLUSH_INTERVAL seconds, whichever comes first.
+DOCUMENT_TRACKING_BUFFERED = config('DOCUMENT_TRACKING_BUFFERED', cast=bool, default=True)
+DOCUMENT_TRACKING_FLUSH_SIZE = config('DOCUMENT_TRACKING_FLUSH_SIZE', cast=int, default=200)
+DOCUMENT_TRACKING_FLUSH_INTERVAL = config('DOCUMENT_TRACKING_FLUSH_INTERVAL', cast=int, default=5)
+
+# Most events the mobile app may send in one offline attendance sync request
+ATTENDANCE_SYNC_MAX_EVENTS = config('ATTENDANCE_SYNC_MAX_EVENTS', cast=int, default=500)
+
+# Check-ins must be within this many km of the centre of one of the attendee's
+# assigned territories (attendance/geofence.py); 0 disables the check
+ATTENDANCE_GEOFENCE_RADIUS_KM = config('ATTENDANCE_GEOFENCE_RADIUS_KM', cast=float, default=0)
+
+# Territory, dealer and farm locations are indexed per process in a lat/lng
+# grid of SPATIAL_INDEX_CELL_DEG degree cells (web_portal/spatial_index.py),
+# rebuilt on change and at the latest every SPATIAL_INDEX_TTL seconds
+SPATIAL_INDEX_TTL = config('SPATIAL_INDEX_TTL', cast=int, default=600)
+SPATIAL_INDEX_CELL_DEG = config('SPATIAL_INDEX_CELL_DEG', cast=float, default=0.05)
+
+# Numbers of an ID series (farmer IDs, portal order IDs) reserved per process
+# at a time outside transactions (accounts/sequences.py); 1 keeps the series
+# gapless, larger blocks cut counter-row round trips during bulk imports
+IDSEQUENCE_BLOCK_SIZE = config('IDSEQUENCE_BLOCK_SIZE', cast=int, default=1)
+
+# Bulk farmer onboarding (farmers/onboarding.py): rows per transaction, the
+# largest accepted upload, and whether uploads run in a background thread of
+# the web process (False leaves them to `manage.py process_farmer_imports`)
+FARMER_IMPORT_BATCH_SIZE = config('FARMER_IMPORT_BATCH_SIZE', cast=int, default=500)
+FARMER_IMPORT_MAX_ROWS = config('FARMER_IMPORT_MAX_ROWS', cast=int, default=100000)
+FARMER_IMPORT_IN_THREAD = config('FARMER_IMPORT_IN_THREAD', cast=bool, default=True)
+
+# Hours a cart item stays in the cart; older items are hidden from cart
+# requests and marked inactive by `manage.py clean_expired_carts`
+CART_ITEM_TTL_HOURS = config('CART_ITEM_TTL_HOURS', cast=int, default=24)
+
+# Seconds order statistics and dealer order dashboards stay cached
+# (cart/statistics.py); order saves invalidate them early, 0 disables.
+# Only used with a cache backend shared by all workers (not LocMemCache)
+ORDER_STATS_CACHE_TTL = config('ORDER_STATS_CACHE_TTL', cast=int, default=60)
+
+# Minutes an initiated JazzCash payment may stay open before
+# `manage.py reconcile_jazzcash_payments` asks the gateway about it
+JAZZCASH_RECONCILE_AFTER_MINUTES = config('JAZZCASH_RECONCILE_AFTER_MINUTES', cast=int, default=15)
+
+# Uploaded photos are re-oriented, downscaled, recompressed and stripped of
+# metadata before they are stored (see web_portal/image_pipeline.py)
+IMAGE_NORMALIZE_ENABLED = config('IMAGE_NORMALIZE_ENABLED', cast=bool, default=True)
+IMAGE_NORMALIZE_MAX_SIDE = config('IMAGE_NORMALIZE_MAX_SIDE', cast=int, default=1600)
+IMAGE_NORMALIZE_QUALITY = config('IMAGE_NORMALIZE_QUALITY', cast=int, default=82)
+IMAGE_NORMALIZE_FORMAT = config('IMAGE_NORMALIZE_FORMAT', default='JPEG')  # JPEG or WEBP
+IMAGE_NORMALIZE_WORKERS = config('IMAGE_NORMALIZE_WORKERS', cast=int, default=2)
+IMAGE_NORMALIZE_TIMEOUT = config('IMAGE_NORMALIZE_TIMEOUT', cast=int, default=30)
+
 # Base URL for generating full image URLs
 # Change this to your production domain when deploying
 # Examples:
@@ -59,6 +126,17 @@ SAP_B1S_PORT     = config('SAP_B1S_PORT',     default='50000')
 SAP_B1S_BASE_PATH= config('SAP_B1S_BASE_PATH',default='/b1s/v1')
 SAP_USE_HTTP     = config('SAP_USE_HTTP',     default='false')
 
+# Local SQLite mirror of closed-month sales/invoice facts used by the HANA
+# reports (sap_integration.hana_mirror). Empty = always query HANA live.
+# Filled by: python manage.py sync_sap_mirror
+SAP_ANALYTICS_MIRROR_DIR = config('SAP_ANALYTICS_MIRROR_DIR', default='')
+
+# Product description .docx files converted to HTML (sap_integration.utils.document_cache).
+# Empty dir = MEDIA_ROOT/cache/product_documents. Filled by: python manage.py warm_product_documents
+PRODUCT_DOCUMENT_CACHE_ENABLED = config('PRODUCT_DOCUMENT_CACHE_ENABLED', cast=bool, default=True)
+PRODUCT_DOCUMENT_CACHE_DIR = config('PRODUCT_DOCUMENT_CACHE_DIR', default='')
+PRODUCT_DOCUMENT_CACHE_MAX_BYTES = config('PRODUCT_DOCUMENT_CACHE_MAX_BYTES', cast=int, default=200 * 1024 * 1024)
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -366,6 +444,30 @@ WEATHER_API_KEY = "36c4dcfbb24443b18b2112951252507"
 # ==============================================================================
 KINDWISE_API_ENABLED = config('KINDWISE_API_ENABLED', cast=bool, default=True)
 KINDWISE_API_KEY = config('KINDWISE_API_KEY', default='K3heryGSyoR6KdYJML6UXGjiQXA9FFqQzBBMycxLT7TLnJG5H9')
+KINDWISE_API_URL = config('KINDWISE_API_URL', default='https://crop.kindwise.com')
+KINDWISE_API_TIMEOUT = config('KINDWISE_API_TIMEOUT', cast=int, default=30)
+# Longer side of the photo sent to Kindwise; larger uploads are downscaled first
+KINDWISE_IMAGE_MAX_SIDE = config('KINDWISE_IMAGE_MAX_SIDE', cast=int, default=1280)
+KINDWISE_IMAGE_QUALITY = config('KINDWISE_IMAGE_QUALITY', cast=int, default=85)
+# Reuse stored identifications for the same photo (exact SHA-256 or perceptual hash)
+KINDWISE_CACHE_ENABLED = config('KINDWISE_CACHE_ENABLED', cast=bool, default=True)
+KINDWISE_CACHE_MAX_DISTANCE = config('KINDWISE_CACHE_MAX_DISTANCE', cast=int, default=4)  # Hamming bits of 64
+KINDWISE_CACHE_MAX_AGE_DAYS = config('KINDWISE_CACHE_MAX_AGE_DAYS', cast=int, default=30)
+KINDWISE_CACHE_SCAN_LIMIT = config('KINDWISE_CACHE_SCAN_LIMIT', cast=int, default=5000)
+# Seconds before a process rebuilds its disease name index even without a change signal
+KINDWISE_DISEASE_INDEX_TTL = config('KINDWISE_DISEASE_INDEX_TTL', cast=int, default=300)
+# Seconds a disease's recommended products (with catalog data) are cached per company schema
+KINDWISE_RECOMMENDATION_CACHE_TTL = config('KINDWISE_RECOMMENDATION_CACHE_TTL', cast=int, default=600)
+# Background identification jobs (kindwise/jobs.py). 0 workers: run them with
+# `manage.py run_kindwise_worker` only. EAGER runs jobs inside the request.
+KINDWISE_JOB_WORKERS = config('KINDWISE_JOB_WORKERS', cast=int, default=2)
+KINDWISE_JOB_EAGER = config('KINDWISE_JOB_EAGER', cast=bool, default=False)
+KINDWISE_JOB_RETRIES = config('KINDWISE_JOB_RETRIES', cast=int, default=2)
+KINDWISE_JOB_RETRY_BACKOFF = config('KINDWISE_JOB_RETRY_BACKOFF', cast=float, default=2.0)
+KINDWISE_JOB_SSE_TIMEOUT = config('KINDWISE_JOB_SSE_TIMEOUT', cast=int, default=60)
+# Answer with a canned identification instead of calling Kindwise (development/tests)
+KINDWISE_FAKE_UPSTREAM = config('KINDWISE_FAKE_UPSTREAM', cast=bool, default=False)
+KINDWISE_FAKE_DELAY = config('KINDWISE_FAKE_DELAY', cast=float, default=0)
 
 # ==============================================================================
 # CACHING CONFIGURATION - Performance Optimization
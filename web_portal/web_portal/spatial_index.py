@@ -0,0 +1,219 @@
+"""
+In-memory spatial index over territories, dealers and farms.
+
+Locations are stored as plain columns (Territory and Dealer latitude /
+longitude decimals, Farm's "lat,lng" GeoLocationField), so "which dealers are
+near this point" or "is this check-in inside the assigned territory" used to
+mean loading every row and measuring in Python. ``GridIndex`` buckets points
+into SPATIAL_INDEX_CELL_DEG x SPATIAL_INDEX_CELL_DEG degree cells; a radius
+query only measures the points of the cells overlapping the search circle's
+bounding box, and a nearest query scans rings of cells outwards until no
+unscanned cell can hold anything closer. Distances are great-circle
+(haversine) kilometres.
+
+One index per layer ('territories', 'dealers', 'farms') is built per process
+on first use, holding only ids and coordinates; callers load the rows they
+need by id. Saving or deleting a territory, dealer or farm invalidates its
+layer (FieldAdvisoryService.signals, farm.signals); other processes notice
+through a version number kept in the Django cache and rebuild at the latest
+after SPATIAL_INDEX_TTL seconds.
+
+``python manage.py bench_spatial_index`` measures the index against a linear
+scan on synthetic points.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+VERSION_KEY = 'spatial_index:{layer}:version'
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_point(value):
+    """(lat, lng) floats from a "lat,lng" string or GeoPt; None when missing or invalid."""
+    if value is None:
+        return None
+    parts = str(value).split(',')
+    if len(parts) != 2:
+        return None
+    try:
+        lat, lng = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+        return None
+    return lat, lng
+
+
+class GridIndex:
+    """Fixed-size lat/lng grid of (key, lat, lng) points."""
+
+    def __init__(self, points=(), cell_deg: float = 0.05):
+        self.cell_deg = cell_deg
+        self._cells = defaultdict(list)
+        self._points = {}
+        for key, lat, lng in points:
+            self.add(key, lat, lng)
+
+    def _cell(self, lat: float, lng: float):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def add(self, key, lat: float, lng: float) -> None:
+        lat, lng = float(lat), float(lng)
+        self._points[key] = (lat, lng)
+        self._cells[self._cell(lat, lng)].append((key, lat, lng))
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key) -> bool:
+        return key in self._points
+
+    def point(self, key):
+        """(lat, lng) of ``key`` or None."""
+        return self._points.get(key)
+
+    def within(self, lat: float, lng: float, radius_km: float, limit: int | None = None):
+        """[(distance_km, key)] of the points within ``radius_km``, nearest first."""
+        dlat = radius_km / KM_PER_DEGREE
+        # Longitude degrees shrink towards the poles; widest at the box's edge nearest a pole
+        edge = min(89.9, abs(lat) + dlat)
+        dlng = min(180.0, radius_km / (KM_PER_DEGREE * math.cos(math.radians(edge))))
+        row0, col0 = self._cell(lat - dlat, lng - dlng)
+        row1, col1 = self._cell(lat + dlat, lng + dlng)
+        hits = []
+        cells = self._cells
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                for key, plat, plng in cells.get((row, col), ()):
+                    distance = haversine_km(lat, lng, plat, plng)
+                    if distance <= radius_km:
+                        hits.append((distance, key))
+        hits.sort(key=lambda hit: hit[0])
+        return hits[:limit] if limit else hits
+
+    def _ring(self, row0: int, col0: int, ring: int):
+        """Cells at Chebyshev distance ``ring`` from (row0, col0)."""
+        if ring == 0:
+            yield row0, col0
+            return
+        for col in range(col0 - ring, col0 + ring + 1):
+            yield row0 - ring, col
+            yield row0 + ring, col
+        for row in range(row0 - ring + 1, row0 + ring):
+            yield row, col0 - ring
+            yield row, col0 + ring
+
+    def nearest(self, lat: float, lng: float, k: int = 1, max_km: float | None = None):
+        """[(distance_km, key)] of the ``k`` nearest points (within ``max_km``), nearest first."""
+        row0, col0 = self._cell(lat, lng)
+        cells = self._cells
+        best = []
+        ring = 0
+        while cells:
+            if (2 * ring + 1) ** 2 > len(cells):
+                # Sparse data far away: measuring every point is cheaper than more rings
+                best = [(haversine_km(lat, lng, plat, plng), key)
+                        for bucket in cells.values() for key, plat, plng in bucket]
+                best.sort(key=lambda hit: hit[0])
+                del best[k:]
+                break
+            for cell in self._ring(row0, col0, ring):
+                for key, plat, plng in cells.get(cell, ()):
+                    best.append((haversine_km(lat, lng, plat, plng), key))
+            best.sort(key=lambda hit: hit[0])
+            del best[k:]
+            # Anything outside the scanned rings is at least this far away
+            edge = min(89.9, abs(lat) + (ring + 1) * self.cell_deg)
+            reach = ring * self.cell_deg * KM_PER_DEGREE * math.cos(math.radians(edge))
+            if (len(best) == k and best[-1][0] <= reach) or (max_km is not None and reach > max_km):
+                break
+            ring += 1
+        if max_km is not None:
+            best = [hit for hit in best if hit[0] <= max_km]
+        return best
+
+
+# ---------------------------------------------------------------------------
+# Layers
+# ---------------------------------------------------------------------------
+
+def _territory_points():
+    from FieldAdvisoryService.models import Territory
+    rows = Territory.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    return rows.values_list('id', 'latitude', 'longitude').iterator()
+
+
+def _dealer_points():
+    from FieldAdvisoryService.models import Dealer
+    rows = Dealer.objects.filter(is_active=True, latitude__isnull=False, longitude__isnull=False)
+    return rows.values_list('id', 'latitude', 'longitude').iterator()
+
+
+def _farm_points():
+    from farm.models import Farm
+    for pk, geolocation in Farm.objects.filter(deleted_at__isnull=True).values_list('id', 'geolocation').iterator():
+        point = parse_point(geolocation)
+        if point:
+            yield pk, point[0], point[1]
+
+
+LAYERS = {
+    'territories': _territory_points,
+    'dealers': _dealer_points,
+    'farms': _farm_points,
+}
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def get_index(layer: str) -> GridIndex:
+    """The process-wide index of ``layer``, built or rebuilt as needed."""
+    if layer not in LAYERS:
+        raise KeyError(f'Unknown spatial layer: {layer}')
+    ttl = _setting('SPATIAL_INDEX_TTL', 600)
+    version = cache.get(VERSION_KEY.format(layer=layer))
+    entry = _indexes.get(layer)
+    if entry and entry[1] == version and (not ttl or time.monotonic() - entry[2] < ttl):
+        return entry[0]
+    with _lock:
+        entry = _indexes.get(layer)
+        if not entry or entry[1] != version or (ttl and time.monotonic() - entry[2] >= ttl):
+            index = GridIndex(
+                ((pk, lat, lng) for pk, lat, lng in LAYERS[layer]()),
+                cell_deg=_setting('SPATIAL_INDEX_CELL_DEG', 0.05),
+            )
+            entry = (index, version, time.monotonic())
+            _indexes[layer] = entry
+        return entry[0]
+
+
+def invalidate(layer: str) -> None:
+    """Drop this process's ``layer`` index and tell other processes to rebuild theirs."""
+    with _lock:
+        _indexes.pop(layer, None)
+    key = VERSION_KEY.format(layer=layer)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
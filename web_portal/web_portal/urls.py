@@ -125,8 +125,9 @@ urlpatterns = [
     path('', include('general_ledger.urls')),  # General Ledger app URLs (includes both API and admin routes)
 ]
 
-# Custom media file serving with graceful error handling
-if settings.DEBUG:
+# Custom media file serving with graceful error handling (also in production when
+# MEDIA_SENDFILE_BACKEND hands the transfer to the front server)
+if settings.DEBUG or settings.MEDIA_SENDFILE_BACKEND:
     urlpatterns += [
         re_path(r'^media/(?P<path>.*)$', serve_media_file, name='serve_media'),
     ]